@@ -17,6 +17,7 @@
 
 import os
 import socket
+import time
 import uuid
 
 import eventlet
@@ -50,6 +51,12 @@ METADATA_DEFAULT_PREFIX = 16
 METADATA_DEFAULT_IP = '169.254.169.254/%d' % METADATA_DEFAULT_PREFIX
 METADATA_PORT = 80
 
+# Actions of the network events, see NetworkEventQueue
+RELOAD_HOSTS = 'reload_hosts'
+REFRESH = 'refresh'
+ENABLE = 'enable'
+DISABLE = 'disable'
+
 
 class DhcpAgent(manager.Manager):
     OPTS = [
@@ -66,6 +73,14 @@ class DhcpAgent(manager.Manager):
                     help=_("Allows for serving metadata requests from a "
                            "dedicated network. Requires "
                            "enable_isolated_metadata = True")),
+        cfg.FloatOpt('event_debounce_interval', default=0.5,
+                     help=_("Minimum number of seconds between two updates "
+                            "of the DHCP server of a network. The events "
+                            "received in the meantime are merged into one "
+                            "update. 0 handles each event on arrival.")),
+        cfg.IntOpt('event_workers', default=8,
+                   help=_("Maximum number of networks whose DHCP server is "
+                          "updated in parallel.")),
     ]
 
     def __init__(self, host=None):
@@ -73,12 +88,20 @@ class DhcpAgent(manager.Manager):
         self.needs_resync = False
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        # Port events received while networks are fetched, one list per
+        # fetch, see _get_network_info
+        self._port_event_logs = []
+        # Statistics of the last sync_state, exposed in the state report
+        self.sync_stats = {}
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
         self.plugin_rpc = DhcpPluginApi(topics.PLUGIN, ctx)
         self.device_manager = DeviceManager(self.conf, self.plugin_rpc)
         self.lease_relay = DhcpLeaseRelay(self.update_lease)
+        self.queue = NetworkEventQueue(self._process_network_event,
+                                       self.conf.event_debounce_interval,
+                                       self.conf.event_workers)
 
         self.dhcp_version = self.dhcp_driver_cls.check_version()
         self._populate_networks_cache()
@@ -146,19 +169,48 @@ class DhcpAgent(manager.Manager):
     def sync_state(self):
         """Sync the local DHCP state with Quantum."""
         LOG.info(_('Synchronizing state'))
+        start = time.time()
         known_networks = set(self.cache.get_network_ids())
 
         try:
-            active_networks = set(self.plugin_rpc.get_active_networks())
+            fingerprints = self.plugin_rpc.get_active_networks(
+                fingerprints=True)
+            if not isinstance(fingerprints, dict):
+                # The server does not compute fingerprints
+                fingerprints = dict.fromkeys(fingerprints)
+            active_networks = set(fingerprints)
             for deleted_id in known_networks - active_networks:
                 self.disable_dhcp_helper(deleted_id)
-
-            for network_id in active_networks:
-                self.refresh_dhcp_helper(network_id)
+            self.cache.prune_fingerprints(active_networks)
+
+            skipped = 0
+            for network_id, fingerprint in fingerprints.iteritems():
+                if (fingerprint is not None and
+                    fingerprint == self.cache.get_fingerprint(network_id)):
+                    skipped += 1
+                    continue
+                self._sync_network(network_id, fingerprint)
+            self.sync_stats = {
+                'resync_duration': round(time.time() - start, 3),
+                'resync_networks': len(active_networks),
+                'resync_skipped': skipped}
+            LOG.info(_('Synchronized %(resync_networks)d networks in '
+                       '%(resync_duration).3fs, %(resync_skipped)d were '
+                       'unchanged'), self.sync_stats)
         except Exception:
             self.needs_resync = True
             LOG.exception(_('Unable to sync network state.'))
 
+    def _sync_network(self, network_id, fingerprint):
+        """Refresh a network, remembering its fingerprint on success."""
+        needs_resync, self.needs_resync = self.needs_resync, False
+        try:
+            self.refresh_dhcp_helper(network_id)
+            if fingerprint is not None and not self.needs_resync:
+                self.cache.put_fingerprint(network_id, fingerprint)
+        finally:
+            self.needs_resync = self.needs_resync or needs_resync
+
     def _periodic_resync_helper(self):
         """Resync the dhcp state at the configured interval."""
         while True:
@@ -171,10 +223,48 @@ class DhcpAgent(manager.Manager):
         """Spawn a thread to periodically resync the dhcp state."""
         eventlet.spawn(self._periodic_resync_helper)
 
+    def _get_network_info(self, network_id):
+        """Fetch a network, logging the port events received meanwhile.
+
+        Events are handled while the network is fetched, and the fetched
+        network may not include their ports yet.
+
+        :returns: the network and the port events to apply to it once it
+                  is cached, see _put_network.
+        """
+        events = []
+        self._port_event_logs.append(events)
+        try:
+            return self.plugin_rpc.get_network_info(network_id), events
+        finally:
+            self._port_event_logs = [log for log in self._port_event_logs
+                                     if log is not events]
+
+    def _log_port_event(self, action, port):
+        for log in self._port_event_logs:
+            log.append((action, port))
+
+    def _put_network(self, network, port_events):
+        """Cache a fetched network, applying the port events it missed."""
+        self.cache.put(network)
+        applied = False
+        for action, port in port_events:
+            if action == 'remove':
+                port = self.cache.get_port_by_id(port)
+            if not port or port.network_id != network.id:
+                continue
+            if action == 'remove':
+                self.cache.remove_port(port)
+            else:
+                self.cache.put_port(port)
+            applied = True
+        if applied:
+            self.queue.put(network.id, RELOAD_HOSTS)
+
     def enable_dhcp_helper(self, network_id):
         """Enable DHCP for a network that meets enabling criteria."""
         try:
-            network = self.plugin_rpc.get_network_info(network_id)
+            network, port_events = self._get_network_info(network_id)
         except Exception:
             self.needs_resync = True
             LOG.exception(_('Network %s RPC info call failed.'), network_id)
@@ -189,7 +279,7 @@ class DhcpAgent(manager.Manager):
                     if (self.conf.use_namespaces and
                         self.conf.enable_isolated_metadata):
                         self.enable_isolated_metadata_proxy(network)
-                    self.cache.put(network)
+                    self._put_network(network, port_events)
                 break
 
     def disable_dhcp_helper(self, network_id):
@@ -212,7 +302,7 @@ class DhcpAgent(manager.Manager):
             return self.enable_dhcp_helper(network_id)
 
         try:
-            network = self.plugin_rpc.get_network_info(network_id)
+            network, port_events = self._get_network_info(network_id)
         except Exception:
             self.needs_resync = True
             LOG.exception(_('Network %s RPC info call failed.'), network_id)
@@ -223,38 +313,48 @@ class DhcpAgent(manager.Manager):
 
         if new_cidrs and old_cidrs == new_cidrs:
             self.call_driver('reload_allocations', network)
-            self.cache.put(network)
+            self._put_network(network, port_events)
         elif new_cidrs:
             if self.call_driver('restart', network):
-                self.cache.put(network)
+                self._put_network(network, port_events)
         else:
             self.disable_dhcp_helper(network.id)
 
+    def _process_network_event(self, network_id, action):
+        """Apply the merged events of a network, called by the queue."""
+        if action == RELOAD_HOSTS:
+            # The cache has the ports of the events applied already
+            network = self.cache.get_network_by_id(network_id)
+            if network:
+                self.call_driver('reload_hosts', network)
+        else:
+            getattr(self, '%s_dhcp_helper' % action)(network_id)
+
     @lockutils.synchronized('agent', 'dhcp-')
     def network_create_end(self, context, payload):
         """Handle the network.create.end notification event."""
         network_id = payload['network']['id']
-        self.enable_dhcp_helper(network_id)
+        self.queue.put(network_id, ENABLE)
 
     @lockutils.synchronized('agent', 'dhcp-')
     def network_update_end(self, context, payload):
         """Handle the network.update.end notification event."""
         network_id = payload['network']['id']
         if payload['network']['admin_state_up']:
-            self.enable_dhcp_helper(network_id)
+            self.queue.put(network_id, ENABLE)
         else:
-            self.disable_dhcp_helper(network_id)
+            self.queue.put(network_id, DISABLE)
 
     @lockutils.synchronized('agent', 'dhcp-')
     def network_delete_end(self, context, payload):
         """Handle the network.delete.end notification event."""
-        self.disable_dhcp_helper(payload['network_id'])
+        self.queue.put(payload['network_id'], DISABLE)
 
     @lockutils.synchronized('agent', 'dhcp-')
     def subnet_update_end(self, context, payload):
         """Handle the subnet.update.end notification event."""
         network_id = payload['subnet']['network_id']
-        self.refresh_dhcp_helper(network_id)
+        self.queue.put(network_id, REFRESH)
 
     # Use the update handler for the subnet create event.
     subnet_create_end = subnet_update_end
@@ -265,16 +365,17 @@ class DhcpAgent(manager.Manager):
         subnet_id = payload['subnet_id']
         network = self.cache.get_network_by_subnet_id(subnet_id)
         if network:
-            self.refresh_dhcp_helper(network.id)
+            self.queue.put(network.id, REFRESH)
 
     @lockutils.synchronized('agent', 'dhcp-')
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
         port = DictModel(payload['port'])
+        self._log_port_event('put', port)
         network = self.cache.get_network_by_id(port.network_id)
         if network:
             self.cache.put_port(port)
-            self.call_driver('reload_allocations', network)
+            self.queue.put(network.id, RELOAD_HOSTS)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -282,11 +383,12 @@ class DhcpAgent(manager.Manager):
     @lockutils.synchronized('agent', 'dhcp-')
     def port_delete_end(self, context, payload):
         """Handle the port.delete.end notification event."""
+        self._log_port_event('remove', payload['port_id'])
         port = self.cache.get_port_by_id(payload['port_id'])
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
+            self.queue.put(network.id, RELOAD_HOSTS)
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -356,11 +458,18 @@ class DhcpPluginApi(proxy.RpcProxy):
         self.context = context
         self.host = cfg.CONF.host
 
-    def get_active_networks(self):
-        """Make a remote process call to retrieve the active networks."""
-        return self.call(self.context,
-                         self.make_msg('get_active_networks', host=self.host),
-                         topic=self.topic)
+    def get_active_networks(self, fingerprints=False):
+        """Make a remote process call to retrieve the active networks.
+
+        With fingerprints, servers which support it return a dict of
+        the content hash of each network instead of a list of ids.
+        """
+        if fingerprints:
+            msg = self.make_msg('get_active_networks', host=self.host,
+                                fingerprints=True)
+        else:
+            msg = self.make_msg('get_active_networks', host=self.host)
+        return self.call(self.context, msg, topic=self.topic)
 
     def get_network_info(self, network_id):
         """Make a remote process call to retrieve network info."""
@@ -415,6 +524,8 @@ class NetworkCache(object):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        # {network_id: server fingerprint of the last successful refresh}
+        self.fingerprints = {}
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -442,6 +553,7 @@ class NetworkCache(object):
 
     def remove(self, network):
         del self.cache[network.id]
+        self.fingerprints.pop(network.id, None)
 
         for subnet in network.subnets:
             del self.subnet_lookup[subnet.id]
@@ -469,6 +581,17 @@ class NetworkCache(object):
                 del self.port_lookup[port.id]
                 break
 
+    def get_fingerprint(self, network_id):
+        return self.fingerprints.get(network_id)
+
+    def put_fingerprint(self, network_id, fingerprint):
+        self.fingerprints[network_id] = fingerprint
+
+    def prune_fingerprints(self, network_ids):
+        """Forget the fingerprints of networks not in network_ids."""
+        for network_id in set(self.fingerprints) - set(network_ids):
+            del self.fingerprints[network_id]
+
     def get_port_by_id(self, port_id):
         network = self.get_network_by_port_id(port_id)
         if network:
@@ -490,6 +613,116 @@ class NetworkCache(object):
                 'ports': num_ports}
 
 
+class NetworkEventQueue(object):
+    """Queue of the pending DHCP updates, merged per network.
+
+    The events of a network are merged into a single action while they
+    wait: enabling or disabling DHCP supersedes any other action, a
+    refresh of the subnets supersedes an update of the host entries.
+    A network is processed at most once per interval, and different
+    networks are processed in parallel by a pool of green threads.
+    """
+
+    def __init__(self, process, interval, workers):
+        # process(network_id, action) applies the action of a network
+        self.process = process
+        self.interval = interval
+        self.pool = eventlet.GreenPool(workers)
+        # {network_id: [action, time of the first merged event]}
+        self.pending = {}
+        # {network_id: time the network was last processed}, pruned of
+        # the networks processed more than an interval ago
+        self.processed_at = {}
+        self.pruned_at = 0
+        # Networks waiting for their interval to elapse, or processed
+        self.scheduled = set()
+        self.events = 0
+        self.merged_events = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.processed = 0
+
+    @staticmethod
+    def _merge(pending, action):
+        if action in (ENABLE, DISABLE):
+            return action
+        if action == REFRESH and pending == RELOAD_HOSTS:
+            return action
+        return pending
+
+    def put(self, network_id, action):
+        """Queue an action, merging it with the one pending, if any."""
+        self.events += 1
+        pending = self.pending.get(network_id)
+        if pending:
+            self.merged_events += 1
+            pending[0] = self._merge(pending[0], action)
+        else:
+            self.pending[network_id] = [action, time.time()]
+        if self.interval <= 0:
+            self._process(network_id)
+        else:
+            self._schedule(network_id)
+
+    def _schedule(self, network_id):
+        if network_id in self.scheduled:
+            return
+        self.scheduled.add(network_id)
+        delay = (self.processed_at.get(network_id, 0) + self.interval -
+                 time.time())
+        if delay > 0:
+            eventlet.spawn_after(delay, self.pool.spawn_n, self._run,
+                                 network_id)
+        else:
+            self.pool.spawn_n(self._run, network_id)
+
+    def _run(self, network_id):
+        try:
+            self._process(network_id)
+        finally:
+            self.scheduled.discard(network_id)
+            # Events received while the network was processed
+            if network_id in self.pending:
+                self._schedule(network_id)
+
+    def _process(self, network_id):
+        action, received_at = self.pending.pop(network_id)
+        now = time.time()
+        self._prune_processed_at(now)
+        self.processed_at[network_id] = now
+        self.processed += 1
+        lag = now - received_at
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        try:
+            self.process(network_id, action)
+        except Exception:
+            LOG.exception(_('Unable to process the events of network %s'),
+                          network_id)
+        if action == DISABLE:
+            self.processed_at.pop(network_id, None)
+
+    def _prune_processed_at(self, now):
+        """Forget the networks which can be processed without delay."""
+        if now - self.pruned_at < self.interval:
+            return
+        self.pruned_at = now
+        for network_id, processed_at in self.processed_at.items():
+            if processed_at + self.interval <= now:
+                del self.processed_at[network_id]
+
+    def get_state(self):
+        return {
+            'events': self.events,
+            'events_merged': self.merged_events,
+            'event_merge_ratio': round(
+                float(self.merged_events) / (self.events or 1), 3),
+            'event_lag_avg': round(
+                self.lag_total / (self.processed or 1), 3),
+            'event_lag_max': round(self.lag_max, 3),
+            'events_pending': len(self.pending)}
+
+
 class DeviceManager(object):
     OPTS = [
         cfg.StrOpt('interface_driver',
@@ -697,6 +930,9 @@ class DhcpAgentWithStateReport(DhcpAgent):
         try:
             self.agent_state.get('configurations').update(
                 self.cache.get_state())
+            self.agent_state.get('configurations').update(self.sync_stats)
+            self.agent_state.get('configurations').update(
+                self.queue.get_state())
             ctx = context.get_admin_context_without_session()
             self.state_rpc.report_state(ctx,
                                         self.agent_state)
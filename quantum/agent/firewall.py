@@ -97,6 +97,22 @@ class FirewallDriver(object):
         """Returns filtered ports."""
         pass
 
+    @property
+    def uses_member_sets(self):
+        """Whether remote groups are matched on sets of member addresses.
+
+        If so, remote_group_id rules are given unexpanded and the members
+        of each remote group through update_security_group_members.
+        """
+        return False
+
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the member addresses of a remote security group.
+
+        :param member_ips: dict of the member addresses by ethertype
+        """
+        pass
+
     @contextlib.contextmanager
     def defer_apply(self):
         """Defer apply context."""
@@ -17,7 +17,12 @@
 # @author: Dan Wendlandt, Nicira, Inc
 #
 
+import itertools
+import time
+
 import eventlet
+from eventlet import event
+from eventlet import queue
 from eventlet import semaphore
 import netaddr
 from oslo.config import cfg
@@ -48,6 +53,9 @@ LOG = logging.getLogger(__name__)
 NS_PREFIX = 'qrouter-'
 INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
+# Router updates from the server jump ahead of the periodic full sync
+PRIORITY_RPC = 0
+PRIORITY_SYNC_ROUTERS = 1
 
 
 class L3PluginApi(proxy.RpcProxy):
@@ -109,7 +117,92 @@ class RouterInfo(object):
             return NS_PREFIX + self.router_id
 
 
+class RouterUpdate(object):
+    """A router to process, or to remove if router is None.
+
+    timestamp is when the router data was requested from the server,
+    or when it was received for the routers the server notifies, so
+    that an update older than the last one applied can be dropped.
+    A delta of the router replaces the router data when given.
+    """
+
+    def __init__(self, router_id, priority, timestamp, router=None,
+                 delta=None):
+        self.router_id = router_id
+        self.priority = priority
+        self.timestamp = timestamp
+        self.router = router
+        self.delta = delta
+        self.done = event.Event()
+
+
+class RouterProcessingQueue(object):
+    """Process router updates with a bounded pool of green threads.
+
+    Updates are taken by priority, then in arrival order. Updates of
+    the same router are never processed concurrently: the worker which
+    holds a router also processes the updates queued for it meanwhile.
+    Updates queued before start are processed once it is called.
+    """
+
+    def __init__(self, process_update, workers):
+        self._process_update = process_update
+        self._workers = max(workers, 1)
+        self._started = False
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        # {router_id: updates waiting for the worker holding the router}
+        self._busy = {}
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            for i in range(self._workers):
+                eventlet.spawn_n(self._worker)
+
+    def add(self, update):
+        self._queue.put((update.priority, next(self._counter), update))
+
+    def process(self, updates):
+        """Queue updates and wait until all of them are processed."""
+        for update in updates:
+            self.add(update)
+        for update in updates:
+            update.done.wait()
+
+    def _worker(self):
+        while True:
+            priority, count, update = self._queue.get()
+            waiting = self._busy.get(update.router_id)
+            if waiting is not None:
+                waiting.append(update)
+                continue
+            self._busy[update.router_id] = waiting = [update]
+            try:
+                while waiting:
+                    self._run(waiting.pop(0))
+            finally:
+                del self._busy[update.router_id]
+
+    def _run(self, update):
+        try:
+            self._process_update(update)
+        except Exception:
+            LOG.exception(_("Failed processing router %s"), update.router_id)
+        finally:
+            update.done.send()
+
+
 class L3NATAgent(manager.Manager):
+    """Manager for the L3 agent.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Added router_delta.
+
+    """
+
+    RPC_API_VERSION = '1.1'
 
     OPTS = [
         cfg.StrOpt('external_network_bridge', default='br-ex',
@@ -141,6 +234,8 @@ class L3NATAgent(manager.Manager):
                           "by the agents.")),
         cfg.BoolOpt('enable_metadata_proxy', default=True,
                     help=_("Allow running metadata proxy.")),
+        cfg.IntOpt('router_processing_workers', default=8,
+                   help=_("Number of routers processed concurrently.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -165,6 +260,13 @@ class L3NATAgent(manager.Manager):
         self.plugin_rpc = L3PluginApi(topics.PLUGIN, host)
         self.fullsync = True
         self.sync_sem = semaphore.Semaphore(1)
+        # {router_id: timestamp of the last update applied to the router},
+        # kept for a while after a router is removed so that updates
+        # fetched before the removal are skipped
+        self._router_timestamps = {}
+        self._queue = RouterProcessingQueue(
+            self._process_router_update,
+            self.conf.router_processing_workers)
         if self.conf.use_namespaces:
             self._destroy_router_namespaces(self.conf.router_id)
         super(L3NATAgent, self).__init__(host=self.conf.host)
@@ -554,27 +656,24 @@ class L3NATAgent(manager.Manager):
 
     def router_deleted(self, context, router_id):
         """Deal with router deletion RPC message."""
-        with self.sync_sem:
-            if router_id in self.router_info:
-                try:
-                    self._router_removed(router_id)
-                except Exception:
-                    msg = _("Failed dealing with router "
-                            "'%s' deletion RPC message")
-                    LOG.debug(msg, router_id)
-                    self.fullsync = True
+        self._queue.process([RouterUpdate(router_id, PRIORITY_RPC,
+                                          time.time())])
 
     def routers_updated(self, context, routers):
         """Deal with routers modification and creation RPC message."""
         if not routers:
             return
-        with self.sync_sem:
-            try:
-                self._process_routers(routers)
-            except Exception:
-                msg = _("Failed dealing with routers update RPC message")
-                LOG.debug(msg)
-                self.fullsync = True
+        try:
+            self._process_routers(routers)
+        except Exception:
+            msg = _("Failed dealing with routers update RPC message")
+            LOG.debug(msg)
+            self.fullsync = True
+
+    def router_delta(self, context, delta):
+        """Deal with the interfaces and floating IPs changed on a router."""
+        self._queue.process([RouterUpdate(delta['router_id'], PRIORITY_RPC,
+                                          time.time(), delta=delta)])
 
     def router_removed_from_agent(self, context, payload):
         self.router_deleted(context, payload['router_id'])
@@ -582,7 +681,95 @@ class L3NATAgent(manager.Manager):
     def router_added_to_agent(self, context, payload):
         self.routers_updated(context, payload)
 
-    def _process_routers(self, routers, all_routers=False):
+    def _process_router_update(self, update):
+        """Apply one router update, called by the processing queue."""
+        router_id = update.router_id
+        if update.delta is not None:
+            self._process_router_delta(router_id, update.delta)
+            return
+        last_timestamp = self._router_timestamps.get(router_id)
+        if last_timestamp is not None and update.timestamp < last_timestamp:
+            LOG.debug(_("Skipping outdated update of router %s"), router_id)
+            return
+        ri = self.router_info.get(router_id)
+        if (update.router is not None and ri is not None and
+            update.router.get('revision_number', 0) <
+                ri.router.get('revision_number', 0)):
+            LOG.debug(_("Skipping outdated update of router %s"), router_id)
+            return
+        try:
+            if update.router is None:
+                if router_id in self.router_info:
+                    self._router_removed(router_id)
+            else:
+                if router_id not in self.router_info:
+                    self._router_added(router_id, update.router)
+                ri = self.router_info[router_id]
+                ri.router = update.router
+                self.process_router(ri)
+        except Exception:
+            LOG.exception(_("Failed processing router %s"), router_id)
+            self.fullsync = True
+            return
+        self._router_timestamps[router_id] = update.timestamp
+
+    def _process_router_delta(self, router_id, delta):
+        """Apply the next revision of a router, or fetch the router.
+
+        The router is fetched from the server when the delta does not
+        follow the revision of the router known to the agent, as some
+        updates of the router were missed.
+        """
+        revision_number = delta['revision_number']
+        ri = self.router_info.get(router_id)
+        current = ri and ri.router.get('revision_number')
+        if current is not None and revision_number <= current:
+            LOG.debug(_("Skipping outdated delta of router %s"), router_id)
+            return
+        if current is None or revision_number != current + 1:
+            LOG.debug(_("Missed updates of router %s, fetching it"),
+                      router_id)
+            eventlet.spawn_n(self._resync_router, router_id)
+            return
+        try:
+            self._apply_router_delta(ri.router, delta)
+            ri.router['revision_number'] = revision_number
+            self.process_router(ri)
+        except Exception:
+            LOG.exception(_("Failed processing router %s"), router_id)
+            self.fullsync = True
+
+    def _apply_router_delta(self, router, delta):
+        """Update the interfaces and floating IPs of a router dict."""
+        for key, added, removed in (
+                (l3_constants.INTERFACE_KEY,
+                 'interfaces_added', 'interfaces_removed'),
+                (l3_constants.FLOATINGIP_KEY,
+                 'floatingips_added', 'floatingips_removed')):
+            items = delta.get(added, [])
+            # An item removed and added again was changed
+            stale_ids = set(delta.get(removed, []))
+            stale_ids.update(item['id'] for item in items)
+            router[key] = [item for item in router.get(key, [])
+                           if item['id'] not in stale_ids] + items
+
+    def _resync_router(self, router_id):
+        """Process the data of one router read from the server."""
+        try:
+            timestamp = time.time()
+            routers = [router for router in self.plugin_rpc.get_routers(
+                self.context, router_id=router_id)
+                if router['id'] == router_id]
+            if routers:
+                self._process_routers(routers, timestamp=timestamp)
+            else:
+                self._queue.process([RouterUpdate(router_id, PRIORITY_RPC,
+                                                  timestamp)])
+        except Exception:
+            LOG.exception(_("Failed fetching router %s"), router_id)
+            self.fullsync = True
+
+    def _process_routers(self, routers, all_routers=False, timestamp=None):
         if (self.conf.external_network_bridge and
             not ip_lib.device_exists(self.conf.external_network_bridge)):
             LOG.error(_("The external network bridge '%s' does not exist"),
@@ -597,10 +784,15 @@ class L3NATAgent(manager.Manager):
         # from subset of incoming routers and ones we have now.
         if all_routers:
             prev_router_ids = set(self.router_info)
+            priority = PRIORITY_SYNC_ROUTERS
         else:
             prev_router_ids = set(self.router_info) & set(
                 [router['id'] for router in routers])
+            priority = PRIORITY_RPC
+        if timestamp is None:
+            timestamp = time.time()
         cur_router_ids = set()
+        updates = []
         for r in routers:
             if not r['admin_state_up']:
                 continue
@@ -618,34 +810,49 @@ class L3NATAgent(manager.Manager):
             if ex_net_id and ex_net_id != target_ex_net_id:
                 continue
             cur_router_ids.add(r['id'])
-            if r['id'] not in self.router_info:
-                self._router_added(r['id'], r)
-            ri = self.router_info[r['id']]
-            ri.router = r
-            self.process_router(ri)
+            updates.append(RouterUpdate(r['id'], priority, timestamp, r))
         # identify and remove routers that no longer exist
         for router_id in prev_router_ids - cur_router_ids:
-            self._router_removed(router_id)
+            updates.append(RouterUpdate(router_id, priority, timestamp))
+        self._queue.process(updates)
+
+    def _prune_router_timestamps(self):
+        """Forget the removed routers no pending update can refer to.
+
+        Updates are stamped before the router is fetched, so once the
+        RPC timeout has passed no update older than the removal can
+        still arrive.
+        """
+        expiry = time.time() - cfg.CONF.rpc_response_timeout
+        for router_id, timestamp in self._router_timestamps.items():
+            if router_id not in self.router_info and timestamp < expiry:
+                del self._router_timestamps[router_id]
 
     @periodic_task.periodic_task
     def _sync_routers_task(self, context):
+        self._prune_router_timestamps()
         # we need to sync with router deletion RPC message
         with self.sync_sem:
             if self.fullsync:
+                # cleared first so failures while processing the routers
+                # set it again
+                self.fullsync = False
                 try:
                     if not self.conf.use_namespaces:
                         router_id = self.conf.router_id
                     else:
                         router_id = None
+                    timestamp = time.time()
                     routers = self.plugin_rpc.get_routers(
                         context, router_id)
-                    self._process_routers(routers, all_routers=True)
-                    self.fullsync = False
+                    self._process_routers(routers, all_routers=True,
+                                          timestamp=timestamp)
                 except Exception:
                     LOG.exception(_("Failed synchronizing routers"))
                     self.fullsync = True
 
     def after_start(self):
+        self._queue.start()
         LOG.info(_("L3 agent started"))
 
     def _update_routing_table(self, ri, operation, route):
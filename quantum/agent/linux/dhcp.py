@@ -95,6 +95,14 @@ class DhcpBase(object):
     def reload_allocations(self):
         """Force the DHCP server to reload the assignment database."""
 
+    def reload_hosts(self):
+        """Reload the host entries after the ports of the network changed.
+
+        The subnets are expected to be unchanged. Drivers which cannot
+        update the host entries alone reload all the allocations.
+        """
+        self.reload_allocations()
+
     @classmethod
     def existing_dhcp_networks(cls, conf, root_helper):
         """Return a list of existing networks ids that we have configs for."""
@@ -178,6 +186,16 @@ class DhcpLocalProcess(DhcpBase):
         LOG.debug(msg % file_name)
         return None
 
+    def _replace_conf_file(self, kind, value):
+        """Write a config file unless it already has the value.
+
+        :returns: True if the file was written.
+        """
+        if self._get_value_from_conf_file(kind) == value:
+            return False
+        utils.replace_file(self.get_conf_file_name(kind), value)
+        return True
+
     @property
     def pid(self):
         """Last known pid for the DHCP process spawned for this network."""
@@ -332,6 +350,25 @@ class Dnsmasq(DhcpLocalProcess):
 
         self._output_hosts_file()
         self._output_opts_file()
+        self._reload()
+
+    def reload_hosts(self):
+        """Rewrite the dnsmasq hosts file, reloading dnsmasq if it changed.
+
+        The opts file only depends on the subnets, and port changes which
+        do not touch the host entries, e.g. of the status or device id,
+        neither write the hosts file nor signal dnsmasq.
+        """
+        if not self._enable_dhcp():
+            return self.reload_allocations()
+
+        if self._replace_conf_file('host', self._make_hosts()):
+            self._reload()
+        else:
+            LOG.debug(_('Host entries of network %s are unchanged'),
+                      self.network.id)
+
+    def _reload(self):
         if self.active:
             cmd = ['kill', '-HUP', self.pid]
             utils.execute(cmd, self.root_helper)
@@ -339,8 +376,8 @@ class Dnsmasq(DhcpLocalProcess):
             LOG.debug(_('Pid %d is stale, relaunching dnsmasq'), self.pid)
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
 
-    def _output_hosts_file(self):
-        """Writes a dnsmasq compatible hosts file."""
+    def _make_hosts(self):
+        """Return the content of a dnsmasq compatible hosts file."""
         r = re.compile('[:.]')
         buf = StringIO.StringIO()
 
@@ -350,9 +387,12 @@ class Dnsmasq(DhcpLocalProcess):
                                   self.conf.dhcp_domain)
                 buf.write('%s,%s,%s\n' %
                           (port.mac_address, name, alloc.ip_address))
+        return buf.getvalue()
 
+    def _output_hosts_file(self):
+        """Writes a dnsmasq compatible hosts file."""
         name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
+        utils.replace_file(name, self._make_hosts())
         return name
 
     def _output_opts_file(self):
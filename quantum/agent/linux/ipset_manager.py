@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Maintain kernel ipsets of addresses using the ipset utility."""
+
+from quantum.agent.linux import utils
+from quantum.common import constants
+from quantum.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# The kernel limits set names to 31 characters
+MAX_SET_NAME_LEN = 31
+SET_FAMILY = {constants.IPv4: 'inet',
+              constants.IPv6: 'inet6'}
+
+
+def get_set_name(name, ethertype):
+    return ('%s%s' % (ethertype, name))[:MAX_SET_NAME_LEN]
+
+
+class IpsetManager(object):
+    """Keep hash:ip sets in the kernel in sync with the wanted members.
+
+    The members last written to each set are remembered, so an update
+    only adds and removes the addresses which changed, in one
+    'ipset restore' call.
+    """
+
+    def __init__(self, execute=None, root_helper=None):
+        self.execute = execute or utils.execute
+        self.root_helper = root_helper
+        # {set name: set of member addresses}
+        self.ipsets = {}
+
+    def set_members(self, set_name, ethertype, member_ips):
+        """Make the set contain exactly member_ips, creating it if needed.
+
+        :returns: True if the set was created or changed.
+        """
+        members = set(member_ips)
+        commands = []
+        old_members = self.ipsets.get(set_name)
+        if old_members is None:
+            # The set may survive an agent restart with stale members
+            commands.append('create %s hash:ip family %s' %
+                            (set_name, SET_FAMILY[ethertype]))
+            commands.append('flush %s' % set_name)
+            old_members = set()
+        commands += ['add %s %s' % (set_name, ip)
+                     for ip in sorted(members - old_members)]
+        commands += ['del %s %s' % (set_name, ip)
+                     for ip in sorted(old_members - members)]
+        self.ipsets[set_name] = members
+        if not commands:
+            return False
+        LOG.debug(_("Updating ipset %(set_name)s with %(count)d command(s)"),
+                  {'set_name': set_name, 'count': len(commands)})
+        self.execute(['ipset', 'restore', '-exist'],
+                     process_input='\n'.join(commands) + '\n',
+                     root_helper=self.root_helper)
+        return True
+
+    def destroy(self, set_name):
+        """Remove a set, which must no longer be referenced by iptables."""
+        if self.ipsets.pop(set_name, None) is None:
+            return
+        self.execute(['ipset', 'destroy', set_name],
+                     root_helper=self.root_helper,
+                     check_exit_code=False)
@@ -19,6 +19,7 @@ import netaddr
 from oslo.config import cfg
 
 from quantum.agent import firewall
+from quantum.agent.linux import ipset_manager
 from quantum.agent.linux import iptables_manager
 from quantum.common import constants
 from quantum.openstack.common import log as logging
@@ -31,6 +32,15 @@ EGRESS_DIRECTION = 'egress'
 CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
+IP_ADDRESS_ARG = {'src': '-s',
+                  'dst': '-d'}
+IP_VERSION = {constants.IPv4: 4,
+              constants.IPv6: 6}
+
+cfg.CONF.import_opt('enable_ipset', 'quantum.agent.securitygroups_rpc',
+                    group='SECURITYGROUP')
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -44,12 +54,33 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             use_ipv6=True)
         # list of port which has security group
         self.filtered_ports = {}
+        self.ipset = None
+        if cfg.CONF.SECURITYGROUP.enable_ipset:
+            self.ipset = ipset_manager.IpsetManager(
+                root_helper=cfg.CONF.AGENT.root_helper)
+        # {sg id: {ethertype: member addresses}} of the remote groups
+        self.sg_members = {}
+        # names of the ipsets referenced by the current chains
+        self.used_ipsets = set()
         self._add_fallback_chain_v4v6()
 
     @property
     def ports(self):
         return self.filtered_ports
 
+    @property
+    def uses_member_sets(self):
+        return self.ipset is not None
+
+    def update_security_group_members(self, sg_id, member_ips):
+        self.sg_members[sg_id] = member_ips
+        # sets are only created once a rule of their ethertype uses them
+        for ethertype in (constants.IPv4, constants.IPv6):
+            set_name = ipset_manager.get_set_name(sg_id, ethertype)
+            if set_name in self.ipset.ipsets:
+                self.ipset.set_members(set_name, ethertype,
+                                       member_ips.get(ethertype, []))
+
     def prepare_port_filter(self, port):
         LOG.debug(_("Preparing device (%s) filter"), port['device'])
         self._remove_chains()
@@ -82,6 +113,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
+        self.used_ipsets = set()
         self._add_chain_by_name_v4v6(SG_CHAIN)
         for port in self.filtered_ports.values():
             self._setup_chain(port, INGRESS_DIRECTION)
@@ -208,18 +240,19 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    ipv6_iptables_rule)
             ipv4_iptables_rule += self._drop_dhcp_rule()
         ipv4_iptables_rule += self._convert_sgr_to_iptables_rules(
-            ipv4_sg_rules)
+            port, ipv4_sg_rules)
         ipv6_iptables_rule += self._convert_sgr_to_iptables_rules(
-            ipv6_sg_rules)
+            port, ipv6_sg_rules)
         self._add_rule_to_chain_v4v6(chain_name,
                                      ipv4_iptables_rule,
                                      ipv6_iptables_rule)
 
-    def _convert_sgr_to_iptables_rules(self, security_group_rules):
+    def _convert_sgr_to_iptables_rules(self, port, security_group_rules):
         iptables_rules = []
         self._drop_invalid_packets(iptables_rules)
         self._allow_established(iptables_rules)
         for rule in security_group_rules:
+            set_args = self._remote_group_set_arg(port, rule)
             args = ['-j RETURN']
             args += self._protocol_arg(rule.get('protocol'))
             args += self._port_arg('dport',
@@ -234,6 +267,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                         rule.get('source_ip_prefix'))
             args += self._ip_prefix_arg('d',
                                         rule.get('dest_ip_prefix'))
+            args += set_args
             iptables_rules += [' '.join(args)]
 
         iptables_rules += ['-j $sg-fallback']
@@ -266,6 +300,54 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                     '--%ss' % direction,
                     '%s:%s' % (port_range_min, port_range_max)]
 
+    def _remote_group_set_arg(self, port, rule):
+        """Match an unexpanded remote_group_id rule on the group's ipset.
+
+        The set is created from the last known members of the group when
+        first used. As when the rule is expanded, the addresses of the
+        port itself are not matched.
+        """
+        remote_group_id = rule.get('remote_group_id')
+        if (not self.ipset or not remote_group_id or
+            rule.get('source_ip_prefix') or rule.get('dest_ip_prefix')):
+            return []
+        ethertype = rule['ethertype']
+        set_name = ipset_manager.get_set_name(remote_group_id, ethertype)
+        if set_name not in self.ipset.ipsets:
+            member_ips = self.sg_members.get(remote_group_id, {})
+            self.ipset.set_members(set_name, ethertype,
+                                   member_ips.get(ethertype, []))
+        self.used_ipsets.add(set_name)
+        direction = IPSET_DIRECTION[rule['direction']]
+        return (self._own_ips_arg(port, ethertype, direction) +
+                ['-m set --match-set', set_name, direction])
+
+    def _own_ips_arg(self, port, ethertype, direction):
+        version = IP_VERSION[ethertype]
+        own_ips = [ip for ip in port.get('fixed_ips', [])
+                   if netaddr.IPAddress(ip).version == version]
+        if not own_ips:
+            return []
+        if len(own_ips) == 1:
+            # iptables can not negate a list of addresses
+            return ['!', IP_ADDRESS_ARG[direction], own_ips[0]]
+        set_name = ipset_manager.get_set_name('port' + port['device'],
+                                              ethertype)
+        self.ipset.set_members(set_name, ethertype, own_ips)
+        self.used_ipsets.add(set_name)
+        return ['-m set ! --match-set', set_name, direction]
+
+    def _remove_unused_ipsets(self):
+        if not self.ipset:
+            return
+        for set_name in set(self.ipset.ipsets) - self.used_ipsets:
+            self.ipset.destroy(set_name)
+        for sg_id in self.sg_members.keys():
+            if not any(ipset_manager.get_set_name(sg_id, ethertype)
+                       in self.used_ipsets
+                       for ethertype in (constants.IPv4, constants.IPv6)):
+                del self.sg_members[sg_id]
+
     def _ip_prefix_arg(self, direction, ip_prefix):
         #NOTE (nati) : source_group_id is converted to list of source_
         # ip_prefix in server side
@@ -282,6 +364,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def filter_defer_apply_off(self):
         self.iptables.defer_apply_off()
+        # sets can only be destroyed once no rule references them
+        self._remove_unused_ipsets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
@@ -23,12 +23,24 @@
 
 import inspect
 import os
+import time
+
+from oslo.config import cfg
 
 from quantum.agent.linux import utils
 from quantum.openstack.common import lockutils
 from quantum.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
+
+OPTS = [
+    cfg.BoolOpt('iptables_incremental', default=False,
+                help=_("Apply only the chains that changed since the last "
+                       "apply using iptables-restore --noflush instead of "
+                       "saving and restoring whole tables.")),
+]
+cfg.CONF.register_opts(OPTS, 'AGENT')
+
 # NOTE(vish): Iptables supports chain names of up to 28 characters,  and we
 #             add up to 12 characters to binary_name which is used as a prefix,
 #             so we limit it to 16 characters.
@@ -38,6 +50,14 @@ binary_name = os.path.basename(inspect.stack()[-1][1])[:16]
 # <max length of iptables chain name> - (<binary_name> + '-') = 28-(16+1) = 11
 MAX_CHAIN_LEN_WRAP = 11
 MAX_CHAIN_LEN_NOWRAP = 28
+# Chains which are created by the kernel and can never be flushed or
+# deleted by an incremental apply.
+BUILTIN_CHAINS = {'filter': set(['INPUT', 'OUTPUT', 'FORWARD']),
+                  'nat': set(['PREROUTING', 'INPUT', 'OUTPUT',
+                              'POSTROUTING']),
+                  'mangle': set(['PREROUTING', 'INPUT', 'FORWARD',
+                                 'OUTPUT', 'POSTROUTING']),
+                  'raw': set(['PREROUTING', 'OUTPUT'])}
 
 
 def get_chain_name(chain_name, wrap=True):
@@ -224,7 +244,8 @@ class IptablesManager(object):
     """
 
     def __init__(self, _execute=None, state_less=False,
-                 root_helper=None, use_ipv6=False, namespace=None):
+                 root_helper=None, use_ipv6=False, namespace=None,
+                 incremental=None):
         if _execute:
             self.execute = _execute
         else:
@@ -234,6 +255,21 @@ class IptablesManager(object):
         self.root_helper = root_helper
         self.namespace = namespace
         self.iptables_apply_deferred = False
+        if incremental is None:
+            incremental = cfg.CONF.AGENT.iptables_incremental
+        self.incremental = incremental
+
+        # Shadow copy of what was last written to the kernel, keyed by
+        # (command, table) and then by the full chain name. Only used in
+        # incremental mode.
+        self._applied = {}
+        self.apply_stats = {'full_applies': 0,
+                            'incremental_applies': 0,
+                            'skipped_applies': 0,
+                            'last_apply_time': 0.0,
+                            'total_apply_time': 0.0,
+                            'last_delta_size': 0,
+                            'total_delta_size': 0}
 
         self.ipv4 = {'filter': IptablesTable()}
         self.ipv6 = {'filter': IptablesTable()}
@@ -315,37 +351,166 @@ class IptablesManager(object):
         same component of Nova, and replace them with our current set of
         rules. This happens atomically, thanks to iptables-restore.
 
+        In incremental mode only the chains that differ from the last
+        successfully applied state are sent, using iptables-restore
+        --noflush. The full save/restore cycle is used for the first apply
+        and whenever an incremental apply fails.
+
         """
+        start = time.time()
+        delta_size = 0
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
             for table in tables:
-                args = ['%s-save' % cmd, '-t', table]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                current_table = (self.execute(args,
-                                 root_helper=self.root_helper))
-                current_lines = current_table.split('\n')
-                new_filter = self._modify_rules(current_lines,
-                                                tables[table])
-                args = ['%s-restore' % (cmd)]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                self.execute(args,
-                             process_input='\n'.join(new_filter),
-                             root_helper=self.root_helper)
-        LOG.debug(_("IPTablesManager.apply completed with success"))
+                if self.incremental and (cmd, table) in self._applied:
+                    delta_size += self._apply_table_delta(cmd, table,
+                                                          tables[table])
+                else:
+                    delta_size += self._apply_table_full(cmd, table,
+                                                         tables[table])
+
+        elapsed = time.time() - start
+        self.apply_stats['last_apply_time'] = elapsed
+        self.apply_stats['total_apply_time'] += elapsed
+        self.apply_stats['last_delta_size'] = delta_size
+        self.apply_stats['total_delta_size'] += delta_size
+        LOG.debug(_("IPTablesManager.apply completed with success "
+                    "(%(lines)d rule lines in %(time).3f seconds)"),
+                  {'lines': delta_size, 'time': elapsed})
+
+    def _run_restore(self, cmd, lines, noflush=False):
+        args = ['%s-restore' % (cmd)]
+        if noflush:
+            args.append('--noflush')
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        self.execute(args,
+                     process_input='\n'.join(lines),
+                     root_helper=self.root_helper)
+
+    def _apply_table_full(self, cmd, table_name, table):
+        args = ['%s-save' % cmd, '-t', table_name]
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        current_table = (self.execute(args,
+                         root_helper=self.root_helper))
+        current_lines = current_table.split('\n')
+        new_filter = self._modify_rules(current_lines, table)
+        self._run_restore(cmd, new_filter)
+        self.apply_stats['full_applies'] += 1
+        if self.incremental:
+            self._applied[(cmd, table_name)] = self._build_chain_model(table)
+        return len(table.rules)
+
+    def _apply_table_delta(self, cmd, table_name, table):
+        key = (cmd, table_name)
+        old_model = self._applied[key]
+        new_model = self._build_chain_model(table)
+        if new_model == old_model:
+            self.apply_stats['skipped_applies'] += 1
+            return 0
+
+        builtins = BUILTIN_CHAINS.get(table_name, set())
+        old_unwrapped = set(c for c in old_model
+                            if not c.startswith(binary_name + '-'))
+        new_unwrapped = set(c for c in new_model
+                            if not c.startswith(binary_name + '-'))
+        if (new_unwrapped - old_unwrapped) - builtins:
+            # Declaring a shared chain would flush rules which belong to
+            # other components, so new shared chains need a full apply.
+            return self._apply_table_full(cmd, table_name, table)
+
+        lines = self._diff_chain_models(old_model, new_model)
+        try:
+            self._run_restore(cmd, ['*%s' % table_name] + lines + ['COMMIT'],
+                              noflush=True)
+        except RuntimeError:
+            LOG.warn(_("Incremental apply of %(cmd)s table %(table)s "
+                       "failed, falling back to a full apply"),
+                     {'cmd': cmd, 'table': table_name})
+            del self._applied[key]
+            return self._apply_table_full(cmd, table_name, table)
+
+        self._applied[key] = new_model
+        self.apply_stats['incremental_applies'] += 1
+        return len(lines)
+
+    def _build_chain_model(self, table):
+        """Return a mapping of full chain name to its list of our rules."""
+        model = {}
+        for name in table.unwrapped_chains:
+            model[name] = []
+        for name in table.chains:
+            model['%s-%s' % (binary_name, name)] = []
+
+        for rule in table.rules:
+            if rule.wrap:
+                chain = '%s-%s' % (binary_name, rule.chain)
+            else:
+                chain = rule.chain
+            model.setdefault(chain, []).append(rule.rule.strip())
+
+        # Duplicates are weeded out the same way as in _modify_rules,
+        # letting the *last* occurrence take precedence.
+        for chain, rules in model.iteritems():
+            seen = set()
+            deduped = []
+            for rule in reversed(rules):
+                if rule not in seen:
+                    seen.add(rule)
+                    deduped.append(rule)
+            deduped.reverse()
+            model[chain] = deduped
+        return model
+
+    def _diff_chain_models(self, old_model, new_model):
+        """Return the iptables-restore --noflush lines for a delta.
+
+        Wrapped chains are owned exclusively by this manager, so a changed
+        wrapped chain is declared (which flushes it) and refilled. Shared
+        chains, built-in or not, may hold rules of other components: only
+        our own previous rules are deleted from them and the new ones are
+        inserted at the top, where a full apply would have put them.
+
+        """
+        declares = []
+        deletes = []
+        adds = []
+        removes = []
+        wrapped_prefix = binary_name + '-'
+        for chain in sorted(set(old_model) | set(new_model)):
+            old_rules = old_model.get(chain)
+            new_rules = new_model.get(chain)
+            if old_rules == new_rules:
+                continue
+            if chain.startswith(wrapped_prefix):
+                declares.append(':%s - [0:0]' % chain)
+                if new_rules is None:
+                    removes.append('-X %s' % chain)
+                    continue
+                adds.extend('-A %s %s' % (chain, rule) for rule in new_rules)
+            else:
+                deletes.extend('-D %s %s' % (chain, rule)
+                               for rule in old_rules or [])
+                adds.extend('-I %s %d %s' % (chain, index, rule)
+                            for index, rule in enumerate(new_rules or [], 1))
+        return declares + deletes + adds + removes
 
     def _modify_rules(self, current_lines, table, binary=None):
         unwrapped_chains = table.unwrapped_chains
         chains = table.chains
         rules = table.rules
 
-        # Remove any trace of our rules
-        new_filter = filter(lambda line: binary_name
-                            not in line, current_lines)
+        # Remove any trace of our rules. Rules that we want at the top are
+        # also removed from wherever they currently are, so the duplicate
+        # weeding further down keeps them in our position.
+        top_rules = set(str(rule).strip() for rule in rules if rule.top)
+        new_filter = [line for line in current_lines
+                      if binary_name not in line and
+                      line.strip() not in top_rules]
 
         seen_chains = False
         rules_index = 0
@@ -357,16 +522,7 @@ class IptablesManager(object):
                 if not rule.startswith(':'):
                     break
 
-        our_rules = []
-        for rule in rules:
-            rule_str = str(rule)
-            if rule.top:
-                # rule.top == True means we want this rule to be at the top.
-                # Further down, we weed out duplicates from the bottom of the
-                # list, so here we remove the dupes ahead of time.
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
-            our_rules += [rule_str]
+        our_rules = [str(rule) for rule in rules]
 
         new_filter[rules_index:rules_index] = our_rules
 
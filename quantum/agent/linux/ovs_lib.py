@@ -242,10 +242,14 @@ class OVSBridge:
         return edge_ports
 
     def get_vif_port_set(self):
-        edge_ports = set()
         port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids")
+        return self.get_vif_port_set_from_external_ids(
+            self.db_get_map("Interface", name, "external_ids")
+            for name in port_names)
+
+    def get_vif_port_set_from_external_ids(self, external_ids_list):
+        edge_ports = set()
+        for external_ids in external_ids_list:
             if "iface-id" in external_ids and "attached-mac" in external_ids:
                 edge_ports.add(external_ids['iface-id'])
             elif ("xs-vif-uuid" in external_ids and
@@ -0,0 +1,176 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Track the local OVSDB Interface table with ovsdb-client monitor."""
+
+import shlex
+
+import eventlet
+from eventlet import event
+from eventlet.green import subprocess
+
+from quantum.common import utils
+from quantum.openstack.common import jsonutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+INTERFACE_COLUMNS = ['name', 'external_ids', 'ofport']
+
+
+def parse_ovsdb_value(value):
+    """Convert an OVSDB JSON encoded datum into a python value.
+
+    Maps become dicts, sets become lists and uuids become their string
+    value. Atoms are returned unchanged.
+    """
+    if isinstance(value, list) and len(value) == 2:
+        kind, data = value
+        if kind == 'map':
+            return dict((k, parse_ovsdb_value(v)) for k, v in data)
+        elif kind == 'set':
+            return [parse_ovsdb_value(v) for v in data]
+        elif kind in ('uuid', 'named-uuid'):
+            return data
+    return value
+
+
+class OvsdbMonitor(object):
+    """Maintain a copy of the Interface table from a streaming monitor.
+
+    A long lived 'ovsdb-client monitor' process reports every insert,
+    update and delete of an Interface row as one JSON line. The monitor
+    keeps the rows in memory so callers can compute the set of VIFs
+    without running ovs-vsctl for each port, and wakes up waiters
+    whenever a row changes.
+
+    Whenever the process dies the copy is considered stale until the
+    respawned process has dumped the initial table contents again;
+    callers should fall back to a full resync while 'synced' is False.
+    """
+
+    def __init__(self, root_helper=None, respawn_interval=3):
+        self.root_helper = root_helper
+        self.respawn_interval = respawn_interval
+        self.synced = False
+        self.interfaces = {}
+        self._process = None
+        self._reader = None
+        self._changed = event.Event()
+        self._stopped = False
+
+    def _get_cmd(self):
+        cmd = ['ovsdb-client', 'monitor', 'Interface',
+               ','.join(INTERFACE_COLUMNS), '--format=json']
+        if self.root_helper:
+            cmd = shlex.split(self.root_helper) + cmd
+        return cmd
+
+    def start(self):
+        self._stopped = False
+        self._reader = eventlet.spawn(self._run)
+
+    def stop(self):
+        self._stopped = True
+        self._kill_process()
+        if self._reader:
+            self._reader.kill()
+            self._reader = None
+
+    def _kill_process(self):
+        if self._process:
+            try:
+                self._process.kill()
+            except OSError:
+                LOG.debug(_('ovsdb-client monitor process already exited'))
+            self._process = None
+        self._invalidate()
+
+    def _invalidate(self):
+        self.synced = False
+        self.interfaces = {}
+        self._notify()
+
+    def _notify(self):
+        if not self._changed.ready():
+            self._changed.send()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                # stderr is inherited, so errors of the monitor show up
+                # in the agent output rather than filling a pipe
+                self._process = utils.subprocess_popen(self._get_cmd(),
+                                                       stdout=subprocess.PIPE)
+                for line in iter(self._process.stdout.readline, ''):
+                    self.process_output(line)
+                LOG.warn(_('ovsdb-client monitor exited unexpectedly'))
+            except Exception:
+                LOG.exception(_('Error while reading ovsdb-client monitor '
+                                'output'))
+            self._kill_process()
+            if not self._stopped:
+                eventlet.sleep(self.respawn_interval)
+
+    def process_output(self, line):
+        """Apply one line of 'ovsdb-client monitor --format=json' output."""
+        line = line.strip()
+        if not line:
+            return
+        update = jsonutils.loads(line)
+        headings = update.get('headings', [])
+        for data in update.get('data', []):
+            row = dict(zip(headings, data))
+            uuid = row.pop('row')
+            action = row.pop('action')
+            if action == 'delete':
+                self.interfaces.pop(uuid, None)
+            elif action in ('initial', 'insert', 'new'):
+                columns = self.interfaces.setdefault(uuid, {})
+                for column, value in row.iteritems():
+                    columns[column] = parse_ovsdb_value(value)
+            # 'old' rows only carry the previous values of changed columns
+        # The first update of a newly spawned process is the initial dump
+        # of the whole table, after which the copy is complete.
+        self.synced = True
+        self._notify()
+
+    def get_external_ids(self, names=None):
+        """Return the external_ids of the known interfaces.
+
+        The Interface table has the interfaces of every bridge; names
+        restricts the result to the interfaces with one of those names.
+        """
+        if names is not None:
+            names = set(names)
+        return [row.get('external_ids', {})
+                for row in self.interfaces.itervalues()
+                if names is None or row.get('name') in names]
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for a change; True if one happened."""
+        try:
+            if timeout > 0 and not self._changed.ready():
+                with eventlet.Timeout(timeout):
+                    self._changed.wait()
+        except eventlet.Timeout:
+            pass
+        changed = self._changed.ready()
+        if changed:
+            self._changed = event.Event()
+        return changed
@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import shlex
+
+from eventlet.green import socket
+from eventlet.green import subprocess
+from eventlet import semaphore
+
+from quantum.common import utils
+from quantum.openstack.common import jsonutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+class RootwrapClient(object):
+    """Run commands through a quantum-rootwrap-daemon.
+
+    The daemon is started with daemon_cmd on first use, and again if it
+    has exited. It stops when this process closes its stdin.
+    """
+
+    def __init__(self, daemon_cmd):
+        self.daemon_cmd = daemon_cmd
+        self._process = None
+        self._socket_path = None
+        self._lock = semaphore.Semaphore()
+
+    def execute(self, cmd, process_input=None):
+        """Run cmd as root.
+
+        :returns: a (returncode, stdout, stderr) tuple.
+        """
+        response = self._request({'cmd': cmd, 'stdin': process_input})
+        return (response['returncode'],
+                response['stdout'].encode('latin-1'),
+                response['stderr'].encode('latin-1'))
+
+    def get_stats(self):
+        """Return the latency histogram of the commands, per executable."""
+        return self._request({'stats': True})
+
+    def _get_socket_path(self):
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                LOG.debug(_("Starting rootwrap daemon: %s"), self.daemon_cmd)
+                self._process = utils.subprocess_popen(
+                    shlex.split(self.daemon_cmd),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE)
+                self._socket_path = self._process.stdout.readline().strip()
+                if not self._socket_path:
+                    self._process = None
+                    raise RuntimeError(_("Failed to start rootwrap daemon: "
+                                         "%s") % self.daemon_cmd)
+            return self._socket_path
+
+    def _request(self, request):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._get_socket_path())
+            sock.sendall(jsonutils.dumps(request) + '\n')
+            response = sock.makefile('rb').readline()
+        finally:
+            sock.close()
+        if not response:
+            raise RuntimeError(_("No response from rootwrap daemon"))
+        return jsonutils.loads(response)
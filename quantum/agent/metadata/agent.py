@@ -16,13 +16,16 @@
 #
 # @author: Mark McClain, DreamHost
 
+import collections
 import hashlib
 import hmac
 import os
 import socket
+import time
 import urlparse
 
 import eventlet
+from eventlet import pools
 import httplib2
 from oslo.config import cfg
 from quantumclient.v2_0 import client
@@ -31,11 +34,64 @@ import webob
 from quantum.common import config
 from quantum.common import utils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
+from quantum.openstack.common import rpc
 from quantum import wsgi
 
 LOG = logging.getLogger(__name__)
 
 DEVICE_OWNER_ROUTER_INTF = "network:router_interface"
+NOTIFICATION_TOPIC = 'notifications.info'
+
+
+class LookupCache(object):
+    """LRU cache of port lookups whose entries expire after ttl seconds.
+
+    Keys are ('router', router_id), mapping to the networks of the router,
+    and ('instance', networks, ip), mapping to an instance id. Each entry
+    remembers the ids of the ports it was derived from, so that it can be
+    dropped when one of them changes.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # {key: (expiry, value, port ids)}, least recently used first
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[0] < time.time():
+            self.misses += 1
+            return None
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, port_ids=()):
+        if self.size <= 0 or self.ttl <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + self.ttl, value,
+                              frozenset(filter(None, port_ids)))
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, port_id=None, network_id=None, router_id=None):
+        """Drop the entries derived from a port, network or router."""
+        for key, (expiry, value, port_ids) in self._entries.items():
+            if (port_id in port_ids or
+                    (router_id and key == ('router', router_id)) or
+                    (key[0] == 'instance' and network_id in key[1])):
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
 
 
 class MetadataProxyHandler(object):
@@ -61,12 +117,42 @@ class MetadataProxyHandler(object):
         cfg.StrOpt('metadata_proxy_shared_secret',
                    default='',
                    help=_('Shared secret to sign instance-id request'),
-                   secret=True)
+                   secret=True),
+        cfg.IntOpt('metadata_pool_size', default=16,
+                   help=_("Maximum number of persistent connections to "
+                          "each of the Quantum and Nova metadata servers")),
+        cfg.IntOpt('metadata_cache_size', default=4096,
+                   help=_("Maximum number of port lookups to cache, "
+                          "0 to disable the cache")),
+        cfg.IntOpt('metadata_cache_ttl', default=30,
+                   help=_("Seconds a cached port lookup stays valid, "
+                          "0 to disable the cache")),
+        cfg.BoolOpt('metadata_cache_notifications', default=False,
+                    help=_("Cache port lookups and invalidate them on the "
+                           "port and router interface notifications of the "
+                           "Quantum server")),
+        cfg.IntOpt('metadata_stats_interval', default=0,
+                   help=_("Seconds between logging the cache hit rate and "
+                          "the request latencies, 0 to disable")),
     ]
 
     def __init__(self, conf):
         self.conf = conf
         self.auth_info = {}
+        # Without invalidation, an address reused within the TTL would be
+        # mapped to the previous instance, so nothing is cached
+        cache_size = (conf.metadata_cache_notifications and
+                      conf.metadata_cache_size or 0)
+        self.cache = LookupCache(cache_size, conf.metadata_cache_ttl)
+        # Clients keep their connections open between requests; a pool
+        # lets concurrent requests each use their own.
+        self._qclients = pools.Pool(max_size=conf.metadata_pool_size,
+                                    create=self._get_quantum_client)
+        self._http_clients = pools.Pool(max_size=conf.metadata_pool_size,
+                                        create=self._get_http_client)
+        self.stats = {'requests': 0,
+                      'lookup_count': 0, 'lookup_ms': 0.0,
+                      'proxy_count': 0, 'proxy_ms': 0.0}
 
     def _get_quantum_client(self):
         qclient = client.Client(
@@ -81,14 +167,24 @@ class MetadataProxyHandler(object):
         )
         return qclient
 
+    def _get_http_client(self):
+        return httplib2.Http()
+
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         try:
             LOG.debug(_("Request: %s"), req)
 
+            self.stats['requests'] += 1
+            start = time.time()
             instance_id = self._get_instance_id(req)
+            self._record('lookup', start)
             if instance_id:
-                return self._proxy_request(instance_id, req)
+                start = time.time()
+                try:
+                    return self._proxy_request(instance_id, req)
+                finally:
+                    self._record('proxy', start)
             else:
                 return webob.exc.HTTPNotFound()
 
@@ -99,28 +195,45 @@ class MetadataProxyHandler(object):
             return webob.exc.HTTPInternalServerError(explanation=unicode(msg))
 
     def _get_instance_id(self, req):
-        qclient = self._get_quantum_client()
-
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Quantum-Network-ID')
         router_id = req.headers.get('X-Quantum-Router-ID')
 
         if network_id:
-            networks = [network_id]
+            networks = (network_id,)
         else:
+            networks = self.cache.get(('router', router_id))
+        if networks is not None:
+            instance_id = self.cache.get(
+                ('instance', networks, remote_address))
+            if instance_id is not None:
+                return instance_id
+
+        with self._qclients.item() as qclient:
+            instance_id = self._lookup_instance_id(
+                qclient, remote_address, networks, router_id)
+            self.auth_info = qclient.get_auth_info()
+        return instance_id
+
+    def _lookup_instance_id(self, qclient, remote_address, networks,
+                            router_id):
+        if networks is None:
             internal_ports = qclient.list_ports(
                 device_id=router_id,
                 device_owner=DEVICE_OWNER_ROUTER_INTF)['ports']
 
-            networks = [p['network_id'] for p in internal_ports]
+            networks = tuple(p['network_id'] for p in internal_ports)
+            if networks:
+                self.cache.set(('router', router_id), networks,
+                               [p.get('id') for p in internal_ports])
 
         ports = qclient.list_ports(
-            network_id=networks,
+            network_id=list(networks),
             fixed_ips=['ip_address=%s' % remote_address])['ports']
 
-        self.auth_info = qclient.get_auth_info()
-
         if len(ports) == 1:
+            self.cache.set(('instance', networks, remote_address),
+                           ports[0]['device_id'], [ports[0].get('id')])
             return ports[0]['device_id']
 
     def _proxy_request(self, instance_id, req):
@@ -138,9 +251,9 @@ class MetadataProxyHandler(object):
             req.query_string,
             ''))
 
-        h = httplib2.Http()
-        resp, content = h.request(url, method=req.method, headers=headers,
-                                  body=req.body)
+        with self._http_clients.item() as h:
+            resp, content = h.request(url, method=req.method,
+                                      headers=headers, body=req.body)
 
         if resp.status == 200:
             LOG.debug(str(resp))
@@ -170,6 +283,54 @@ class MetadataProxyHandler(object):
                         instance_id,
                         hashlib.sha256).hexdigest()
 
+    def handle_notification(self, message):
+        """Drop the cached lookups affected by a Quantum notification."""
+        event_type = message.get('event_type', '')
+        payload = message.get('payload') or {}
+        if event_type.startswith('port.') and event_type.endswith('.end'):
+            port = payload.get('port') or {}
+            self.cache.invalidate(port_id=port.get('id') or
+                                  payload.get('port_id'),
+                                  network_id=port.get('network_id'))
+            if port.get('device_owner') == DEVICE_OWNER_ROUTER_INTF:
+                self.cache.invalidate(router_id=port.get('device_id'))
+        elif event_type.startswith('router.interface.'):
+            interface = payload.get('router.interface') or {}
+            self.cache.invalidate(router_id=interface.get('id'))
+        elif event_type == 'network.delete.end':
+            self.cache.invalidate(network_id=payload.get('network_id'))
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        lookups = self.cache.hits + self.cache.misses
+        stats.update(cache_entries=len(self.cache),
+                     cache_hits=self.cache.hits,
+                     cache_misses=self.cache.misses,
+                     cache_hit_rate=(float(self.cache.hits) / lookups
+                                     if lookups else 0.0))
+        return stats
+
+    def start(self):
+        """Start listening to notifications and reporting statistics."""
+        if self.conf.metadata_cache_notifications:
+            self.connection = rpc.create_connection(new=True)
+            self.connection.declare_topic_consumer(
+                NOTIFICATION_TOPIC, self.handle_notification,
+                queue_name='quantum-metadata-agent.%s' % self.conf.host)
+            self.connection.consume_in_thread()
+        if self.conf.metadata_stats_interval > 0:
+            self.stats_reporter = loopingcall.FixedIntervalLoopingCall(
+                self._report_stats)
+            self.stats_reporter.start(
+                interval=self.conf.metadata_stats_interval)
+
+    def _record(self, stage, start):
+        self.stats[stage + '_count'] += 1
+        self.stats[stage + '_ms'] += (time.time() - start) * 1000
+
+    def _report_stats(self):
+        LOG.info(_("Metadata proxy statistics: %s"), self.get_stats())
+
 
 class UnixDomainHttpProtocol(eventlet.wsgi.HttpProtocol):
     def __init__(self, request, client_address, server):
@@ -219,8 +380,9 @@ class UnixDomainMetadataProxy(object):
 
     def run(self):
         server = UnixDomainWSGIServer('quantum-metadata-agent')
-        server.start(MetadataProxyHandler(self.conf),
-                     self.conf.metadata_proxy_socket)
+        handler = MetadataProxyHandler(self.conf)
+        handler.start()
+        server.start(handler, self.conf.metadata_proxy_socket)
         server.wait()
 
 
@@ -19,6 +19,7 @@ from quantum.common import topics
 
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import rpc
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import proxy
 from quantum.openstack.common import timeutils
 
@@ -66,14 +67,35 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.2 - get_devices_details_list and update_devices_down_list.
 
     '''
 
     BASE_RPC_API_VERSION = '1.0'
+    BATCH_RPC_API_VERSION = '1.2'
 
     def __init__(self, topic):
         super(PluginApi, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # Cleared the first time the server turns down a batched call
+        self.batch_supported = True
+
+    def _call_batch(self, context, method, devices, agent_id):
+        """Call a batched method, returning None if it is unsupported."""
+        if not self.batch_supported:
+            return
+        try:
+            return self.call(context,
+                             self.make_msg(method, devices=devices,
+                                           agent_id=agent_id),
+                             topic=self.topic,
+                             version=self.BATCH_RPC_API_VERSION)
+        except rpc_common.RemoteError as e:
+            if e.exc_type not in ('UnsupportedRpcVersion', 'AttributeError'):
+                raise
+            LOG.info(_("Server does not support %s, falling back to "
+                       "per device calls"), method)
+            self.batch_supported = False
 
     def get_device_details(self, context, device, agent_id):
         return self.call(context,
@@ -81,12 +103,28 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def get_devices_details_list(self, context, devices, agent_id):
+        details = self._call_batch(context, 'get_devices_details_list',
+                                   devices, agent_id)
+        if details is None:
+            details = [self.get_device_details(context, device, agent_id)
+                       for device in devices]
+        return details
+
     def update_device_down(self, context, device, agent_id):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def update_devices_down_list(self, context, devices, agent_id):
+        details = self._call_batch(context, 'update_devices_down_list',
+                                   devices, agent_id)
+        if details is None:
+            details = [self.update_device_down(context, device, agent_id)
+                       for device in devices]
+        return details
+
     def update_device_up(self, context, device, agent_id):
         return self.call(context,
                          self.make_msg('update_device_up', device=device,
@@ -19,16 +19,24 @@
 from oslo.config import cfg
 
 from quantum.common import topics
+from quantum.common import utils
 from quantum.openstack.common import importutils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+SG_INFO_RPC_VERSION = "1.3"
 
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
-        default='quantum.agent.firewall.NoopFirewallDriver')
+        default='quantum.agent.firewall.NoopFirewallDriver'),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_("Match remote security groups with one ipset per group "
+               "instead of one iptables rule per member address"))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -47,6 +55,10 @@ def disable_security_group_extension_if_noop_driver(
 
 class SecurityGroupServerRpcApiMixin(object):
     """A mix-in that enable SecurityGroup support in plugin rpc."""
+
+    # Cleared the first time the server turns down security_group_info
+    sg_info_supported = True
+
     def security_group_rules_for_devices(self, context, devices):
         LOG.debug(_("Get security group rules "
                     "for devices via rpc %r"), devices)
@@ -56,6 +68,26 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        """Get rules and remote group members, None if unsupported."""
+        if not self.sg_info_supported:
+            return
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        try:
+            return self.call(context,
+                             self.make_msg('security_group_info_for_devices',
+                                           devices=devices),
+                             version=SG_INFO_RPC_VERSION,
+                             topic=self.topic)
+        except rpc_common.RemoteError as e:
+            if e.exc_type not in ('UnsupportedRpcVersion', 'AttributeError'):
+                raise
+            LOG.info(_("Server does not support "
+                       "security_group_info_for_devices, falling back to "
+                       "security_group_rules_for_devices"))
+            self.sg_info_supported = False
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -104,12 +136,25 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._get_devices_with_rules(list(device_ids))
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
 
+    def _get_devices_with_rules(self, device_ids):
+        info = self.plugin_rpc.security_group_info_for_devices(
+            self.context, device_ids)
+        if info is None:
+            return self.plugin_rpc.security_group_rules_for_devices(
+                self.context, device_ids)
+        if self.firewall.uses_member_sets:
+            for sg_id, member_ips in info['sg_member_ips'].iteritems():
+                self.firewall.update_security_group_members(sg_id,
+                                                            member_ips)
+            return info['devices']
+        return utils.expand_remote_group_rules(info['devices'],
+                                               info['sg_member_ips'])
+
     def security_groups_rule_updated(self, security_groups):
         LOG.info(_("Security group "
                    "rule updated %r"), security_groups)
@@ -120,10 +165,32 @@ class SecurityGroupAgentRpcMixin(object):
     def security_groups_member_updated(self, security_groups):
         LOG.info(_("Security group "
                    "member updated %r"), security_groups)
+        if self.firewall.uses_member_sets:
+            self._refresh_security_group_members(security_groups)
+            return
         self._security_group_updated(
             security_groups,
             'security_group_source_groups')
 
+    def _refresh_security_group_members(self, security_groups):
+        """Update the member sets only, leaving the port chains alone."""
+        device_ids = [
+            device_id for device_id, device in self.firewall.ports.items()
+            if set(device.get('security_group_source_groups',
+                              [])).intersection(security_groups)]
+        if not device_ids:
+            return
+        info = self.plugin_rpc.security_group_info_for_devices(
+            self.context, device_ids)
+        if info is None:
+            self.refresh_firewall()
+            return
+        for sg_id in security_groups:
+            member_ips = info['sg_member_ips'].get(sg_id)
+            if member_ips is not None:
+                self.firewall.update_security_group_members(sg_id,
+                                                            member_ips)
+
     def _security_group_updated(self, security_groups, attribute):
         #check need update or not
         for device in self.firewall.ports.values():
@@ -153,8 +220,7 @@ class SecurityGroupAgentRpcMixin(object):
         device_ids = self.firewall.ports.keys()
         if not device_ids:
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device)
@@ -25,7 +25,12 @@ LOG = logging.getLogger(__name__)
 
 
 class L3AgentNotifyAPI(proxy.RpcProxy):
-    """API for plugin to notify L3 agent."""
+    """API for plugin to notify L3 agent.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Added router_delta.
+    """
     BASE_RPC_API_VERSION = '1.0'
 
     def __init__(self, topic=topics.L3_AGENT):
@@ -109,6 +114,35 @@ class L3AgentNotifyAPI(proxy.RpcProxy):
             self._notification(context, 'routers_updated', routers,
                                operation, data)
 
+    def router_delta(self, context, delta):
+        """Notify the agents hosting a router of the objects changed on it.
+
+        A router not hosted by any agent yet is sent whole instead, to
+        get it scheduled.
+        """
+        plugin = manager.QuantumManager.get_plugin()
+        msg = self.make_msg('router_delta', delta=delta)
+        if not utils.is_extension_supported(
+            plugin, constants.AGENT_SCHEDULER_EXT_ALIAS):
+            self.fanout_cast(context, msg, topic=topics.L3_AGENT,
+                             version='1.1')
+            return
+        router_id = delta['router_id']
+        adminContext = context.is_admin and context or context.elevated()
+        l3_agents = plugin.get_l3_agents_hosting_routers(
+            adminContext, [router_id], admin_state_up=True, active=True)
+        if not l3_agents:
+            self.routers_updated(
+                context, plugin.get_sync_data(adminContext, [router_id]))
+            return
+        for l3_agent in l3_agents:
+            LOG.debug(_('Notify agent at %(topic)s.%(host)s the message '
+                        'router_delta'),
+                      {'topic': l3_agent.topic, 'host': l3_agent.host})
+            self.cast(context, msg,
+                      topic='%s.%s' % (l3_agent.topic, l3_agent.host),
+                      version='1.1')
+
     def router_removed_from_agent(self, context, router_id, host):
         self._notification_host(context, 'router_removed_from_agent',
                                 {'router_id': router_id}, host)
@@ -52,7 +52,8 @@ class Controller(object):
 
     def __init__(self, plugin, collection, resource, attr_info,
                  allow_bulk=False, member_actions=None, parent=None,
-                 allow_pagination=False, allow_sorting=False):
+                 allow_pagination=False, allow_sorting=False,
+                 allow_streaming=False):
         if member_actions is None:
             member_actions = []
         self._plugin = plugin
@@ -62,9 +63,11 @@ class Controller(object):
         self._allow_bulk = allow_bulk
         self._allow_pagination = allow_pagination
         self._allow_sorting = allow_sorting
+        self._allow_streaming = allow_streaming
         self._native_bulk = self._is_native_bulk_supported()
         self._native_pagination = self._is_native_pagination_supported()
         self._native_sorting = self._is_native_sorting_supported()
+        self._native_streaming = self._is_native_streaming_supported()
         self._policy_attrs = [name for (name, info) in self._attr_info.items()
                               if info.get('required_by_policy')]
         self._publisher_id = notifier_api.publisher_id('network')
@@ -116,6 +119,11 @@ class Controller(object):
                                     % self._plugin.__class__.__name__)
         return getattr(self._plugin, native_sorting_attr_name, False)
 
+    def _is_native_streaming_supported(self):
+        native_streaming_attr_name = ("_%s__native_streaming_support"
+                                      % self._plugin.__class__.__name__)
+        return getattr(self._plugin, native_streaming_attr_name, False)
+
     def _is_visible(self, context, attr_name, data):
         action = "%s:%s" % (self._plugin_handlers[self.SHOW], attr_name)
         # Optimistically init authz_check to True
@@ -213,6 +221,8 @@ class Controller(object):
         filters = api_common.get_filters(request, self._attr_info,
                                          ['fields', 'sort_key', 'sort_dir',
                                           'limit', 'marker', 'page_reverse'])
+        if do_authz:
+            self._add_policy_filters(request.context, filters)
         kwargs = {'filters': filters,
                   'fields': original_fields}
         sorting_helper = self._get_sorting_helper(request)
@@ -224,6 +234,11 @@ class Controller(object):
         if parent_id:
             kwargs[self._parent_id_name] = parent_id
         obj_getter = getattr(self._plugin, self._plugin_handlers[self.LIST])
+        if self._is_streamed(sorting_helper, pagination_helper):
+            obj_iter = obj_getter(request.context, stream=True, **kwargs)
+            return wsgi_resource.StreamedCollection(
+                self._collection,
+                self._iter_view(request, obj_iter, do_authz, fields_to_add))
         obj_list = obj_getter(request.context, **kwargs)
         obj_list = sorting_helper.sort(obj_list)
         obj_list = pagination_helper.paginate(obj_list)
@@ -232,11 +247,9 @@ class Controller(object):
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
+            obj_list = list(policy.check_list(
+                request.context, self._plugin_handlers[self.SHOW], obj_list,
+                plugin=self._plugin))
         collection = {self._collection:
                       [self._view(request.context, obj,
                                   fields_to_strip=fields_to_add)
@@ -247,6 +260,36 @@ class Controller(object):
 
         return collection
 
+    def _add_policy_filters(self, context, filters):
+        """Have the plugin query only return objects allowed by policy."""
+        policy_filters = policy.get_filters(context,
+                                            self._plugin_handlers[self.SHOW])
+        # Attributes of parent resources cannot be filtered on
+        if not policy_filters or not all(key in self._attr_info
+                                         for key in policy_filters):
+            return
+        for key, values in policy_filters.iteritems():
+            if key in filters:
+                values = [value for value in filters[key] if value in values]
+            filters[key] = values
+
+    def _is_streamed(self, sorting_helper, pagination_helper):
+        # Emulated sorting and paginated lists need the whole list
+        return (self._allow_streaming and self._native_streaming and
+                not isinstance(sorting_helper,
+                               api_common.SortingEmulatedHelper) and
+                not getattr(pagination_helper, 'limit', None))
+
+    def _iter_view(self, request, obj_iter, do_authz, fields_to_strip):
+        """Check authz and build the view of each object as it comes."""
+        if do_authz:
+            obj_iter = policy.check_list(
+                request.context, self._plugin_handlers[self.SHOW], obj_iter,
+                plugin=self._plugin)
+        for obj in obj_iter:
+            yield self._view(request.context, obj,
+                             fields_to_strip=fields_to_strip)
+
     def _item(self, request, id, do_authz=False, field_list=None,
               parent_id=None):
         """Retrieves and formats a single element of the requested entity."""
@@ -627,10 +670,11 @@ class Controller(object):
 
 def create_resource(collection, resource, plugin, params, allow_bulk=False,
                     member_actions=None, parent=None, allow_pagination=False,
-                    allow_sorting=False):
+                    allow_sorting=False, allow_streaming=False):
     controller = Controller(plugin, collection, resource, params, allow_bulk,
                             member_actions=member_actions, parent=parent,
                             allow_pagination=allow_pagination,
-                            allow_sorting=allow_sorting)
+                            allow_sorting=allow_sorting,
+                            allow_streaming=allow_streaming)
 
     return wsgi_resource.Resource(controller, FAULT_MAP)
@@ -17,6 +17,8 @@
 Utility methods for working with WSGI servers redux
 """
 
+import itertools
+
 import netaddr
 import webob.dec
 import webob.exc
@@ -34,6 +36,24 @@ class Request(wsgi.Request):
     pass
 
 
+class StreamedCollection(object):
+    """A list response whose items are produced while it is being sent."""
+
+    def __init__(self, collection, items):
+        self.collection = collection
+        self.items = items
+
+
+def _log_stream_errors(body, action):
+    try:
+        for chunk in body:
+            yield chunk
+    except Exception:
+        # The status is sent already, the response is left incomplete
+        LOG.exception(_('%s failed while sending the response'), action)
+        raise
+
+
 def Resource(controller, faults=None, deserializers=None, serializers=None):
     """Represents an API entity resource and the associated serialization and
     deserialization logic
@@ -80,6 +100,17 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             method = getattr(controller, action)
 
             result = method(request=request, **args)
+            body_iter = None
+            if isinstance(result, StreamedCollection):
+                if isinstance(serializer, wsgi.JSONDictSerializer):
+                    body_iter = serializer.serialize_collection_iter(
+                        result.collection, result.items)
+                    # Produce the first chunk here, so that errors in the
+                    # early processing get the usual error response
+                    body_iter = itertools.chain([next(body_iter)],
+                                                body_iter)
+                else:
+                    result = {result.collection: list(result.items)}
         except (exceptions.QuantumException,
                 netaddr.AddrFormatError) as e:
             LOG.exception(_('%s failed'), action)
@@ -105,6 +136,11 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
+        if body_iter is not None:
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=_log_stream_errors(body_iter,
+                                                              action))
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -84,10 +84,11 @@ class APIRouter(wsgi.Router):
             allow_bulk = cfg.CONF.allow_bulk
             allow_pagination = cfg.CONF.allow_pagination
             allow_sorting = cfg.CONF.allow_sorting
+            allow_streaming = cfg.CONF.allow_list_streaming
             controller = base.create_resource(
                 collection, resource, plugin, params, allow_bulk=allow_bulk,
                 parent=parent, allow_pagination=allow_pagination,
-                allow_sorting=allow_sorting)
+                allow_sorting=allow_sorting, allow_streaming=allow_streaming)
             path_prefix = None
             if parent:
                 path_prefix = "/%s/{%s_id}/%s" % (parent['collection_name'],
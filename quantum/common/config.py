@@ -60,6 +60,9 @@ core_opts = [
                 help=_("Allow the usage of the pagination")),
     cfg.BoolOpt('allow_sorting', default=False,
                 help=_("Allow the usage of the sorting")),
+    cfg.BoolOpt('allow_list_streaming', default=False,
+                help=_("Stream the JSON responses of list requests which "
+                       "are not paginated")),
     cfg.StrOpt('pagination_max_limit', default="-1",
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
@@ -72,6 +75,10 @@ core_opts = [
                help=_("Maximum number of fixed ips per port")),
     cfg.IntOpt('dhcp_lease_duration', default=120,
                help=_("DHCP lease duration")),
+    cfg.StrOpt('ipam_driver',
+               default='quantum.db.ipam.range_driver.AvailabilityRangeDriver',
+               help=_("The driver used to track free addresses of subnet "
+                      "allocation pools")),
     cfg.BoolOpt('dhcp_agent_notification', default=True,
                 help=_("Allow sending resource operation"
                        " notification to DHCP agent")),
@@ -34,6 +34,12 @@ INTERFACE_KEY = '_interfaces'
 IPv4 = 'IPv4'
 IPv6 = 'IPv6'
 
+IP_MASK = {IPv4: 32,
+           IPv6: 128}
+
+DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
+                       'egress': 'dest_ip_prefix'}
+
 UDP_PROTOCOL = 17
 DHCP_RESPONSE_PORT = 68
 
@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from quantum import context
 from quantum.openstack.common import log as logging
 from quantum.openstack.common.rpc import dispatcher
@@ -42,3 +44,88 @@ class PluginRpcDispatcher(dispatcher.RpcDispatcher):
         quantum_ctxt = context.Context(user_id, tenant_id, **rpc_ctxt_dict)
         return super(PluginRpcDispatcher, self).dispatch(
             quantum_ctxt, version, method, namespace, **kwargs)
+
+
+class TopicStats(object):
+    """Queue depth and handler latencies of the messages of a topic.
+
+    The depth is the number of messages received by this process which
+    are not handled yet. The latencies are accumulated per method until
+    they are collected.
+    """
+
+    def __init__(self, topic):
+        self.topic = topic
+        self.pending = 0
+        self._reset()
+
+    def _reset(self):
+        self.max_pending = self.pending
+        # {method: [count, total seconds, max seconds]}
+        self.methods = {}
+
+    def received(self):
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+
+    def handled(self, method, elapsed):
+        self.pending -= 1
+        latencies = self.methods.setdefault(method, [0, 0.0, 0.0])
+        latencies[0] += 1
+        latencies[1] += elapsed
+        latencies[2] = max(latencies[2], elapsed)
+
+    def collect(self):
+        """Return the stats since the previous collect and reset them."""
+        stats = {'topic': self.topic,
+                 'pending': self.pending,
+                 'max_pending': self.max_pending,
+                 'methods': dict(
+                     (method, {'count': count,
+                               'mean_ms': total * 1000 / count,
+                               'max_ms': longest * 1000})
+                     for method, (count, total, longest)
+                     in self.methods.iteritems())}
+        self._reset()
+        return stats
+
+
+# {topic: TopicStats} of the consumers of this process
+_TOPIC_STATS = {}
+
+
+def get_topic_stats(topic):
+    stats = _TOPIC_STATS.get(topic)
+    if stats is None:
+        stats = _TOPIC_STATS[topic] = TopicStats(topic)
+    return stats
+
+
+class StatsDispatcher(object):
+    """Record the TopicStats of the messages dispatched to a dispatcher."""
+
+    def __init__(self, topic, dispatcher):
+        self.stats = get_topic_stats(topic)
+        self.dispatcher = dispatcher
+
+    def dispatch(self, rpc_ctxt, version, method, namespace, **kwargs):
+        self.stats.received()
+        start = time.time()
+        try:
+            return self.dispatcher.dispatch(rpc_ctxt, version, method,
+                                            namespace, **kwargs)
+        finally:
+            self.stats.handled(method, time.time() - start)
+
+
+def report_stats():
+    """Log the stats of the topics consumed by this process."""
+    for topic in sorted(_TOPIC_STATS):
+        stats = _TOPIC_STATS[topic].collect()
+        LOG.info(_("RPC topic %(topic)s: %(pending)d messages pending, "
+                   "%(max_pending)d at most"), stats)
+        for method, latencies in sorted(stats['methods'].iteritems()):
+            latencies['method'] = method
+            LOG.info(_("RPC topic %(topic)s: %(count)d %(method)s handled "
+                       "in %(mean_ms).1fms on average, %(max_ms).1fms at "
+                       "most"), dict(latencies, topic=topic))
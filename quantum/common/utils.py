@@ -29,6 +29,7 @@ import socket
 from eventlet.green import subprocess
 from oslo.config import cfg
 
+from quantum.common import constants
 from quantum.openstack.common import log as logging
 
 
@@ -193,3 +194,34 @@ def is_extension_supported(plugin, ext_alias):
 
 def log_opt_values(log):
     cfg.CONF.log_opt_values(log, std_logging.DEBUG)
+
+
+def expand_remote_group_rules(devices, sg_member_ips):
+    """Convert remote_group_id rules to source/dest_ip_prefix rules.
+
+    :param devices: ports with their security group rules
+    :param sg_member_ips: member addresses of the remote groups, by
+                          ethertype
+    :returns: the devices, with one rule per remote group member
+    """
+    for device in devices.values():
+        fixed_ips = set(device.get('fixed_ips', []))
+        updated_rule = []
+        for rule in device.get('security_group_rules'):
+            remote_group_id = rule.get('remote_group_id')
+            if not remote_group_id:
+                updated_rule.append(rule)
+                continue
+            direction_ip_prefix = (
+                constants.DIRECTION_IP_PREFIX[rule['direction']])
+            ethertype = rule['ethertype']
+            member_ips = sg_member_ips.get(remote_group_id, {})
+            for ip in member_ips.get(ethertype, []):
+                if ip in fixed_ips:
+                    continue
+                ip_rule = rule.copy()
+                ip_rule[direction_ip_prefix] = "%s/%s" % (
+                    ip, constants.IP_MASK[ethertype])
+                updated_rule.append(ip_rule)
+        device['security_group_rules'] = updated_rule
+    return devices
@@ -19,18 +19,26 @@ from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from quantum import context as q_context
 from quantum.db import model_base
 from quantum.db import models_v2
 from quantum.extensions import agent as ext_agent
 from quantum import manager
 from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
 from quantum.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
-cfg.CONF.register_opt(
+agent_opts = [
     cfg.IntOpt('agent_down_time', default=5,
-               help=_("Seconds to regard the agent is down.")))
+               help=_("Seconds to regard the agent is down.")),
+    cfg.IntOpt('agent_heartbeat_flush_interval', default=0,
+               help=_("Seconds between writing the heartbeats of the agents "
+                      "with unchanged reports to the database, 0 to write "
+                      "them as they are received")),
+]
+cfg.CONF.register_opts(agent_opts)
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -57,6 +65,125 @@ class Agent(model_base.BASEV2, models_v2.HasId):
     configurations = sa.Column(sa.String(4095), nullable=False)
 
 
+class AgentHeartbeats(object):
+    """In-memory liveness table of the agents reporting to this process.
+
+    A report equal to the previous one of its agent is a mere heartbeat:
+    it is recorded here, and only its heartbeat_timestamp is written to
+    the database, along with the others received since the last flush.
+    """
+
+    def __init__(self):
+        # {(agent_type, host): (agent id, reported columns)}
+        self._reports = {}
+        # {agent id: time of its last heartbeat}
+        self._heartbeats = {}
+        self._unflushed = set()
+        self._flusher = None
+
+    def record(self, agent_id, report, heartbeat):
+        """Record the report of an agent, written to the database."""
+        self._reports[(report['agent_type'], report['host'])] = (agent_id,
+                                                                 report)
+        self._heartbeats[agent_id] = heartbeat
+        self._unflushed.discard(agent_id)
+
+    def absorb(self, report, heartbeat):
+        """Record a report equal to the previous one of its agent.
+
+        :returns: the id of the agent, None if the report changed and
+                  must be written.
+        """
+        agent_id, previous = self._reports.get(
+            (report['agent_type'], report['host']), (None, None))
+        if previous != report:
+            return
+        self._heartbeats[agent_id] = heartbeat
+        self._unflushed.add(agent_id)
+        return agent_id
+
+    def forget(self, agent_id):
+        for key, (known_id, report) in self._reports.items():
+            if known_id == agent_id:
+                del self._reports[key]
+        self._heartbeats.pop(agent_id, None)
+        self._unflushed.discard(agent_id)
+
+    def get(self, agent_id):
+        return self._heartbeats.get(agent_id)
+
+    def flush(self, context):
+        """Write the recorded heartbeats in a single statement.
+
+        A heartbeat is only written to a row which still holds the report
+        it was absorbed into, as another server process may have written
+        a different report of the agent meanwhile.
+
+        :returns: False if some rows were not updated, in which case the
+                  reports are forgotten and the next ones written in full.
+        """
+        reports = dict(self._reports.values())
+        heartbeats = []
+        for agent_id in self._unflushed:
+            # The report may have been forgotten by a concurrent flush,
+            # the next one of the agent is then written in full
+            report = reports.get(agent_id)
+            if report is None:
+                continue
+            heartbeats.append({'agent_id': agent_id,
+                               'heartbeat': self._heartbeats[agent_id],
+                               'report_binary': report['binary'],
+                               'report_topic': report['topic'],
+                               'report_configurations':
+                               report['configurations']})
+        self._unflushed = set()
+        if not heartbeats:
+            return True
+        table = Agent.__table__
+        with context.session.begin(subtransactions=True):
+            result = context.session.execute(
+                table.update().where(sa.and_(
+                    table.c.id == sa.bindparam('agent_id'),
+                    table.c.binary == sa.bindparam('report_binary'),
+                    table.c.topic == sa.bindparam('report_topic'),
+                    table.c.configurations ==
+                    sa.bindparam('report_configurations'))).values(
+                        heartbeat_timestamp=sa.bindparam('heartbeat')),
+                heartbeats)
+        # Some drivers do not count the rows matched by executemany
+        if 0 <= result.rowcount < len(heartbeats):
+            # The reports of the agents still present will be written
+            # again, the agents of the others created again
+            self._reports.clear()
+            self._unflushed.clear()
+            return False
+        return True
+
+    def start_flushing(self, interval):
+        if self._flusher is None:
+            # The other server processes only see the flushed heartbeats
+            down_time = cfg.CONF.agent_down_time
+            if interval >= down_time:
+                LOG.warn(_("agent_heartbeat_flush_interval %(interval)s is "
+                           "not below agent_down_time %(down_time)s, "
+                           "flushing every %(clamped)s seconds instead"),
+                         {'interval': interval, 'down_time': down_time,
+                          'clamped': max(down_time / 2, 1)})
+                interval = max(down_time / 2, 1)
+            self._flusher = loopingcall.FixedIntervalLoopingCall(
+                self._periodic_flush)
+            self._flusher.start(interval=interval, initial_delay=interval)
+
+    def _periodic_flush(self):
+        try:
+            self.flush(q_context.get_admin_context())
+        except Exception:
+            LOG.exception(_("Failed to write the heartbeats of the agents"))
+
+
+HEARTBEATS = AgentHeartbeats()
+
+
 class AgentDbMixin(ext_agent.AgentPluginBase):
     """Mixin class to add agent extension to db_plugin_base_v2."""
 
@@ -68,7 +195,17 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         return agent
 
     @classmethod
-    def is_agent_down(cls, heart_beat_time):
+    def get_heartbeat(cls, heart_beat_time, agent_id):
+        """Return the last heartbeat of an agent, from memory if newer."""
+        heartbeat = HEARTBEATS.get(agent_id)
+        if heartbeat is None or heartbeat < heart_beat_time:
+            return heart_beat_time
+        return heartbeat
+
+    @classmethod
+    def is_agent_down(cls, heart_beat_time, agent_id=None):
+        if agent_id is not None:
+            heart_beat_time = cls.get_heartbeat(heart_beat_time, agent_id)
         return timeutils.is_older_than(heart_beat_time,
                                        cfg.CONF.agent_down_time)
 
@@ -88,6 +225,8 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             ext_agent.RESOURCE_NAME + 's')
         res = dict((k, agent[k]) for k in attr
                    if k not in ['alive', 'configurations'])
+        res['heartbeat_timestamp'] = AgentDbMixin.get_heartbeat(
+            res['heartbeat_timestamp'], res['id'])
         res['alive'] = not AgentDbMixin.is_agent_down(
             res['heartbeat_timestamp'])
         res['configurations'] = self.get_configuration_dict(agent)
@@ -97,6 +236,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        HEARTBEATS.forget(id)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -133,27 +273,40 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
 
     def create_or_update_agent(self, context, agent):
         """Create or update agent according to report."""
-        with context.session.begin(subtransactions=True):
-            res_keys = ['agent_type', 'binary', 'host', 'topic']
-            res = dict((k, agent[k]) for k in res_keys)
+        res_keys = ['agent_type', 'binary', 'host', 'topic']
+        res = dict((k, agent[k]) for k in res_keys)
 
-            configurations_dict = agent.get('configurations', {})
-            res['configurations'] = jsonutils.dumps(configurations_dict)
-            current_time = timeutils.utcnow()
+        configurations_dict = agent.get('configurations', {})
+        res['configurations'] = jsonutils.dumps(configurations_dict)
+        current_time = timeutils.utcnow()
+        # A heartbeat of an agent which did not restart nor change
+        if not agent.get('start_flag') and HEARTBEATS.absorb(res,
+                                                             current_time):
+            interval = cfg.CONF.agent_heartbeat_flush_interval
+            if interval > 0:
+                HEARTBEATS.start_flushing(interval)
+                return
+            if HEARTBEATS.flush(context):
+                return
+        with context.session.begin(subtransactions=True):
             try:
                 agent_db = self._get_agent_by_type_and_host(
                     context, agent['agent_type'], agent['host'])
-                res['heartbeat_timestamp'] = current_time
+                changes = dict((k, v) for k, v in res.iteritems()
+                               if agent_db[k] != v)
+                changes['heartbeat_timestamp'] = current_time
                 if agent.get('start_flag'):
-                    res['started_at'] = current_time
-                agent_db.update(res)
+                    changes['started_at'] = current_time
+                agent_db.update(changes)
             except ext_agent.AgentNotFoundByTypeHost:
-                res['created_at'] = current_time
-                res['started_at'] = current_time
-                res['heartbeat_timestamp'] = current_time
-                res['admin_state_up'] = True
-                agent_db = Agent(**res)
+                agent_db = Agent(created_at=current_time,
+                                 started_at=current_time,
+                                 heartbeat_timestamp=current_time,
+                                 admin_state_up=True,
+                                 **res)
                 context.session.add(agent_db)
+                context.session.flush()
+        HEARTBEATS.record(agent_db.id, res, current_time)
 
 
 class AgentExtRpcCallback(object):
@@ -75,7 +75,7 @@ class AgentSchedulerDbMixin(agentscheduler.AgentSchedulerPluginBase,
             #                   (i.e. have a recent heartbeat timestamp)
             #                   are eligible, even if active is False
             return not agents_db.AgentDbMixin.is_agent_down(
-                agent['heartbeat_timestamp'])
+                agent['heartbeat_timestamp'], agent['id'])
 
     def get_dhcp_agents_hosting_networks(
         self, context, network_ids, active=None):
@@ -277,7 +277,7 @@ class AgentSchedulerDbMixin(agentscheduler.AgentSchedulerPluginBase,
             l3_agents = [l3_agent for l3_agent in
                          l3_agents if not
                          agents_db.AgentDbMixin.is_agent_down(
-                         l3_agent['heartbeat_timestamp'])]
+                         l3_agent['heartbeat_timestamp'], l3_agent['id'])]
         return l3_agents
 
     def _get_l3_bindings_hosting_routers(self, context, router_ids):
@@ -372,6 +372,42 @@ class AgentSchedulerDbMixin(agentscheduler.AgentSchedulerPluginBase,
         for router in routers:
             self.schedule_router(context, router)
 
+    def rebalance_networks(self, context):
+        moves = {}
+        if self.network_scheduler:
+            moves = self.network_scheduler.rebalance_networks(self, context)
+        if self.dhcp_agent_notifier:
+            for network_id, (old_agent, new_agent) in moves.iteritems():
+                self.dhcp_agent_notifier.network_removed_from_agent(
+                    context, network_id, old_agent.host)
+                self.dhcp_agent_notifier.network_added_to_agent(
+                    context, network_id, new_agent.host)
+        return {'networks': [{'id': network_id,
+                              'old_agent_id': old_agent.id,
+                              'new_agent_id': new_agent.id}
+                             for network_id, (old_agent, new_agent)
+                             in moves.iteritems()]}
+
+    def rebalance_routers(self, context):
+        moves = {}
+        if self.router_scheduler:
+            moves = self.router_scheduler.rebalance_routers(self, context)
+        if self.l3_agent_notifier:
+            added = {}
+            for router_id, (old_agent, new_agent) in moves.iteritems():
+                self.l3_agent_notifier.router_removed_from_agent(
+                    context, router_id, old_agent.host)
+                added.setdefault(new_agent.host, []).append(router_id)
+            for host, router_ids in added.iteritems():
+                routers = self.get_sync_data(context, router_ids)
+                self.l3_agent_notifier.router_added_to_agent(
+                    context, routers, host)
+        return {'routers': [{'id': router_id,
+                             'old_agent_id': old_agent.id,
+                             'new_agent_id': new_agent.id}
+                            for router_id, (old_agent, new_agent)
+                            in moves.iteritems()]}
+
     def update_agent(self, context, id, agent):
         original_agent = self.get_agent(context, id)
         result = super(AgentSchedulerDbMixin, self).update_agent(
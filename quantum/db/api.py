@@ -157,6 +157,10 @@ def configure_db():
             engine_args['listeners'] = [SqliteForeignKeysListener()]
             if sql_connection == "sqlite://":
                 engine_args["connect_args"] = {'check_same_thread': False}
+            else:
+                # Database files are not pooled, which can then be used
+                # by several processes
+                del engine_args['pool_size']
 
         _ENGINE = create_engine(sql_connection, **engine_args)
 
@@ -181,6 +185,12 @@ def clear_db(base=BASE):
     _ENGINE = None
 
 
+def dispose():
+    """Close the pooled connections, which are opened again when needed."""
+    if _ENGINE:
+        _ENGINE.dispose()
+
+
 def get_session(autocommit=True, expire_on_commit=False):
     """Helper method to grab session."""
     global _MAKER, _ENGINE
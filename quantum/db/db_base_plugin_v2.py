@@ -27,6 +27,7 @@ from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as q_exc
 from quantum.db import api as db
+from quantum.db.ipam import driver as ipam_driver
 from quantum.db import models_v2
 from quantum.db import sqlalchemyutils
 from quantum.openstack.common import log as logging
@@ -48,6 +49,9 @@ AGENT_OWNER_PREFIX = 'network:'
 # IP allocations being cleaned up by cascade.
 AUTO_DELETE_PORT_OWNERS = ['network:dhcp']
 
+# Number of rows read at once when streaming a collection
+STREAM_CHUNK_SIZE = 500
+
 
 class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     """V2 Quantum plugin interface implementation using SQLAlchemy models.
@@ -59,11 +63,12 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     """
 
     # This attribute specifies whether the plugin supports or not
-    # bulk/pagination/sorting operations. Name mangling is used in
+    # bulk/pagination/sorting/streaming operations. Name mangling is used in
     # order to ensure it is qualified by class
     __native_bulk_support = True
     __native_pagination_support = True
     __native_sorting_support = True
+    __native_streaming_support = True
     # Plugins, mixin classes implementing extension will register
     # hooks into the dict below for "augmenting" the "core way" of
     # building a query for retrieving objects from a model class.
@@ -74,6 +79,24 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     # api resources. Mixins can use this dict for adding their own methods
     # TODO(salvatore-orlando): Avoid using class-level variables
     _dict_extend_functions = {}
+    # Names of the methods extending a list of resource dicts at once, as
+    # method(context, resources), with the data of all of them loaded by a
+    # single query. Methods the plugin does not define are skipped, so that
+    # mixins can register them
+    _dict_extend_batch_functions = {}
+    # Attributes of the core resources read from the column of the same
+    # name. A list request for some of them only selects these columns,
+    # without loading the rows and their relationships
+    _column_attributes = {
+        models_v2.Network: frozenset(['id', 'name', 'tenant_id',
+                                      'admin_state_up', 'status', 'shared']),
+        models_v2.Subnet: frozenset(['id', 'name', 'tenant_id', 'network_id',
+                                     'ip_version', 'cidr', 'gateway_ip',
+                                     'enable_dhcp', 'shared']),
+        models_v2.Port: frozenset(['id', 'name', 'network_id', 'tenant_id',
+                                   'mac_address', 'admin_state_up', 'status',
+                                   'device_id', 'device_owner']),
+    }
 
     def __init__(self):
         # NOTE(jkoelker) This is an incomlete implementation. Subclasses
@@ -127,6 +150,36 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         cur_funcs.extend(funcs)
         cls._dict_extend_functions[resource] = cur_funcs
 
+    @classmethod
+    def register_dict_extend_batch_funcs(cls, resource, func_names):
+        cur_funcs = cls._dict_extend_batch_functions.setdefault(resource, [])
+        cur_funcs.extend(name for name in func_names
+                         if name not in cur_funcs)
+
+    def _get_dict_extend_batch_funcs(self, resource):
+        funcs = []
+        for name in self._dict_extend_batch_functions.get(resource, []):
+            func = getattr(self, name, None)
+            if func:
+                funcs.append(func)
+        return funcs
+
+    def _apply_dict_extend_batch_funcs(self, context, resource, results):
+        for func in self._get_dict_extend_batch_funcs(resource):
+            func(context, results)
+        return results
+
+    def _make_dicts(self, context, resource, rows, dict_func, fields=None):
+        """Return the dicts of rows, extended by the batch functions.
+
+        The dicts are extended with all their fields, then selected.
+        """
+        if not self._get_dict_extend_batch_funcs(resource):
+            return [dict_func(row, fields) for row in rows]
+        items = self._apply_dict_extend_batch_funcs(
+            context, resource, [dict_func(row) for row in rows])
+        return [self._fields(item, fields) for item in items]
+
     @classmethod
     def register_model_query_hook(cls, model, name, query_hook, filter_hook,
                                   result_filters=None):
@@ -219,6 +272,27 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                          if key in fields))
         return resource
 
+    def _get_column_fields(self, model, fields):
+        """Return the requested fields if they are all column attributes.
+
+        :returns: the list of fields without duplicates, or None.
+        """
+        if not fields:
+            return None
+        column_attributes = self._column_attributes.get(model, ())
+        column_fields = []
+        for field in fields:
+            if field not in column_attributes:
+                return None
+            if field not in column_fields:
+                column_fields.append(field)
+        return column_fields
+
+    def _make_column_dicts(self, query, model, fields):
+        query = query.with_entities(*[getattr(model, field)
+                                      for field in fields])
+        return [dict(zip(fields, row)) for row in query]
+
     def _apply_filters_to_query(self, query, model, filters):
         if filters:
             for key, value in filters.iteritems():
@@ -244,15 +318,58 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                                     marker_obj=marker_obj)
         return collection
 
+    def _iter_collection(self, get_query, make_dicts, fields=None,
+                         sorts=None):
+        """Yield the dicts of a collection, reading it by chunks.
+
+        Each chunk is the page following the last row of the previous
+        one, as for native pagination, so that memory use does not grow
+        with the size of the collection. query.yield_per() cannot be used
+        as it does not load joined eager collections correctly.
+        """
+        sorts = list(sorts or [])
+        if 'id' not in dict(sorts):
+            sorts.append(('id', True))
+        marker_obj = None
+        while True:
+            rows = get_query(sorts=sorts, limit=STREAM_CHUNK_SIZE,
+                             marker_obj=marker_obj).all()
+            for item in make_dicts(rows, fields):
+                yield item
+            if len(rows) < STREAM_CHUNK_SIZE:
+                return
+            marker_obj = rows[-1]
+
     def _get_collection(self, context, model, dict_func, filters=None,
                         fields=None, sorts=None, limit=None, marker_obj=None,
-                        page_reverse=False):
+                        page_reverse=False, stream=False, resource=None):
+        """Return the dicts of the rows of model matching filters.
+
+        :param resource: name of the resource whose batch dict extend
+                         functions are applied to the dicts.
+        """
+        def make_dicts(rows, fields):
+            if resource:
+                return self._make_dicts(context, resource, rows, dict_func,
+                                        fields)
+            return [dict_func(row, fields) for row in rows]
+
+        if stream and not limit:
+            def get_query(**kwargs):
+                return self._get_collection_query(context, model,
+                                                  filters=filters, **kwargs)
+            return self._iter_collection(get_query, make_dicts, fields,
+                                         sorts)
         query = self._get_collection_query(context, model, filters=filters,
                                            sorts=sorts,
                                            limit=limit,
                                            marker_obj=marker_obj,
                                            page_reverse=page_reverse)
-        items = [dict_func(c, fields) for c in query]
+        column_fields = self._get_column_fields(model, fields)
+        if column_fields:
+            items = self._make_column_dicts(query, model, column_fields)
+        else:
+            items = make_dicts(query, fields)
         if limit and page_reverse:
             items.reverse()
         return items
@@ -297,6 +414,47 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             return True
         return False
 
+    @staticmethod
+    def _generate_macs(context, network_id, count, exclude=()):
+        """Generate count MAC addresses unique on the network.
+
+        Candidates are checked with a single query per attempt instead of
+        one query per address. MAC addresses in exclude are never returned.
+        """
+        base_mac = cfg.CONF.base_mac.split(':')
+        max_retries = cfg.CONF.mac_generation_retries
+        macs = set()
+        for i in range(max_retries):
+            candidates = set()
+            for j in range(count - len(macs)):
+                mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+                       int(base_mac[2], 16), random.randint(0x00, 0xff),
+                       random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+                if base_mac[3] != '00':
+                    mac[3] = int(base_mac[3], 16)
+                candidates.add(':'.join(map(lambda x: "%02x" % x, mac)))
+            candidates -= macs
+            candidates -= set(exclude)
+            if candidates:
+                mac_qry = context.session.query(models_v2.Port.mac_address)
+                mac_qry = mac_qry.filter(
+                    models_v2.Port.network_id == network_id,
+                    models_v2.Port.mac_address.in_(candidates))
+                candidates -= set(mac for mac, in mac_qry)
+            macs |= candidates
+            if len(macs) == count:
+                LOG.debug(_("Generated %(count)d macs for network "
+                            "%(network_id)s"),
+                          {'count': count, 'network_id': network_id})
+                return list(macs)
+            LOG.debug(_("%(count)d generated macs exist. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'count': count - len(macs),
+                       'max_retries': max_retries - (i + 1)})
+        LOG.error(_("Unable to generate mac address after %s attempts"),
+                  max_retries)
+        raise q_exc.MacAddressGenerationFailure(net_id=network_id)
+
     @staticmethod
     def _hold_ip(context, network_id, subnet_id, port_id, ip_address):
         alloc_qry = context.session.query(
@@ -350,81 +508,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         """Return an IP address to the pool of free IP's on the network
         subnet.
         """
-        # Grab all allocation pools for the subnet
-        pool_qry = context.session.query(
-            models_v2.IPAllocationPool).with_lockmode('update')
-        allocation_pools = pool_qry.filter_by(subnet_id=subnet_id)
-        # Find the allocation pool for the IP to recycle
-        pool_id = None
-        for allocation_pool in allocation_pools:
-            allocation_pool_range = netaddr.IPRange(
-                allocation_pool['first_ip'],
-                allocation_pool['last_ip'])
-            if netaddr.IPAddress(ip_address) in allocation_pool_range:
-                pool_id = allocation_pool['id']
-                break
-        if not pool_id:
-            error_message = _("No allocation pool found for "
-                              "ip address:%s") % ip_address
-            raise q_exc.InvalidInput(error_message=error_message)
-        # Two requests will be done on the database. The first will be to
-        # search if an entry starts with ip_address + 1 (r1). The second
-        # will be to see if an entry ends with ip_address -1 (r2).
-        # If 1 of the above holds true then the specific entry will be
-        # modified. If both hold true then the two ranges will be merged.
-        # If there are no entries then a single entry will be added.
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).with_lockmode('update')
-        ip_first = str(netaddr.IPAddress(ip_address) + 1)
-        ip_last = str(netaddr.IPAddress(ip_address) - 1)
-        LOG.debug(_("Recycle %s"), ip_address)
-        try:
-            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     first_ip=ip_first).one()
-            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        except exc.NoResultFound:
-            r1 = []
-        try:
-            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     last_ip=ip_last).one()
-            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        except exc.NoResultFound:
-            r2 = []
-
-        if r1 and r2:
-            # Merge the two ranges
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=r2['first_ip'],
-                last_ip=r1['last_ip'])
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
-                        "%(first_ip2)s-%(last_ip2)s"),
-                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
-                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
-            context.session.delete(r1)
-            context.session.delete(r2)
-        elif r1:
-            # Update the range with matched first IP
-            r1['first_ip'] = ip_address
-            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        elif r2:
-            # Update the range with matched last IP
-            r2['last_ip'] = ip_address
-            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        else:
-            # Create a new range
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=ip_address,
-                last_ip=ip_address)
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': ip_address, 'last_ip': ip_address})
+        ipam_driver.get_ipam_driver().release(context, subnet_id, ip_address)
         QuantumDbPluginV2._delete_ip_allocation(context, network_id, subnet_id,
                                                 ip_address)
 
@@ -474,66 +558,22 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         The IP address will be generated from one of the subnets defined on
         the network.
         """
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        for subnet in subnets:
-            range = range_qry.filter_by(subnet_id=subnet['id']).first()
-            if not range:
-                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
-                            "allocated"),
-                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
-                continue
-            ip_address = range['first_ip']
-            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
-                        "to %(last_ip)s"),
-                      {'ip_address': ip_address,
-                       'first_ip': range['first_ip'],
-                       'last_ip': range['last_ip']})
-            if range['first_ip'] == range['last_ip']:
-                # No more free indices on subnet => delete
-                LOG.debug(_("No more free IP's in slice. Deleting allocation "
-                            "pool."))
-                context.session.delete(range)
-            else:
-                # increment the first free
-                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
-        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+        return QuantumDbPluginV2._generate_ips(context, subnets, 1)[0]
+
+    @staticmethod
+    def _generate_ips(context, subnets, count):
+        """Generate count IP addresses in a single pass.
+
+        The addresses are taken from the subnets in the given order, so
+        they may be spread over several subnets of the network.
+        """
+        return ipam_driver.get_ipam_driver().allocate(context, subnets, count)
 
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
-        ip = int(netaddr.IPAddress(ip_address))
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange,
-            models_v2.IPAllocationPool).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        results = range_qry.filter_by(subnet_id=subnet_id)
-        for (range, pool) in results:
-            first = int(netaddr.IPAddress(range['first_ip']))
-            last = int(netaddr.IPAddress(range['last_ip']))
-            if first <= ip <= last:
-                if first == last:
-                    context.session.delete(range)
-                    return
-                elif first == ip:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-                    return
-                elif last == ip:
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    return
-                else:
-                    # Split into two ranges
-                    new_first = str(netaddr.IPAddress(ip_address) + 1)
-                    new_last = range['last_ip']
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    ip_range = models_v2.IPAvailabilityRange(
-                        allocation_pool_id=pool['id'],
-                        first_ip=new_first,
-                        last_ip=new_last)
-                    context.session.add(ip_range)
-                    return
+        ipam_driver.get_ipam_driver().allocate_specific(context, subnet_id,
+                                                        ip_address)
 
     @staticmethod
     def _check_unique_ip(context, network_id, subnet_id, ip_address):
@@ -928,7 +968,11 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         return self._fields(res, fields)
 
     def _make_port_dict(self, port, fields=None,
-                        process_extensions=True):
+                        process_extensions=True, fixed_ips=None):
+        if fixed_ips is None:
+            # NOTE: fixed_ips is a dynamic relationship, iterating it
+            # queries (and flushes) the database
+            fixed_ips = port["fixed_ips"]
         res = {"id": port["id"],
                'name': port['name'],
                "network_id": port["network_id"],
@@ -938,7 +982,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                "status": port["status"],
                "fixed_ips": [{'subnet_id': ip["subnet_id"],
                               'ip_address': ip["ip_address"]}
-                             for ip in port["fixed_ips"]],
+                             for ip in fixed_ips],
                "device_id": port["device_id"],
                "device_owner": port["device_owner"]}
         # Call auxiliary extend functions, if any
@@ -1031,11 +1075,12 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     def get_network(self, context, id, fields=None):
         network = self._get_network(context, id)
-        return self._make_network_dict(network, fields)
+        return self._make_dicts(context, attributes.NETWORKS, [network],
+                                self._make_network_dict, fields)[0]
 
     def get_networks(self, context, filters=None, fields=None,
                      sorts=None, limit=None, marker=None,
-                     page_reverse=False):
+                     page_reverse=False, stream=False):
         marker_obj = self._get_marker_obj(context, 'network', limit, marker)
         return self._get_collection(context, models_v2.Network,
                                     self._make_network_dict,
@@ -1043,7 +1088,9 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                     sorts=sorts,
                                     limit=limit,
                                     marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+                                    page_reverse=page_reverse,
+                                    stream=stream,
+                                    resource=attributes.NETWORKS)
 
     def get_networks_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Network,
@@ -1174,11 +1221,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                                      first_ip=pool['start'],
                                                      last_ip=pool['end'])
                 context.session.add(ip_pool)
-                ip_range = models_v2.IPAvailabilityRange(
-                    ipallocationpool=ip_pool,
-                    first_ip=pool['start'],
-                    last_ip=pool['end'])
-                context.session.add(ip_range)
+                ipam_driver.get_ipam_driver().create_pool(context, ip_pool)
 
         return self._make_subnet_dict(subnet)
 
@@ -1266,6 +1309,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             allocated.delete()
 
             context.session.delete(subnet)
+            ipam_driver.get_ipam_driver().delete_subnet(context, id)
 
     def get_subnet(self, context, id, fields=None):
         subnet = self._get_subnet(context, id)
@@ -1273,7 +1317,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     def get_subnets(self, context, filters=None, fields=None,
                     sorts=None, limit=None, marker=None,
-                    page_reverse=False):
+                    page_reverse=False, stream=False):
         marker_obj = self._get_marker_obj(context, 'subnet', limit, marker)
         return self._get_collection(context, models_v2.Subnet,
                                     self._make_subnet_dict,
@@ -1281,16 +1325,181 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                     sorts=sorts,
                                     limit=limit,
                                     marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+                                    page_reverse=page_reverse,
+                                    stream=stream)
 
     def get_subnets_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Subnet,
                                           filters=filters)
 
+    def _create_port_db(self, context, p, port_id, tenant_id, mac_address,
+                        ips):
+        """Add the Port and IPAllocation rows of a new port to the session.
+        """
+        network_id = p['network_id']
+        if 'status' not in p:
+            status = constants.PORT_STATUS_ACTIVE
+        else:
+            status = p['status']
+
+        port = models_v2.Port(tenant_id=tenant_id,
+                              name=p['name'],
+                              id=port_id,
+                              network_id=network_id,
+                              mac_address=mac_address,
+                              admin_state_up=p['admin_state_up'],
+                              status=status,
+                              device_id=p['device_id'],
+                              device_owner=p['device_owner'])
+        context.session.add(port)
+
+        # Update the allocated IP's
+        for ip in ips:
+            ip_address = ip['ip_address']
+            subnet_id = ip['subnet_id']
+            LOG.debug(_("Allocated IP %(ip_address)s "
+                        "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
+                      {'ip_address': ip_address,
+                       'network_id': network_id,
+                       'subnet_id': subnet_id,
+                       'port_id': port_id})
+            allocated = models_v2.IPAllocation(
+                network_id=network_id,
+                port_id=port_id,
+                ip_address=ip_address,
+                subnet_id=subnet_id,
+                expiration=self._default_allocation_expiration()
+            )
+            context.session.add(allocated)
+        return port
+
+    def _prepare_ports_for_bulk(self, context, items):
+        """Generate MAC and IP addresses for a batch of new ports.
+
+        The MACs of each network are generated with one uniqueness query
+        and the addresses of ports without fixed_ips are allocated from
+        the subnets in one pass. The items must have their port id set;
+        returns the results keyed by port id.
+        """
+        by_network = {}
+        for item in items:
+            p = item['port']
+            by_network.setdefault(p['network_id'], []).append(p)
+
+        prepared = {}
+        for network_id, ports in by_network.iteritems():
+            self._recycle_expired_ip_allocations(context, network_id)
+            network = self._get_network(context, network_id)
+            for p in ports:
+                prepared[p['id']] = {'network': network}
+
+            need_mac = [p for p in ports
+                        if p['mac_address'] is attributes.ATTR_NOT_SPECIFIED]
+            if need_mac:
+                macs = self._generate_macs(
+                    context, network_id, len(need_mac),
+                    exclude=[p['mac_address'] for p in ports
+                             if p['mac_address'] is not
+                             attributes.ATTR_NOT_SPECIFIED])
+                for p, mac in zip(need_mac, macs):
+                    prepared[p['id']]['mac_address'] = mac
+
+            need_ips = [p for p in ports
+                        if p['fixed_ips'] is attributes.ATTR_NOT_SPECIFIED]
+            if need_ips:
+                for p in need_ips:
+                    prepared[p['id']]['ips'] = []
+                filter = {'network_id': [network_id]}
+                subnets = self.get_subnets(context, filters=filter)
+                for version in (4, 6):
+                    version_subnets = [subnet for subnet in subnets
+                                       if subnet['ip_version'] == version]
+                    if not version_subnets:
+                        continue
+                    ips = self._generate_ips(context, version_subnets,
+                                             len(need_ips))
+                    for p, ip in zip(need_ips, ips):
+                        prepared[p['id']]['ips'].append(ip)
+        return prepared
+
+    def _create_prepared_port(self, context, port, prepared):
+        p = port['port']
+        if 'mac_address' not in prepared or 'ips' not in prepared:
+            # Addresses given by the user still need validation
+            return QuantumDbPluginV2._create_port(self, context, port,
+                                                  prepared)
+        tenant_id = self._get_tenant_id_for_create(context, p)
+        port = self._create_port_db(context, p, p['id'], tenant_id,
+                                    prepared['mac_address'], prepared['ips'])
+        return self._make_port_dict(port, process_extensions=False,
+                                    fixed_ips=prepared['ips'])
+
+    def _prepare_port_create(self, context, port):
+        """Complete the request of a new port before its rows are added.
+
+        This and _extend_port_create and _notify_port_create are the steps
+        of create_port_bulk a plugin adds around the base create_port.
+        create_port_bulk adds the rows of a batch of ports together when
+        the create_port of the plugin is the one of the class defining
+        _extend_port_create, which should then be made of these steps.
+        """
+
+    def _extend_port_create(self, context, port, port_dict):
+        """Process a new port within the transaction which added it.
+
+        :returns: the port dict returned to the caller.
+        """
+        return port_dict
+
+    def _notify_port_create(self, context, port_dict):
+        """Process a new port once its transaction is committed."""
+
+    def _is_native_port_create(self):
+        for cls in type(self).__mro__:
+            if '_extend_port_create' in cls.__dict__:
+                break
+        return (getattr(self.create_port, 'im_func', None) is
+                cls.create_port.im_func)
+
     def create_port_bulk(self, context, ports):
-        return self._create_bulk('port', context, ports)
+        """Create many ports within a single transaction.
+
+        If the plugin creates ports with the base create_port and the port
+        create hooks only, the MAC and IP addresses of all ports are
+        generated up front and the rows are added to the session, so that
+        they are flushed together at commit time; otherwise create_port
+        is invoked for every port.
+        """
+        # The port ids are assigned to copies of the requests
+        items = []
+        for item in ports['ports']:
+            p = dict(item['port'])
+            p['id'] = p.get('id') or uuidutils.generate_uuid()
+            items.append({'port': p})
+        if not self._is_native_port_create():
+            return self._create_bulk('port', context, {'ports': items})
+        with context.session.begin(subtransactions=True):
+            prepared = self._prepare_ports_for_bulk(context, items)
+            objects = []
+            for item in items:
+                self._prepare_port_create(context, item)
+                objects.append(self._extend_port_create(
+                    context, item,
+                    self._create_prepared_port(
+                        context, item, prepared[item['port']['id']])))
+        for port_dict in objects:
+            self._notify_port_create(context, port_dict)
+        return objects
 
     def create_port(self, context, port):
+        return QuantumDbPluginV2._create_port(self, context, port)
+
+    def _create_port(self, context, port, prepared=None):
+        """Create a port, with the addresses prepared for it if any.
+
+        :param prepared: the network, MAC and IP addresses generated for
+                         the port by _prepare_ports_for_bulk, if any.
+        """
         p = port['port']
         port_id = p.get('id') or uuidutils.generate_uuid()
         network_id = p['network_id']
@@ -1298,14 +1507,20 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
         #                unneeded db action if the operation raises
         tenant_id = self._get_tenant_id_for_create(context, p)
+        prepared = prepared or {}
 
         with context.session.begin(subtransactions=True):
-            self._recycle_expired_ip_allocations(context, network_id)
-            network = self._get_network(context, network_id)
+            if 'network' in prepared:
+                network = prepared['network']
+            else:
+                self._recycle_expired_ip_allocations(context, network_id)
+                network = self._get_network(context, network_id)
 
             # Ensure that a MAC address is defined and it is unique on the
             # network
-            if mac_address is attributes.ATTR_NOT_SPECIFIED:
+            if 'mac_address' in prepared:
+                mac_address = prepared['mac_address']
+            elif mac_address is attributes.ATTR_NOT_SPECIFIED:
                 mac_address = QuantumDbPluginV2._generate_mac(context,
                                                               network_id)
             else:
@@ -1317,45 +1532,16 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                                 mac=mac_address)
 
             # Returns the IP's for the port
-            ips = self._allocate_ips_for_port(context, network, port)
-
-            if 'status' not in p:
-                status = constants.PORT_STATUS_ACTIVE
+            if 'ips' in prepared:
+                ips = prepared['ips']
             else:
-                status = p['status']
-
-            port = models_v2.Port(tenant_id=tenant_id,
-                                  name=p['name'],
-                                  id=port_id,
-                                  network_id=network_id,
-                                  mac_address=mac_address,
-                                  admin_state_up=p['admin_state_up'],
-                                  status=status,
-                                  device_id=p['device_id'],
-                                  device_owner=p['device_owner'])
-            context.session.add(port)
-
-            # Update the allocated IP's
-            if ips:
-                for ip in ips:
-                    ip_address = ip['ip_address']
-                    subnet_id = ip['subnet_id']
-                    LOG.debug(_("Allocated IP %(ip_address)s "
-                                "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
-                              {'ip_address': ip_address,
-                               'network_id': network_id,
-                               'subnet_id': subnet_id,
-                               'port_id': port_id})
-                    allocated = models_v2.IPAllocation(
-                        network_id=network_id,
-                        port_id=port_id,
-                        ip_address=ip_address,
-                        subnet_id=subnet_id,
-                        expiration=self._default_allocation_expiration()
-                    )
-                    context.session.add(allocated)
+                ips = self._allocate_ips_for_port(context, network, port)
 
-        return self._make_port_dict(port, process_extensions=False)
+            port = self._create_port_db(context, p, port_id, tenant_id,
+                                        mac_address, ips)
+
+        return self._make_port_dict(port, process_extensions=False,
+                                    fixed_ips=ips)
 
     def update_port(self, context, id, port):
         p = port['port']
@@ -1423,7 +1609,8 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     def get_port(self, context, id, fields=None):
         port = self._get_port(context, id)
-        return self._make_port_dict(port, fields)
+        return self._make_dicts(context, attributes.PORTS, [port],
+                                self._make_port_dict, fields)[0]
 
     def _get_ports_query(self, context, filters=None, sorts=None, limit=None,
                          marker_obj=None, page_reverse=False):
@@ -1454,13 +1641,33 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     def get_ports(self, context, filters=None, fields=None,
                   sorts=None, limit=None, marker=None,
-                  page_reverse=False):
+                  page_reverse=False, stream=False):
+        def make_dicts(rows, fields):
+            return self._make_dicts(context, attributes.PORTS, rows,
+                                    self._make_port_dict, fields)
+
+        if stream and not limit:
+            def get_query(**kwargs):
+                # _get_ports_query pops the fixed_ips filter
+                return self._get_ports_query(context, dict(filters or {}),
+                                             **kwargs)
+            return self._iter_collection(get_query, make_dicts, fields,
+                                         sorts)
         marker_obj = self._get_marker_obj(context, 'port', limit, marker)
+        fixed_ips = (filters or {}).get('fixed_ips', {})
         query = self._get_ports_query(context, filters=filters,
                                       sorts=sorts, limit=limit,
                                       marker_obj=marker_obj,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query]
+        column_fields = self._get_column_fields(models_v2.Port, fields)
+        # Column queries are not uniqued: with the join on the IP
+        # allocations, a port would be returned once per matching address
+        if column_fields and not (fixed_ips.get('ip_address') or
+                                  fixed_ips.get('subnet_id')):
+            items = self._make_column_dicts(query, models_v2.Port,
+                                            column_fields)
+        else:
+            items = make_dicts(query, fields)
         if limit and page_reverse:
             items.reverse()
         return items
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+
 from oslo.config import cfg
 from sqlalchemy.orm import exc
 
@@ -20,11 +22,16 @@ from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import utils
 from quantum import manager
+from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 
+# The port attributes which matter to the DHCP agents
+DHCP_PORT_FIELDS = ['id', 'network_id', 'mac_address', 'fixed_ips',
+                    'device_id', 'device_owner', 'admin_state_up']
+
 
 class DhcpRpcCallbackMixin(object):
     """A mix-in that enable DHCP agent support in plugin implementations."""
@@ -43,8 +50,38 @@ class DhcpRpcCallbackMixin(object):
         else:
             filters = dict(admin_state_up=[True])
             nets = plugin.get_networks(context, filters=filters)
+        if kwargs.get('fingerprints'):
+            return self._get_network_fingerprints(context, plugin, nets)
         return [net['id'] for net in nets]
 
+    def _get_network_fingerprints(self, context, plugin, nets):
+        """Return a hash of the DHCP relevant content of each network.
+
+        Agents compare these with the hashes of their last refresh to
+        skip get_network_info for the networks which did not change.
+        """
+        contents = {}
+        for net in nets:
+            contents[net['id']] = {'admin_state_up': net['admin_state_up'],
+                                   'subnets': [],
+                                   'ports': []}
+        if contents:
+            filters = dict(network_id=contents.keys())
+            for subnet in plugin.get_subnets(context, filters=filters):
+                contents[subnet['network_id']]['subnets'].append(subnet)
+            for port in plugin.get_ports(context, filters=filters,
+                                         fields=DHCP_PORT_FIELDS):
+                port['fixed_ips'].sort(key=lambda ip: ip['ip_address'])
+                contents[port['network_id']]['ports'].append(port)
+
+        fingerprints = {}
+        for network_id, content in contents.iteritems():
+            content['subnets'].sort(key=lambda subnet: subnet['id'])
+            content['ports'].sort(key=lambda port: port['id'])
+            fingerprints[network_id] = hashlib.sha1(
+                jsonutils.dumps(content, sort_keys=True)).hexdigest()
+        return fingerprints
+
     def get_network_info(self, context, **kwargs):
         """Retrieve and return a extended information about a network."""
         network_id = kwargs.get('network_id')
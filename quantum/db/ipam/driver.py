@@ -0,0 +1,83 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from abc import ABCMeta, abstractmethod
+
+from oslo.config import cfg
+
+from quantum.openstack.common import importutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+_DRIVER = None
+
+
+class IpamDriver(object):
+    """Track which addresses of the subnet allocation pools are free.
+
+    The driver only manages the free space of the allocation pools; the
+    IPAllocation rows binding addresses to ports are still maintained by
+    QuantumDbPluginV2. All methods are invoked within the transaction of
+    the calling plugin operation.
+    """
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def create_pool(self, context, ip_pool):
+        """Mark every address of a new IPAllocationPool as free."""
+        pass
+
+    @abstractmethod
+    def allocate(self, context, subnets, count=1):
+        """Allocate count addresses from the given subnets.
+
+        Subnets are consumed in the given order. Returns a list of
+        {'ip_address': ..., 'subnet_id': ...} dicts and raises
+        IpAddressGenerationFailure if not enough addresses are free.
+        """
+        pass
+
+    @abstractmethod
+    def allocate_specific(self, context, subnet_id, ip_address):
+        """Remove a specific address from the free space of the subnet."""
+        pass
+
+    @abstractmethod
+    def release(self, context, subnet_id, ip_address):
+        """Return an address to the free space of its allocation pool."""
+        pass
+
+    def delete_subnet(self, context, subnet_id):
+        """Forget a subnet, whose pools are deleted with it."""
+        pass
+
+
+def get_ipam_driver():
+    """Return the IPAM driver selected by the ipam_driver option."""
+    global _DRIVER
+    if _DRIVER is None:
+        LOG.debug(_("Loading IPAM driver %s"), cfg.CONF.ipam_driver)
+        _DRIVER = importutils.import_object(cfg.CONF.ipam_driver)
+    return _DRIVER
+
+
+def reset_ipam_driver():
+    """Drop the loaded driver so the next call reloads it."""
+    global _DRIVER
+    _DRIVER = None
@@ -0,0 +1,289 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import random
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from quantum.common import exceptions as q_exc
+from quantum.db.ipam import driver
+from quantum.db import model_base
+from quantum.db import models_v2
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+stripe_opts = [
+    cfg.IntOpt('ipam_stripes_per_pool', default=16,
+               help=_("Number of independently locked stripes each "
+                      "allocation pool is split into by the striped IPAM "
+                      "driver")),
+]
+cfg.CONF.register_opts(stripe_opts)
+
+# Pools are never split into stripes smaller than this
+MIN_STRIPE_SIZE = 16
+
+
+class IPAvailabilityStripe(model_base.BASEV2, models_v2.HasId):
+    """Free addresses of a contiguous slice of an allocation pool.
+
+    free_runs holds the free addresses as a comma separated list of
+    'start-end' runs of offsets from first_ip, sorted by start.
+    """
+
+    allocation_pool_id = sa.Column(sa.String(36),
+                                   sa.ForeignKey('ipallocationpools.id',
+                                                 ondelete="CASCADE"),
+                                   nullable=False)
+    first_ip = sa.Column(sa.String(64), nullable=False)
+    last_ip = sa.Column(sa.String(64), nullable=False)
+    free_runs = sa.Column(sa.Text)
+    available = sa.Column(sa.Boolean, nullable=False)
+    ipallocationpool = orm.relationship(
+        models_v2.IPAllocationPool,
+        backref=orm.backref('stripes', lazy='dynamic', cascade='delete'))
+
+
+def decode_runs(text):
+    """Convert a free_runs column into a sorted list of (start, end)."""
+    runs = []
+    for run in (text or '').split(','):
+        if run:
+            start, sep, end = run.partition('-')
+            runs.append((int(start), int(end or start)))
+    return runs
+
+
+def encode_runs(runs):
+    """Convert a list of (start, end) runs into a free_runs column."""
+    return ','.join(start == end and str(start) or '%d-%d' % (start, end)
+                    for start, end in runs)
+
+
+def take_offsets(runs, count):
+    """Remove up to count of the lowest offsets from runs and return them."""
+    taken = []
+    while runs and len(taken) < count:
+        start, end = runs[0]
+        num = min(count - len(taken), end - start + 1)
+        taken.extend(start + i for i in xrange(num))
+        if start + num > end:
+            del runs[0]
+        else:
+            runs[0] = (start + num, end)
+    return taken
+
+
+def remove_offset(runs, offset):
+    """Remove offset from runs; return False if it was not free."""
+    i = bisect.bisect_left(runs, (offset + 1,)) - 1
+    if i < 0 or runs[i][1] < offset:
+        return False
+    start, end = runs[i]
+    replacement = []
+    if start < offset:
+        replacement.append((start, offset - 1))
+    if offset < end:
+        replacement.append((offset + 1, end))
+    runs[i:i + 1] = replacement
+    return True
+
+
+def add_offset(runs, offset):
+    """Add offset to runs; return False if it was already free."""
+    i = bisect.bisect_left(runs, (offset + 1,))
+    prev = runs[i - 1] if i > 0 else None
+    next = runs[i] if i < len(runs) else None
+    if prev and prev[1] >= offset:
+        return False
+    merge_prev = prev and prev[1] == offset - 1
+    merge_next = next and next[0] == offset + 1
+    if merge_prev and merge_next:
+        runs[i - 1:i + 1] = [(prev[0], next[1])]
+    elif merge_prev:
+        runs[i - 1] = (prev[0], offset)
+    elif merge_next:
+        runs[i] = (offset, next[1])
+    else:
+        runs.insert(i, (offset, offset))
+    return True
+
+
+class StripedIpamDriver(driver.IpamDriver):
+    """Keep the free space of each pool as run-length encoded stripes.
+
+    Every allocation pool is split into ipam_stripes_per_pool stripes.
+    An allocation locks only one randomly chosen stripe with free space,
+    so concurrent port creations on the same subnet rarely wait for each
+    other, and releasing an address is a bisect on the runs of a single
+    row instead of a search over IPAvailabilityRange rows.
+
+    Pools created before this driver was enabled are converted from
+    their IPAvailabilityRange rows the first time they are used.
+    """
+
+    def __init__(self):
+        # Subnets whose pools are known to be striped. Allocation pools
+        # can not be changed after the subnet has been created.
+        self._striped_subnets = set()
+
+    @staticmethod
+    def _build_stripes(context, pool, free_ranges):
+        first = netaddr.IPAddress(pool['first_ip'])
+        last = netaddr.IPAddress(pool['last_ip'])
+        size = int(last) - int(first) + 1
+        num = max(1, min(cfg.CONF.ipam_stripes_per_pool,
+                         size // MIN_STRIPE_SIZE))
+        stripe_size = -(-size // num)
+        free_ranges = sorted(free_ranges)
+        start = int(first)
+        while start <= int(last):
+            end = min(start + stripe_size - 1, int(last))
+            runs = [(max(f, start) - start, min(l, end) - start)
+                    for f, l in free_ranges if f <= end and l >= start]
+            stripe = IPAvailabilityStripe(
+                ipallocationpool=pool,
+                first_ip=str(netaddr.IPAddress(start, first.version)),
+                last_ip=str(netaddr.IPAddress(end, first.version)),
+                free_runs=encode_runs(runs),
+                available=bool(runs))
+            context.session.add(stripe)
+            start = end + 1
+
+    def delete_subnet(self, context, subnet_id):
+        self._striped_subnets.discard(subnet_id)
+
+    def _ensure_stripes(self, context, subnet_id):
+        """Convert the IPAvailabilityRange rows of unstriped pools."""
+        if subnet_id in self._striped_subnets:
+            return
+        converted = False
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        for pool in pool_qry.filter_by(subnet_id=subnet_id):
+            if pool.stripes.first():
+                continue
+            converted = True
+            pool = pool_qry.filter_by(
+                id=pool['id']).with_lockmode('update').one()
+            if not pool.stripes.first():
+                LOG.debug(_("Converting allocation pool %s to stripes"),
+                          pool['id'])
+                ranges = pool.available_ranges.all()
+                self._build_stripes(
+                    context, pool,
+                    [(int(netaddr.IPAddress(r['first_ip'])),
+                      int(netaddr.IPAddress(r['last_ip'])))
+                     for r in ranges])
+                for r in ranges:
+                    context.session.delete(r)
+        # A conversion only counts once the transaction has committed
+        if not converted:
+            self._striped_subnets.add(subnet_id)
+
+    @staticmethod
+    def _lock_stripe(context, stripe_id):
+        return context.session.query(IPAvailabilityStripe).filter_by(
+            id=stripe_id).with_lockmode('update').one()
+
+    @staticmethod
+    def _store_runs(stripe, runs):
+        stripe['free_runs'] = encode_runs(runs)
+        stripe['available'] = bool(runs)
+
+    def _find_stripe(self, context, subnet_id, ip_address):
+        """Lock and return the stripe holding ip_address, if any."""
+        self._ensure_stripes(context, subnet_id)
+        ip = netaddr.IPAddress(ip_address)
+        stripe_qry = context.session.query(
+            IPAvailabilityStripe.id,
+            IPAvailabilityStripe.first_ip,
+            IPAvailabilityStripe.last_ip).join(models_v2.IPAllocationPool)
+        for stripe_id, first_ip, last_ip in stripe_qry.filter_by(
+                subnet_id=subnet_id):
+            if ip in netaddr.IPRange(first_ip, last_ip):
+                return self._lock_stripe(context, stripe_id)
+
+    def create_pool(self, context, ip_pool):
+        self._build_stripes(
+            context, ip_pool,
+            [(int(netaddr.IPAddress(ip_pool['first_ip'])),
+              int(netaddr.IPAddress(ip_pool['last_ip'])))])
+
+    def allocate(self, context, subnets, count=1):
+        ips = []
+        for subnet in subnets:
+            self._ensure_stripes(context, subnet['id'])
+            # Candidates are read without locks; only the stripes actually
+            # used are locked and their state is checked again then.
+            stripe_qry = context.session.query(
+                IPAvailabilityStripe.id).join(models_v2.IPAllocationPool)
+            candidates = [stripe_id for stripe_id, in stripe_qry.filter(
+                models_v2.IPAllocationPool.subnet_id == subnet['id'],
+                IPAvailabilityStripe.available == True)]
+            random.shuffle(candidates)
+            for stripe_id in candidates:
+                if len(ips) == count:
+                    break
+                stripe = self._lock_stripe(context, stripe_id)
+                runs = decode_runs(stripe['free_runs'])
+                offsets = take_offsets(runs, count - len(ips))
+                if not offsets:
+                    continue
+                self._store_runs(stripe, runs)
+                first = netaddr.IPAddress(stripe['first_ip'])
+                ips.extend({'ip_address': str(first + offset),
+                            'subnet_id': subnet['id']}
+                           for offset in offsets)
+                LOG.debug(_("Allocated %(num)d IP(s) from stripe "
+                            "%(first_ip)s-%(last_ip)s"),
+                          {'num': len(offsets),
+                           'first_ip': stripe['first_ip'],
+                           'last_ip': stripe['last_ip']})
+            if len(ips) == count:
+                return ips
+            LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific(self, context, subnet_id, ip_address):
+        stripe = self._find_stripe(context, subnet_id, ip_address)
+        if not stripe:
+            return
+        runs = decode_runs(stripe['free_runs'])
+        offset = (int(netaddr.IPAddress(ip_address)) -
+                  int(netaddr.IPAddress(stripe['first_ip'])))
+        if remove_offset(runs, offset):
+            self._store_runs(stripe, runs)
+
+    def release(self, context, subnet_id, ip_address):
+        stripe = self._find_stripe(context, subnet_id, ip_address)
+        if not stripe:
+            error_message = _("No allocation pool found for "
+                              "ip address:%s") % ip_address
+            raise q_exc.InvalidInput(error_message=error_message)
+        LOG.debug(_("Recycle %s"), ip_address)
+        runs = decode_runs(stripe['free_runs'])
+        offset = (int(netaddr.IPAddress(ip_address)) -
+                  int(netaddr.IPAddress(stripe['first_ip'])))
+        if add_offset(runs, offset):
+            self._store_runs(stripe, runs)
@@ -18,6 +18,7 @@
 #
 
 import netaddr
+from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
@@ -37,6 +38,12 @@ from quantum.openstack.common import uuidutils
 
 LOG = logging.getLogger(__name__)
 
+cfg.CONF.register_opt(
+    cfg.BoolOpt('l3_delta_updates', default=False,
+                help=_("Notify L3 agents of the interfaces and floating IPs "
+                       "added to or removed from a router instead of "
+                       "sending the whole router. Requires L3 agents "
+                       "supporting the router_delta RPC method.")))
 
 DEVICE_OWNER_ROUTER_INTF = l3_constants.DEVICE_OWNER_ROUTER_INTF
 DEVICE_OWNER_ROUTER_GW = l3_constants.DEVICE_OWNER_ROUTER_GW
@@ -47,6 +54,10 @@ DEVICE_OWNER_FLOATINGIP = l3_constants.DEVICE_OWNER_FLOATINGIP
 # Useful to keep the filtering between API and Database.
 API_TO_DB_COLUMN_MAP = {'port_id': 'fixed_port_id'}
 
+# Number of routers synced by one round of queries, which keeps the IN
+# clauses of the queries short
+SYNC_CHUNK_SIZE = 500
+
 
 class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     """Represents a v2 quantum router."""
@@ -55,6 +66,10 @@ class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     status = sa.Column(sa.String(16))
     admin_state_up = sa.Column(sa.Boolean)
     gw_port_id = sa.Column(sa.String(36), sa.ForeignKey('ports.id'))
+    # Bumped whenever the router changes, so that agents can order the
+    # updates of the router and detect the ones they missed
+    revision_number = sa.Column(sa.BigInteger, nullable=False, default=0,
+                                server_default='0')
     gw_port = orm.relationship(models_v2.Port)
 
 
@@ -116,6 +131,9 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         _network_filter_hook,
         _network_result_filter_hook)
 
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_extend_networks_dict_l3'])
+
     def _get_router(self, context, id):
         try:
             router = self._get_by_id(context, Router, id)
@@ -178,11 +196,47 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             # Ensure we actually have something to update
             if r.keys():
                 router_db.update(r)
+            self._bump_router_revision(context, id)
         routers = self.get_sync_data(context.elevated(),
                                      [router_db['id']])
         l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers)
         return self._make_router_dict(router_db)
 
+    def _bump_router_revision(self, context, router_id):
+        """Increment the revision number of a router and return it.
+
+        Called in the transaction changing the router, the row lock taken
+        by the update serializes the concurrent changes of the router.
+        """
+        router_db = self._get_router(context, router_id)
+        router_db.revision_number = Router.revision_number + 1
+        context.session.flush()
+        return router_db.revision_number
+
+    def _notify_router_delta(self, context, router_id, revision_number,
+                             delta, operation=None, data=None):
+        """Notify the agents of the objects added to a router or removed.
+
+        delta may hold interfaces_added and floatingips_added, lists of
+        port and floating IP dicts as found in the sync data, and
+        interfaces_removed and floatingips_removed, lists of ids. The whole
+        router is sent instead unless l3_delta_updates is set.
+        """
+        if not cfg.CONF.l3_delta_updates:
+            routers = self.get_sync_data(context.elevated(), [router_id])
+            l3_rpc_agent_api.L3AgentNotify.routers_updated(
+                context, routers, operation, data)
+            return
+        delta = dict(delta, router_id=router_id,
+                     revision_number=revision_number)
+        l3_rpc_agent_api.L3AgentNotify.router_delta(context, delta)
+
+    def _get_sync_interface(self, context, port_id):
+        port = self._make_port_dict(self._get_port(context, port_id),
+                                    process_extensions=False)
+        self._populate_subnet_for_ports(context, [port])
+        return port
+
     def _update_router_gw_info(self, context, router_id, info):
         # TODO(salvatore-orlando): guarantee atomic behavior also across
         # operations that span beyond the model classes handled by this
@@ -328,55 +382,63 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             msg = _("Either subnet_id or port_id must be specified")
             raise q_exc.BadRequest(resource='router', msg=msg)
 
-        if 'port_id' in interface_info:
-            if 'subnet_id' in interface_info:
-                msg = _("Cannot specify both subnet-id and port-id")
-                raise q_exc.BadRequest(resource='router', msg=msg)
-
-            port = self._get_port(context, interface_info['port_id'])
-            if port['device_id']:
-                raise q_exc.PortInUse(net_id=port['network_id'],
-                                      port_id=port['id'],
-                                      device_id=port['device_id'])
-            fixed_ips = [ip for ip in port['fixed_ips']]
-            if len(fixed_ips) != 1:
-                msg = _('Router port must have exactly one fixed IP')
-                raise q_exc.BadRequest(resource='router', msg=msg)
-            subnet_id = fixed_ips[0]['subnet_id']
-            subnet = self._get_subnet(context, subnet_id)
-            self._check_for_dup_router_subnet(context, router_id,
-                                              port['network_id'],
-                                              subnet['id'],
-                                              subnet['cidr'])
-            port.update({'device_id': router_id,
-                         'device_owner': DEVICE_OWNER_ROUTER_INTF})
-        elif 'subnet_id' in interface_info:
-            subnet_id = interface_info['subnet_id']
-            subnet = self._get_subnet(context, subnet_id)
-            # Ensure the subnet has a gateway
-            if not subnet['gateway_ip']:
-                msg = _('Subnet for router interface must have a gateway IP')
-                raise q_exc.BadRequest(resource='router', msg=msg)
-            self._check_for_dup_router_subnet(context, router_id,
-                                              subnet['network_id'],
-                                              subnet_id,
-                                              subnet['cidr'])
-            fixed_ip = {'ip_address': subnet['gateway_ip'],
-                        'subnet_id': subnet['id']}
-            port = self.create_port(context, {
-                'port':
-                {'tenant_id': subnet['tenant_id'],
-                 'network_id': subnet['network_id'],
-                 'fixed_ips': [fixed_ip],
-                 'mac_address': attributes.ATTR_NOT_SPECIFIED,
-                 'admin_state_up': True,
-                 'device_id': router_id,
-                 'device_owner': DEVICE_OWNER_ROUTER_INTF,
-                 'name': ''}})
+        # The revision is bumped with the change of the interface, so
+        # that the deltas are numbered in the order of their changes
+        with context.session.begin(subtransactions=True):
+            if 'port_id' in interface_info:
+                if 'subnet_id' in interface_info:
+                    msg = _("Cannot specify both subnet-id and port-id")
+                    raise q_exc.BadRequest(resource='router', msg=msg)
+
+                port = self._get_port(context, interface_info['port_id'])
+                if port['device_id']:
+                    raise q_exc.PortInUse(net_id=port['network_id'],
+                                          port_id=port['id'],
+                                          device_id=port['device_id'])
+                fixed_ips = [ip for ip in port['fixed_ips']]
+                if len(fixed_ips) != 1:
+                    msg = _('Router port must have exactly one fixed IP')
+                    raise q_exc.BadRequest(resource='router', msg=msg)
+                subnet_id = fixed_ips[0]['subnet_id']
+                subnet = self._get_subnet(context, subnet_id)
+                self._check_for_dup_router_subnet(context, router_id,
+                                                  port['network_id'],
+                                                  subnet['id'],
+                                                  subnet['cidr'])
+                port.update({'device_id': router_id,
+                             'device_owner': DEVICE_OWNER_ROUTER_INTF})
+            elif 'subnet_id' in interface_info:
+                subnet_id = interface_info['subnet_id']
+                subnet = self._get_subnet(context, subnet_id)
+                # Ensure the subnet has a gateway
+                if not subnet['gateway_ip']:
+                    msg = _('Subnet for router interface must have a '
+                            'gateway IP')
+                    raise q_exc.BadRequest(resource='router', msg=msg)
+                self._check_for_dup_router_subnet(context, router_id,
+                                                  subnet['network_id'],
+                                                  subnet_id,
+                                                  subnet['cidr'])
+                fixed_ip = {'ip_address': subnet['gateway_ip'],
+                            'subnet_id': subnet['id']}
+                port = self.create_port(context, {
+                    'port':
+                    {'tenant_id': subnet['tenant_id'],
+                     'network_id': subnet['network_id'],
+                     'fixed_ips': [fixed_ip],
+                     'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                     'admin_state_up': True,
+                     'device_id': router_id,
+                     'device_owner': DEVICE_OWNER_ROUTER_INTF,
+                     'name': ''}})
 
-        routers = self.get_sync_data(context.elevated(), [router_id])
-        l3_rpc_agent_api.L3AgentNotify.routers_updated(
-            context, routers, 'add_router_interface',
+            revision_number = self._bump_router_revision(context,
+                                                         router_id)
+        self._notify_router_delta(
+            context, router_id, revision_number,
+            {'interfaces_added': [self._get_sync_interface(
+                context.elevated(), port['id'])]},
+            'add_router_interface',
             {'network_id': port['network_id'],
              'subnet_id': subnet_id})
         info = {'id': router_id,
@@ -404,56 +466,63 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         if not interface_info:
             msg = _("Either subnet_id or port_id must be specified")
             raise q_exc.BadRequest(resource='router', msg=msg)
-        if 'port_id' in interface_info:
-            port_id = interface_info['port_id']
-            port_db = self._get_port(context, port_id)
-            if not (port_db['device_owner'] == DEVICE_OWNER_ROUTER_INTF and
-                    port_db['device_id'] == router_id):
-                raise l3.RouterInterfaceNotFound(router_id=router_id,
-                                                 port_id=port_id)
-            if 'subnet_id' in interface_info:
-                port_subnet_id = port_db['fixed_ips'][0]['subnet_id']
-                if port_subnet_id != interface_info['subnet_id']:
-                    raise q_exc.SubnetMismatchForPort(
-                        port_id=port_id,
-                        subnet_id=interface_info['subnet_id'])
-            subnet_id = port_db['fixed_ips'][0]['subnet_id']
-            subnet = self._get_subnet(context, subnet_id)
-            self._confirm_router_interface_not_in_use(
-                context, router_id, subnet_id)
-            _network_id = port_db['network_id']
-            self.delete_port(context, port_db['id'], l3_port_check=False)
-        elif 'subnet_id' in interface_info:
-            subnet_id = interface_info['subnet_id']
-            self._confirm_router_interface_not_in_use(context, router_id,
-                                                      subnet_id)
-
-            subnet = self._get_subnet(context, subnet_id)
-            found = False
-
-            try:
-                rport_qry = context.session.query(models_v2.Port)
-                ports = rport_qry.filter_by(
-                    device_id=router_id,
-                    device_owner=DEVICE_OWNER_ROUTER_INTF,
-                    network_id=subnet['network_id'])
-
-                for p in ports:
-                    if p['fixed_ips'][0]['subnet_id'] == subnet_id:
-                        port_id = p['id']
-                        _network_id = p['network_id']
-                        self.delete_port(context, p['id'], l3_port_check=False)
-                        found = True
-                        break
-            except exc.NoResultFound:
-                pass
-
-            if not found:
-                raise l3.RouterInterfaceNotFoundForSubnet(router_id=router_id,
-                                                          subnet_id=subnet_id)
-        routers = self.get_sync_data(context.elevated(), [router_id])
-        l3_rpc_agent_api.L3AgentNotify.routers_updated(
-            context, routers, 'remove_router_interface',
+        # The revision is bumped with the change of the interface, so
+        # that the deltas are numbered in the order of their changes
+        with context.session.begin(subtransactions=True):
+            if 'port_id' in interface_info:
+                port_id = interface_info['port_id']
+                port_db = self._get_port(context, port_id)
+                if not (port_db['device_owner'] == DEVICE_OWNER_ROUTER_INTF and
+                        port_db['device_id'] == router_id):
+                    raise l3.RouterInterfaceNotFound(router_id=router_id,
+                                                     port_id=port_id)
+                if 'subnet_id' in interface_info:
+                    port_subnet_id = port_db['fixed_ips'][0]['subnet_id']
+                    if port_subnet_id != interface_info['subnet_id']:
+                        raise q_exc.SubnetMismatchForPort(
+                            port_id=port_id,
+                            subnet_id=interface_info['subnet_id'])
+                subnet_id = port_db['fixed_ips'][0]['subnet_id']
+                subnet = self._get_subnet(context, subnet_id)
+                self._confirm_router_interface_not_in_use(
+                    context, router_id, subnet_id)
+                _network_id = port_db['network_id']
+                self.delete_port(context, port_db['id'], l3_port_check=False)
+            elif 'subnet_id' in interface_info:
+                subnet_id = interface_info['subnet_id']
+                self._confirm_router_interface_not_in_use(context, router_id,
+                                                          subnet_id)
+
+                subnet = self._get_subnet(context, subnet_id)
+                found = False
+
+                try:
+                    rport_qry = context.session.query(models_v2.Port)
+                    ports = rport_qry.filter_by(
+                        device_id=router_id,
+                        device_owner=DEVICE_OWNER_ROUTER_INTF,
+                        network_id=subnet['network_id'])
+
+                    for p in ports:
+                        if p['fixed_ips'][0]['subnet_id'] == subnet_id:
+                            port_id = p['id']
+                            _network_id = p['network_id']
+                            self.delete_port(context, p['id'],
+                                             l3_port_check=False)
+                            found = True
+                            break
+                except exc.NoResultFound:
+                    pass
+
+                if not found:
+                    raise l3.RouterInterfaceNotFoundForSubnet(
+                        router_id=router_id, subnet_id=subnet_id)
+            revision_number = self._bump_router_revision(context,
+                                                         router_id)
+        self._notify_router_delta(
+            context, router_id, revision_number,
+            {'interfaces_removed': [port_id]},
+            'remove_router_interface',
             {'network_id': _network_id,
              'subnet_id': subnet_id})
         info = {'id': router_id,
@@ -661,6 +730,10 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 self._update_fip_assoc(context, fip,
                                        floatingip_db, external_port)
                 context.session.add(floatingip_db)
+                router_id = floatingip_db['router_id']
+                if router_id:
+                    revision_number = self._bump_router_revision(context,
+                                                                 router_id)
         # TODO(salvatore-orlando): Avoid broad catch
         # Maybe by introducing base class for L3 exceptions
         except q_exc.BadRequest:
@@ -670,12 +743,12 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         except Exception:
             LOG.exception(_("Floating IP association failed"))
             raise
-        router_id = floatingip_db['router_id']
+        floatingip = self._make_floatingip_dict(floatingip_db)
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'create_floatingip')
-        return self._make_floatingip_dict(floatingip_db)
+            self._notify_router_delta(context, router_id, revision_number,
+                                      {'floatingips_added': [floatingip]},
+                                      'create_floatingip')
+        return floatingip
 
     def update_floatingip(self, context, id, floatingip):
         fip = floatingip['floatingip']
@@ -688,16 +761,20 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._update_fip_assoc(context, fip, floatingip_db,
                                    self.get_port(context.elevated(),
                                                  fip_port_id))
-        router_ids = []
-        if before_router_id:
-            router_ids.append(before_router_id)
-        router_id = floatingip_db['router_id']
-        if router_id and router_id != before_router_id:
-            router_ids.append(router_id)
-        if router_ids:
-            routers = self.get_sync_data(context.elevated(), router_ids)
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'update_floatingip')
+            router_id = floatingip_db['router_id']
+            deltas = {}
+            if before_router_id:
+                deltas[before_router_id] = {'floatingips_removed': [id]}
+            if router_id:
+                deltas.setdefault(router_id, {})['floatingips_added'] = [
+                    self._make_floatingip_dict(floatingip_db)]
+            revisions = dict(
+                (changed_id, self._bump_router_revision(context, changed_id))
+                for changed_id in deltas)
+        for changed_id, delta in deltas.iteritems():
+            self._notify_router_delta(context, changed_id,
+                                      revisions[changed_id], delta,
+                                      'update_floatingip')
         return self._make_floatingip_dict(floatingip_db)
 
     def delete_floatingip(self, context, id):
@@ -708,10 +785,13 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self.delete_port(context.elevated(),
                              floatingip['floating_port_id'],
                              l3_port_check=False)
+            if router_id:
+                revision_number = self._bump_router_revision(context,
+                                                             router_id)
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'delete_floatingip')
+            self._notify_router_delta(context, router_id, revision_number,
+                                      {'floatingips_removed': [id]},
+                                      'delete_floatingip')
 
     def get_floatingip(self, context, id, fields=None):
         floatingip = self._get_floatingip(context, id)
@@ -773,6 +853,9 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 floating_ip.update({'fixed_port_id': None,
                                     'fixed_ip_address': None,
                                     'router_id': None})
+                if router_id:
+                    revision_number = self._bump_router_revision(context,
+                                                                 router_id)
             except exc.NoResultFound:
                 return
             except exc.MultipleResultsFound:
@@ -780,8 +863,9 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 raise Exception(_('Multiple floating IPs found for port %s')
                                 % port_id)
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers)
+            self._notify_router_delta(context, router_id, revision_number,
+                                      {'floatingips_removed':
+                                       [floating_ip['id']]})
 
     def _network_is_external(self, context, net_id):
         try:
@@ -792,8 +876,18 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             return False
 
     def _extend_network_dict_l3(self, context, network):
-        network[l3.EXTERNAL] = self._network_is_external(
-            context, network['id'])
+        self._extend_networks_dict_l3(context, [network])
+
+    def _extend_networks_dict_l3(self, context, networks):
+        if not networks:
+            return
+        external_ids = set(
+            network_id for (network_id,) in context.session.query(
+                ExternalNetwork.network_id).filter(
+                    ExternalNetwork.network_id.in_(
+                        [network['id'] for network in networks])))
+        for network in networks:
+            network[l3.EXTERNAL] = network['id'] in external_ids
 
     def _process_l3_create(self, context, net_data, net_id):
         external = net_data.get(l3.EXTERNAL)
@@ -907,10 +1001,11 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._populate_subnet_for_ports(context, interfaces)
         return interfaces
 
-    def _populate_subnet_for_ports(self, context, ports):
+    def _populate_subnet_for_ports(self, context, ports, subnets=None):
         """Populate ports with subnet.
 
-        These ports already have fixed_ips populated.
+        These ports already have fixed_ips populated. The subnets are
+        queried unless they are given as a {subnet id: subnet dict}.
         """
         if not ports:
             return
@@ -933,9 +1028,14 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             subnet_id_ports_dict[fixed_ip['subnet_id']] = my_ports
         if not subnet_id_ports_dict:
             return
-        filters = {'id': subnet_id_ports_dict.keys()}
-        fields = ['id', 'cidr', 'gateway_ip']
-        subnet_dicts = self.get_subnets(context, filters, fields)
+        if subnets is None:
+            filters = {'id': subnet_id_ports_dict.keys()}
+            fields = ['id', 'cidr', 'gateway_ip']
+            subnet_dicts = self.get_subnets(context, filters, fields)
+        else:
+            subnet_dicts = [subnets[subnet_id]
+                            for subnet_id in subnet_id_ports_dict
+                            if subnet_id in subnets]
         for subnet_dict in subnet_dicts:
             ports = subnet_id_ports_dict.get(subnet_dict['id'], [])
             for port in ports:
@@ -965,14 +1065,93 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         return routers_dict.values()
 
     def get_sync_data(self, context, router_ids=None, active=None):
-        """Query routers and their related floating_ips, interfaces."""
+        """Query routers and their related floating_ips, interfaces.
+
+        The payload is built from the rows of a fixed number of queries
+        per SYNC_CHUNK_SIZE routers, without going through get_routers
+        and get_ports. Ports are not extended by the port extensions.
+        """
+        if isinstance(router_ids, basestring):
+            router_ids = [router_ids]
         with context.session.begin(subtransactions=True):
-            routers = self._get_sync_routers(context,
-                                             router_ids=router_ids,
-                                             active=active)
-            router_ids = [router['id'] for router in routers]
-            floating_ips = self._get_sync_floating_ips(context, router_ids)
-            interfaces = self.get_sync_interfaces(context, router_ids)
+            if not router_ids:
+                return self._get_sync_data_chunk(context, None, active)
+            routers = []
+            for i in xrange(0, len(router_ids), SYNC_CHUNK_SIZE):
+                routers.extend(self._get_sync_data_chunk(
+                    context, router_ids[i:i + SYNC_CHUNK_SIZE], active))
+            return routers
+
+    def _get_sync_data_chunk(self, context, router_ids, active):
+        def filter_routers(query):
+            if router_ids:
+                query = query.filter(Router.id.in_(router_ids))
+            if active is not None:
+                query = query.filter(Router.admin_state_up == active)
+            return query
+
+        query = self._model_query(context, Router)
+        query = filter_routers(query.options(orm.joinedload('gw_port')))
+        routers = []
+        for router in query:
+            router_dict = self._make_router_dict(router)
+            router_dict['revision_number'] = router['revision_number']
+            routers.append(router_dict)
+        if not routers:
+            return []
+
+        port_owners = [DEVICE_OWNER_ROUTER_INTF, DEVICE_OWNER_ROUTER_GW]
+        query = context.session.query(models_v2.IPAllocation)
+        query = query.join(models_v2.Port,
+                           models_v2.IPAllocation.port_id ==
+                           models_v2.Port.id)
+        query = filter_routers(query.join(
+            Router, models_v2.Port.device_id == Router.id))
+        fixed_ips = {}
+        for ip in query.filter(models_v2.Port.device_owner.in_(port_owners)):
+            fixed_ips.setdefault(ip.port_id, []).append(ip)
+
+        query = context.session.query(models_v2.Subnet.id,
+                                      models_v2.Subnet.cidr,
+                                      models_v2.Subnet.gateway_ip)
+        query = query.join(models_v2.IPAllocation,
+                           models_v2.IPAllocation.subnet_id ==
+                           models_v2.Subnet.id)
+        query = query.join(models_v2.Port,
+                           models_v2.IPAllocation.port_id ==
+                           models_v2.Port.id)
+        query = filter_routers(query.join(
+            Router, models_v2.Port.device_id == Router.id))
+        query = query.filter(models_v2.Port.device_owner.in_(port_owners))
+        subnets = dict((subnet.id, {'id': subnet.id,
+                                    'cidr': subnet.cidr,
+                                    'gateway_ip': subnet.gateway_ip})
+                       for subnet in query.distinct())
+
+        query = context.session.query(models_v2.Port)
+        query = filter_routers(query.join(
+            Router, models_v2.Port.device_id == Router.id))
+        query = query.filter(models_v2.Port.device_owner.in_(port_owners))
+        ports = [self._make_port_dict(port, process_extensions=False,
+                                      fixed_ips=fixed_ips.get(port.id, []))
+                 for port in query]
+        self._populate_subnet_for_ports(context, ports, subnets)
+
+        query = context.session.query(FloatingIP)
+        query = filter_routers(query.join(
+            Router, FloatingIP.router_id == Router.id))
+        floating_ips = [self._make_floatingip_dict(floating_ip)
+                        for floating_ip in query]
+
+        gw_ports = dict((router['gw_port_id'], router)
+                        for router in routers if router['gw_port_id'])
+        interfaces = []
+        for port in ports:
+            router = gw_ports.get(port['id'])
+            if router:
+                router['gw_port'] = port
+            elif port['device_owner'] == DEVICE_OWNER_ROUTER_INTF:
+                interfaces.append(port)
         return self._process_sync_data(routers, interfaces, floating_ips)
 
     def get_external_network_id(self, context):
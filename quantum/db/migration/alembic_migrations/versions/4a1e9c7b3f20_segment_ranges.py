@@ -0,0 +1,114 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Store free vlans and tunnels as ranges
+
+The allocation tables only keep the allocated ids. The ranges of free
+ids are computed from the configuration when the server starts.
+
+Revision ID: 4a1e9c7b3f20
+Revises: 3c5e1f7a2d94
+Create Date: 2013-06-12 16:05:21.370128
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4a1e9c7b3f20'
+down_revision = '3c5e1f7a2d94'
+
+PLUGINS = {
+    'lbr': 'quantum.plugins.linuxbridge.lb_quantum_plugin.LinuxBridgePluginV2',
+    'ovs': 'quantum.plugins.openvswitch.ovs_quantum_plugin.OVSQuantumPluginV2',
+}
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    PLUGINS['lbr'],
+    PLUGINS['ovs'],
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from quantum.db import migration
+
+
+def _delete_free_ids(table_name):
+    allocated = sa.sql.column('allocated', sa.Boolean)
+    table = sa.sql.table(table_name, allocated)
+    op.execute(table.delete().where(allocated == sa.sql.false()))
+
+
+def upgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    if active_plugin == PLUGINS['lbr']:
+        upgrade_linuxbridge()
+    elif active_plugin == PLUGINS['ovs']:
+        upgrade_ovs()
+
+
+def upgrade_linuxbridge():
+    op.create_table(
+        'network_state_ranges',
+        sa.Column('physical_network', sa.String(length=64), nullable=False),
+        sa.Column('first_id', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('physical_network', 'first_id')
+    )
+    op.create_index('ix_network_state_ranges_last_id',
+                    'network_state_ranges', ['last_id'])
+    _delete_free_ids('network_states')
+
+
+def upgrade_ovs():
+    op.create_table(
+        'ovs_vlan_ranges',
+        sa.Column('physical_network', sa.String(length=64), nullable=False),
+        sa.Column('first_id', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('physical_network', 'first_id')
+    )
+    op.create_index('ix_ovs_vlan_ranges_last_id',
+                    'ovs_vlan_ranges', ['last_id'])
+    op.create_table(
+        'ovs_tunnel_ranges',
+        sa.Column('first_id', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('first_id')
+    )
+    op.create_index('ix_ovs_tunnel_ranges_last_id',
+                    'ovs_tunnel_ranges', ['last_id'])
+    _delete_free_ids('ovs_vlan_allocations')
+    _delete_free_ids('ovs_tunnel_allocations')
+
+
+def downgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    # The rows of the free ids are added back by the server when it starts
+    if active_plugin == PLUGINS['lbr']:
+        op.drop_table('network_state_ranges')
+    elif active_plugin == PLUGINS['ovs']:
+        op.drop_table('ovs_tunnel_ranges')
+        op.drop_table('ovs_vlan_ranges')
@@ -19,6 +19,8 @@
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from quantum.api.v2 import attributes
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.extensions import portsecurity as psec
 from quantum.openstack.common import log as logging
@@ -43,6 +45,11 @@ class NetworkSecurityBinding(model_base.BASEV2):
 class PortSecurityDbMixin(object):
     """Mixin class to add port security."""
 
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_extend_networks_port_security_dict'])
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.PORTS, ['_extend_ports_port_security_dict'])
+
     def _process_network_create_port_security(self, context, network):
         with context.session.begin(subtransactions=True):
             db = NetworkSecurityBinding(
@@ -52,12 +59,32 @@ class PortSecurityDbMixin(object):
         return self._make_network_port_security_dict(db)
 
     def _extend_network_port_security_dict(self, context, network):
-        network[psec.PORTSECURITY] = self._get_network_security_binding(
-            context, network['id'])
+        self._extend_networks_port_security_dict(context, [network])
 
     def _extend_port_port_security_dict(self, context, port):
-        port[psec.PORTSECURITY] = self._get_port_security_binding(
-            context, port['id'])
+        self._extend_ports_port_security_dict(context, [port])
+
+    def _extend_port_security_dicts(self, context, model, key, resources):
+        if not resources:
+            return
+        column = getattr(model, key)
+        query = self._model_query(context, model).filter(
+            column.in_([resource['id'] for resource in resources]))
+        bindings = dict((binding[key], binding[psec.PORTSECURITY])
+                        for binding in query)
+        for resource in resources:
+            try:
+                resource[psec.PORTSECURITY] = bindings[resource['id']]
+            except KeyError:
+                raise psec.PortSecurityBindingNotFound()
+
+    def _extend_networks_port_security_dict(self, context, networks):
+        self._extend_port_security_dicts(context, NetworkSecurityBinding,
+                                         'network_id', networks)
+
+    def _extend_ports_port_security_dict(self, context, ports):
+        self._extend_port_security_dicts(context, PortSecurityBinding,
+                                         'port_id', ports)
 
     def _get_network_security_binding(self, context, network_id):
         try:
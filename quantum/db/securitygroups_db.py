@@ -34,6 +34,9 @@ class SecurityGroup(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
 
     name = sa.Column(sa.String(255))
     description = sa.Column(sa.String(255))
+    # Bumped whenever the rules or the members of the group change
+    revision_number = sa.Column(sa.BigInteger, nullable=False, default=0,
+                                server_default='0')
 
 
 class SecurityGroupPortBinding(model_base.BASEV2):
@@ -198,6 +201,10 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         if sg['name'] == 'default' and not context.is_admin:
             raise ext_sg.SecurityGroupCannotRemoveDefault()
         with context.session.begin(subtransactions=True):
+            # Rules of other groups referencing this one go away as well
+            self._bump_security_group_revisions(
+                context, [rule['security_group_id']
+                          for rule in sg.source_rules])
             context.session.delete(sg)
 
     def _make_security_group_dict(self, security_group, fields=None):
@@ -214,12 +221,25 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
                'security_group_id': security_group['security_group_id']}
         return self._fields(res, fields)
 
+    def _bump_security_group_revisions(self, context, security_group_ids):
+        """Invalidate what has been compiled from the given groups."""
+        security_group_ids = set(security_group_ids)
+        if not security_group_ids:
+            return
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(SecurityGroup)
+            query = query.filter(SecurityGroup.id.in_(security_group_ids))
+            query.update({SecurityGroup.revision_number:
+                          SecurityGroup.revision_number + 1},
+                         synchronize_session=False)
+
     def _create_port_security_group_binding(self, context, port_id,
                                             security_group_id):
         with context.session.begin(subtransactions=True):
             db = SecurityGroupPortBinding(port_id=port_id,
                                           security_group_id=security_group_id)
             context.session.add(db)
+            self._bump_security_group_revisions(context, [security_group_id])
 
     def _get_port_security_group_bindings(self, context,
                                           filters=None, fields=None):
@@ -233,8 +253,11 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         bindings = query.filter(
             SecurityGroupPortBinding.port_id == port_id)
         with context.session.begin(subtransactions=True):
+            security_group_ids = []
             for binding in bindings:
+                security_group_ids.append(binding['security_group_id'])
                 context.session.delete(binding)
+            self._bump_security_group_revisions(context, security_group_ids)
 
     def create_security_group_rule_bulk(self, context, security_group_rule):
         return self._create_bulk('security_group_rule', context,
@@ -268,6 +291,7 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
                     remote_ip_prefix=rule.get('remote_ip_prefix'))
                 context.session.add(db)
             ret.append(self._make_security_group_rule_dict(db))
+            self._bump_security_group_revisions(context, [security_group_id])
         return ret
 
     def create_security_group_rule(self, context, security_group_rule):
@@ -398,6 +422,8 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
     def delete_security_group_rule(self, context, id):
         with context.session.begin(subtransactions=True):
             rule = self._get_security_group_rule(context, id)
+            self._bump_security_group_revisions(context,
+                                                [rule['security_group_id']])
             context.session.delete(rule)
 
     def _extend_port_dict_security_group(self, port_res, port_db):
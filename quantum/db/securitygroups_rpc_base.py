@@ -27,14 +27,6 @@ from quantum.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
-IP_MASK = {q_const.IPv4: 32,
-           q_const.IPv6: 128}
-
-
-DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
-                       'egress': 'dest_ip_prefix'}
-
-
 class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 
     def create_security_group_rule(self, context, security_group_rule):
@@ -83,6 +75,10 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         else:
             updated_port[ext_sg.SECURITYGROUPS] = (
                 original_port[ext_sg.SECURITYGROUPS])
+        if original_port['fixed_ips'] != updated_port['fixed_ips']:
+            # the members of the groups have new addresses
+            self._bump_security_group_revisions(
+                context, updated_port.get(ext_sg.SECURITYGROUPS, []))
         return need_notify
 
     def is_security_group_member_updated(self, context,
@@ -126,6 +122,11 @@ class SecurityGroupServerRpcCallbackMixin(object):
     implementations.
     """
 
+    # {security_group_id: (revision_number, compiled security group)}
+    _compiled_security_groups = None
+    # Number of compiled groups left by the last pruning
+    _compiled_security_groups_pruned = 0
+
     def security_group_rules_for_devices(self, context, **kwargs):
         """Return security group rules for each port.
 
@@ -135,6 +136,21 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :params devices: list of devices
         :returns: port correspond to the devices with security group rules
         """
+        info = self.security_group_info_for_devices(context, **kwargs)
+        return utils.expand_remote_group_rules(info['devices'],
+                                               info['sg_member_ips'])
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group rules and member addresses for each port.
+
+        Unlike security_group_rules_for_devices, remote_group_id rules
+        are not expanded. The addresses of each remote group are sent
+        once in sg_member_ips instead.
+
+        :params devices: list of devices
+        :returns: dict with the ports correspond to the devices and the
+                  member addresses of the remote groups, by ethertype
+        """
         devices = kwargs.get('devices')
 
         ports = {}
@@ -145,29 +161,39 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return self._security_group_info_for_ports(context, ports)
+
+    def _make_compiled_rule(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'security_group_id': rule_in_db['security_group_id'],
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype'],
+        }
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key):
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = (
+                        q_const.DIRECTION_IP_PREFIX[direction])
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
 
-    def _select_rules_for_ports(self, context, ports):
-        if not ports:
-            return []
-        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
-        sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+    def _compile_security_groups(self, context, security_group_ids):
+        compiled = {}
+        for security_group_id in security_group_ids:
+            compiled[security_group_id] = {
+                'rules': [],
+                'member_ips': {q_const.IPv4: [], q_const.IPv6: []}}
 
         sgr_sgid = sg_db.SecurityGroupRule.security_group_id
-
-        query = context.session.query(sg_db.SecurityGroupPortBinding,
-                                      sg_db.SecurityGroupRule)
-        query = query.join(sg_db.SecurityGroupRule,
-                           sgr_sgid == sg_binding_sgid)
-        query = query.filter(sg_binding_port.in_(ports.keys()))
-        return query.all()
-
-    def _select_ips_for_remote_group(self, context, remote_group_ids):
-        ips_by_group = {}
-        if not remote_group_ids:
-            return ips_by_group
-        for remote_group_id in remote_group_ids:
-            ips_by_group[remote_group_id] = []
+        query = context.session.query(sg_db.SecurityGroupRule)
+        query = query.filter(sgr_sgid.in_(security_group_ids))
+        for rule_in_db in query:
+            compiled[rule_in_db['security_group_id']]['rules'].append(
+                self._make_compiled_rule(rule_in_db))
 
         ip_port = models_v2.IPAllocation.port_id
         sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
@@ -177,19 +203,63 @@ class SecurityGroupServerRpcCallbackMixin(object):
                                       models_v2.IPAllocation.ip_address)
         query = query.join(models_v2.IPAllocation,
                            ip_port == sg_binding_port)
-        query = query.filter(sg_binding_sgid.in_(remote_group_ids))
+        query = query.filter(sg_binding_sgid.in_(security_group_ids))
         for security_group_id, ip_address in query:
-            ips_by_group[security_group_id].append(ip_address)
-        return ips_by_group
+            ethertype = 'IPv%s' % netaddr.IPAddress(ip_address).version
+            compiled[security_group_id]['member_ips'][ethertype].append(
+                ip_address)
+        return compiled
 
-    def _select_remote_group_ids(self, ports):
-        remote_group_ids = []
-        for port in ports.values():
-            for rule in port.get('security_group_rules'):
-                remote_group_id = rule.get('remote_group_id')
-                if remote_group_id:
-                    remote_group_ids.append(remote_group_id)
-        return remote_group_ids
+    def _get_compiled_security_groups(self, context, security_group_ids):
+        """Return the compiled rules and members of security groups.
+
+        Compiled groups are kept until the revision number of the
+        group changes, so only stale groups hit the rule and member
+        queries.
+        """
+        security_group_ids = set(security_group_ids)
+        if not security_group_ids:
+            return {}
+        if self._compiled_security_groups is None:
+            self._compiled_security_groups = {}
+        cache = self._compiled_security_groups
+
+        # Revisions are read first: anything compiled afterwards is at
+        # least as recent as the revision it is stored with.
+        query = context.session.query(sg_db.SecurityGroup.id,
+                                      sg_db.SecurityGroup.revision_number)
+        query = query.filter(sg_db.SecurityGroup.id.in_(security_group_ids))
+        revisions = dict(query)
+        for security_group_id in security_group_ids - set(revisions):
+            cache.pop(security_group_id, None)
+
+        stale = [security_group_id
+                 for security_group_id, revision in revisions.iteritems()
+                 if cache.get(security_group_id, (None,))[0] != revision]
+        if stale:
+            LOG.debug(_("Compiling security groups %s"), stale)
+            compiled = self._compile_security_groups(context, stale)
+            for security_group_id in stale:
+                cache[security_group_id] = (revisions[security_group_id],
+                                            compiled[security_group_id])
+            if len(cache) > 2 * self._compiled_security_groups_pruned:
+                self._prune_compiled_security_groups(context)
+        return dict((security_group_id, cache[security_group_id][1])
+                    for security_group_id in revisions)
+
+    def _prune_compiled_security_groups(self, context):
+        """Forget the compiled groups which were deleted.
+
+        The groups may be deleted by another process, and are not
+        requested again once deleted. Pruning whenever the cache doubles
+        keeps it within twice the number of existing groups.
+        """
+        cache = self._compiled_security_groups
+        existing = set(security_group_id for (security_group_id,) in
+                       context.session.query(sg_db.SecurityGroup.id))
+        for security_group_id in set(cache) - existing:
+            del cache[security_group_id]
+        self._compiled_security_groups_pruned = len(cache)
 
     def _select_network_ids(self, ports):
         return set((port['network_id'] for port in ports.values()))
@@ -212,35 +282,6 @@ class SecurityGroupServerRpcCallbackMixin(object):
             ips[port['network_id']].append(ip)
         return ips
 
-    def _convert_remote_group_id_to_ip_prefix(self, context, ports):
-        remote_group_ids = self._select_remote_group_ids(ports)
-        ips = self._select_ips_for_remote_group(context, remote_group_ids)
-        for port in ports.values():
-            updated_rule = []
-            for rule in port.get('security_group_rules'):
-                remote_group_id = rule.get('remote_group_id')
-                direction = rule.get('direction')
-                direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                if not remote_group_id:
-                    updated_rule.append(rule)
-                    continue
-
-                port['security_group_source_groups'].append(remote_group_id)
-                base_rule = rule
-                for ip in ips[remote_group_id]:
-                    if ip in port.get('fixed_ips', []):
-                        continue
-                    ip_rule = base_rule.copy()
-                    version = netaddr.IPAddress(ip).version
-                    ethertype = 'IPv%s' % version
-                    if base_rule['ethertype'] != ethertype:
-                        continue
-                    ip_rule[direction_ip_prefix] = "%s/%s" % (
-                        ip, IP_MASK[ethertype])
-                    updated_rule.append(ip_rule)
-            port['security_group_rules'] = updated_rule
-        return ports
-
     def _add_ingress_dhcp_rule(self, port, ips):
         dhcp_ips = ips.get(port['network_id'])
         for dhcp_ip in dhcp_ips:
@@ -254,8 +295,8 @@ class SecurityGroupServerRpcCallbackMixin(object):
                          'port_range_max': 68,
                          'source_port_range_min': 67,
                          'source_port_range_max': 67}
-            dhcp_rule['source_ip_prefix'] = "%s/%s" % (dhcp_ip,
-                                                       IP_MASK[q_const.IPv4])
+            dhcp_rule['source_ip_prefix'] = "%s/%s" % (
+                dhcp_ip, q_const.IP_MASK[q_const.IPv4])
             port['security_group_rules'].append(dhcp_rule)
 
     def _add_ingress_ra_rule(self, port, ips):
@@ -267,8 +308,8 @@ class SecurityGroupServerRpcCallbackMixin(object):
             ra_rule = {'direction': 'ingress',
                        'ethertype': q_const.IPv6,
                        'protocol': 'icmp'}
-            ra_rule['source_ip_prefix'] = "%s/%s" % (ra_ip,
-                                                     IP_MASK[q_const.IPv6])
+            ra_rule['source_ip_prefix'] = "%s/%s" % (
+                ra_ip, q_const.IP_MASK[q_const.IPv6])
             port['security_group_rules'].append(ra_rule)
 
     def _apply_provider_rule(self, context, ports):
@@ -278,25 +319,34 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_ra_rule(port, ips)
             self._add_ingress_dhcp_rule(port, ips)
 
-    def _security_group_rules_for_ports(self, context, ports):
-        rules_in_db = self._select_rules_for_ports(context, ports)
-        for (binding, rule_in_db) in rules_in_db:
-            port_id = binding['port_id']
-            port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
+    def _security_group_info_for_ports(self, context, ports):
+        security_group_ids = set()
+        for port in ports.values():
+            security_group_ids.update(port.get(ext_sg.SECURITYGROUPS, []))
+        groups = self._get_compiled_security_groups(context,
+                                                    security_group_ids)
+
+        remote_group_ids = set()
+        for port in ports.values():
+            for security_group_id in port.get(ext_sg.SECURITYGROUPS, []):
+                group = groups.get(security_group_id)
+                if not group:
+                    continue
+                for rule in group['rules']:
+                    # the rules are shared with the cache
+                    port['security_group_rules'].append(rule.copy())
+                    remote_group_id = rule.get('remote_group_id')
+                    if remote_group_id:
+                        port['security_group_source_groups'].append(
+                            remote_group_id)
+                        remote_group_ids.add(remote_group_id)
         self._apply_provider_rule(context, ports)
-        return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+        groups.update(self._get_compiled_security_groups(
+            context, remote_group_ids - set(groups)))
+        sg_member_ips = {}
+        for remote_group_id in remote_group_ids:
+            if remote_group_id in groups:
+                sg_member_ips[remote_group_id] = (
+                    groups[remote_group_id]['member_ips'])
+        return {'devices': ports, 'sg_member_ips': sg_member_ips}
@@ -0,0 +1,138 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pools of segment ids stored as ranges of free ids.
+
+The rows of a range model are the ranges first_id..last_id of the ids
+free for allocation. Rows with the same values of the other columns,
+e.g. physical_network for VLANs, make a pool. The size of the table
+depends on how fragmented the pools are, not on their size, and taking
+an id out of a pool or putting it back updates a couple of rows.
+"""
+
+
+def merge_ranges(ranges):
+    """Return the sorted, disjoint ranges covering the given ones."""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last) for first, last in merged]
+
+
+def subtract_ids(ranges, ids):
+    """Return the sorted, disjoint ranges of the ids of ranges not in ids."""
+    ids = sorted(ids)
+    free = []
+    i = 0
+    for first, last in merge_ranges(ranges):
+        while i < len(ids) and ids[i] < first:
+            i += 1
+        while i < len(ids) and ids[i] <= last:
+            if ids[i] > first:
+                free.append((first, ids[i] - 1))
+            first = max(first, ids[i] + 1)
+            i += 1
+        if first <= last:
+            free.append((first, last))
+    return free
+
+
+def add_pool(session, model, ranges, allocated_ids, **pool):
+    """Add the ranges of a pool, less the ids already allocated."""
+    for first, last in subtract_ids(ranges, allocated_ids):
+        session.add(model(first_id=first, last_id=last, **pool))
+
+
+def _get_range(session, model, segment_id, **pool):
+    return (session.query(model).
+            filter_by(**pool).
+            filter(model.first_id <= segment_id,
+                   model.last_id >= segment_id).
+            with_lockmode('update').
+            first())
+
+
+def _remove_id(session, free, segment_id):
+    if free.first_id == free.last_id:
+        session.delete(free)
+    elif segment_id == free.first_id:
+        free.first_id += 1
+    elif segment_id == free.last_id:
+        free.last_id -= 1
+    else:
+        upper = type(free)(**dict((column.name, getattr(free, column.name))
+                                  for column in free.__table__.columns))
+        upper.first_id = segment_id + 1
+        free.last_id = segment_id - 1
+        session.add(upper)
+
+
+def is_free(session, model, segment_id, **pool):
+    """Tell whether an id is free in a pool."""
+    return bool(session.query(model).
+                filter_by(**pool).
+                filter(model.first_id <= segment_id,
+                       model.last_id >= segment_id).
+                first())
+
+
+def allocate(session, model, **pool):
+    """Take the first id of a range of the pool, or of any pool.
+
+    :returns: a (range, id) tuple, where range is the row the id was taken
+              from, or None if the pools are exhausted.
+    """
+    free = (session.query(model).
+            filter_by(**pool).
+            with_lockmode('update').
+            first())
+    if not free:
+        return
+    segment_id = free.first_id
+    _remove_id(session, free, segment_id)
+    return free, segment_id
+
+
+def allocate_specific(session, model, segment_id, **pool):
+    """Take an id out of a pool.
+
+    :returns: False if the id is not free in the pool.
+    """
+    free = _get_range(session, model, segment_id, **pool)
+    if not free:
+        return False
+    _remove_id(session, free, segment_id)
+    return True
+
+
+def release(session, model, segment_id, **pool):
+    """Put an id back in a pool, merging it with the adjacent ranges."""
+    query = session.query(model).filter_by(**pool).with_lockmode('update')
+    before = query.filter(model.last_id == segment_id - 1).first()
+    after = query.filter(model.first_id == segment_id + 1).first()
+    if before and after:
+        before.last_id = after.last_id
+        session.delete(after)
+    elif before:
+        before.last_id = segment_id
+    elif after:
+        after.first_id = segment_id
+    else:
+        session.add(model(first_id=segment_id, last_id=segment_id, **pool))
@@ -35,6 +35,7 @@ L3_ROUTER = 'l3-router'
 L3_ROUTERS = L3_ROUTER + 's'
 L3_AGENT = 'l3-agent'
 L3_AGENTS = L3_AGENT + 's'
+AGENT_SCHEDULER = 'agent-scheduler'
 
 
 class NetworkSchedulerController(wsgi.Controller):
@@ -119,6 +120,24 @@ class L3AgentsHostingRouterController(wsgi.Controller):
             request.context, kwargs['router_id'])
 
 
+class RebalanceController(wsgi.Controller):
+    def rebalance_networks(self, request, **kwargs):
+        plugin = manager.QuantumManager.get_plugin()
+        policy.enforce(request.context,
+                       "rebalance_networks",
+                       {},
+                       plugin=plugin)
+        return plugin.rebalance_networks(request.context)
+
+    def rebalance_routers(self, request, **kwargs):
+        plugin = manager.QuantumManager.get_plugin()
+        policy.enforce(request.context,
+                       "rebalance_routers",
+                       {},
+                       plugin=plugin)
+        return plugin.rebalance_routers(request.context)
+
+
 class Agentscheduler(extensions.ExtensionDescriptor):
     """Extension class supporting agent scheduler.
     """
@@ -174,6 +193,13 @@ class Agentscheduler(extensions.ExtensionDescriptor):
                                        base.FAULT_MAP)
         exts.append(extensions.ResourceExtension(
             L3_AGENTS, controller, parent))
+
+        controller = resource.Resource(RebalanceController(),
+                                       base.FAULT_MAP)
+        exts.append(extensions.ResourceExtension(
+            AGENT_SCHEDULER, controller,
+            collection_actions={'rebalance_networks': 'PUT',
+                                'rebalance_routers': 'PUT'}))
         return exts
 
     def get_extended_resources(self, version):
@@ -250,3 +276,11 @@ class AgentSchedulerPluginBase(object):
     @abstractmethod
     def list_l3_agents_hosting_router(self, context, router_id):
         pass
+
+    @abstractmethod
+    def rebalance_networks(self, context):
+        pass
+
+    @abstractmethod
+    def rebalance_routers(self, context):
+        pass
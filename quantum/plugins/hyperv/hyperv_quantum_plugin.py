@@ -295,7 +295,6 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
     def get_network(self, context, id, fields=None):
         net = super(HyperVQuantumPlugin, self).get_network(context, id, None)
         self._extend_network_dict_provider(context, net)
-        self._extend_network_dict_l3(context, net)
         return self._fields(net, fields)
 
     def get_networks(self, context, filters=None, fields=None):
@@ -303,7 +302,6 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
             context, filters, None)
         for net in nets:
             self._extend_network_dict_provider(context, net)
-            self._extend_network_dict_l3(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -14,12 +14,14 @@
 # limitations under the License.
 
 
+from sqlalchemy import or_
 from sqlalchemy.orm import exc
 
 from quantum.common import exceptions as q_exc
 import quantum.db.api as db
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import segment_ranges
 from quantum import manager
 from quantum.openstack.common import log as logging
 from quantum.plugins.linuxbridge.common import config  # noqa
@@ -34,62 +36,32 @@ def initialize():
 
 
 def sync_network_states(network_vlan_ranges):
-    """Synchronize network_states table with current configured VLAN ranges."""
+    """Synchronize network_states tables with current configured VLAN ranges.
+
+    The ranges of free vlans are the configured ones, less the allocated
+    vlans, so this does not depend on the size of the ranges.
+    """
 
     session = db.get_session()
     with session.begin():
-        # get existing allocations for all physical networks
-        allocations = dict()
+        allocated = dict()
         states = (session.query(l2network_models_v2.NetworkState).
-                  all())
+                  filter_by(allocated=True))
         for state in states:
-            if state.physical_network not in allocations:
-                allocations[state.physical_network] = set()
-            allocations[state.physical_network].add(state)
+            allocated.setdefault(state.physical_network, set()).add(
+                state.vlan_id)
 
-        # process vlan ranges for each configured physical network
+        session.query(l2network_models_v2.NetworkStateRange).delete()
         for physical_network, vlan_ranges in network_vlan_ranges.iteritems():
-            # determine current configured allocatable vlans for this
-            # physical network
-            vlan_ids = set()
-            for vlan_range in vlan_ranges:
-                vlan_ids |= set(xrange(vlan_range[0], vlan_range[1] + 1))
-
-            # remove from table unallocated vlans not currently allocatable
-            if physical_network in allocations:
-                for state in allocations[physical_network]:
-                    try:
-                        # see if vlan is allocatable
-                        vlan_ids.remove(state.vlan_id)
-                    except KeyError:
-                        # it's not allocatable, so check if its allocated
-                        if not state.allocated:
-                            # it's not, so remove it from table
-                            LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                        "physical network %(physical_network)s"
-                                        " from pool"),
-                                      {'vlan_id': state.vlan_id,
-                                       'physical_network': physical_network})
-                            session.delete(state)
-                del allocations[physical_network]
-
-            # add missing allocatable vlans to table
-            for vlan_id in sorted(vlan_ids):
-                state = l2network_models_v2.NetworkState(physical_network,
-                                                         vlan_id)
-                session.add(state)
-
-        # remove from table unallocated vlans for any unconfigured physical
-        # networks
-        for states in allocations.itervalues():
-            for state in states:
-                if not state.allocated:
-                    LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s"
-                                " from pool"),
-                              {'vlan_id': state.vlan_id,
-                               'physical_network': physical_network})
-                    session.delete(state)
+            LOG.debug(_("Setting vlan ranges %(vlan_ranges)s on physical "
+                        "network %(physical_network)s"),
+                      {'vlan_ranges': vlan_ranges,
+                       'physical_network': physical_network})
+            segment_ranges.add_pool(session,
+                                    l2network_models_v2.NetworkStateRange,
+                                    vlan_ranges,
+                                    allocated.get(physical_network, ()),
+                                    physical_network=physical_network)
 
 
 def get_network_state(physical_network, vlan_id):
@@ -103,53 +75,64 @@ def get_network_state(physical_network, vlan_id):
                  one())
         return state
     except exc.NoResultFound:
+        # Free vlans have no state row
+        if segment_ranges.is_free(session,
+                                  l2network_models_v2.NetworkStateRange,
+                                  vlan_id, physical_network=physical_network):
+            return l2network_models_v2.NetworkState(physical_network,
+                                                    vlan_id)
         return None
 
 
+def _add_network_state(session, physical_network, vlan_id):
+    state = l2network_models_v2.NetworkState(physical_network, vlan_id)
+    state.allocated = True
+    session.add(state)
+
+
 def reserve_network(session):
     with session.begin(subtransactions=True):
-        state = (session.query(l2network_models_v2.NetworkState).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if not state:
+        taken = segment_ranges.allocate(
+            session, l2network_models_v2.NetworkStateRange)
+        if not taken:
             raise q_exc.NoNetworkAvailable()
+        vlan_range, vlan_id = taken
+        physical_network = vlan_range.physical_network
         LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
                     "%(physical_network)s from pool"),
-                  {'vlan_id': state.vlan_id,
-                   'physical_network': state.physical_network})
-        state.allocated = True
-    return (state.physical_network, state.vlan_id)
+                  {'vlan_id': vlan_id,
+                   'physical_network': physical_network})
+        _add_network_state(session, physical_network, vlan_id)
+    return (physical_network, vlan_id)
 
 
 def reserve_specific_network(session, physical_network, vlan_id):
     with session.begin(subtransactions=True):
-        try:
+        if segment_ranges.allocate_specific(
+                session, l2network_models_v2.NetworkStateRange, vlan_id,
+                physical_network=physical_network):
+            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
+                        "network %(physical_network)s from pool"),
+                      {'vlan_id': vlan_id,
+                       'physical_network': physical_network})
+        else:
             state = (session.query(l2network_models_v2.NetworkState).
                      filter_by(physical_network=physical_network,
                                vlan_id=vlan_id).
                      with_lockmode('update').
-                     one())
-            if state.allocated:
+                     first())
+            if state:
                 if vlan_id == constants.FLAT_VLAN_ID:
                     raise q_exc.FlatNetworkInUse(
                         physical_network=physical_network)
                 else:
                     raise q_exc.VlanIdInUse(vlan_id=vlan_id,
                                             physical_network=physical_network)
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s from pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            state.allocated = True
-        except exc.NoResultFound:
             LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
                         "network %(physical_network)s outside pool"),
                       {'vlan_id': vlan_id,
                        'physical_network': physical_network})
-            state = l2network_models_v2.NetworkState(physical_network, vlan_id)
-            state.allocated = True
-            session.add(state)
+        _add_network_state(session, physical_network, vlan_id)
 
 
 def release_network(session, physical_network, vlan_id, network_vlan_ranges):
@@ -160,13 +143,17 @@ def release_network(session, physical_network, vlan_id, network_vlan_ranges):
                                vlan_id=vlan_id).
                      with_lockmode('update').
                      one())
-            state.allocated = False
+            session.delete(state)
             inside = False
             for vlan_range in network_vlan_ranges.get(physical_network, []):
                 if vlan_id >= vlan_range[0] and vlan_id <= vlan_range[1]:
                     inside = True
                     break
             if inside:
+                segment_ranges.release(session,
+                                       l2network_models_v2.NetworkStateRange,
+                                       vlan_id,
+                                       physical_network=physical_network)
                 LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
                             "%(physical_network)s to pool"),
                           {'vlan_id': vlan_id,
@@ -176,7 +163,6 @@ def release_network(session, physical_network, vlan_id, network_vlan_ranges):
                           "%(physical_network)s outside pool"),
                           {'vlan_id': vlan_id,
                            'physical_network': physical_network})
-                session.delete(state)
         except exc.NoResultFound:
             LOG.warning(_("vlan_id %(vlan_id)s on physical network "
                           "%(physical_network)s not found"),
@@ -201,6 +187,31 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Return a dict of network id to binding for the given networks."""
+    if not network_ids:
+        return {}
+    bindings = (session.query(l2network_models_v2.NetworkBinding).
+                filter(l2network_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
+def get_ports_from_devices(devices):
+    """Return a dict of device to port for the given device prefixes."""
+    if not devices:
+        return {}
+    session = db.get_session()
+    query = session.query(models_v2.Port).filter(
+        or_(*[models_v2.Port.id.startswith(device) for device in devices]))
+    ports = {}
+    for port in query:
+        for device in devices:
+            if port['id'].startswith(device):
+                ports[device] = port
+    return ports
+
+
 def get_port_from_device(device):
     """Get port from database."""
     LOG.debug(_("get_port_from_device() called"))
@@ -240,3 +251,15 @@ def set_port_status(port_id, status):
         session.flush()
     except exc.NoResultFound:
         raise q_exc.PortNotFound(port_id=port_id)
+
+
+def set_ports_status(port_ids, status):
+    """Set the status of several ports with a single update."""
+    LOG.debug(_("set_ports_status as %s called"), status)
+    if not port_ids:
+        return
+    session = db.get_session()
+    with session.begin():
+        (session.query(models_v2.Port).
+         filter(models_v2.Port.id.in_(port_ids)).
+         update({'status': status}, synchronize_session=False))
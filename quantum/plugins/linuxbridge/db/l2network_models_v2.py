@@ -19,7 +19,7 @@ from quantum.db import model_base
 
 
 class NetworkState(model_base.BASEV2):
-    """Represents state of vlan_id on physical network."""
+    """Represents an allocated vlan_id on physical network."""
     __tablename__ = 'network_states'
 
     physical_network = sa.Column(sa.String(64), nullable=False,
@@ -38,6 +38,21 @@ class NetworkState(model_base.BASEV2):
                                              self.vlan_id, self.allocated)
 
 
+class NetworkStateRange(model_base.BASEV2):
+    """Represents a range of free vlan_ids on physical network."""
+    __tablename__ = 'network_state_ranges'
+
+    physical_network = sa.Column(sa.String(64), nullable=False,
+                                 primary_key=True)
+    first_id = sa.Column(sa.Integer, nullable=False, primary_key=True,
+                         autoincrement=False)
+    last_id = sa.Column(sa.Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return "<NetworkStateRange(%s,%d,%d)>" % (self.physical_network,
+                                                  self.first_id, self.last_id)
+
+
 class NetworkBinding(model_base.BASEV2):
     """Represents binding of virtual network to physical network and vlan."""
     __tablename__ = 'network_bindings'
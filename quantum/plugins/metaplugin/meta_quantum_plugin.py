@@ -124,6 +124,18 @@ class MetaPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             raise FlavorNotFound(flavor=flavor)
         return self.l3_plugins[flavor]
 
+    def start_rpc_listener(self):
+        """Consume the topics of all the plugins in this process."""
+        conns = []
+        started = set()
+        for plugin in self.plugins.values() + self.l3_plugins.values():
+            if id(plugin) in started or not hasattr(plugin,
+                                                    'start_rpc_listener'):
+                continue
+            started.add(id(plugin))
+            conns.append(plugin.start_rpc_listener())
+        return conns
+
     def __getattr__(self, key):
         # At first,  try to pickup extension command from extension_map
 
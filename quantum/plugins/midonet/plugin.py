@@ -342,17 +342,14 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         LOG.debug(_("MidonetPluginV2.get_network called: id=%(id)r, "
                     "fields=%(fields)r"), {'id': id, 'fields': fields})
 
-        # NOTE: Get network data with all fields (fields=None) for
-        #       _extend_network_dict_l3() method, which needs 'id' field
-        qnet = super(MidonetPluginV2, self).get_network(context, id, None)
+        qnet = super(MidonetPluginV2, self).get_network(context, id, fields)
         try:
             self.mido_api.get_bridge(id)
         except w_exc.HTTPNotFound:
             raise MidonetResourceNotFound(resource_type='Bridge', id=id)
 
-        self._extend_network_dict_l3(context, qnet)
         LOG.debug(_("MidonetPluginV2.get_network exiting: qnet=%r"), qnet)
-        return self._fields(qnet, fields)
+        return qnet
 
     def get_networks(self, context, filters=None, fields=None):
         """List quantum networks and verify that all exist in MidoNet."""
@@ -361,7 +358,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                   {'filters': filters, 'fields': fields})
 
         # NOTE: Get network data with all fields (fields=None) for
-        #       _extend_network_dict_l3() method, which needs 'id' field
+        #       the MidoNet bridge lookup, which needs 'id' field
         qnets = super(MidonetPluginV2, self).get_networks(context, filters,
                                                           None)
         self.mido_api.get_bridges({'tenant_id': context.tenant_id})
@@ -371,7 +368,6 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             except w_exc.HTTPNotFound:
                 raise MidonetResourceNotFound(resource_type='Bridge',
                                               id=n['id'])
-            self._extend_network_dict_l3(context, n)
 
         return [self._fields(net, fields) for net in qnets]
 
@@ -317,7 +317,6 @@ class MellanoxEswitchPlugin(db_base_plugin_v2.QuantumDbPluginV2,
                                                                  net_id,
                                                                  None)
             self._extend_network_dict_provider(context, net)
-            self._extend_network_dict_l3(context, net)
         return self._fields(net, fields)
 
     def get_networks(self, context, filters=None, fields=None):
@@ -328,7 +327,6 @@ class MellanoxEswitchPlugin(db_base_plugin_v2.QuantumDbPluginV2,
                                                                    None)
             for net in nets:
                 self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
             # TODO(rkukura): Filter on extended provider attributes.
             nets = self._filter_nets_l3(context, nets, filters)
         return [self._fields(net, fields) for net in nets]
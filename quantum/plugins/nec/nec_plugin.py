@@ -346,17 +346,6 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
                 reason = _("delete_ofc_tenant() failed due to %s") % exc
                 LOG.warn(reason)
 
-    def get_network(self, context, id, fields=None):
-        net = super(NECPluginV2, self).get_network(context, id, None)
-        self._extend_network_dict_l3(context, net)
-        return self._fields(net, fields)
-
-    def get_networks(self, context, filters=None, fields=None):
-        nets = super(NECPluginV2, self).get_networks(context, filters, None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
-        return [self._fields(net, fields) for net in nets]
-
     def _extend_port_dict_binding(self, context, port):
         port[portbindings.VIF_TYPE] = portbindings.VIF_TYPE_OVS
         port[portbindings.CAPABILITIES] = {
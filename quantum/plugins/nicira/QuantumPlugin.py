@@ -20,7 +20,6 @@
 # @author: Aaron Rosen, Nicira Networks, Inc.
 
 
-import hashlib
 import logging
 
 from oslo.config import cfg
@@ -55,6 +54,7 @@ from quantum.plugins.nicira.common import config  # noqa
 from quantum.plugins.nicira.common import exceptions as nvp_exc
 from quantum.plugins.nicira.common import metadata_access as nvp_meta
 from quantum.plugins.nicira.common import securitygroups as nvp_sec
+from quantum.plugins.nicira.common import sync
 from quantum.plugins.nicira.extensions import nvp_networkgw as networkgw
 from quantum.plugins.nicira.extensions import nvp_qos as ext_qos
 from quantum.plugins.nicira import nicira_db
@@ -137,7 +137,11 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                                    "router", "security-group", "nvp-qos",
                                    "network-gateway"]
 
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attr.NETWORKS, ['_extend_networks_dict_provider'])
+
     __native_bulk_support = True
+    __native_streaming_support = True
 
     # Map nova zones to cluster for easy retrieval
     novazone_cluster_map = {}
@@ -188,6 +192,9 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         self.setup_rpc()
         self.network_scheduler = importutils.import_object(
             cfg.CONF.network_scheduler_driver)
+        self._synchronizer = sync.NvpSynchronizer(self, self.cluster)
+        if cfg.CONF.NVP_SYNC.state_sync_interval > 0:
+            self._synchronizer.start(cfg.CONF.NVP_SYNC.state_sync_interval)
         # Set this flag to false as the default gateway has not
         # been yet updated from the config file
         self._is_default_net_gw_in_sync = False
@@ -717,15 +724,25 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def _extend_network_dict_provider(self, context, network, binding=None):
         if not binding:
-            binding = nicira_db.get_network_binding(context.session,
-                                                    network['id'])
-        # With NVP plugin 'normal' overlay networks will have no binding
-        # TODO(salvatore-orlando) make sure users can specify a distinct
-        # phy_uuid as 'provider network' for STT net type
-        if binding:
-            network[pnet.NETWORK_TYPE] = binding.binding_type
-            network[pnet.PHYSICAL_NETWORK] = binding.phy_uuid
-            network[pnet.SEGMENTATION_ID] = binding.vlan_id
+            self._extend_networks_dict_provider(context, [network])
+        else:
+            self._set_network_dict_provider(network, binding)
+
+    def _extend_networks_dict_provider(self, context, networks):
+        bindings = nicira_db.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            binding = bindings.get(network['id'])
+            # With NVP plugin 'normal' overlay networks will have no binding
+            # TODO(salvatore-orlando) make sure users can specify a distinct
+            # phy_uuid as 'provider network' for STT net type
+            if binding:
+                self._set_network_dict_provider(network, binding)
+
+    def _set_network_dict_provider(self, network, binding):
+        network[pnet.NETWORK_TYPE] = binding.binding_type
+        network[pnet.PHYSICAL_NETWORK] = binding.phy_uuid
+        network[pnet.SEGMENTATION_ID] = binding.vlan_id
 
     def _handle_lswitch_selection(self, cluster, network,
                                   network_binding, max_ports,
@@ -850,6 +867,7 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                               "quantum port '%s'"), port['id'])
 
         super(NvpPluginV2, self).delete_network(context, id)
+        self._synchronizer.forget(id)
         # clean up network owned ports
         for port in router_iface_ports:
             try:
@@ -884,130 +902,24 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # goto to the plugin DB and fetch the network
             network = self._get_network(context, id)
             # if the network is external, do not go to NVP
-            if not self._network_is_external(context, id):
-                # verify the fabric status of the corresponding
-                # logical switch(es) in nvp
-                try:
-                    lswitches = nvplib.get_lswitches(self.cluster, id)
-                    nvp_net_status = constants.NET_STATUS_ACTIVE
-                    quantum_status = network.status
-                    for lswitch in lswitches:
-                        relations = lswitch.get('_relations')
-                        if relations:
-                            lswitch_status = relations.get(
-                                'LogicalSwitchStatus')
-                            # FIXME(salvatore-orlando): Being unable to fetch
-                            # logical switch status should be an exception.
-                            if (lswitch_status and
-                                not lswitch_status.get('fabric_status',
-                                                       None)):
-                                nvp_net_status = constants.NET_STATUS_DOWN
-                                break
-                    LOG.debug(_("Current network status:%(nvp_net_status)s; "
-                                "Status in Quantum DB:%(quantum_status)s"),
-                              {'nvp_net_status': nvp_net_status,
-                               'quantum_status': quantum_status})
-                    if nvp_net_status != network.status:
-                        # update the network status
-                        network.status = nvp_net_status
-                except q_exc.NotFound:
-                    network.status = constants.NET_STATUS_ERROR
-                except Exception:
-                    err_msg = _("Unable to get logical switches")
-                    LOG.exception(err_msg)
-                    raise nvp_exc.NvpPluginException(err_msg=err_msg)
-            # Don't do field selection here otherwise we won't be able
-            # to add provider networks fields
-            net_result = self._make_network_dict(network, None)
-            self._extend_network_dict_provider(context, net_result)
-            self._extend_network_port_security_dict(context, net_result)
-            self._extend_network_dict_l3(context, net_result)
-            self._extend_network_qos_queue(context, net_result)
-        return self._fields(net_result, fields)
-
-    def get_networks(self, context, filters=None, fields=None):
-        nvp_lswitches = {}
-        filters = filters or {}
+            if (not self._network_is_external(context, id) and
+                    self._synchronizer.is_stale(id, fields)):
+                self._synchronizer.synchronize_network(context, network)
+            return self._make_dicts(context, attr.NETWORKS, [network],
+                                    self._make_network_dict, fields)[0]
+
+    def get_networks(self, context, filters=None, fields=None, stream=False):
+        # The status is the one last read from NVP by the synchronizer
+        if stream:
+            # The networks are read page by page as the response is written
+            return super(NvpPluginV2, self).get_networks(context, filters,
+                                                         fields, stream=True)
         with context.session.begin(subtransactions=True):
             quantum_lswitches = (
-                super(NvpPluginV2, self).get_networks(context, filters))
-            for net in quantum_lswitches:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_port_security_dict(context, net)
-                self._extend_network_dict_l3(context, net)
-                self._extend_network_qos_queue(context, net)
-
-            tenant_ids = filters and filters.get('tenant_id') or None
-        filter_fmt = "&tag=%s&tag_scope=os_tid"
-        if context.is_admin and not tenant_ids:
-            tenant_filter = ""
-        else:
-            tenant_ids = tenant_ids or [context.tenant_id]
-            tenant_filter = ''.join(filter_fmt % tid for tid in tenant_ids)
-        lswitch_filters = "uuid,display_name,fabric_status,tags"
-        lswitch_url_path_1 = (
-            "/ws.v1/lswitch?fields=%s&relations=LogicalSwitchStatus%s"
-            % (lswitch_filters, tenant_filter))
-        lswitch_url_path_2 = nvplib._build_uri_path(
-            nvplib.LSWITCH_RESOURCE,
-            fields=lswitch_filters,
-            relations='LogicalSwitchStatus',
-            filters={'tag': 'true', 'tag_scope': 'shared'})
-        try:
-            res = nvplib.get_all_query_pages(lswitch_url_path_1, self.cluster)
-            nvp_lswitches.update(dict((ls['uuid'], ls) for ls in res))
-            # Issue a second query for fetching shared networks.
-            # We cannot unfortunately use just a single query because tags
-            # cannot be or-ed
-            res_shared = nvplib.get_all_query_pages(lswitch_url_path_2,
-                                                    self.cluster)
-            nvp_lswitches.update(dict((ls['uuid'], ls) for ls in res_shared))
-        except Exception:
-            err_msg = _("Unable to get logical switches")
-            LOG.exception(err_msg)
-            raise nvp_exc.NvpPluginException(err_msg=err_msg)
-
-        if filters.get('id'):
-            nvp_lswitches = dict(
-                (uuid, ls) for (uuid, ls) in nvp_lswitches.iteritems()
-                if uuid in set(filters['id']))
-
-        for quantum_lswitch in quantum_lswitches:
-            # Skip external networks as they do not exist in NVP
-            if quantum_lswitch[l3.EXTERNAL]:
-                continue
-            elif quantum_lswitch['id'] not in nvp_lswitches:
-                LOG.warning(_("Logical Switch %s found in quantum database "
-                              "but not in NVP."), quantum_lswitch["id"])
-                quantum_lswitch["status"] = constants.NET_STATUS_ERROR
-            else:
-                # TODO(salvatore-orlando): be careful about "extended"
-                # logical switches
-                ls = nvp_lswitches.pop(quantum_lswitch['id'])
-                if (ls["_relations"]["LogicalSwitchStatus"]["fabric_status"]):
-                    quantum_lswitch["status"] = constants.NET_STATUS_ACTIVE
-                else:
-                    quantum_lswitch["status"] = constants.NET_STATUS_DOWN
-
-        # do not make the case in which switches are found in NVP
-        # but not in Quantum catastrophic.
-        if nvp_lswitches:
-            LOG.warning(_("Found %s logical switches not bound "
-                        "to Quantum networks. Quantum and NVP are "
-                        "potentially out of sync"), len(nvp_lswitches))
-
+                super(NvpPluginV2, self).get_networks(context, filters,
+                                                      fields))
         LOG.debug(_("get_networks() completed for tenant %s"),
                   context.tenant_id)
-
-        if fields:
-            ret_fields = []
-            for quantum_lswitch in quantum_lswitches:
-                row = {}
-                for field in fields:
-                    row[field] = quantum_lswitch[field]
-                ret_fields.append(row)
-            return ret_fields
-
         return quantum_lswitches
 
     def update_network(self, context, id, network):
@@ -1032,181 +944,99 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_network_qos_queue(context, net)
         return net
 
-    def get_ports(self, context, filters=None, fields=None):
+    def get_ports(self, context, filters=None, fields=None, stream=False):
+        # The status is the one last read from NVP by the synchronizer
+        if stream:
+            # The ports are read page by page as the response is written
+            return super(NvpPluginV2, self).get_ports(context, filters,
+                                                      fields, stream=True)
         with context.session.begin(subtransactions=True):
-            quantum_lports = super(NvpPluginV2, self).get_ports(
-                context, filters)
-            for quantum_lport in quantum_lports:
-                self._extend_port_port_security_dict(context, quantum_lport)
-        if (filters.get('network_id') and len(filters.get('network_id')) and
-            self._network_is_external(context, filters['network_id'][0])):
-            # Do not perform check on NVP platform
-            return quantum_lports
-
-        vm_filter = ""
-        tenant_filter = ""
-        # This is used when calling delete_network. Quantum checks to see if
-        # the network has any ports.
-        if filters.get("network_id"):
-            # FIXME (Aaron) If we get more than one network_id this won't work
-            lswitch = filters["network_id"][0]
-        else:
-            lswitch = "*"
-
-        if filters.get("device_id"):
-            for vm_id in filters.get("device_id"):
-                vm_filter = ("%stag_scope=vm_id&tag=%s&" % (vm_filter,
-                             hashlib.sha1(vm_id).hexdigest()))
-        else:
-            vm_id = ""
-
-        if filters.get("tenant_id"):
-            for tenant in filters.get("tenant_id"):
-                tenant_filter = ("%stag_scope=os_tid&tag=%s&" %
-                                 (tenant_filter, tenant))
+            return super(NvpPluginV2, self).get_ports(context, filters,
+                                                      fields)
 
-        nvp_lports = {}
-
-        lport_fields_str = ("tags,admin_status_enabled,display_name,"
-                            "fabric_status_up")
-        try:
-            lport_query_path = (
-                "/ws.v1/lswitch/%s/lport?fields=%s&%s%stag_scope=q_port_id"
-                "&relations=LogicalPortStatus" %
-                (lswitch, lport_fields_str, vm_filter, tenant_filter))
-
-            try:
-                ports = nvplib.get_all_query_pages(lport_query_path,
-                                                   self.cluster)
-            except q_exc.NotFound:
-                LOG.warn(_("Lswitch %s not found in NVP"), lswitch)
-                ports = None
-
-            if ports:
-                for port in ports:
-                    for tag in port["tags"]:
-                        if tag["scope"] == "q_port_id":
-                            nvp_lports[tag["tag"]] = port
-        except Exception:
-            err_msg = _("Unable to get ports")
-            LOG.exception(err_msg)
-            raise nvp_exc.NvpPluginException(err_msg=err_msg)
-
-        lports = []
-        for quantum_lport in quantum_lports:
-            # if a quantum port is not found in NVP, this migth be because
-            # such port is not mapped to a logical switch - ie: floating ip
-            if quantum_lport['device_owner'] in (l3_db.DEVICE_OWNER_FLOATINGIP,
-                                                 l3_db.DEVICE_OWNER_ROUTER_GW):
-                lports.append(quantum_lport)
-                continue
-            try:
-                quantum_lport["admin_state_up"] = (
-                    nvp_lports[quantum_lport["id"]]["admin_status_enabled"])
-
-                if (nvp_lports[quantum_lport["id"]]
-                        ["_relations"]
-                        ["LogicalPortStatus"]
-                        ["fabric_status_up"]):
-                    quantum_lport["status"] = constants.PORT_STATUS_ACTIVE
-                else:
-                    quantum_lport["status"] = constants.PORT_STATUS_DOWN
-
-                del nvp_lports[quantum_lport["id"]]
-            except KeyError:
-                quantum_lport["status"] = constants.PORT_STATUS_ERROR
-                LOG.debug(_("Quantum logical port %s was not found on NVP"),
-                          quantum_lport['id'])
-
-            lports.append(quantum_lport)
-        # do not make the case in which ports are found in NVP
-        # but not in Quantum catastrophic.
-        if nvp_lports:
-            LOG.warning(_("Found %s logical ports not bound "
-                          "to Quantum ports. Quantum and NVP are "
-                          "potentially out of sync"), len(nvp_lports))
-
-        if fields:
-            ret_fields = []
-            for lport in lports:
-                row = {}
-                for field in fields:
-                    row[field] = lport[field]
-                ret_fields.append(row)
-            return ret_fields
-        return lports
-
-    def create_port(self, context, port):
+    def _extend_port_create(self, context, port, quantum_db):
         # If PORTSECURITY is not the default value ATTR_NOT_SPECIFIED
         # then we pass the port to the policy engine. The reason why we don't
         # pass the value to the policy engine when the port is
         # ATTR_NOT_SPECIFIED is for the case where a port is created on a
         # shared network that is not owned by the tenant.
         port_data = port['port']
-        notify_dhcp_agent = False
-        with context.session.begin(subtransactions=True):
-            # First we allocate port in quantum database
-            quantum_db = super(NvpPluginV2, self).create_port(context, port)
-            # Update fields obtained from quantum db (eg: MAC address)
-            port["port"].update(quantum_db)
-            # metadata_dhcp_host_route
-            if (cfg.CONF.NVP.metadata_mode == "dhcp_host_route" and
-                quantum_db.get('device_owner') == constants.DEVICE_OWNER_DHCP):
-                if (quantum_db.get('fixed_ips') and
-                    len(quantum_db['fixed_ips'])):
-                    notify_dhcp_agent = self._ensure_metadata_host_route(
-                        context, quantum_db['fixed_ips'][0])
-            # port security extension checks
-            (port_security, has_ip) = self._determine_port_security_and_has_ip(
-                context, port_data)
-            port_data[psec.PORTSECURITY] = port_security
-            self._process_port_security_create(context, port_data)
-            # security group extension checks
-            if port_security and has_ip:
-                self._ensure_default_security_group_on_port(context, port)
-            elif attr.is_attr_set(port_data.get(ext_sg.SECURITYGROUPS)):
-                raise psec.PortSecurityAndIPRequiredForSecurityGroups()
-            port_data[ext_sg.SECURITYGROUPS] = (
-                self._get_security_groups_on_port(context, port))
-            self._process_port_create_security_group(
-                context, port_data, port_data[ext_sg.SECURITYGROUPS])
-            # QoS extension checks
-            port_data[ext_qos.QUEUE] = self._check_for_queue_and_create(
-                context, port_data)
-            self._process_port_queue_mapping(context, port_data)
-            # provider networking extension checks
-            # Fetch the network and network binding from Quantum db
-            try:
-                port_data = port['port'].copy()
-                port_create_func = self._port_drivers['create'].get(
-                    port_data['device_owner'],
-                    self._port_drivers['create']['default'])
+        # Update fields obtained from quantum db (eg: MAC address)
+        port["port"].update(quantum_db)
+        # metadata_dhcp_host_route
+        if self._has_metadata_host_route(quantum_db):
+            # The DHCP agents are notified by _notify_port_create
+            self._ensure_metadata_host_route(context,
+                                             quantum_db['fixed_ips'][0])
+        # port security extension checks
+        (port_security, has_ip) = self._determine_port_security_and_has_ip(
+            context, port_data)
+        port_data[psec.PORTSECURITY] = port_security
+        self._process_port_security_create(context, port_data)
+        # security group extension checks
+        if port_security and has_ip:
+            self._ensure_default_security_group_on_port(context, port)
+        elif attr.is_attr_set(port_data.get(ext_sg.SECURITYGROUPS)):
+            raise psec.PortSecurityAndIPRequiredForSecurityGroups()
+        port_data[ext_sg.SECURITYGROUPS] = (
+            self._get_security_groups_on_port(context, port))
+        self._process_port_create_security_group(
+            context, port_data, port_data[ext_sg.SECURITYGROUPS])
+        # QoS extension checks
+        port_data[ext_qos.QUEUE] = self._check_for_queue_and_create(
+            context, port_data)
+        self._process_port_queue_mapping(context, port_data)
+        # provider networking extension checks
+        # Fetch the network and network binding from Quantum db
+        try:
+            port_data = port['port'].copy()
+            port_create_func = self._port_drivers['create'].get(
+                port_data['device_owner'],
+                self._port_drivers['create']['default'])
 
-                port_create_func(context, port_data)
-            except q_exc.NotFound:
-                LOG.warning(_("Network %s was not found in NVP."),
-                            port_data['network_id'])
-                port_data['status'] = constants.PORT_STATUS_ERROR
-            except Exception as e:
-                # FIXME (arosen) or the plugin_interface call failed in which
-                # case we need to garbage collect the left over port in nvp.
-                err_msg = _("Unable to create port or set port attachment "
-                            "in NVP.")
-                LOG.exception(err_msg)
-                raise e
-
-            LOG.debug(_("create_port completed on NVP for tenant "
-                        "%(tenant_id)s: (%(id)s)"), port_data)
+            port_create_func(context, port_data)
+        except q_exc.NotFound:
+            LOG.warning(_("Network %s was not found in NVP."),
+                        port_data['network_id'])
+            port_data['status'] = constants.PORT_STATUS_ERROR
+        except Exception as e:
+            # FIXME (arosen) or the plugin_interface call failed in which
+            # case we need to garbage collect the left over port in nvp.
+            err_msg = _("Unable to create port or set port attachment "
+                        "in NVP.")
+            LOG.exception(err_msg)
+            raise e
 
-            # remove since it will be added in extend based on policy
-            del port_data[ext_qos.QUEUE]
-            self._extend_port_port_security_dict(context, port_data)
-            self._extend_port_qos_queue(context, port_data)
-        net = self.get_network(context, port_data['network_id'])
+        LOG.debug(_("create_port completed on NVP for tenant "
+                    "%(tenant_id)s: (%(id)s)"), port_data)
+
+        # remove since it will be added in extend based on policy
+        del port_data[ext_qos.QUEUE]
+        self._extend_port_port_security_dict(context, port_data)
+        self._extend_port_qos_queue(context, port_data)
+        return port_data
+
+    def _has_metadata_host_route(self, port_dict):
+        return (cfg.CONF.NVP.metadata_mode == "dhcp_host_route" and
+                port_dict.get('device_owner') == constants.DEVICE_OWNER_DHCP
+                and bool(port_dict.get('fixed_ips')))
+
+    def _notify_port_create(self, context, port_dict):
+        net = self.get_network(context, port_dict['network_id'])
         self.schedule_network(context, net)
-        if notify_dhcp_agent:
-            self._send_subnet_update_end(
-                context, quantum_db['fixed_ips'][0]['subnet_id'])
+        if (self._has_metadata_host_route(port_dict) and
+                cfg.CONF.dhcp_agent_notification):
+            # The route was set unless the subnet has no gateway
+            subnet_id = port_dict['fixed_ips'][0]['subnet_id']
+            if self.get_subnet(context, subnet_id).get('gateway_ip'):
+                self._send_subnet_update_end(context, subnet_id)
+
+    def create_port(self, context, port):
+        with context.session.begin(subtransactions=True):
+            # First we allocate port in quantum database
+            quantum_db = super(NvpPluginV2, self).create_port(context, port)
+            port_data = self._extend_port_create(context, port, quantum_db)
+        self._notify_port_create(context, port_data)
         return port_data
 
     def update_port(self, context, id, port):
@@ -1334,6 +1164,7 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                         context, quantum_db_port['fixed_ips'][0],
                         is_delete=True)
             super(NvpPluginV2, self).delete_port(context, id)
+            self._synchronizer.forget(id)
             # Delete qos queue if possible
             if queue:
                 self.delete_qos_queue(context, queue[0]['queue_id'], False)
@@ -1343,35 +1174,12 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def get_port(self, context, id, fields=None):
         with context.session.begin(subtransactions=True):
-            quantum_db_port = super(NvpPluginV2, self).get_port(context,
-                                                                id, fields)
-            self._extend_port_port_security_dict(context, quantum_db_port)
-            self._extend_port_qos_queue(context, quantum_db_port)
-
-            if self._network_is_external(context,
-                                         quantum_db_port['network_id']):
-                return quantum_db_port
-            nvp_id = self._nvp_get_port_id(context, self.cluster,
-                                           quantum_db_port)
-            # If there's no nvp IP do not bother going to NVP and put
-            # the port in error state
-            if nvp_id:
-                try:
-                    port = nvplib.get_logical_port_status(
-                        self.cluster, quantum_db_port['network_id'],
-                        nvp_id)
-                    quantum_db_port["admin_state_up"] = (
-                        port["admin_status_enabled"])
-                    if port["fabric_status_up"]:
-                        quantum_db_port["status"] = (
-                            constants.PORT_STATUS_ACTIVE)
-                    else:
-                        quantum_db_port["status"] = constants.PORT_STATUS_DOWN
-                except q_exc.NotFound:
-                    quantum_db_port["status"] = constants.PORT_STATUS_ERROR
-            else:
-                quantum_db_port["status"] = constants.PORT_STATUS_ERROR
-        return quantum_db_port
+            port = self._get_port(context, id)
+            if (not self._network_is_external(context, port['network_id'])
+                    and self._synchronizer.is_stale(id, fields)):
+                self._synchronizer.synchronize_port(context, port)
+            return self._make_dicts(context, attr.PORTS, [port],
+                                    self._make_port_dict, fields)[0]
 
     def create_router(self, context, router):
         # NOTE(salvatore-orlando): We completely override this method in
@@ -1467,6 +1275,7 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # cause the router delete operation to fail too.
             self._handle_metadata_access_network(context, id, do_create=False)
             super(NvpPluginV2, self).delete_router(context, id)
+            self._synchronizer.forget(id)
             # If removal is successful in Quantum it should be so on
             # the NVP platform too - otherwise the transaction should
             # be automatically aborted
@@ -1485,81 +1294,17 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def get_router(self, context, id, fields=None):
         router = self._get_router(context, id)
-        try:
-            try:
-                lrouter = nvplib.get_lrouter(self.cluster, id)
-            except q_exc.NotFound:
-                lrouter = {}
-                router_op_status = constants.NET_STATUS_ERROR
-            relations = lrouter.get('_relations')
-            if relations:
-                lrouter_status = relations.get('LogicalRouterStatus')
-                # FIXME(salvatore-orlando): Being unable to fetch the
-                # logical router status should be an exception.
-                if lrouter_status:
-                    router_op_status = (lrouter_status.get('fabric_status')
-                                        and constants.NET_STATUS_ACTIVE or
-                                        constants.NET_STATUS_DOWN)
-            if router_op_status != router.status:
-                LOG.debug(_("Current router status:%(router_status)s;"
-                            "Status in Quantum DB:%(db_router_status)s"),
-                          {'router_status': router_op_status,
-                           'db_router_status': router.status})
-                 # update the router status
-                with context.session.begin(subtransactions=True):
-                    router.status = router_op_status
-        except NvpApiClient.NvpApiException:
-            err_msg = _("Unable to get logical router")
-            LOG.exception(err_msg)
-            raise nvp_exc.NvpPluginException(err_msg=err_msg)
+        if self._synchronizer.is_stale(id, fields):
+            self._synchronizer.synchronize_router(context, router)
         return self._make_router_dict(router, fields)
 
     def get_routers(self, context, filters=None, fields=None):
+        # The status is the one last read from NVP by the synchronizer
         router_query = self._apply_filters_to_query(
             self._model_query(context, l3_db.Router),
             l3_db.Router, filters)
-        routers = router_query.all()
-        # Query routers on NVP for updating operational status
-        if context.is_admin and not filters.get("tenant_id"):
-            tenant_id = None
-        elif 'tenant_id' in filters:
-            tenant_id = filters.get('tenant_id')[0]
-            del filters['tenant_id']
-        else:
-            tenant_id = context.tenant_id
-        try:
-            nvp_lrouters = nvplib.get_lrouters(self.cluster,
-                                               tenant_id,
-                                               fields)
-        except NvpApiClient.NvpApiException:
-            err_msg = _("Unable to get logical routers from NVP controller")
-            LOG.exception(err_msg)
-            raise nvp_exc.NvpPluginException(err_msg=err_msg)
-
-        nvp_lrouters_dict = {}
-        for nvp_lrouter in nvp_lrouters:
-            nvp_lrouters_dict[nvp_lrouter['uuid']] = nvp_lrouter
-        for router in routers:
-            nvp_lrouter = nvp_lrouters_dict.get(router['id'])
-            if nvp_lrouter:
-                if (nvp_lrouter["_relations"]["LogicalRouterStatus"]
-                        ["fabric_status"]):
-                    router.status = constants.NET_STATUS_ACTIVE
-                else:
-                    router.status = constants.NET_STATUS_DOWN
-                nvp_lrouters.remove(nvp_lrouter)
-            else:
-                router.status = constants.NET_STATUS_ERROR
-
-        # do not make the case in which routers are found in NVP
-        # but not in Quantum catastrophic.
-        if nvp_lrouters:
-            LOG.warning(_("Found %s logical routers not bound "
-                          "to Quantum routers. Quantum and NVP are "
-                          "potentially out of sync"), len(nvp_lrouters))
-
         return [self._make_router_dict(router, fields)
-                for router in routers]
+                for router in router_query.all()]
 
     def add_router_interface(self, context, router_id, interface_info):
         router_iface_info = super(NvpPluginV2, self).add_router_interface(
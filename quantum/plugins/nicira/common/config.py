@@ -46,6 +46,21 @@ nvp_opts = [
                       "bridge, ipsec_gre, or ipsec_stt)")),
 ]
 
+sync_opts = [
+    cfg.IntOpt('state_sync_interval', default=120,
+               help=_("Seconds between synchronizing the operational status "
+                      "of all the NVP logical switches, routers and ports "
+                      "into the Quantum database, 0 to disable it")),
+    cfg.IntOpt('max_chunk_size', default=500,
+               help=_("Maximum number of NVP resources read by a single "
+                      "request of the synchronizer")),
+    cfg.IntOpt('max_status_staleness', default=-1,
+               help=_("Seconds after which a show call reads the status of "
+                      "its network, port or router from NVP again, -1 to "
+                      "read it from the database only. Requesting the status "
+                      "field explicitly always reads it from NVP")),
+]
+
 connection_opts = [
     cfg.StrOpt('nvp_user',
                default='admin',
@@ -97,6 +112,7 @@ cluster_opts = [
 cfg.CONF.register_opts(connection_opts)
 cfg.CONF.register_opts(cluster_opts)
 cfg.CONF.register_opts(nvp_opts, "NVP")
+cfg.CONF.register_opts(sync_opts, "NVP_SYNC")
 cfg.CONF.register_opts(scheduler.AGENTS_SCHEDULER_OPTS)
 # NOTE(armando-migliaccio): keep the following code until we support
 # NVP configuration files in older format (Grizzly or older).
@@ -0,0 +1,292 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+from oslo.config import cfg
+
+from quantum.common import constants
+from quantum.common import exceptions as q_exc
+from quantum import context as q_context
+from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
+from quantum.openstack.common import timeutils
+from quantum.plugins.nicira.common import exceptions as nvp_exc
+from quantum.plugins.nicira import NvpApiClient
+from quantum.plugins.nicira import nvplib
+
+LOG = logging.getLogger(__name__)
+
+LSWITCH_QUERY = nvplib._build_uri_path(
+    nvplib.LSWITCH_RESOURCE, fields='uuid,tags,fabric_status',
+    relations='LogicalSwitchStatus')
+LROUTER_QUERY = nvplib._build_uri_path(
+    nvplib.LROUTER_RESOURCE, fields='uuid,fabric_status',
+    relations='LogicalRouterStatus')
+LPORT_QUERY = nvplib._build_uri_path(
+    nvplib.LSWITCHPORT_RESOURCE, parent_resource_id='*',
+    fields='uuid,tags,fabric_status_up', relations='LogicalPortStatus',
+    filters={'tag_scope': 'q_port_id'})
+
+# Ports which have no logical switch port
+NO_LPORT_DEVICE_OWNERS = (l3_db.DEVICE_OWNER_FLOATINGIP,
+                          l3_db.DEVICE_OWNER_ROUTER_GW)
+
+
+def _get_tag(resource, scope):
+    for tag in resource.get('tags', []):
+        if tag['scope'] == scope:
+            return tag['tag']
+
+
+def _get_lswitch_status(lswitch):
+    relations = lswitch.get('_relations')
+    if relations:
+        lswitch_status = relations.get('LogicalSwitchStatus')
+        # FIXME(salvatore-orlando): Being unable to fetch logical
+        # switch status should be an exception.
+        if lswitch_status and not lswitch_status.get('fabric_status'):
+            return constants.NET_STATUS_DOWN
+    return constants.NET_STATUS_ACTIVE
+
+
+def _get_lrouter_status(lrouter):
+    lrouter_status = lrouter.get('_relations', {}).get('LogicalRouterStatus')
+    # FIXME(salvatore-orlando): Being unable to fetch the logical router
+    # status should be an exception.
+    if not lrouter_status:
+        return constants.NET_STATUS_ERROR
+    return (lrouter_status.get('fabric_status') and
+            constants.NET_STATUS_ACTIVE or constants.NET_STATUS_DOWN)
+
+
+def _get_lport_status(lport):
+    lport_status = lport.get('_relations', {}).get('LogicalPortStatus')
+    # A port whose status could not be fetched does not stop the others
+    if not lport_status:
+        return constants.PORT_STATUS_ERROR
+    return (lport_status.get('fabric_status_up') and
+            constants.PORT_STATUS_ACTIVE or constants.PORT_STATUS_DOWN)
+
+
+def _merge_statuses(statuses, resource_id, status):
+    # A network is down as soon as one of its logical switches is
+    if statuses.get(resource_id) != constants.NET_STATUS_DOWN:
+        statuses[resource_id] = status
+    return statuses[resource_id]
+
+
+class NvpSynchronizer(object):
+    """Persist the operational status of the NVP resources in the DB.
+
+    All the logical switches, routers and ports are periodically read,
+    one chunk of each kind at a time, and the status of the matching
+    networks, routers and ports updated, so that list and show calls
+    read the database only. Show calls read the status of their object
+    from NVP when it is older than max_status_staleness, or when the
+    status field is requested explicitly.
+    """
+
+    def __init__(self, plugin, cluster):
+        self._plugin = plugin
+        self._cluster = cluster
+        # {quantum id: time its status was last read from NVP}
+        self._synced_at = {}
+        self._looping_call = None
+
+    def start(self, interval):
+        self._looping_call = loopingcall.FixedIntervalLoopingCall(
+            self._periodic_synchronize)
+        self._looping_call.start(interval=interval, initial_delay=interval)
+
+    def is_stale(self, resource_id, fields=None):
+        """Tell whether a show call must read the status from NVP."""
+        if fields and 'status' in fields:
+            return True
+        max_staleness = cfg.CONF.NVP_SYNC.max_status_staleness
+        if max_staleness < 0:
+            return False
+        synced_at = self._synced_at.get(resource_id)
+        return (synced_at is None or
+                timeutils.is_older_than(synced_at, max_staleness))
+
+    def forget(self, resource_id):
+        """Drop the sync time of a deleted network, router or port."""
+        self._synced_at.pop(resource_id, None)
+
+    def _set_status(self, context, resource, status):
+        if resource.status != status:
+            LOG.debug(_("Status of %(id)s changed from %(old)s to %(new)s"),
+                      {'id': resource.id, 'old': resource.status,
+                       'new': status})
+            with context.session.begin(subtransactions=True):
+                resource.status = status
+        self._synced_at[resource.id] = timeutils.utcnow()
+
+    def synchronize_network(self, context, network):
+        """Read the status of a network DB object from NVP."""
+        try:
+            lswitches = nvplib.get_lswitches(self._cluster, network.id)
+            status = constants.NET_STATUS_ACTIVE
+            for lswitch in lswitches:
+                status = _get_lswitch_status(lswitch)
+                if status == constants.NET_STATUS_DOWN:
+                    break
+        except q_exc.NotFound:
+            status = constants.NET_STATUS_ERROR
+        except Exception:
+            err_msg = _("Unable to get logical switches")
+            LOG.exception(err_msg)
+            raise nvp_exc.NvpPluginException(err_msg=err_msg)
+        self._set_status(context, network, status)
+
+    def synchronize_router(self, context, router):
+        """Read the status of a router DB object from NVP."""
+        try:
+            status = _get_lrouter_status(
+                nvplib.get_lrouter(self._cluster, router.id))
+        except q_exc.NotFound:
+            status = constants.NET_STATUS_ERROR
+        except NvpApiClient.NvpApiException:
+            err_msg = _("Unable to get logical router")
+            LOG.exception(err_msg)
+            raise nvp_exc.NvpPluginException(err_msg=err_msg)
+        self._set_status(context, router, status)
+
+    def synchronize_port(self, context, port):
+        """Read the status of a port DB object from NVP."""
+        status = constants.PORT_STATUS_ERROR
+        # If there's no nvp IP do not bother going to NVP and put
+        # the port in error state
+        nvp_id = self._plugin._nvp_get_port_id(context, self._cluster, port)
+        if nvp_id:
+            try:
+                lport = nvplib.get_logical_port_status(
+                    self._cluster, port.network_id, nvp_id)
+                if lport['fabric_status_up']:
+                    status = constants.PORT_STATUS_ACTIVE
+                else:
+                    status = constants.PORT_STATUS_DOWN
+            except q_exc.NotFound:
+                pass
+        self._set_status(context, port, status)
+
+    def _get_chunks(self, query):
+        chunk_size = cfg.CONF.NVP_SYNC.max_chunk_size
+        page_cursor = None
+        while True:
+            path = '%s&_page_length=%d' % (query, chunk_size)
+            if page_cursor:
+                path += '&_page_cursor=%s' % page_cursor
+            body = json.loads(nvplib.do_single_request(
+                nvplib.HTTP_GET, path, cluster=self._cluster))
+            yield body['results']
+            page_cursor = body.get('page_cursor')
+            if not page_cursor:
+                return
+
+    def _update_statuses(self, context, model, statuses):
+        by_status = {}
+        for resource_id, status in statuses.iteritems():
+            by_status.setdefault(status, []).append(resource_id)
+        with context.session.begin(subtransactions=True):
+            for status, resource_ids in by_status.iteritems():
+                context.session.query(model).filter(
+                    model.id.in_(resource_ids),
+                    model.status != status).update(
+                        {'status': status}, synchronize_session=False)
+        now = timeutils.utcnow()
+        for resource_id in statuses:
+            self._synced_at[resource_id] = now
+
+    def _synchronize_resources(self, context, model, query, get_status,
+                               known_ids, error_status):
+        """Update the status of the DB objects, chunk by chunk.
+
+        :param get_status: function returning the quantum id and status of
+                           an NVP resource.
+        :param known_ids: ids of the objects which are expected in NVP, and
+                          put in error_status if they are not found.
+        """
+        statuses = {}
+        for chunk in self._get_chunks(query):
+            chunk_statuses = {}
+            for resource in chunk:
+                resource_id, status = get_status(resource)
+                if resource_id:
+                    chunk_statuses[resource_id] = _merge_statuses(
+                        statuses, resource_id, status)
+            self._update_statuses(context, model, chunk_statuses)
+        missing = known_ids - set(statuses)
+        if missing:
+            LOG.warning(_("%(count)d %(resources)s found in quantum database "
+                          "but not in NVP"),
+                        {'count': len(missing),
+                         'resources': model.__tablename__})
+            self._update_statuses(context, model, dict(
+                (resource_id, error_status) for resource_id in missing))
+
+    def synchronize(self):
+        """Read the status of all the logical switches, routers, ports."""
+        context = q_context.get_admin_context()
+        session = context.session
+        # Only the objects created before the NVP resources are read may
+        # be missing from NVP
+        network_ids = set(
+            network_id for (network_id,) in session.query(
+                models_v2.Network.id).outerjoin(
+                    l3_db.ExternalNetwork).filter(
+                        l3_db.ExternalNetwork.network_id == None))  # noqa
+        router_ids = set(router_id for (router_id,) in session.query(
+            l3_db.Router.id))
+        port_ids = set(port_id for (port_id,) in session.query(
+            models_v2.Port.id).outerjoin(
+                l3_db.ExternalNetwork,
+                l3_db.ExternalNetwork.network_id ==
+                models_v2.Port.network_id).filter(
+                    l3_db.ExternalNetwork.network_id == None,  # noqa
+                    ~models_v2.Port.device_owner.in_(NO_LPORT_DEVICE_OWNERS)))
+
+        self._synchronize_resources(
+            context, models_v2.Network, LSWITCH_QUERY,
+            lambda lswitch: (_get_tag(lswitch, 'quantum_net_id') or
+                             lswitch['uuid'], _get_lswitch_status(lswitch)),
+            network_ids, constants.NET_STATUS_ERROR)
+        self._synchronize_resources(
+            context, l3_db.Router, LROUTER_QUERY,
+            lambda lrouter: (lrouter['uuid'], _get_lrouter_status(lrouter)),
+            router_ids, constants.NET_STATUS_ERROR)
+        self._synchronize_resources(
+            context, models_v2.Port, LPORT_QUERY,
+            lambda lport: (_get_tag(lport, 'q_port_id'),
+                           _get_lport_status(lport)),
+            port_ids, constants.PORT_STATUS_ERROR)
+        # Forget the objects deleted by other server processes, and the
+        # NVP resources with no quantum object
+        known_ids = network_ids | router_ids | port_ids
+        for resource_id in self._synced_at.keys():
+            if resource_id not in known_ids:
+                del self._synced_at[resource_id]
+
+    def _periodic_synchronize(self):
+        try:
+            self.synchronize()
+        except Exception:
+            LOG.exception(_("Failed to synchronize the status of the NVP "
+                            "resources"))
@@ -36,6 +36,17 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Return a dict of network id to binding for the given networks."""
+    session = session or db.get_session()
+    if not network_ids:
+        return {}
+    bindings = (session.query(nicira_models.NvpNetworkBinding).
+                filter(nicira_models.NvpNetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def get_network_binding_by_vlanid(session, vlan_id):
     session = session or db.get_session()
     try:
@@ -20,6 +20,7 @@ import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from quantum.api.v2 import attributes as attr
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
 from quantum.openstack.common import uuidutils
@@ -58,6 +59,11 @@ class NetworkQueueMapping(model_base.BASEV2):
 class NVPQoSDbMixin(ext_qos.QueuePluginBase):
     """Mixin class to add queues."""
 
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attr.NETWORKS, ['_extend_networks_qos_queue'])
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attr.PORTS, ['_extend_ports_qos_queue'])
+
     def create_qos_queue(self, context, qos_queue):
         q = qos_queue['qos_queue']
         with context.session.begin(subtransactions=True):
@@ -138,25 +144,35 @@ class NVPQoSDbMixin(ext_qos.QueuePluginBase):
                 context.session.delete(binding)
 
     def _extend_port_qos_queue(self, context, port):
-        filters = {'port_id': [port['id']]}
-        fields = ['queue_id']
-        port[ext_qos.QUEUE] = None
-        queue_id = self._get_port_queue_bindings(
-            context, filters, fields)
-        if queue_id:
-            port[ext_qos.QUEUE] = queue_id[0]['queue_id']
+        self._extend_ports_qos_queue(context, [port])
         return port
 
     def _extend_network_qos_queue(self, context, network):
-        filters = {'network_id': [network['id']]}
-        fields = ['queue_id']
-        network[ext_qos.QUEUE] = None
-        queue_id = self._get_network_queue_bindings(
-            context, filters, fields)
-        if queue_id:
-            network[ext_qos.QUEUE] = queue_id[0]['queue_id']
+        self._extend_networks_qos_queue(context, [network])
         return network
 
+    def _extend_ports_qos_queue(self, context, ports):
+        if not ports:
+            return
+        bindings = self._get_port_queue_bindings(
+            context, {'port_id': [port['id'] for port in ports]},
+            ['port_id', 'queue_id'])
+        queue_ids = dict((binding['port_id'], binding['queue_id'])
+                         for binding in bindings)
+        for port in ports:
+            port[ext_qos.QUEUE] = queue_ids.get(port['id'])
+
+    def _extend_networks_qos_queue(self, context, networks):
+        if not networks:
+            return
+        bindings = self._get_network_queue_bindings(
+            context, {'network_id': [network['id'] for network in networks]},
+            ['network_id', 'queue_id'])
+        queue_ids = dict((binding['network_id'], binding['queue_id'])
+                         for binding in bindings)
+        for network in networks:
+            network[ext_qos.QUEUE] = queue_ids.get(network['id'])
+
     def _make_qos_queue_dict(self, queue, fields=None):
         res = {'id': queue['id'],
                'name': queue.get('name'),
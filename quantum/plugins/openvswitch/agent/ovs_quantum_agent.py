@@ -28,6 +28,7 @@ from oslo.config import cfg
 
 from quantum.agent.linux import ip_lib
 from quantum.agent.linux import ovs_lib
+from quantum.agent.linux import ovsdb_monitor
 from quantum.agent.linux import utils
 from quantum.agent import rpc as agent_rpc
 from quantum.agent import securitygroups_rpc as sg_rpc
@@ -153,7 +154,8 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
 
     def __init__(self, integ_br, tun_br, local_ip,
                  bridge_mappings, root_helper,
-                 polling_interval, enable_tunneling):
+                 polling_interval, enable_tunneling,
+                 use_ovsdb_monitor=False, ovsdb_monitor_respawn_interval=3):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
@@ -163,6 +165,10 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         :param root_helper: utility to use when running shell cmds.
         :param polling_interval: interval (secs) to poll DB.
         :param enable_tunneling: if True enable GRE networks.
+        :param use_ovsdb_monitor: if True watch the OVSDB for device changes
+               instead of polling.
+        :param ovsdb_monitor_respawn_interval: interval (secs) before a
+               dead ovsdb-client monitor process is respawned.
         '''
         self.root_helper = root_helper
         self.available_local_vlans = set(
@@ -173,6 +179,10 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         self.local_vlan_map = {}
 
         self.polling_interval = polling_interval
+        self.ovsdb_monitor = None
+        if use_ovsdb_monitor:
+            self.ovsdb_monitor = ovsdb_monitor.OvsdbMonitor(
+                root_helper, ovsdb_monitor_respawn_interval)
 
         self.enable_tunneling = enable_tunneling
         self.local_ip = local_ip
@@ -196,7 +206,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
     def _report_state(self):
         try:
             # How many devices are likely used by a VM
-            ports = self.int_br.get_vif_port_set()
+            ports = self.get_vif_port_set()
             num_devices = len(ports)
             self.agent_state.get('configurations')['devices'] = num_devices
             self.state_rpc.report_state(self.context,
@@ -591,8 +601,18 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             int_veth.link.set_up()
             phys_veth.link.set_up()
 
+    def get_vif_port_set(self):
+        if self.ovsdb_monitor and self.ovsdb_monitor.synced:
+            # The monitor sees the interfaces of all the bridges, e.g. the
+            # router gateway ports of br-ex, keep the ones of br-int
+            return self.int_br.get_vif_port_set_from_external_ids(
+                self.ovsdb_monitor.get_external_ids(
+                    self.int_br.get_port_name_list()))
+        # Poll while the monitor is disabled, starting or respawning
+        return self.int_br.get_vif_port_set()
+
     def update_ports(self, registered_ports):
-        ports = self.int_br.get_vif_port_set()
+        ports = self.get_vif_port_set()
         if ports == registered_ports:
             return
         added = ports - registered_ports
@@ -615,18 +635,18 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
     def treat_devices_added(self, devices):
         resync = False
         self.sg_agent.prepare_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            # resync is needed
+            return True
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
             port = self.int_br.get_vif_port_by_id(details['device'])
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
@@ -646,17 +666,17 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
     def treat_devices_removed(self, devices):
         resync = False
         self.sg_agent.remove_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.update_devices_down_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            # resync is needed
+            return True
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
             if details['exists']:
                 LOG.info(_("Port %s updated."), device)
                 # Nothing to do regarding local networking
@@ -722,10 +742,14 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                 sync = True
                 tunnel_sync = True
 
-            # sleep till end of polling interval
+            # sleep till end of polling interval, or until the monitor
+            # reports a device change
             elapsed = (time.time() - start)
             if (elapsed < self.polling_interval):
-                time.sleep(self.polling_interval - elapsed)
+                if self.ovsdb_monitor:
+                    self.ovsdb_monitor.wait(self.polling_interval - elapsed)
+                else:
+                    time.sleep(self.polling_interval - elapsed)
             else:
                 LOG.debug(_("Loop iteration exceeded interval "
                             "(%(polling_interval)s vs. %(elapsed)s)!"),
@@ -733,7 +757,13 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                            'elapsed': elapsed})
 
     def daemon_loop(self):
-        self.rpc_loop()
+        if self.ovsdb_monitor:
+            self.ovsdb_monitor.start()
+        try:
+            self.rpc_loop()
+        finally:
+            if self.ovsdb_monitor:
+                self.ovsdb_monitor.stop()
 
 
 def create_agent_config_map(config):
@@ -755,6 +785,9 @@ def create_agent_config_map(config):
         root_helper=config.AGENT.root_helper,
         polling_interval=config.AGENT.polling_interval,
         enable_tunneling=config.OVS.enable_tunneling,
+        use_ovsdb_monitor=config.AGENT.use_ovsdb_monitor,
+        ovsdb_monitor_respawn_interval=(
+            config.AGENT.ovsdb_monitor_respawn_interval),
     )
 
     if kwargs['enable_tunneling'] and not kwargs['local_ip']:
@@ -58,6 +58,13 @@ agent_opts = [
     cfg.IntOpt('polling_interval', default=2,
                help=_("The number of seconds the agent will wait between "
                       "polling for local device changes.")),
+    cfg.BoolOpt('use_ovsdb_monitor', default=False,
+                help=_("Watch the OVSDB Interface table with a long lived "
+                       "ovsdb-client monitor process instead of polling "
+                       "ovs-vsctl for local device changes.")),
+    cfg.IntOpt('ovsdb_monitor_respawn_interval', default=3,
+               help=_("The number of seconds to wait before respawning "
+                      "the ovsdb-client monitor process if it dies.")),
 ]
 
 
@@ -23,6 +23,7 @@ from quantum.common import exceptions as q_exc
 import quantum.db.api as db
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import segment_ranges
 from quantum.extensions import securitygroup as ext_sg
 from quantum import manager
 from quantum.openstack.common import log as logging
@@ -47,6 +48,17 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Return a dict of network id to binding for the given networks."""
+    session = session or db.get_session()
+    if not network_ids:
+        return {}
+    bindings = (session.query(ovs_models_v2.NetworkBinding).
+                filter(ovs_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def add_network_binding(session, network_id, network_type,
                         physical_network, segmentation_id):
     with session.begin(subtransactions=True):
@@ -57,60 +69,31 @@ def add_network_binding(session, network_id, network_type,
 
 
 def sync_vlan_allocations(network_vlan_ranges):
-    """Synchronize vlan_allocations table with configured VLAN ranges."""
+    """Synchronize vlan ranges tables with configured VLAN ranges.
+
+    The ranges of free vlans are the configured ones, less the allocated
+    vlans, so this does not depend on the size of the ranges.
+    """
 
     session = db.get_session()
     with session.begin():
-        # get existing allocations for all physical networks
-        allocations = dict()
+        allocated = dict()
         allocs = (session.query(ovs_models_v2.VlanAllocation).
-                  all())
+                  filter_by(allocated=True))
         for alloc in allocs:
-            if alloc.physical_network not in allocations:
-                allocations[alloc.physical_network] = set()
-            allocations[alloc.physical_network].add(alloc)
+            allocated.setdefault(alloc.physical_network, set()).add(
+                alloc.vlan_id)
 
-        # process vlan ranges for each configured physical network
+        session.query(ovs_models_v2.VlanRange).delete()
         for physical_network, vlan_ranges in network_vlan_ranges.iteritems():
-            # determine current configured allocatable vlans for this
-            # physical network
-            vlan_ids = set()
-            for vlan_range in vlan_ranges:
-                vlan_ids |= set(xrange(vlan_range[0], vlan_range[1] + 1))
-
-            # remove from table unallocated vlans not currently allocatable
-            if physical_network in allocations:
-                for alloc in allocations[physical_network]:
-                    try:
-                        # see if vlan is allocatable
-                        vlan_ids.remove(alloc.vlan_id)
-                    except KeyError:
-                        # it's not allocatable, so check if its allocated
-                        if not alloc.allocated:
-                            # it's not, so remove it from table
-                            LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                        "physical network "
-                                        "%(physical_network)s from pool"),
-                                      {'vlan_id': alloc.vlan_id,
-                                       'physical_network': physical_network})
-                            session.delete(alloc)
-                del allocations[physical_network]
-
-            # add missing allocatable vlans to table
-            for vlan_id in sorted(vlan_ids):
-                alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
-                session.add(alloc)
-
-        # remove from table unallocated vlans for any unconfigured physical
-        # networks
-        for allocs in allocations.itervalues():
-            for alloc in allocs:
-                if not alloc.allocated:
-                    LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s from pool"),
-                              {'vlan_id': alloc.vlan_id,
-                               'physical_network': alloc.physical_network})
-                    session.delete(alloc)
+            LOG.debug(_("Setting vlan ranges %(vlan_ranges)s on physical "
+                        "network %(physical_network)s"),
+                      {'vlan_ranges': vlan_ranges,
+                       'physical_network': physical_network})
+            segment_ranges.add_pool(session, ovs_models_v2.VlanRange,
+                                    vlan_ranges,
+                                    allocated.get(physical_network, ()),
+                                    physical_network=physical_network)
 
 
 def get_vlan_allocation(physical_network, vlan_id):
@@ -122,53 +105,60 @@ def get_vlan_allocation(physical_network, vlan_id):
                  one())
         return alloc
     except exc.NoResultFound:
-        return
+        # Free vlans have no allocation row
+        if segment_ranges.is_free(session, ovs_models_v2.VlanRange, vlan_id,
+                                  physical_network=physical_network):
+            return ovs_models_v2.VlanAllocation(physical_network, vlan_id)
+
+
+def _add_vlan_allocation(session, physical_network, vlan_id):
+    alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
+    alloc.allocated = True
+    session.add(alloc)
 
 
 def reserve_vlan(session):
     with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.VlanAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if alloc:
+        taken = segment_ranges.allocate(session, ovs_models_v2.VlanRange)
+        if taken:
+            vlan_range, vlan_id = taken
             LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
                         "%(physical_network)s from pool"),
-                      {'vlan_id': alloc.vlan_id,
-                       'physical_network': alloc.physical_network})
-            alloc.allocated = True
-            return (alloc.physical_network, alloc.vlan_id)
+                      {'vlan_id': vlan_id,
+                       'physical_network': vlan_range.physical_network})
+            _add_vlan_allocation(session, vlan_range.physical_network,
+                                 vlan_id)
+            return (vlan_range.physical_network, vlan_id)
     raise q_exc.NoNetworkAvailable()
 
 
 def reserve_specific_vlan(session, physical_network, vlan_id):
     with session.begin(subtransactions=True):
-        try:
+        if segment_ranges.allocate_specific(
+                session, ovs_models_v2.VlanRange, vlan_id,
+                physical_network=physical_network):
+            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
+                        "network %(physical_network)s from pool"),
+                      {'vlan_id': vlan_id,
+                       'physical_network': physical_network})
+        else:
             alloc = (session.query(ovs_models_v2.VlanAllocation).
                      filter_by(physical_network=physical_network,
                                vlan_id=vlan_id).
                      with_lockmode('update').
-                     one())
-            if alloc.allocated:
+                     first())
+            if alloc:
                 if vlan_id == constants.FLAT_VLAN_ID:
                     raise q_exc.FlatNetworkInUse(
                         physical_network=physical_network)
                 else:
                     raise q_exc.VlanIdInUse(vlan_id=vlan_id,
                                             physical_network=physical_network)
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s from pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            alloc.allocated = True
-        except exc.NoResultFound:
             LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
                         "network %(physical_network)s outside pool"),
                       {'vlan_id': vlan_id,
                        'physical_network': physical_network})
-            alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
-            alloc.allocated = True
-            session.add(alloc)
+        _add_vlan_allocation(session, physical_network, vlan_id)
 
 
 def release_vlan(session, physical_network, vlan_id, network_vlan_ranges):
@@ -179,19 +169,21 @@ def release_vlan(session, physical_network, vlan_id, network_vlan_ranges):
                                vlan_id=vlan_id).
                      with_lockmode('update').
                      one())
-            alloc.allocated = False
+            session.delete(alloc)
             inside = False
             for vlan_range in network_vlan_ranges.get(physical_network, []):
                 if vlan_id >= vlan_range[0] and vlan_id <= vlan_range[1]:
                     inside = True
                     break
             if not inside:
-                session.delete(alloc)
                 LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
                             "%(physical_network)s outside pool"),
                           {'vlan_id': vlan_id,
                            'physical_network': physical_network})
             else:
+                segment_ranges.release(session, ovs_models_v2.VlanRange,
+                                       vlan_id,
+                                       physical_network=physical_network)
                 LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
                             "%(physical_network)s to pool"),
                           {'vlan_id': vlan_id,
@@ -204,40 +196,17 @@ def release_vlan(session, physical_network, vlan_id, network_vlan_ranges):
 
 
 def sync_tunnel_allocations(tunnel_id_ranges):
-    """Synchronize tunnel_allocations table with configured tunnel ranges."""
-
-    # determine current configured allocatable tunnels
-    tunnel_ids = set()
-    for tunnel_id_range in tunnel_id_ranges:
-        tun_min, tun_max = tunnel_id_range
-        if tun_max + 1 - tun_min > 1000000:
-            LOG.error(_("Skipping unreasonable tunnel ID range "
-                        "%(tun_min)s:%(tun_max)s"),
-                      {'tun_min': tun_min, 'tun_max': tun_max})
-        else:
-            tunnel_ids |= set(xrange(tun_min, tun_max + 1))
+    """Synchronize tunnel ranges table with configured tunnel ranges."""
 
     session = db.get_session()
     with session.begin():
-        # remove from table unallocated tunnels not currently allocatable
-        allocs = (session.query(ovs_models_v2.TunnelAllocation).
-                  all())
-        for alloc in allocs:
-            try:
-                # see if tunnel is allocatable
-                tunnel_ids.remove(alloc.tunnel_id)
-            except KeyError:
-                # it's not allocatable, so check if its allocated
-                if not alloc.allocated:
-                    # it's not, so remove it from table
-                    LOG.debug(_("Removing tunnel %s from pool"),
-                              alloc.tunnel_id)
-                    session.delete(alloc)
-
-        # add missing allocatable tunnels to table
-        for tunnel_id in sorted(tunnel_ids):
-            alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
-            session.add(alloc)
+        allocated = [tunnel_id for (tunnel_id,) in session.query(
+            ovs_models_v2.TunnelAllocation.tunnel_id).filter_by(
+                allocated=True)]
+        session.query(ovs_models_v2.TunnelRange).delete()
+        LOG.debug(_("Setting tunnel ranges %s"), tunnel_id_ranges)
+        segment_ranges.add_pool(session, ovs_models_v2.TunnelRange,
+                                tunnel_id_ranges, allocated)
 
 
 def get_tunnel_allocation(tunnel_id):
@@ -249,39 +218,44 @@ def get_tunnel_allocation(tunnel_id):
                  one())
         return alloc
     except exc.NoResultFound:
-        return
+        # Free tunnels have no allocation row
+        if segment_ranges.is_free(session, ovs_models_v2.TunnelRange,
+                                  tunnel_id):
+            return ovs_models_v2.TunnelAllocation(tunnel_id)
+
+
+def _add_tunnel_allocation(session, tunnel_id):
+    alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
+    alloc.allocated = True
+    session.add(alloc)
 
 
 def reserve_tunnel(session):
     with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if alloc:
-            LOG.debug(_("Reserving tunnel %s from pool"), alloc.tunnel_id)
-            alloc.allocated = True
-            return alloc.tunnel_id
+        taken = segment_ranges.allocate(session, ovs_models_v2.TunnelRange)
+        if taken:
+            tunnel_id = taken[1]
+            LOG.debug(_("Reserving tunnel %s from pool"), tunnel_id)
+            _add_tunnel_allocation(session, tunnel_id)
+            return tunnel_id
     raise q_exc.NoNetworkAvailable()
 
 
 def reserve_specific_tunnel(session, tunnel_id):
     with session.begin(subtransactions=True):
-        try:
+        if segment_ranges.allocate_specific(
+                session, ovs_models_v2.TunnelRange, tunnel_id):
+            LOG.debug(_("Reserving specific tunnel %s from pool"), tunnel_id)
+        else:
             alloc = (session.query(ovs_models_v2.TunnelAllocation).
                      filter_by(tunnel_id=tunnel_id).
                      with_lockmode('update').
-                     one())
-            if alloc.allocated:
+                     first())
+            if alloc:
                 raise q_exc.TunnelIdInUse(tunnel_id=tunnel_id)
-            LOG.debug(_("Reserving specific tunnel %s from pool"), tunnel_id)
-            alloc.allocated = True
-        except exc.NoResultFound:
             LOG.debug(_("Reserving specific tunnel %s outside pool"),
                       tunnel_id)
-            alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
-            alloc.allocated = True
-            session.add(alloc)
+        _add_tunnel_allocation(session, tunnel_id)
 
 
 def release_tunnel(session, tunnel_id, tunnel_id_ranges):
@@ -291,7 +265,7 @@ def release_tunnel(session, tunnel_id, tunnel_id_ranges):
                      filter_by(tunnel_id=tunnel_id).
                      with_lockmode('update').
                      one())
-            alloc.allocated = False
+            session.delete(alloc)
             inside = False
             for tunnel_id_range in tunnel_id_ranges:
                 if (tunnel_id >= tunnel_id_range[0]
@@ -299,9 +273,10 @@ def release_tunnel(session, tunnel_id, tunnel_id_ranges):
                     inside = True
                     break
             if not inside:
-                session.delete(alloc)
                 LOG.debug(_("Releasing tunnel %s outside pool"), tunnel_id)
             else:
+                segment_ranges.release(session, ovs_models_v2.TunnelRange,
+                                       tunnel_id)
                 LOG.debug(_("Releasing tunnel %s to pool"), tunnel_id)
         except exc.NoResultFound:
             LOG.warning(_("tunnel_id %s not found"), tunnel_id)
@@ -316,6 +291,16 @@ def get_port(port_id):
     return port
 
 
+def get_ports(port_ids):
+    """Return a dict of port id to port for the given port ids."""
+    if not port_ids:
+        return {}
+    session = db.get_session()
+    ports = session.query(models_v2.Port).filter(
+        models_v2.Port.id.in_(port_ids))
+    return dict((port.id, port) for port in ports)
+
+
 def get_port_from_device(port_id):
     """Get port from database."""
     LOG.debug(_("get_port_with_securitygroups() called:port_id=%s"), port_id)
@@ -353,6 +338,17 @@ def set_port_status(port_id, status):
         raise q_exc.PortNotFound(port_id=port_id)
 
 
+def set_ports_status(port_ids, status):
+    """Set the status of several ports with a single update."""
+    if not port_ids:
+        return
+    session = db.get_session()
+    with session.begin():
+        (session.query(models_v2.Port).
+         filter(models_v2.Port.id.in_(port_ids)).
+         update({'status': status}, synchronize_session=False))
+
+
 def get_tunnel_endpoints():
     session = db.get_session()
 
@@ -23,7 +23,7 @@ from quantum.db.models_v2 import model_base
 
 
 class VlanAllocation(model_base.BASEV2):
-    """Represents allocation state of vlan_id on physical network."""
+    """Represents an allocated vlan_id on physical network."""
     __tablename__ = 'ovs_vlan_allocations'
 
     physical_network = Column(String(64), nullable=False, primary_key=True)
@@ -41,8 +41,22 @@ class VlanAllocation(model_base.BASEV2):
                                                self.vlan_id, self.allocated)
 
 
+class VlanRange(model_base.BASEV2):
+    """Represents a range of free vlan_ids on physical network."""
+    __tablename__ = 'ovs_vlan_ranges'
+
+    physical_network = Column(String(64), nullable=False, primary_key=True)
+    first_id = Column(Integer, nullable=False, primary_key=True,
+                      autoincrement=False)
+    last_id = Column(Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return "<VlanRange(%s,%d,%d)>" % (self.physical_network,
+                                          self.first_id, self.last_id)
+
+
 class TunnelAllocation(model_base.BASEV2):
-    """Represents allocation state of tunnel_id."""
+    """Represents an allocated tunnel_id."""
     __tablename__ = 'ovs_tunnel_allocations'
 
     tunnel_id = Column(Integer, nullable=False, primary_key=True,
@@ -57,6 +71,18 @@ class TunnelAllocation(model_base.BASEV2):
         return "<TunnelAllocation(%d,%s)>" % (self.tunnel_id, self.allocated)
 
 
+class TunnelRange(model_base.BASEV2):
+    """Represents a range of free tunnel_ids."""
+    __tablename__ = 'ovs_tunnel_ranges'
+
+    first_id = Column(Integer, nullable=False, primary_key=True,
+                      autoincrement=False)
+    last_id = Column(Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return "<TunnelRange(%d,%d)>" % (self.first_id, self.last_id)
+
+
 class NetworkBinding(model_base.BASEV2):
     """Represents binding of virtual network to physical realization."""
     __tablename__ = 'ovs_network_bindings'
@@ -63,8 +63,10 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
     # history
     #   1.0 Initial version
     #   1.1 Support Security Group RPC
+    #   1.2 Support get_devices_details_list and update_devices_down_list
+    #   1.3 Support security_group_info_for_devices
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.3'
 
     def __init__(self, notifier):
         self.notifier = notifier
@@ -94,13 +96,7 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         port = ovs_db_v2.get_port(device)
         if port:
             binding = ovs_db_v2.get_network_binding(None, port['network_id'])
-            entry = {'device': device,
-                     'network_id': port['network_id'],
-                     'port_id': port['id'],
-                     'admin_state_up': port['admin_state_up'],
-                     'network_type': binding.network_type,
-                     'segmentation_id': binding.segmentation_id,
-                     'physical_network': binding.physical_network}
+            entry = self._make_device_details(device, port, binding)
             new_status = (q_const.PORT_STATUS_ACTIVE if port['admin_state_up']
                           else q_const.PORT_STATUS_DOWN)
             if port['status'] != new_status:
@@ -110,6 +106,45 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def _make_device_details(self, device, port, binding):
+        return {'device': device,
+                'network_id': port['network_id'],
+                'port_id': port['id'],
+                'admin_state_up': port['admin_state_up'],
+                'network_type': binding.network_type,
+                'segmentation_id': binding.segmentation_id,
+                'physical_network': binding.physical_network}
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices at once."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Details of %(count)d devices requested from "
+                    "%(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = ovs_db_v2.get_ports(devices)
+        bindings = ovs_db_v2.get_network_bindings(
+            None, set(port['network_id'] for port in ports.itervalues()))
+        entries = []
+        new_statuses = {q_const.PORT_STATUS_ACTIVE: [],
+                        q_const.PORT_STATUS_DOWN: []}
+        for device in devices:
+            port = ports.get(device)
+            if port:
+                entries.append(self._make_device_details(
+                    device, port, bindings[port['network_id']]))
+                new_status = (q_const.PORT_STATUS_ACTIVE
+                              if port['admin_state_up']
+                              else q_const.PORT_STATUS_DOWN)
+                if port['status'] != new_status:
+                    new_statuses[new_status].append(port['id'])
+            else:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+        for status, port_ids in new_statuses.iteritems():
+            ovs_db_v2.set_ports_status(port_ids, status)
+        return entries
+
     def update_device_down(self, rpc_context, **kwargs):
         """Device no longer exists on agent."""
         # TODO(garyk) - live migration and port status
@@ -130,6 +165,25 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def update_devices_down_list(self, rpc_context, **kwargs):
+        """Several devices no longer exist on agent."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("%(count)d devices no longer exist on %(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = ovs_db_v2.get_ports(devices)
+        entries = []
+        for device in devices:
+            entries.append({'device': device,
+                            'exists': device in ports})
+            if device not in ports:
+                LOG.debug(_("%s can not be found in database"), device)
+        ovs_db_v2.set_ports_status(
+            [port['id'] for port in ports.itervalues()
+             if port['status'] != q_const.PORT_STATUS_DOWN],
+            q_const.PORT_STATUS_DOWN)
+        return entries
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent."""
         agent_id = kwargs.get('agent_id')
@@ -235,16 +289,20 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     """
 
     # This attribute specifies whether the plugin supports or not
-    # bulk/pagination/sorting operations. Name mangling is used in
-    # order to ensure it is qualified by class
+    # bulk/pagination/sorting/streaming operations. Name mangling is used
+    # in order to ensure it is qualified by class
     __native_bulk_support = True
     __native_pagination_support = True
     __native_sorting_support = True
+    __native_streaming_support = True
 
     _supported_extension_aliases = ["provider", "router",
                                     "binding", "quotas", "security-group",
                                     "agent", "extraroute", "agent_scheduler"]
 
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_extend_networks_dict_provider'])
+
     @property
     def supported_extension_aliases(self):
         if not hasattr(self, '_aliases'):
@@ -289,16 +347,22 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def setup_rpc(self):
         # RPC support
         self.topic = topics.PLUGIN
-        self.conn = rpc.create_connection(new=True)
         self.notifier = AgentNotifierApi(topics.AGENT)
         self.dhcp_agent_notifier = dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
         self.l3_agent_notifier = l3_rpc_agent_api.L3AgentNotify
         self.callbacks = OVSRpcCallbacks(self.notifier)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
-        self.conn.create_consumer(self.topic, self.dispatcher,
+
+    def start_rpc_listener(self):
+        """Consume the plugin topic in this process."""
+        self.conn = rpc.create_connection(new=True)
+        self.conn.create_consumer(self.topic,
+                                  q_rpc.StatsDispatcher(self.topic,
+                                                        self.dispatcher),
                                   fanout=False)
         # Consume from all consumers in a thread
         self.conn.consume_in_thread()
+        return self.conn
 
     def _parse_network_vlan_ranges(self):
         try:
@@ -323,21 +387,26 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         LOG.info(_("Tunnel ID ranges: %s"), self.tunnel_id_ranges)
 
     def _extend_network_dict_provider(self, context, network):
-        binding = ovs_db_v2.get_network_binding(context.session,
-                                                network['id'])
-        network[provider.NETWORK_TYPE] = binding.network_type
-        if binding.network_type == constants.TYPE_GRE:
-            network[provider.PHYSICAL_NETWORK] = None
-            network[provider.SEGMENTATION_ID] = binding.segmentation_id
-        elif binding.network_type == constants.TYPE_FLAT:
-            network[provider.PHYSICAL_NETWORK] = binding.physical_network
-            network[provider.SEGMENTATION_ID] = None
-        elif binding.network_type == constants.TYPE_VLAN:
-            network[provider.PHYSICAL_NETWORK] = binding.physical_network
-            network[provider.SEGMENTATION_ID] = binding.segmentation_id
-        elif binding.network_type == constants.TYPE_LOCAL:
-            network[provider.PHYSICAL_NETWORK] = None
-            network[provider.SEGMENTATION_ID] = None
+        self._extend_networks_dict_provider(context, [network])
+
+    def _extend_networks_dict_provider(self, context, networks):
+        bindings = ovs_db_v2.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            binding = bindings[network['id']]
+            network[provider.NETWORK_TYPE] = binding.network_type
+            if binding.network_type == constants.TYPE_GRE:
+                network[provider.PHYSICAL_NETWORK] = None
+                network[provider.SEGMENTATION_ID] = binding.segmentation_id
+            elif binding.network_type == constants.TYPE_FLAT:
+                network[provider.PHYSICAL_NETWORK] = binding.physical_network
+                network[provider.SEGMENTATION_ID] = None
+            elif binding.network_type == constants.TYPE_VLAN:
+                network[provider.PHYSICAL_NETWORK] = binding.physical_network
+                network[provider.SEGMENTATION_ID] = binding.segmentation_id
+            elif binding.network_type == constants.TYPE_LOCAL:
+                network[provider.PHYSICAL_NETWORK] = None
+                network[provider.SEGMENTATION_ID] = None
 
     def _process_provider_create(self, context, attrs):
         network_type = attrs.get(provider.NETWORK_TYPE)
@@ -501,43 +570,30 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # the network record, so explicit removal is not necessary
         self.notifier.network_delete(context, id)
 
-    def get_network(self, context, id, fields=None):
-        session = context.session
-        with session.begin(subtransactions=True):
-            net = super(OVSQuantumPluginV2, self).get_network(context,
-                                                              id, None)
-            self._extend_network_dict_provider(context, net)
-            self._extend_network_dict_l3(context, net)
-        return self._fields(net, fields)
+    def _prepare_port_create(self, context, port):
+        # Set port status as 'DOWN'. This will be updated by agent
+        port['port']['status'] = q_const.PORT_STATUS_DOWN
+        self._ensure_default_security_group_on_port(context, port)
 
-    def get_networks(self, context, filters=None, fields=None,
-                     sorts=None,
-                     limit=None, marker=None, page_reverse=False):
-        session = context.session
-        with session.begin(subtransactions=True):
-            nets = super(OVSQuantumPluginV2,
-                         self).get_networks(context, filters, None, sorts,
-                                            limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
+    def _extend_port_create(self, context, port, port_dict):
+        sgids = self._get_security_groups_on_port(context, port)
+        self._process_portbindings_create_and_update(context, port['port'],
+                                                     port_dict)
+        self._process_port_create_security_group(context, port_dict, sgids)
+        return port_dict
 
-        return [self._fields(net, fields) for net in nets]
+    def _notify_port_create(self, context, port_dict):
+        self.notify_security_groups_member_updated(context, port_dict)
 
     def create_port(self, context, port):
-        # Set port status as 'DOWN'. This will be updated by agent
-        port['port']['status'] = q_const.PORT_STATUS_DOWN
-        port_data = port['port']
         session = context.session
         with session.begin(subtransactions=True):
-            self._ensure_default_security_group_on_port(context, port)
-            sgids = self._get_security_groups_on_port(context, port)
-            port = super(OVSQuantumPluginV2, self).create_port(context, port)
-            self._process_portbindings_create_and_update(context,
-                                                         port_data, port)
-            self._process_port_create_security_group(context, port, sgids)
-        self.notify_security_groups_member_updated(context, port)
-        return port
+            self._prepare_port_create(context, port)
+            port_dict = super(OVSQuantumPluginV2, self).create_port(context,
+                                                                    port)
+            port_dict = self._extend_port_create(context, port, port_dict)
+        self._notify_port_create(context, port_dict)
+        return port_dict
 
     def update_port(self, context, id, port):
         session = context.session
@@ -182,19 +182,6 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self.tunnel_key.delete(session, id)
             super(RyuQuantumPluginV2, self).delete_network(context, id)
 
-    def get_network(self, context, id, fields=None):
-        net = super(RyuQuantumPluginV2, self).get_network(context, id, None)
-        self._extend_network_dict_l3(context, net)
-        return self._fields(net, fields)
-
-    def get_networks(self, context, filters=None, fields=None):
-        nets = super(RyuQuantumPluginV2, self).get_networks(context, filters,
-                                                            None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
-
-        return [self._fields(net, fields) for net in nets]
-
     def create_port(self, context, port):
         session = context.session
         with session.begin(subtransactions=True):
@@ -19,6 +19,7 @@
 Policy engine for quantum.  Largely copied from nova.
 """
 import itertools
+import re
 
 from oslo.config import cfg
 
@@ -32,6 +33,13 @@ from quantum.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# {(action, roles): rule compiled for roles}, valid for _COMPILED_RULES_OF
+_COMPILED_RULES = {}
+_COMPILED_RULES_OF = None
+# Number of targets whose parent resources are fetched at once by check_list
+LIST_CHECK_CHUNK_SIZE = 500
+_TARGET_KEY_RE = re.compile(r'%\((\w+)\)s')
+_TARGET_VALUE_RE = re.compile(r'^%\(([\w:]+)\)s$')
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -58,6 +66,7 @@ def reset():
     global _POLICY_CACHE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _COMPILED_RULES.clear()
     policy.reset()
 
 
@@ -123,6 +132,191 @@ def _is_attribute_explicitly_set(attribute_name, resource, target):
             target[attribute_name] != resource[attribute_name]['default'])
 
 
+class _InlinedRuleCheck(policy.BaseCheck):
+    """A rule inlined by _compile_check in place of its rule: check.
+
+    Fails closed when the target lacks an attribute the rule refers to,
+    as RuleCheck does, so that the other branches of the rule including
+    it are still evaluated.
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+
+    def __str__(self):
+        return str(self.rule)
+
+    def __call__(self, target, cred):
+        try:
+            return self.rule(target, cred)
+        except KeyError:
+            return False
+
+
+def _compile_check(rule, roles):
+    """Evaluate the parts of rule which only depend on the roles.
+
+    :returns: True or False if the roles are enough to decide, otherwise
+              a check equivalent to rule for these roles.
+    """
+    if isinstance(rule, policy.TrueCheck):
+        return True
+    elif isinstance(rule, policy.FalseCheck):
+        return False
+    elif isinstance(rule, policy.RoleCheck):
+        return rule.match.lower() in roles
+    elif isinstance(rule, policy.RuleCheck):
+        try:
+            sub_rule = _compile_check(policy._rules[rule.match], roles)
+        except KeyError:
+            # We don't have any matching rule; fail closed
+            return False
+        if isinstance(sub_rule, (bool, _InlinedRuleCheck)):
+            return sub_rule
+        return _InlinedRuleCheck(sub_rule)
+    elif isinstance(rule, policy.NotCheck):
+        sub_rule = _compile_check(rule.rule, roles)
+        if isinstance(sub_rule, bool):
+            return not sub_rule
+        return policy.NotCheck(sub_rule)
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        # A False operand decides an 'and', a True one decides an 'or',
+        # and the other constant can be dropped
+        decisive = isinstance(rule, policy.OrCheck)
+        sub_rules = []
+        for sub_rule in rule.rules:
+            sub_rule = _compile_check(sub_rule, roles)
+            if isinstance(sub_rule, bool):
+                if sub_rule == decisive:
+                    return decisive
+                continue
+            sub_rules.append(sub_rule)
+        if not sub_rules:
+            return not decisive
+        elif len(sub_rules) == 1:
+            return sub_rules[0]
+        return rule.__class__(sub_rules)
+    # Checks on the target, or on other credentials than the roles
+    return rule
+
+
+def _get_compiled_rule(action, credentials):
+    """Return the rule of a read action compiled for the credentials."""
+    global _COMPILED_RULES_OF
+    if _COMPILED_RULES_OF is not policy._rules:
+        # The rules were reloaded
+        _COMPILED_RULES.clear()
+        _COMPILED_RULES_OF = policy._rules
+    roles = frozenset(role.lower() for role in credentials['roles'])
+    key = (action, roles)
+    compiled = _COMPILED_RULES.get(key)
+    if compiled is None:
+        if not policy._rules:
+            # No rules to reference means we're going to fail closed
+            compiled = False
+        else:
+            compiled = _compile_check(policy.RuleCheck('rule', action),
+                                      roles)
+        _COMPILED_RULES[key] = compiled
+    return compiled
+
+
+def _evaluate(compiled, target, credentials):
+    if isinstance(compiled, bool):
+        return compiled
+    return compiled(target, credentials)
+
+
+def _get_target_keys(rule):
+    """Return the target attributes used by a compiled rule.
+
+    :returns: a set of attribute names, or None if it cannot be told.
+    """
+    if isinstance(rule, bool):
+        return set()
+    elif isinstance(rule, (policy.NotCheck, _InlinedRuleCheck)):
+        return _get_target_keys(rule.rule)
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        keys = set()
+        for sub_rule in rule.rules:
+            sub_keys = _get_target_keys(sub_rule)
+            if sub_keys is None:
+                return None
+            keys |= sub_keys
+        return keys
+    elif isinstance(rule, FieldCheck):
+        return set([rule.field])
+    elif isinstance(rule, policy.GenericCheck):
+        return set(_TARGET_KEY_RE.findall(rule.match))
+    return None
+
+
+def _rule_to_filters(rule, credentials):
+    """Express a compiled rule as list filters, if it is simple enough.
+
+    :returns: a dict of filters, as taken by the get_<collection> plugin
+              calls, or None if the rule cannot be expressed as filters.
+    """
+    if rule is True:
+        return {}
+    elif isinstance(rule, _InlinedRuleCheck):
+        # A missing attribute fails the check as it fails the filter
+        return _rule_to_filters(rule.rule, credentials)
+    elif isinstance(rule, policy.AndCheck):
+        filters = {}
+        for sub_rule in rule.rules:
+            sub_filters = _rule_to_filters(sub_rule, credentials)
+            if sub_filters is None:
+                return None
+            for key, values in sub_filters.iteritems():
+                if key in filters:
+                    values = [value for value in filters[key]
+                              if value in values]
+                filters[key] = values
+        return filters
+    elif isinstance(rule, FieldCheck):
+        return {rule.field: [rule.value]}
+    elif isinstance(rule, policy.GenericCheck):
+        match = _TARGET_VALUE_RE.match(rule.match)
+        if match and rule.kind in credentials:
+            return {match.group(1): [credentials[rule.kind]]}
+    return None
+
+
+def get_filters(context, action):
+    """Return the list filters equivalent to a read action, if any.
+
+    Rules which, for the roles of the context, only require attributes to
+    be equal to credentials or fixed values (e.g. 'tenant_id:%(tenant_id)s'
+    for a non admin) can be applied by the plugin query instead of being
+    checked on each object it returns.
+
+    :returns: a dict of filters, or None if the rule cannot be expressed
+              as filters.
+    """
+    init()
+    credentials = context.to_dict()
+    return _rule_to_filters(_get_compiled_rule(action, credentials),
+                            credentials)
+
+
+def _get_parent_info(action, compiled, plugin):
+    """Return the parent resource and its id attribute if rule needs them.
+
+    :returns: a (parent collection, parent id attribute) tuple, or None.
+    """
+    resource, _a = get_resource_and_action(action)
+    hierarchy_info = attributes.RESOURCE_HIERARCHY_MAP.get(resource, None)
+    if not hierarchy_info or not plugin:
+        return None
+    parent_resource = hierarchy_info['parent'][:-1]
+    target_keys = _get_target_keys(compiled)
+    if (target_keys is not None and
+            '%s_tenant_id' % parent_resource not in target_keys):
+        return None
+    return hierarchy_info['parent'], hierarchy_info['identified_by']
+
+
 def _build_target(action, original_target, plugin, context):
     """Augment dictionary of target attributes for policy engine.
 
@@ -236,7 +430,68 @@ def check(context, action, target, plugin=None):
 
     :return: Returns True if access is permitted else False.
     """
-    return policy.check(*(_prepare_check(context, action, target, plugin)))
+    resource, is_write = get_resource_and_action(action)
+    if is_write:
+        return policy.check(*(_prepare_check(context, action, target,
+                                             plugin)))
+    init()
+    if target is None:
+        target = {}
+    credentials = context.to_dict()
+    compiled = _get_compiled_rule(action, credentials)
+    if _get_parent_info(action, compiled, plugin):
+        target = _build_target(action, target, plugin, context)
+    return _evaluate(compiled, target, credentials)
+
+
+def check_list(context, action, targets, plugin=None):
+    """Yield the targets on which a read action is allowed in this context.
+
+    This is equivalent to filtering targets with check(), but the rule is
+    compiled once for the roles of the context, and the tenants of the
+    parent resources are only fetched if the rule needs them, with one
+    plugin call for each chunk of targets.
+    """
+    init()
+    credentials = context.to_dict()
+    compiled = _get_compiled_rule(action, credentials)
+    if compiled is True:
+        for target in targets:
+            yield target
+        return
+    elif compiled is False:
+        return
+    parent_info = _get_parent_info(action, compiled, plugin)
+    # {parent id: parent tenant id}
+    parent_tenants = {}
+    targets = iter(targets)
+    while True:
+        chunk = list(itertools.islice(targets, LIST_CHECK_CHUNK_SIZE))
+        if not chunk:
+            return
+        if parent_info:
+            parent_collection, parent_id = parent_info
+            parent_tenant_id = '%s_tenant_id' % parent_collection[:-1]
+            missing = set(target[parent_id] for target in chunk
+                          if target[parent_id] not in parent_tenants)
+            if missing:
+                # Note: we do not use admin context
+                f = getattr(plugin, 'get_%s' % parent_collection)
+                parents = f(context, filters={'id': list(missing)},
+                            fields=['id', 'tenant_id'])
+                parent_tenants.update((parent['id'], parent['tenant_id'])
+                                      for parent in parents)
+        for target in chunk:
+            real_target = target
+            if parent_info:
+                if target[parent_id] not in parent_tenants:
+                    # The parent is not visible in this context
+                    continue
+                real_target = target.copy()
+                real_target[parent_tenant_id] = (
+                    parent_tenants[target[parent_id]])
+            if _evaluate(compiled, real_target, credentials):
+                yield target
 
 
 def check_if_exists(context, action, target):
@@ -252,7 +507,7 @@ def check_if_exists(context, action, target):
     # Raise if there's no match for requested action in the policy engine
     if not policy._rules or action not in policy._rules:
         raise exceptions.PolicyRuleNotFound(rule=action)
-    return policy.check(*(_prepare_check(context, action, target)))
+    return check(context, action, target)
 
 
 def enforce(context, action, target, plugin=None):
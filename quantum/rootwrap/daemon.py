@@ -0,0 +1,192 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-running root wrapper serving commands over a Unix socket.
+
+   The filters are loaded once, and each command is matched and run as
+   quantum-rootwrap would, without starting sudo and a Python interpreter
+   per command. Requests and responses are one JSON object per line:
+
+     {"cmd": ["ip", "link"], "stdin": null}
+     {"returncode": 0, "stdout": "...", "stderr": ""}
+
+   A {"stats": true} request returns the latency histogram of the commands
+   run so far, per executable.
+"""
+
+import bisect
+import json
+import logging
+import os
+import shutil
+import signal
+import SocketServer
+import subprocess
+import tempfile
+import threading
+import time
+
+from quantum.rootwrap import wrapper
+
+
+# Same exit codes as quantum-rootwrap
+RC_UNAUTHORIZED = 99
+RC_NOEXECFOUND = 96
+
+SOCKET_NAME = 'rootwrap.sock'
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+class LatencyHistogram(object):
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_ms = 0.0
+
+    def add(self, elapsed_ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+
+    def to_dict(self):
+        labels = ['le_%d' % bound for bound in LATENCY_BUCKETS] + ['inf']
+        return {'count': sum(self.counts),
+                'total_ms': self.total_ms,
+                'buckets': dict(zip(labels, self.counts))}
+
+
+class RootwrapDaemon(object):
+
+    def __init__(self, config, filters):
+        self.config = config
+        self.filters = filters
+        # {executable name: LatencyHistogram}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def run_command(self, userargs, process_input=None):
+        """Run userargs if a filter allows it.
+
+        :returns: a (returncode, stdout, stderr) tuple.
+        """
+        try:
+            filtermatch = wrapper.match_filter(
+                self.filters, userargs, exec_dirs=self.config.exec_dirs)
+        except wrapper.FilterMatchNotExecutable as exc:
+            msg = ("Executable not found: %s (filter match = %s)"
+                   % (exc.match.exec_path, exc.match.name))
+            return self._error(msg, RC_NOEXECFOUND)
+        except wrapper.NoFilterMatched:
+            msg = ("Unauthorized command: %s (no filter matched)"
+                   % ' '.join(userargs))
+            return self._error(msg, RC_UNAUTHORIZED)
+
+        command = filtermatch.get_command(userargs,
+                                          exec_dirs=self.config.exec_dirs)
+        if self.config.use_syslog:
+            logging.info("Executing %s (filter match = %s)" % (
+                command, filtermatch.name))
+        start = time.time()
+        obj = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               preexec_fn=_subprocess_setup,
+                               close_fds=True,
+                               env=filtermatch.get_environment(userargs))
+        stdout, stderr = obj.communicate(process_input)
+        self._record(os.path.basename(command[0]),
+                     (time.time() - start) * 1000)
+        return obj.returncode, stdout, stderr
+
+    def get_stats(self):
+        with self._lock:
+            return dict((name, histogram.to_dict())
+                        for name, histogram in self.histograms.iteritems())
+
+    def _record(self, name, elapsed_ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(elapsed_ms)
+
+    def _error(self, msg, returncode):
+        if self.config.use_syslog:
+            logging.error(msg)
+        return returncode, '', msg
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        rootwrap = self.server.rootwrap
+        if request.get('stats'):
+            response = rootwrap.get_stats()
+        else:
+            # Output is passed as latin-1 to carry any byte through JSON
+            process_input = request.get('stdin')
+            if process_input is not None:
+                process_input = process_input.encode('latin-1')
+            returncode, stdout, stderr = rootwrap.run_command(
+                [arg.encode('utf-8') for arg in request['cmd']],
+                process_input)
+            response = {'returncode': returncode,
+                        'stdout': stdout.decode('latin-1'),
+                        'stderr': stderr.decode('latin-1')}
+        self.wfile.write(json.dumps(response) + '\n')
+
+
+class _UnixStreamServer(SocketServer.ThreadingMixIn,
+                        SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(config, filters, stdin, stdout):
+    """Serve commands until stdin is closed.
+
+    The socket is created in a new private directory, owned by the user
+    who ran sudo, and its path is written to stdout.
+    """
+    socket_dir = tempfile.mkdtemp(prefix='quantum-rootwrap-')
+    socket_path = os.path.join(socket_dir, SOCKET_NAME)
+    try:
+        server = _UnixStreamServer(socket_path, _RequestHandler)
+        server.rootwrap = RootwrapDaemon(config, filters)
+        os.chmod(socket_path, 0600)
+        uid = os.environ.get('SUDO_UID')
+        if uid:
+            os.chown(socket_dir, int(uid), -1)
+            os.chown(socket_path, int(uid), -1)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        stdout.write(socket_path + '\n')
+        stdout.flush()
+        # The client holds our stdin open for as long as it needs us
+        stdin.read()
+        server.shutdown()
+        server.server_close()
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Placement helpers shared by the DHCP and L3 agent schedulers."""
+
+import bisect
+import hashlib
+
+# Points of each agent on the hash ring; more points spread the resources
+# more evenly among the agents
+RING_REPLICAS = 64
+
+
+def _hash(key):
+    return int(hashlib.md5(key).hexdigest()[:8], 16)
+
+
+class HashRing(object):
+    """Consistent hash ring of agent ids.
+
+    A resource is placed on the first agent found clockwise from its hash.
+    When an agent joins or leaves the ring, only the resources on the arcs
+    it gains or loses change agent, about 1/N of them.
+    """
+
+    def __init__(self, agent_ids, replicas=RING_REPLICAS):
+        self._ring = sorted((_hash('%s-%d' % (agent_id, i)), agent_id)
+                            for agent_id in agent_ids
+                            for i in xrange(replicas))
+        self._keys = [key for key, agent_id in self._ring]
+
+    def get_agent(self, resource_id, eligible=None):
+        """Return the agent of a resource, among eligible ones if given."""
+        if not self._ring:
+            return
+        start = bisect.bisect(self._keys, _hash(resource_id))
+        for i in xrange(len(self._ring)):
+            agent_id = self._ring[(start + i) % len(self._ring)][1]
+            if eligible is None or agent_id in eligible:
+                return agent_id
+
+
+def level_loads(placement, agent_ids, is_candidate):
+    """Compute the moves evening out the resources among agents.
+
+    :param placement: {resource id: agent id} of the hosted resources.
+    :param agent_ids: the agents which may host resources. Resources
+                      placed on other agents are moved to them.
+    :param is_candidate: function telling whether a resource id may be
+                         hosted by an agent id.
+    :returns: {resource id: new agent id}
+    """
+    if not agent_ids:
+        return {}
+    limit = -(-len(placement) // len(agent_ids))
+    loads = dict((agent_id, 0) for agent_id in agent_ids)
+    by_agent = {}
+    for resource_id, agent_id in placement.iteritems():
+        by_agent.setdefault(agent_id, []).append(resource_id)
+        if agent_id in loads:
+            loads[agent_id] += 1
+
+    moves = {}
+    for agent_id, resource_ids in sorted(by_agent.iteritems()):
+        if agent_id in loads:
+            excess = len(resource_ids) - limit
+        else:
+            excess = len(resource_ids)
+        for resource_id in sorted(resource_ids):
+            if excess <= 0:
+                break
+            targets = [target for target in agent_ids
+                       if loads[target] < limit and target != agent_id and
+                       is_candidate(resource_id, target)]
+            if not targets:
+                continue
+            target = min(targets, key=lambda target: loads[target])
+            moves[resource_id] = target
+            loads[target] += 1
+            if agent_id in loads:
+                loads[agent_id] -= 1
+            excess -= 1
+    return moves
+
+
+def hash_moves(placement, agent_ids, is_candidate):
+    """Compute the moves placing the resources as a HashRing would.
+
+    Takes the same arguments and returns the same moves as level_loads.
+    """
+    ring = HashRing(agent_ids)
+    moves = {}
+    for resource_id, agent_id in placement.iteritems():
+        target = ring.get_agent(
+            resource_id,
+            set(target for target in agent_ids
+                if is_candidate(resource_id, target)))
+        if target and target != agent_id:
+            moves[resource_id] = target
+    return moves
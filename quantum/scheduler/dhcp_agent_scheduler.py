@@ -17,7 +17,9 @@
 
 import random
 
+from sqlalchemy import func
 from sqlalchemy.orm import exc
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import exists
 
 from quantum.common import constants
@@ -25,10 +27,14 @@ from quantum.db import agents_db
 from quantum.db import agentschedulers_db
 from quantum.db import models_v2
 from quantum.openstack.common import log as logging
+from quantum.scheduler import balancing
 
 
 LOG = logging.getLogger(__name__)
 
+# Number of bindings moved by one UPDATE statement
+REBALANCE_CHUNK_SIZE = 500
+
 
 class ChanceScheduler(object):
     """Allocate a DHCP agent for a network in a random way.
@@ -59,11 +65,14 @@ class ChanceScheduler(object):
             active_dhcp_agents = [enabled_dhcp_agent for enabled_dhcp_agent in
                                   enabled_dhcp_agents if not
                                   agents_db.AgentDbMixin.is_agent_down(
-                                  enabled_dhcp_agent['heartbeat_timestamp'])]
+                                      enabled_dhcp_agent[
+                                          'heartbeat_timestamp'],
+                                      enabled_dhcp_agent['id'])]
             if not active_dhcp_agents:
                 LOG.warn(_('No active DHCP agents'))
                 return
-            chosen_agent = random.choice(active_dhcp_agents)
+            chosen_agent = self._choose_agent(plugin, context, network['id'],
+                                              active_dhcp_agents)
             binding = agentschedulers_db.NetworkDhcpAgentBinding()
             binding.dhcp_agent = chosen_agent
             binding.network_id = network['id']
@@ -91,7 +100,7 @@ class ChanceScheduler(object):
                          host)
                 return False
             if agents_db.AgentDbMixin.is_agent_down(
-                dhcp_agent.heartbeat_timestamp):
+                dhcp_agent.heartbeat_timestamp, dhcp_agent.id):
                 LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
             #TODO(gongysh) consider the disabled agent's network
             net_stmt = ~exists().where(
@@ -108,3 +117,96 @@ class ChanceScheduler(object):
                 binding.network_id = net_id[0]
                 context.session.add(binding)
         return True
+
+    def rebalance_networks(self, plugin, context):
+        """Move networks between the active DHCP agents to even them out.
+
+        Only the networks hosted by a single DHCP agent are moved, the
+        ones hosted by inactive agents included.
+
+        :returns: {network id: (old agent, new agent)}
+        """
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        with context.session.begin(subtransactions=True):
+            agents = self._get_active_agents(plugin, context)
+            agents_by_id = dict((agent.id, agent) for agent in agents)
+            query = context.session.query(binding)
+            query = query.options(joinedload('dhcp_agent'))
+            placement = {}
+            hosted_twice = set()
+            for network_binding in query:
+                if network_binding.network_id in placement:
+                    hosted_twice.add(network_binding.network_id)
+                placement[network_binding.network_id] = (
+                    network_binding.dhcp_agent)
+            for network_id in hosted_twice:
+                del placement[network_id]
+            moves = self._get_moves(
+                dict((network_id, agent.id)
+                     for network_id, agent in placement.iteritems()),
+                sorted(agents_by_id), lambda network_id, agent_id: True)
+            by_target = {}
+            for network_id, agent_id in moves.iteritems():
+                by_target.setdefault(agent_id, []).append(network_id)
+            for agent_id, network_ids in by_target.iteritems():
+                for i in xrange(0, len(network_ids), REBALANCE_CHUNK_SIZE):
+                    query = context.session.query(binding).filter(
+                        binding.network_id.in_(
+                            network_ids[i:i + REBALANCE_CHUNK_SIZE]))
+                    query.update({'dhcp_agent_id': agent_id},
+                                 synchronize_session=False)
+        LOG.debug(_('Rebalancing moved %d network(s) between DHCP agents'),
+                  len(moves))
+        return dict((network_id, (placement[network_id],
+                                  agents_by_id[agent_id]))
+                    for network_id, agent_id in moves.iteritems())
+
+    def _get_active_agents(self, plugin, context):
+        agents = plugin.get_agents_db(
+            context, filters={'agent_type': [constants.AGENT_TYPE_DHCP],
+                              'admin_state_up': [True]})
+        return [agent for agent in agents
+                if not agents_db.AgentDbMixin.is_agent_down(
+                    agent['heartbeat_timestamp'], agent['id'])]
+
+    def _choose_agent(self, plugin, context, network_id, agents):
+        return random.choice(agents)
+
+    def _get_moves(self, placement, agent_ids, is_candidate):
+        return balancing.level_loads(placement, agent_ids, is_candidate)
+
+
+class LeastLoadedScheduler(ChanceScheduler):
+    """Allocate the DHCP agent hosting the fewest networks.
+
+    Ties are broken by the number of ports the agents report.
+    """
+
+    def _choose_agent(self, plugin, context, network_id, agents):
+        binding = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(
+            binding.dhcp_agent_id, func.count(binding.network_id))
+        query = query.filter(
+            binding.dhcp_agent_id.in_([agent.id for agent in agents]))
+        loads = dict(query.group_by(binding.dhcp_agent_id))
+
+        def load(agent):
+            conf = plugin.get_configuration_dict(agent)
+            return loads.get(agent.id, 0), conf.get('ports', 0)
+        return min(agents, key=load)
+
+
+class ConsistentHashScheduler(ChanceScheduler):
+    """Allocate DHCP agents with a consistent hash of the network ids.
+
+    Adding or removing an agent moves only about 1/N of the networks
+    when they are rebalanced.
+    """
+
+    def _choose_agent(self, plugin, context, network_id, agents):
+        ring = balancing.HashRing([agent.id for agent in agents])
+        agent_id = ring.get_agent(network_id)
+        return [agent for agent in agents if agent.id == agent_id][0]
+
+    def _get_moves(self, placement, agent_ids, is_candidate):
+        return balancing.hash_moves(placement, agent_ids, is_candidate)
@@ -17,18 +17,25 @@
 
 import random
 
+from sqlalchemy import func
 from sqlalchemy.orm import exc
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import exists
 
 from quantum.common import constants
 from quantum.db import agents_db
 from quantum.db import agentschedulers_db
 from quantum.db import l3_db
+from quantum.db import models_v2
 from quantum.openstack.common import log as logging
+from quantum.scheduler import balancing
 
 
 LOG = logging.getLogger(__name__)
 
+# Number of bindings moved by one UPDATE statement
+REBALANCE_CHUNK_SIZE = 500
+
 
 class ChanceScheduler(object):
     """Allocate a L3 agent for a router in a random way.
@@ -57,7 +64,7 @@ class ChanceScheduler(object):
                           host)
                 return False
             if agents_db.AgentDbMixin.is_agent_down(
-                l3_agent.heartbeat_timestamp):
+                l3_agent.heartbeat_timestamp, l3_agent.id):
                 LOG.warn(_('L3 agent %s is not active'), l3_agent.id)
             # check if the specified router is hosted
             if router_id:
@@ -138,7 +145,8 @@ class ChanceScheduler(object):
                          sync_router['id'])
                 return
 
-            chosen_agent = random.choice(candidates)
+            chosen_agent = self._choose_agent(plugin, context,
+                                              sync_router['id'], candidates)
             binding = agentschedulers_db.RouterL3AgentBinding()
             binding.l3_agent = chosen_agent
             binding.router_id = sync_router['id']
@@ -148,3 +156,118 @@ class ChanceScheduler(object):
                       {'router_id': sync_router['id'],
                        'agent_id': chosen_agent['id']})
             return chosen_agent
+
+    def rebalance_routers(self, plugin, context):
+        """Move routers between the active L3 agents to even them out.
+
+        Only the routers hosted by a single L3 agent are moved, the ones
+        hosted by inactive agents included. Agents not using namespaces
+        host a configured router and are left alone.
+
+        :returns: {router id: (old agent, new agent)}
+        """
+        binding = agentschedulers_db.RouterL3AgentBinding
+        with context.session.begin(subtransactions=True):
+            configurations = {}
+
+            def uses_namespaces(agent):
+                if agent.id not in configurations:
+                    configurations[agent.id] = plugin.get_configuration_dict(
+                        agent)
+                return configurations[agent.id].get('use_namespaces', True)
+
+            agents = [agent for agent in
+                      plugin.get_l3_agents(context, active=True)
+                      if uses_namespaces(agent)]
+            agents_by_id = dict((agent.id, agent) for agent in agents)
+            query = context.session.query(binding)
+            query = query.options(joinedload('l3_agent'))
+            placement = {}
+            hosted_twice = set()
+            for router_binding in query:
+                if router_binding.router_id in placement:
+                    hosted_twice.add(router_binding.router_id)
+                placement[router_binding.router_id] = router_binding.l3_agent
+            for router_id, agent in placement.items():
+                if router_id in hosted_twice or not uses_namespaces(agent):
+                    del placement[router_id]
+
+            query = context.session.query(l3_db.Router.id,
+                                          models_v2.Port.network_id)
+            query = query.outerjoin(
+                models_v2.Port, l3_db.Router.gw_port_id == models_v2.Port.id)
+            gateway_networks = dict(query)
+            candidates = {}
+
+            def is_candidate(router_id, agent_id):
+                network_id = gateway_networks.get(router_id)
+                key = (network_id, agent_id)
+                if key not in candidates:
+                    router = {'id': router_id,
+                              'external_gateway_info':
+                              network_id and {'network_id': network_id}}
+                    candidates[key] = bool(plugin.get_l3_agent_candidates(
+                        router, [agents_by_id[agent_id]]))
+                return candidates[key]
+
+            moves = self._get_moves(
+                dict((router_id, agent.id)
+                     for router_id, agent in placement.iteritems()),
+                sorted(agents_by_id), is_candidate)
+            by_target = {}
+            for router_id, agent_id in moves.iteritems():
+                by_target.setdefault(agent_id, []).append(router_id)
+            for agent_id, router_ids in by_target.iteritems():
+                for i in xrange(0, len(router_ids), REBALANCE_CHUNK_SIZE):
+                    query = context.session.query(binding).filter(
+                        binding.router_id.in_(
+                            router_ids[i:i + REBALANCE_CHUNK_SIZE]))
+                    query.update({'l3_agent_id': agent_id},
+                                 synchronize_session=False)
+        LOG.debug(_('Rebalancing moved %d router(s) between L3 agents'),
+                  len(moves))
+        return dict((router_id, (placement[router_id],
+                                 agents_by_id[agent_id]))
+                    for router_id, agent_id in moves.iteritems())
+
+    def _choose_agent(self, plugin, context, router_id, agents):
+        return random.choice(agents)
+
+    def _get_moves(self, placement, agent_ids, is_candidate):
+        return balancing.level_loads(placement, agent_ids, is_candidate)
+
+
+class LeastLoadedScheduler(ChanceScheduler):
+    """Allocate the L3 agent hosting the fewest routers.
+
+    Ties are broken by the number of interfaces the agents report.
+    """
+
+    def _choose_agent(self, plugin, context, router_id, agents):
+        binding = agentschedulers_db.RouterL3AgentBinding
+        query = context.session.query(
+            binding.l3_agent_id, func.count(binding.router_id))
+        query = query.filter(
+            binding.l3_agent_id.in_([agent.id for agent in agents]))
+        loads = dict(query.group_by(binding.l3_agent_id))
+
+        def load(agent):
+            conf = plugin.get_configuration_dict(agent)
+            return loads.get(agent.id, 0), conf.get('interfaces', 0)
+        return min(agents, key=load)
+
+
+class ConsistentHashScheduler(ChanceScheduler):
+    """Allocate L3 agents with a consistent hash of the router ids.
+
+    Adding or removing an agent moves only about 1/N of the routers
+    when they are rebalanced.
+    """
+
+    def _choose_agent(self, plugin, context, router_id, agents):
+        ring = balancing.HashRing([agent.id for agent in agents])
+        agent_id = ring.get_agent(router_id)
+        return [agent for agent in agents if agent.id == agent_id][0]
+
+    def _get_moves(self, placement, agent_ids, is_candidate):
+        return balancing.hash_moves(placement, agent_ids, is_candidate)
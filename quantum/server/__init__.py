@@ -36,7 +36,14 @@ def main():
                    " the '--config-file' option!"))
     try:
         quantum_service = service.serve_wsgi(service.QuantumApiService)
-        quantum_service.wait()
+        # The RPC workers are supervised along with the API workers, if
+        # any, else by a launcher of their own while this process keeps
+        # serving the API
+        launcher = service.serve_rpc(quantum_service.launcher)
+        if launcher is not None:
+            launcher.wait()
+        else:
+            quantum_service.wait()
     except RuntimeError as e:
         sys.exit(_("ERROR: %s") % e)
 
@@ -20,10 +20,13 @@ import logging as std_logging
 import os
 import random
 
+from eventlet import event
 from oslo.config import cfg
 
 from quantum.common import config
+from quantum.common import rpc as q_rpc
 from quantum import context
+from quantum import manager
 from quantum.openstack.common import importutils
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import loopingcall
@@ -42,6 +45,20 @@ service_opts = [
                help=_('range of seconds to randomly delay when starting the'
                       ' periodic task scheduler to reduce stampeding.'
                       ' (Disable by setting to 0)')),
+    cfg.IntOpt('api_workers',
+               default=0,
+               help=_('Number of separate processes serving the API, '
+                      '0 to serve it from the main process')),
+    cfg.IntOpt('rpc_workers',
+               default=0,
+               help=_('Number of separate processes consuming the RPC '
+                      'topics of the plugin, 0 to consume them from the '
+                      'main process')),
+    cfg.IntOpt('rpc_stats_interval',
+               default=60,
+               help=_('Seconds between logging the queue depth and handler '
+                      'latencies of each RPC topic (Disable by setting to '
+                      '0)')),
 ]
 CONF = cfg.CONF
 CONF.register_opts(service_opts)
@@ -68,6 +85,10 @@ class WsgiService(object):
     def wait(self):
         self.wsgi_app.wait()
 
+    @property
+    def launcher(self):
+        return self.wsgi_app.launcher
+
 
 class QuantumApiService(WsgiService):
     """Class for quantum-api service."""
@@ -107,7 +128,8 @@ def _run_wsgi(app_name):
         LOG.error(_('No known API applications configured.'))
         return
     server = wsgi.Server("Quantum")
-    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host)
+    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host,
+                 workers=cfg.CONF.api_workers)
     # Dump all option values here after all options are parsed
     cfg.CONF.log_opt_values(LOG, std_logging.DEBUG)
     LOG.info(_("Quantum service started, listening on %(host)s:%(port)s"),
@@ -116,6 +138,72 @@ def _run_wsgi(app_name):
     return server
 
 
+class RpcWorker(object):
+    """Consume the RPC topics of the core plugin.
+
+    Run in the main process, or in the worker processes forked by a
+    WorkerLauncher.
+    """
+
+    def __init__(self, plugin):
+        self._plugin = plugin
+        self._conns = []
+        self._reporter = None
+        self._stopped = event.Event()
+
+    def start(self):
+        # A plugin delegating to others returns their connections
+        conns = self._plugin.start_rpc_listener()
+        if not isinstance(conns, list):
+            conns = [conns]
+        self._conns = conns
+        if cfg.CONF.rpc_stats_interval > 0:
+            self._reporter = loopingcall.FixedIntervalLoopingCall(
+                q_rpc.report_stats)
+            self._reporter.start(interval=cfg.CONF.rpc_stats_interval,
+                                 initial_delay=cfg.CONF.rpc_stats_interval)
+
+    def wait(self):
+        self._stopped.wait()
+
+    def stop(self):
+        if self._reporter:
+            self._reporter.stop()
+            self._reporter = None
+        for conn in self._conns:
+            conn.close()
+        self._conns = []
+        if not self._stopped.ready():
+            self._stopped.send()
+
+
+def serve_rpc(launcher=None):
+    """Consume the RPC topics of the core plugin.
+
+    With rpc_workers, they are consumed by as many processes forked by
+    launcher, or by a new WorkerLauncher, which is returned. Otherwise
+    they are consumed by this process and None is returned.
+    """
+    plugin = manager.QuantumManager.get_plugin()
+    if not hasattr(plugin, 'start_rpc_listener'):
+        # The plugin consumes its topics itself, from this process
+        if cfg.CONF.rpc_workers > 0:
+            LOG.warning(_("The %s plugin does not support rpc_workers, "
+                          "its RPC topics are consumed by the main "
+                          "process"), plugin.__class__.__name__)
+        return
+    rpc_worker = RpcWorker(plugin)
+    if cfg.CONF.rpc_workers < 1:
+        rpc_worker.start()
+        return
+    if launcher is None:
+        launcher = wsgi.WorkerLauncher()
+    launcher.launch_service(rpc_worker, workers=cfg.CONF.rpc_workers)
+    LOG.info(_("RPC topics consumed by %d worker processes"),
+             cfg.CONF.rpc_workers)
+    return launcher
+
+
 class Service(service.Service):
     """Service object for binaries running on hosts.
 
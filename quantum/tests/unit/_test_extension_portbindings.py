@@ -85,6 +85,19 @@ class PortBindingsTestCase(test_db_plugin.QuantumDbPluginV2TestCase):
             for non_admin_port in ports:
                 self._check_response_no_portbindings(non_admin_port)
 
+    def test_ports_bulk_vif_details(self):
+        plugin = QuantumManager.get_plugin()
+        with self.network() as net:
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True)
+            self.assertEqual(res.status_int, 201)
+            ctx = context.get_admin_context()
+            ports = plugin.get_ports(ctx)
+            self.assertEqual(len(ports), 2)
+            for port in ports:
+                self._check_response_portbindings(port)
+                self._delete('ports', port['id'])
+
 
 class PortBindingsHostTestCaseMixin(object):
     fmt = 'json'
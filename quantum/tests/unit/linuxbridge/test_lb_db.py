@@ -19,6 +19,7 @@ from testtools import matchers
 from quantum.common import exceptions as q_exc
 from quantum.db import api as db
 from quantum.plugins.linuxbridge.db import l2network_db_v2 as lb_db
+from quantum.plugins.linuxbridge.db import l2network_models_v2
 from quantum.tests import base
 from quantum.tests.unit import test_db_plugin as test_plugin
 
@@ -116,6 +117,11 @@ class NetworkStatesTest(base.BaseTestCase):
         for vlan_id in vlan_ids:
             lb_db.release_network(self.session, PHYS_NET, vlan_id, VLAN_RANGES)
 
+        ranges = self.session.query(l2network_models_v2.NetworkStateRange)
+        self.assertEqual([(PHYS_NET, VLAN_MIN, VLAN_MAX)],
+                         [(r.physical_network, r.first_id, r.last_id)
+                          for r in ranges])
+
     def test_specific_network_inside_pool(self):
         vlan_id = VLAN_MIN + 5
         self.assertFalse(lb_db.get_network_state(PHYS_NET,
@@ -13,7 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+import mock
+
+from quantum.common import constants as q_const
+from quantum.api.v2 import attributes
+from quantum import context
 from quantum.extensions import portbindings
+from quantum import manager
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
 from quantum.tests.unit import test_db_plugin as test_plugin
 from quantum.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -54,6 +62,12 @@ class TestLinuxBridgePortsV2(test_plugin.TestPortsV2,
             self.assertEqual(port['port']['status'], 'DOWN')
             self.assertEqual(self.port_create_status, 'DOWN')
 
+    def test_list_ports_streamed_by_plugin(self):
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet)) as ports:
+                self._test_list_resources_streamed('port', ports)
+
 
 class TestLinuxBridgePortBinding(LinuxBridgePluginV2TestCase,
                                  test_bindings.PortBindingsTestCase):
@@ -65,6 +79,35 @@ class TestLinuxBridgePortBinding(LinuxBridgePluginV2TestCase,
         test_sg_rpc.set_firewall_driver(self.FIREWALL_DRIVER)
         super(TestLinuxBridgePortBinding, self).setUp()
 
+    def test_create_ports_bulk_native_path(self):
+        plugin = manager.QuantumManager.get_plugin()
+        self.assertTrue(plugin._is_native_port_create())
+        with self.network() as net:
+            request = {'ports': [{'port': {
+                'network_id': net['network']['id'],
+                'tenant_id': self._tenant_id, 'name': 'test',
+                'admin_state_up': True, 'device_id': '',
+                'device_owner': '',
+                'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                'fixed_ips': attributes.ATTR_NOT_SPECIFIED}}] * 2}
+            ctx = context.get_admin_context()
+            with contextlib.nested(
+                mock.patch.object(plugin, '_create_prepared_port',
+                                  wraps=plugin._create_prepared_port),
+                mock.patch.object(plugin,
+                                  'notify_security_groups_member_updated')
+            ) as (create_prepared, notify):
+                ports = plugin.create_port_bulk(ctx, request)
+            self.assertEqual(create_prepared.call_count, 2)
+            self.assertEqual(notify.call_count, 2)
+            # The request is left alone
+            self.assertFalse('id' in request['ports'][0]['port'])
+            self.assertFalse('status' in request['ports'][0]['port'])
+            for port in ports:
+                self.assertEqual(port['status'], q_const.PORT_STATUS_DOWN)
+                self._check_response_portbindings(port)
+                self._delete('ports', port['id'])
+
 
 class TestLinuxBridgePortBindingNoSG(TestLinuxBridgePortBinding):
     HAS_PORT_FILTER = False
@@ -75,3 +118,47 @@ class TestOpenvswitchPortBindingHost(
     LinuxBridgePluginV2TestCase,
     test_bindings.PortBindingsHostTestCaseMixin):
     pass
+
+
+class TestLinuxBridgeRpcCallbacks(LinuxBridgePluginV2TestCase):
+
+    def _callbacks(self):
+        return manager.QuantumManager.get_plugin().callbacks
+
+    def _device(self, port):
+        return 'tap' + port['port']['id'][:11]
+
+    def test_get_devices_details_list(self):
+        ctx = context.get_admin_context()
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet),
+                self.port(subnet=subnet, admin_state_up=False)
+            ) as (port1, port2):
+                devices = [self._device(port1), self._device(port2),
+                           'tapdeadbeef-00']
+                entries = self._callbacks().get_devices_details_list(
+                    ctx, devices=devices, agent_id='fake_agent')
+                self.assertEqual([e['device'] for e in entries], devices)
+                self.assertEqual(entries[0]['port_id'], port1['port']['id'])
+                self.assertTrue(entries[0]['admin_state_up'])
+                self.assertEqual(entries[1]['port_id'], port2['port']['id'])
+                self.assertFalse(entries[1]['admin_state_up'])
+                self.assertNotIn('port_id', entries[2])
+                port = self._show('ports', port1['port']['id'])['port']
+                self.assertEqual(port['status'], q_const.PORT_STATUS_ACTIVE)
+
+    def test_update_devices_down_list(self):
+        ctx = context.get_admin_context()
+        with self.port() as port1:
+            devices = [self._device(port1), 'tapdeadbeef-00']
+            callbacks = self._callbacks()
+            callbacks.get_devices_details_list(ctx, devices=devices[:1],
+                                               agent_id='fake_agent')
+            entries = callbacks.update_devices_down_list(
+                ctx, devices=devices, agent_id='fake_agent')
+            self.assertEqual(entries, [{'device': devices[0], 'exists': True},
+                                       {'device': devices[1],
+                                        'exists': False}])
+            port = self._show('ports', port1['port']['id'])['port']
+            self.assertEqual(port['status'], q_const.PORT_STATUS_DOWN)
@@ -305,6 +305,17 @@ class MetaQuantumPluginV2Test(base.BaseTestCase):
 
         self.fail("No Error is not raised")
 
+    def test_start_rpc_listener(self):
+        fake1 = self.plugin.plugins['fake1']
+        fake2 = self.plugin.plugins['fake2']
+        fake1.start_rpc_listener = mock.Mock(return_value='conn1')
+        fake2.start_rpc_listener = mock.Mock(return_value='conn2')
+        conns = self.plugin.start_rpc_listener()
+        self.assertEqual(sorted(conns), ['conn1', 'conn2'])
+        # The l3 plugins of the same flavors are started once
+        fake1.start_rpc_listener.assert_called_once_with()
+        fake2.start_rpc_listener.assert_called_once_with()
+
     def tearDown(self):
         self.mox.UnsetStubs()
         self.stubs.UnsetAll()
@@ -394,12 +394,22 @@ class FakeClient:
                 parent_func = lambda x: True
 
             items = [_build_item(res_dict[res_uuid])
-                     for res_uuid in res_dict
+                     for res_uuid in sorted(res_dict)
                      if (parent_func(res_uuid) and
                          _tag_match(res_uuid) and
                          _attr_match(res_uuid))]
-            return json.dumps({'results': items,
-                               'result_count': len(items)})
+            response = {'result_count': len(items)}
+            # The page cursor is the index of the first item of the page
+            params = urlparse.parse_qs(query or '')
+            page_length = params.get('_page_length')
+            if page_length:
+                start = int(params.get('_page_cursor', [0])[0])
+                end = start + int(page_length[0])
+                if end < len(items):
+                    response['page_cursor'] = str(end)
+                items = items[start:end]
+            response['results'] = items
+            return json.dumps(response)
 
     def _show(self, resource_type, response_file,
               uuid1, uuid2=None, relations=None):
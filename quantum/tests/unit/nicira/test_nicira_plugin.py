@@ -28,9 +28,12 @@ from quantum.extensions import l3
 from quantum.extensions import providernet as pnet
 from quantum.extensions import securitygroup as secgrp
 from quantum import manager
+from quantum.openstack.common import timeutils
 import quantum.plugins.nicira as nvp_plugin
+from quantum.plugins.nicira.common import sync
 from quantum.plugins.nicira.extensions import nvp_networkgw
 from quantum.plugins.nicira.extensions import nvp_qos as ext_qos
+from quantum.plugins.nicira import nicira_db
 from quantum.plugins.nicira import nvplib
 from quantum.plugins.nicira import QuantumPlugin
 from quantum.tests.unit.nicira import fake_nvpapiclient
@@ -103,6 +106,14 @@ class TestNiciraV2HTTPResponse(test_plugin.TestV2HTTPResponse,
 
 class TestNiciraPortsV2(test_plugin.TestPortsV2, NiciraPluginV2TestCase):
 
+    def test_list_ports_streamed_by_plugin(self):
+        # emulated sorting needs the whole list
+        cfg.CONF.set_override('allow_sorting', False)
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet)) as ports:
+                self._test_list_resources_streamed('port', ports)
+
     def test_exhaust_ports_overlay_network(self):
         cfg.CONF.set_override('max_lp_per_overlay_ls', 1, group='NVP')
         with self.network(name='testnet',
@@ -149,6 +160,28 @@ class TestNiciraPortsV2(test_plugin.TestPortsV2, NiciraPluginV2TestCase):
                 self.assertEqual(res['port']['fixed_ips'],
                                  data['port']['fixed_ips'])
 
+    def test_create_ports_bulk_native_path(self):
+        plugin = manager.QuantumManager.get_plugin()
+        self.assertTrue(plugin._is_native_port_create())
+        with self.network() as net:
+            with contextlib.nested(
+                mock.patch.object(plugin, '_create_prepared_port',
+                                  wraps=plugin._create_prepared_port),
+                mock.patch.object(plugin, 'schedule_network')
+            ) as (create_prepared, schedule):
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True)
+            self.assertEqual(res.status_int, 201)
+            self.assertEqual(create_prepared.call_count, 2)
+            self.assertEqual(schedule.call_count, 2)
+            for port in self.deserialize(self.fmt, res)['ports']:
+                ls = nvplib.get_lswitches(plugin.cluster,
+                                          net['network']['id'])
+                self.assertTrue(nvplib.get_port_by_quantum_tag(
+                    plugin.cluster, ls[0]['uuid'], port['id']))
+                self._delete('ports', port['id'])
+
     def test_create_port_name_exceeds_40_chars(self):
         name = 'this_is_a_port_whose_name_is_longer_than_40_chars'
         with self.port(name=name) as port:
@@ -159,6 +192,13 @@ class TestNiciraPortsV2(test_plugin.TestPortsV2, NiciraPluginV2TestCase):
 class TestNiciraNetworksV2(test_plugin.TestNetworksV2,
                            NiciraPluginV2TestCase):
 
+    def test_list_networks_streamed_by_plugin(self):
+        # emulated sorting needs the whole list
+        cfg.CONF.set_override('allow_sorting', False)
+        with contextlib.nested(self.network(),
+                               self.network()) as networks:
+            self._test_list_resources_streamed('network', networks)
+
     def _test_create_bridge_network(self, vlan_id=None):
         net_type = vlan_id and 'vlan' or 'flat'
         name = 'bridge_net'
@@ -203,6 +243,25 @@ class TestNiciraNetworksV2(test_plugin.TestNetworksV2,
             self._test_list_resources('network', [net1, net2],
                                       query_params=query_params)
 
+    def test_list_networks_reads_bindings_once(self):
+        providernet_args = {pnet.NETWORK_TYPE: 'flat',
+                            pnet.PHYSICAL_NETWORK: 'tzuuid'}
+        with contextlib.nested(
+            self.network(name='net1'),
+            self.network(name='net2', providernet_args=providernet_args,
+                         arg_list=(pnet.NETWORK_TYPE,
+                                   pnet.PHYSICAL_NETWORK)),
+            mock.patch.object(nicira_db, 'get_network_bindings',
+                              wraps=nicira_db.get_network_bindings)
+        ) as (net1, net2, get_bindings):
+            req = self.new_list_request('networks')
+            res = self.deserialize('json', req.get_response(self.api))
+            self.assertEqual(1, get_bindings.call_count)
+            networks = dict((network['name'], network)
+                            for network in res['networks'])
+            self.assertNotIn(pnet.NETWORK_TYPE, networks['net1'])
+            self.assertEqual('flat', networks['net2'][pnet.NETWORK_TYPE])
+
     def test_delete_network_after_removing_subet(self):
         gateway_ip = '10.0.0.1'
         cidr = '10.0.0.0/24'
@@ -780,6 +839,9 @@ class TestNiciraQoSQueue(NiciraPluginV2TestCase):
 class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
                                 NiciraPluginV2TestCase):
 
+    def _synchronize(self):
+        manager.QuantumManager.get_plugin()._synchronizer.synchronize()
+
     def test_delete_network_not_in_nvp(self):
         res = self._create_network('json', 'net1', True)
         net1 = self.deserialize('json', res)
@@ -792,6 +854,7 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_network('json', 'net1', True)
         self.deserialize('json', res)
         self.fc._fake_lswitch_dict.clear()
+        self._synchronize()
         req = self.new_list_request('networks')
         nets = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(nets['networks'][0]['status'],
@@ -801,6 +864,7 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_network('json', 'net1', True)
         net = self.deserialize('json', res)
         self.fc._fake_lswitch_dict.clear()
+        cfg.CONF.set_override('max_status_staleness', 0, 'NVP_SYNC')
         req = self.new_show_request('networks', net['network']['id'])
         net = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(net['network']['status'],
@@ -822,6 +886,7 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_port('json', net1['network']['id'])
         self.deserialize('json', res)
         self.fc._fake_lswitch_lport_dict.clear()
+        self._synchronize()
         req = self.new_list_request('ports')
         nets = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(nets['ports'][0]['status'],
@@ -833,6 +898,7 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_port('json', net1['network']['id'])
         port = self.deserialize('json', res)
         self.fc._fake_lswitch_lport_dict.clear()
+        cfg.CONF.set_override('max_status_staleness', 0, 'NVP_SYNC')
         req = self.new_show_request('ports', port['port']['id'])
         net = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(net['port']['status'],
@@ -884,6 +950,7 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_router('json', 'tenant')
         self.deserialize('json', res)
         self.fc._fake_lrouter_dict.clear()
+        self._synchronize()
         req = self.new_list_request('routers')
         routers = self.deserialize('json', req.get_response(self.ext_api))
         self.assertEqual(routers['routers'][0]['status'],
@@ -893,11 +960,93 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_router('json', 'tenant')
         router = self.deserialize('json', res)
         self.fc._fake_lrouter_dict.clear()
+        cfg.CONF.set_override('max_status_staleness', 0, 'NVP_SYNC')
         req = self.new_show_request('routers', router['router']['id'])
         router = self.deserialize('json', req.get_response(self.ext_api))
         self.assertEqual(router['router']['status'],
                          constants.NET_STATUS_ERROR)
 
+    def test_show_network_reads_database(self):
+        res = self._create_network('json', 'net1', True)
+        net = self.deserialize('json', res)
+        self.fc._fake_lswitch_dict.clear()
+        req = self.new_show_request('networks', net['network']['id'])
+        net = self.deserialize('json', req.get_response(self.api))
+        self.assertEqual(net['network']['status'],
+                         constants.NET_STATUS_ACTIVE)
+
+    def test_show_network_status_field_reads_nvp(self):
+        res = self._create_network('json', 'net1', True)
+        net = self.deserialize('json', res)
+        self.fc._fake_lswitch_dict.clear()
+        plugin = manager.QuantumManager.get_plugin()
+        net = plugin.get_network(context.get_admin_context(),
+                                 net['network']['id'], fields=['status'])
+        self.assertEqual(net['status'], constants.NET_STATUS_ERROR)
+
+    def test_show_port_not_stale_reads_database(self):
+        cfg.CONF.set_override('max_status_staleness', 60, 'NVP_SYNC')
+        res = self._create_network('json', 'net1', True)
+        net1 = self.deserialize('json', res)
+        res = self._create_port('json', net1['network']['id'])
+        port = self.deserialize('json', res)
+        self._synchronize()
+        self.fc._fake_lswitch_lport_dict.clear()
+        req = self.new_show_request('ports', port['port']['id'])
+        port = self.deserialize('json', req.get_response(self.api))
+        self.assertNotEqual(port['port']['status'],
+                            constants.PORT_STATUS_ERROR)
+
+    def test_synchronize_in_chunks(self):
+        cfg.CONF.set_override('max_chunk_size', 2, 'NVP_SYNC')
+        for i in range(3):
+            self._create_network('json', 'net%d' % i, True)
+        with mock.patch.object(nvplib, 'do_single_request',
+                               wraps=nvplib.do_single_request) as request:
+            self._synchronize()
+        requests = [call[0][1] for call in request.call_args_list
+                    if call[0][1].startswith('/ws.v1/lswitch?')]
+        self.assertEqual(len(requests), 2)
+        self.assertIn('_page_cursor=2', requests[-1])
+        req = self.new_list_request('networks')
+        nets = self.deserialize('json', req.get_response(self.api))
+        self.assertEqual([net['status'] for net in nets['networks']],
+                         [constants.NET_STATUS_ACTIVE] * 3)
+
+    def test_synchronize_network_down(self):
+        self._create_network('json', 'net1', True)
+        with mock.patch.object(sync, '_get_lswitch_status',
+                               return_value=constants.NET_STATUS_DOWN):
+            self._synchronize()
+        req = self.new_list_request('networks')
+        nets = self.deserialize('json', req.get_response(self.api))
+        self.assertEqual(nets['networks'][0]['status'],
+                         constants.NET_STATUS_DOWN)
+
+    def test_lport_status_without_relation(self):
+        self.assertEqual(sync._get_lport_status({'_relations': {}}),
+                         constants.PORT_STATUS_ERROR)
+        self.assertEqual(sync._get_lport_status(
+            {'_relations': {'LogicalPortStatus': {'fabric_status_up': True}}}),
+            constants.PORT_STATUS_ACTIVE)
+
+    def test_deleted_network_sync_time_forgotten(self):
+        synchronizer = manager.QuantumManager.get_plugin()._synchronizer
+        res = self._create_network('json', 'net1', True)
+        net_id = self.deserialize('json', res)['network']['id']
+        self._synchronize()
+        self.assertIn(net_id, synchronizer._synced_at)
+        self._delete('networks', net_id)
+        self.assertNotIn(net_id, synchronizer._synced_at)
+
+    def test_synchronize_forgets_unknown_resources(self):
+        synchronizer = manager.QuantumManager.get_plugin()._synchronizer
+        res = self._create_network('json', 'net1', True)
+        net_id = self.deserialize('json', res)['network']['id']
+        synchronizer._synced_at['deleted_id'] = timeutils.utcnow()
+        self._synchronize()
+        self.assertEqual(synchronizer._synced_at.keys(), [net_id])
+
 
 class TestNiciraNetworkGateway(test_l2_gw.NetworkGatewayDbTestCase,
                                NiciraPluginV2TestCase):
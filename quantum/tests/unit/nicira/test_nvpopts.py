@@ -108,6 +108,8 @@ class ConfigurationTest(testtools.TestCase):
         cluster = plugin.cluster
         self._assert_required_options(cluster)
         self._assert_extra_options(cluster)
+        self.assertEqual(10, cfg.CONF.NVP_SYNC.max_chunk_size)
+        self.assertEqual(5, cfg.CONF.NVP_SYNC.max_status_staleness)
 
     def test_load_plugin_with_required_options_only(self):
         q_config.parse(['--config-file', BASE_CONF_PATH,
@@ -122,6 +124,9 @@ class ConfigurationTest(testtools.TestCase):
         self.assertEqual(5, cfg.CONF.NVP.concurrent_connections)
         self.assertEqual('access_network', cfg.CONF.NVP.metadata_mode)
         self.assertEqual('stt', cfg.CONF.NVP.default_transport_type)
+        self.assertEqual(120, cfg.CONF.NVP_SYNC.state_sync_interval)
+        self.assertEqual(500, cfg.CONF.NVP_SYNC.max_chunk_size)
+        self.assertEqual(-1, cfg.CONF.NVP_SYNC.max_status_staleness)
 
         self.assertIsNone(cfg.CONF.default_tz_uuid)
         self.assertIsNone(cfg.CONF.nvp_cluster_uuid)
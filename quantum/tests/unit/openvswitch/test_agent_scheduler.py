@@ -17,6 +17,7 @@ import contextlib
 import copy
 
 import mock
+from oslo.config import cfg
 from webob import exc
 
 from quantum.api import extensions
@@ -32,6 +33,8 @@ from quantum.extensions import agentscheduler
 from quantum import manager
 from quantum.openstack.common import timeutils
 from quantum.openstack.common import uuidutils
+from quantum.scheduler import balancing
+from quantum.scheduler import l3_agent_scheduler
 from quantum.tests.unit import test_agent_ext_plugin
 from quantum.tests.unit import test_db_plugin as test_plugin
 from quantum.tests.unit import test_extensions
@@ -167,6 +170,16 @@ class AgentSchedulerTestMixIn(object):
         res = req.get_response(self.ext_api)
         self.assertEqual(res.status_int, expected_code)
 
+    def _rebalance(self, action, expected_code=exc.HTTPOk.code,
+                   admin_context=True):
+        path = "/%s/%s.%s" % (agentscheduler.AGENT_SCHEDULER, action,
+                              self.fmt)
+        req = self._path_update_request(path, {},
+                                        admin_context=admin_context)
+        res = req.get_response(self.ext_api)
+        self.assertEqual(res.status_int, expected_code)
+        return self.deserialize(self.fmt, res)
+
     def _register_one_agent_state(self, agent_state):
         callback = agents_db.AgentExtRpcCallback()
         callback.report_state(self.adminContext,
@@ -736,6 +749,81 @@ class OvsAgentSchedulerTestCase(test_l3_plugin.L3NatTestCaseMixin,
         self.assertEqual(0, num_before_add)
         self.assertEqual(1, num_after_add)
 
+    def test_rebalance_routers(self):
+        with contextlib.nested(self.router(), self.router()):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            num_before = len(
+                self._list_routers_hosted_by_l3_agent(hosta_id)['routers'])
+            moves = self._rebalance('rebalance_routers')['routers']
+            hosta_routers = self._list_routers_hosted_by_l3_agent(hosta_id)
+            hostb_routers = self._list_routers_hosted_by_l3_agent(hostb_id)
+            again = self._rebalance('rebalance_routers')['routers']
+        self.assertEqual(2, num_before)
+        self.assertEqual(1, len(moves))
+        self.assertEqual(hosta_id, moves[0]['old_agent_id'])
+        self.assertEqual(hostb_id, moves[0]['new_agent_id'])
+        self.assertEqual(1, len(hosta_routers['routers']))
+        self.assertEqual(moves[0]['id'], hostb_routers['routers'][0]['id'])
+        self.assertEqual([], again)
+
+    def test_rebalance_networks(self):
+        with contextlib.nested(self.network(), self.network()):
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            moves = self._rebalance('rebalance_networks')['networks']
+            hostc_nets = self._list_networks_hosted_by_dhcp_agent(hostc_id)
+        self.assertEqual(1, len(moves))
+        self.assertEqual(hostc_id, moves[0]['new_agent_id'])
+        self.assertEqual(moves[0]['id'], hostc_nets['networks'][0]['id'])
+
+    def test_rebalance_policy(self):
+        self._rebalance('rebalance_routers',
+                        expected_code=exc.HTTPForbidden.code,
+                        admin_context=False)
+        self._rebalance('rebalance_networks',
+                        expected_code=exc.HTTPForbidden.code,
+                        admin_context=False)
+
+    def _schedule_routers_with(self, scheduler):
+        self.agentscheduler_dbMinxin.router_scheduler = scheduler
+        with contextlib.nested(self.router(), self.router()) as routers:
+            self._register_agent_states()
+            hosts = []
+            for router in routers:
+                router = self.agentscheduler_dbMinxin.get_router(
+                    self.adminContext, router['router']['id'])
+                agent = self.agentscheduler_dbMinxin.schedule_router(
+                    self.adminContext, router)
+                hosts.append(agent['host'])
+        return hosts
+
+    def test_least_loaded_router_scheduler(self):
+        hosts = self._schedule_routers_with(
+            l3_agent_scheduler.LeastLoadedScheduler())
+        self.assertEqual(set([L3_HOSTA, L3_HOSTB]), set(hosts))
+
+    def test_consistent_hash_router_scheduler(self):
+        scheduler = l3_agent_scheduler.ConsistentHashScheduler()
+        with mock.patch.object(scheduler, '_choose_agent',
+                               wraps=scheduler._choose_agent) as choose:
+            hosts = self._schedule_routers_with(scheduler)
+        ring = balancing.HashRing(
+            [self._get_agent_id(constants.AGENT_TYPE_L3, host)
+             for host in (L3_HOSTA, L3_HOSTB)])
+        for call, host in zip(choose.call_args_list, hosts):
+            self.assertEqual(ring.get_agent(call[0][2]),
+                             self._get_agent_id(constants.AGENT_TYPE_L3,
+                                                host))
+
     def test_router_policy(self):
         with self.router() as router1:
             self._register_agent_states()
@@ -945,6 +1033,49 @@ class OvsL3AgentNotifierTestCase(test_l3_plugin.L3NatTestCaseMixin,
                     payload={'router_id': router1['router']['id']}),
                 topic='l3_agent.hosta')
 
+    def test_router_delta_l3_agent_notification(self):
+        cfg.CONF.set_override('l3_delta_updates', True)
+        plugin = manager.QuantumManager.get_plugin()
+        with mock.patch.object(plugin.l3_agent_notifier, 'cast') as mock_l3:
+            with contextlib.nested(self.router(),
+                                   self.subnet()) as (router1, subnet1):
+                router_id = router1['router']['id']
+                self._register_agent_states()
+                hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                              L3_HOSTA)
+                self._add_router_to_l3_agent(hosta_id, router_id)
+                self._router_interface_action('add', router_id,
+                                              subnet1['subnet']['id'], None)
+                msg = mock_l3.call_args[0][1]
+                self._router_interface_action('remove', router_id,
+                                              subnet1['subnet']['id'], None)
+            self.assertEqual('router_delta', msg['method'])
+            delta = msg['args']['delta']
+            self.assertEqual(router_id, delta['router_id'])
+            self.assertEqual(1, len(delta['interfaces_added']))
+            self.assertEqual(subnet1['subnet']['id'],
+                             delta['interfaces_added'][0]['subnet']['id'])
+            self.assertEqual({'topic': 'l3_agent.hosta', 'version': '1.1'},
+                             mock_l3.call_args[1])
+
+    def test_router_delta_unscheduled_router_notification(self):
+        cfg.CONF.set_override('l3_delta_updates', True)
+        plugin = manager.QuantumManager.get_plugin()
+        with contextlib.nested(
+            mock.patch.object(plugin.l3_agent_notifier, 'cast'),
+            mock.patch.object(plugin.l3_agent_notifier, 'routers_updated')
+        ) as (mock_l3, mock_updated):
+            with contextlib.nested(self.router(),
+                                   self.subnet()) as (router1, subnet1):
+                router_id = router1['router']['id']
+                self._router_interface_action('add', router_id,
+                                              subnet1['subnet']['id'], None)
+                self._router_interface_action('remove', router_id,
+                                              subnet1['subnet']['id'], None)
+            self.assertFalse(mock_l3.called)
+            routers = mock_updated.call_args_list[0][0][1]
+            self.assertEqual([router_id], [r['id'] for r in routers])
+
     def test_agent_updated_l3_agent_notification(self):
         plugin = manager.QuantumManager.get_plugin()
         with mock.patch.object(plugin.l3_agent_notifier, 'cast') as mock_l3:
@@ -19,6 +19,7 @@ from testtools import matchers
 from quantum.common import exceptions as q_exc
 from quantum.db import api as db
 from quantum.plugins.openvswitch import ovs_db_v2
+from quantum.plugins.openvswitch import ovs_models_v2
 from quantum.tests import base
 from quantum.tests.unit import test_db_plugin as test_plugin
 
@@ -178,6 +179,31 @@ class VlanAllocationsTest(base.BaseTestCase):
                                VLAN_RANGES)
         ovs_db_v2.sync_vlan_allocations({})
 
+    def test_vlan_ranges_merge(self):
+        vlan_ids = [ovs_db_v2.reserve_vlan(self.session)[1]
+                    for x in xrange(VLAN_MIN, VLAN_MAX + 1)]
+        self.assertEqual(0, self.session.query(
+            ovs_models_v2.VlanRange).count())
+        # Release every other vlan, then the remaining ones
+        for vlan_id in vlan_ids[::2] + vlan_ids[1::2]:
+            ovs_db_v2.release_vlan(self.session, PHYS_NET, vlan_id,
+                                   VLAN_RANGES)
+        ranges = self.session.query(ovs_models_v2.VlanRange).all()
+        self.assertEqual([(PHYS_NET, VLAN_MIN, VLAN_MAX)],
+                         [(r.physical_network, r.first_id, r.last_id)
+                          for r in ranges])
+
+    def test_sync_keeps_allocated_vlans(self):
+        vlan_id = VLAN_MIN + 5
+        ovs_db_v2.reserve_specific_vlan(self.session, PHYS_NET, vlan_id)
+        ovs_db_v2.sync_vlan_allocations(VLAN_RANGES)
+        self.assertTrue(ovs_db_v2.get_vlan_allocation(PHYS_NET,
+                                                      vlan_id).allocated)
+        self.assertEqual(2, self.session.query(
+            ovs_models_v2.VlanRange).count())
+        with testtools.ExpectedException(q_exc.VlanIdInUse):
+            ovs_db_v2.reserve_specific_vlan(self.session, PHYS_NET, vlan_id)
+
 
 class TunnelAllocationsTest(base.BaseTestCase):
     def setUp(self):
@@ -230,6 +256,16 @@ class TunnelAllocationsTest(base.BaseTestCase):
         for tunnel_id in tunnel_ids:
             ovs_db_v2.release_tunnel(self.session, tunnel_id, TUNNEL_RANGES)
 
+    def test_sync_large_tunnel_range(self):
+        ovs_db_v2.sync_tunnel_allocations([(1, 1 << 24)])
+        self.assertEqual(1, self.session.query(
+            ovs_models_v2.TunnelRange).count())
+        self.assertFalse(ovs_db_v2.get_tunnel_allocation(1 << 24).allocated)
+        ovs_db_v2.reserve_specific_tunnel(self.session, 1 << 23)
+        self.assertEqual(1, ovs_db_v2.reserve_tunnel(self.session))
+        self.assertEqual(2, self.session.query(
+            ovs_models_v2.TunnelRange).count())
+
     def test_add_tunnel_endpoints(self):
         tun_1 = ovs_db_v2.add_tunnel_endpoint('192.168.0.1')
         tun_2 = ovs_db_v2.add_tunnel_endpoint('192.168.0.2')
@@ -108,7 +108,8 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         self.assertEqual(expected, actual)
 
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_added([{}]))
 
@@ -121,8 +122,9 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=port),
             mock.patch.object(self.agent, func_name)
@@ -150,18 +152,36 @@ class TestOvsQuantumAgent(base.BaseTestCase):
                                                        'treat_vif_port'))
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'update_devices_down_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
     def _mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        details = dict(device='vif1', exists=port_exists)
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'update_devices_down_list',
+                               return_value=[details]):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertEqual(port_unbound.called, not port_exists)
 
+    def test_treat_devices_added_single_batched_rpc(self):
+        details = [{'device': 'vif1'}, {'device': 'vif2'}]
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=details),
+            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
+                              return_value=None)
+        ) as (get_devs_fn, get_vif_func):
+            self.assertFalse(self.agent.treat_devices_added(['vif1',
+                                                              'vif2']))
+        get_devs_fn.assert_called_once_with(self.agent.context,
+                                            ['vif1', 'vif2'],
+                                            self.agent.agent_id)
+        self.assertEqual(get_vif_func.call_count, 2)
+
     def test_treat_devices_removed_unbinds_port(self):
         self._mock_treat_devices_removed(True)
 
@@ -310,3 +330,41 @@ class TestOvsQuantumAgent(base.BaseTestCase):
             lvm.vif_ports = {"vif1": mock.Mock()}
             self.agent.port_unbound("vif3", "netuid12345")
             self.assertEqual(reclvl_fn.call_count, 2)
+
+    def test_get_vif_port_set_uses_synced_monitor(self):
+        self.agent.ovsdb_monitor = mock.Mock()
+        self.agent.ovsdb_monitor.synced = True
+        self.agent.ovsdb_monitor.get_external_ids.return_value = [
+            {'iface-id': 'port-1', 'attached-mac': 'fa:16:3e:00:00:01'},
+            {'iface-id': 'port-2'}]
+        with mock.patch.object(self.agent.int_br,
+                               'get_vif_port_set') as get_vif_fn:
+            with mock.patch.object(
+                self.agent.int_br, 'get_vif_port_set_from_external_ids',
+                return_value=set(['port-1'])) as from_ids_fn:
+                with mock.patch.object(self.agent.int_br,
+                                       'get_port_name_list',
+                                       return_value=['tap1', 'tap2']):
+                    self.assertEqual(self.agent.get_vif_port_set(),
+                                     set(['port-1']))
+        self.assertFalse(get_vif_fn.called)
+        self.agent.ovsdb_monitor.get_external_ids.assert_called_once_with(
+            ['tap1', 'tap2'])
+        from_ids_fn.assert_called_once_with(
+            self.agent.ovsdb_monitor.get_external_ids.return_value)
+
+    def test_get_vif_port_set_polls_when_monitor_not_synced(self):
+        self.agent.ovsdb_monitor = mock.Mock()
+        self.agent.ovsdb_monitor.synced = False
+        with mock.patch.object(self.agent.int_br, 'get_vif_port_set',
+                               return_value=set(['port-1'])) as get_vif_fn:
+            self.assertEqual(self.agent.get_vif_port_set(), set(['port-1']))
+        self.assertTrue(get_vif_fn.called)
+
+    def test_daemon_loop_starts_and_stops_monitor(self):
+        self.agent.ovsdb_monitor = mock.Mock()
+        with mock.patch.object(self.agent, 'rpc_loop',
+                               side_effect=RuntimeError):
+            self.assertRaises(RuntimeError, self.agent.daemon_loop)
+        self.agent.ovsdb_monitor.start.assert_called_once_with()
+        self.agent.ovsdb_monitor.stop.assert_called_once_with()
@@ -16,8 +16,10 @@
 #    under the License.
 
 import copy
+import datetime
 import time
 
+import mock
 from oslo.config import cfg
 from webob import exc
 
@@ -29,7 +31,9 @@ from quantum import context
 from quantum.db import agents_db
 from quantum.db import db_base_plugin_v2
 from quantum.extensions import agent
+from quantum import manager
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
 from quantum.openstack.common import timeutils
 from quantum.openstack.common import uuidutils
 from quantum.tests.unit import test_api_v2
@@ -143,6 +147,10 @@ class AgentDBTestCase(AgentDBTestMixIn,
         test_config['extension_manager'] = ext_mgr
         self.addCleanup(self.restore_resource_attribute_map)
         self.addCleanup(cfg.CONF.reset)
+        heartbeats_p = mock.patch.object(agents_db, 'HEARTBEATS',
+                                         agents_db.AgentHeartbeats())
+        heartbeats_p.start()
+        self.addCleanup(heartbeats_p.stop)
         super(AgentDBTestCase, self).setUp()
 
     def restore_resource_attribute_map(self):
@@ -201,6 +209,135 @@ class AgentDBTestCase(AgentDBTestMixIn,
             query_string='binary=quantum-l3-agent&host=' + L3_HOSTB)
         self.assertFalse(agents['agents'][0]['alive'])
 
+    def _report_state(self, agent_state, seconds_later):
+        with mock.patch.object(timeutils, 'utcnow') as utcnow:
+            utcnow.return_value = (datetime.datetime.utcnow() +
+                                   datetime.timedelta(seconds=seconds_later))
+            agents_db.AgentExtRpcCallback().report_state(
+                self.adminContext, agent_state={'agent_state': agent_state},
+                time=timeutils.strtime())
+        return utcnow.return_value
+
+    def _get_agent_db(self, agent_state):
+        plugin = manager.QuantumManager.get_plugin()
+        agent_db = plugin._get_agent_by_type_and_host(
+            self.adminContext, agent_state['agent_type'], agent_state['host'])
+        self.adminContext.session.refresh(agent_db)
+        return agent_db
+
+    def test_heartbeat_written_alone(self):
+        l3_hosta = self._register_agent_states()[0]
+        plugin = manager.QuantumManager.get_plugin()
+        with mock.patch.object(plugin, '_get_agent_by_type_and_host') as get:
+            heartbeat = self._report_state(l3_hosta, 10)
+        self.assertFalse(get.called)
+        agent_db = self._get_agent_db(l3_hosta)
+        self.assertEqual(agent_db.heartbeat_timestamp,
+                         heartbeat)
+
+    def test_changed_configurations_written(self):
+        l3_hosta = self._register_agent_states()[0]
+        l3_hosta['configurations']['router_id'] = 'router'
+        self._report_state(l3_hosta, 10)
+        plugin = manager.QuantumManager.get_plugin()
+        agent_db = self._get_agent_db(l3_hosta)
+        self.assertEqual(
+            plugin.get_configuration_dict(agent_db)['router_id'], 'router')
+
+    def test_restarted_agent_written(self):
+        l3_hosta = self._register_agent_states()[0]
+        l3_hosta['start_flag'] = True
+        heartbeat = self._report_state(l3_hosta, 10)
+        agent_db = self._get_agent_db(l3_hosta)
+        self.assertEqual(agent_db.started_at,
+                         heartbeat)
+
+    def test_heartbeats_flushed(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 10)
+        l3_hosta, l3_hostb = self._register_agent_states()[:2]
+        before = self._get_agent_db(l3_hostb).heartbeat_timestamp
+        with mock.patch.object(agents_db.HEARTBEATS,
+                               'start_flushing') as start_flushing:
+            heartbeat_a = self._report_state(l3_hosta, 10)
+            heartbeat = self._report_state(l3_hostb, 10)
+        start_flushing.assert_called_with(10)
+        agent_db = self._get_agent_db(l3_hostb)
+        self.assertEqual(agent_db.heartbeat_timestamp, before)
+        # The liveness is served from memory until the heartbeats are
+        # written
+        cfg.CONF.set_override('agent_down_time', 5)
+        with mock.patch.object(timeutils, 'utcnow') as utcnow:
+            utcnow.return_value = heartbeat
+            self.assertFalse(agents_db.AgentDbMixin.is_agent_down(
+                agent_db.heartbeat_timestamp, agent_db.id))
+            self.assertTrue(agents_db.AgentDbMixin.is_agent_down(
+                agent_db.heartbeat_timestamp))
+        self.assertTrue(agents_db.HEARTBEATS.flush(self.adminContext))
+        self.assertEqual(self._get_agent_db(l3_hosta).heartbeat_timestamp,
+                         heartbeat_a)
+        self.assertEqual(self._get_agent_db(l3_hostb).heartbeat_timestamp,
+                         heartbeat)
+
+    def test_report_written_by_other_server_corrected(self):
+        l3_hosta = self._register_agent_states()[0]
+        agent_id = self._get_agent_db(l3_hosta).id
+        # Another report written by another server process
+        with self.adminContext.session.begin():
+            self.adminContext.session.query(agents_db.Agent).filter_by(
+                id=agent_id).update({'configurations': '{}'})
+        heartbeat = self._report_state(l3_hosta, 10)
+        agent_db = self._get_agent_db(l3_hosta)
+        plugin = manager.QuantumManager.get_plugin()
+        self.assertEqual(plugin.get_configuration_dict(agent_db),
+                         l3_hosta['configurations'])
+        self.assertEqual(agent_db.heartbeat_timestamp, heartbeat)
+
+    def test_flush_with_unknown_rowcount(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 10)
+        l3_hosta, l3_hostb = self._register_agent_states()[:2]
+        with mock.patch.object(agents_db.HEARTBEATS, 'start_flushing'):
+            self._report_state(l3_hosta, 10)
+            self._report_state(l3_hostb, 10)
+        with mock.patch.object(self.adminContext.session,
+                               'execute') as execute:
+            execute.return_value.rowcount = -1
+            self.assertTrue(agents_db.HEARTBEATS.flush(self.adminContext))
+        with mock.patch.object(agents_db.HEARTBEATS, 'start_flushing'):
+            plugin = manager.QuantumManager.get_plugin()
+            with mock.patch.object(plugin,
+                                   '_get_agent_by_type_and_host') as get:
+                self._report_state(l3_hosta, 20)
+        self.assertFalse(get.called)
+
+    def test_flush_after_reports_forgotten(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 10)
+        l3_hosta = self._register_agent_states()[0]
+        with mock.patch.object(agents_db.HEARTBEATS, 'start_flushing'):
+            self._report_state(l3_hosta, 10)
+        # Forgotten by a concurrent flush which found a changed row
+        agents_db.HEARTBEATS._reports.clear()
+        self.assertTrue(agents_db.HEARTBEATS.flush(self.adminContext))
+        self.assertFalse(agents_db.HEARTBEATS._unflushed)
+
+    def test_flush_interval_below_agent_down_time(self):
+        cfg.CONF.set_override('agent_down_time', 5)
+        heartbeats = agents_db.AgentHeartbeats()
+        with mock.patch.object(loopingcall,
+                               'FixedIntervalLoopingCall') as looping:
+            heartbeats.start_flushing(10)
+        looping.return_value.start.assert_called_once_with(
+            interval=2, initial_delay=2)
+
+    def test_deleted_agent_created_again(self):
+        l3_hosta = self._register_agent_states()[0]
+        agent_id = self._get_agent_db(l3_hosta).id
+        # Deleted by another server process
+        with self.adminContext.session.begin():
+            self.adminContext.session.query(agents_db.Agent).filter_by(
+                id=agent_id).delete()
+        self._report_state(l3_hosta, 10)
+        self.assertNotEqual(self._get_agent_db(l3_hosta).id, agent_id)
+
 
 class AgentDBTestCaseXML(AgentDBTestCase):
     fmt = 'xml'
@@ -15,9 +15,14 @@
 #    under the License.
 # @author: Dan Wendlandt, Nicira, Inc.
 
+import os
+import sys
+
 import fixtures
 import mock
 
+import quantum
+from quantum.agent.linux import rootwrap_client
 from quantum.agent.linux import utils
 from quantum.tests import base
 
@@ -63,6 +68,51 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, "%s\n" % self.test_file)
 
 
+class AgentUtilsRootwrapDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsRootwrapDaemonTest, self).setUp()
+        temp_dir = self.useFixture(fixtures.TempDir())
+        filters_dir = temp_dir.join('rootwrap.d')
+        os.mkdir(filters_dir)
+        with open(os.path.join(filters_dir, 'test.filters'), 'w') as f:
+            f.write('[Filters]\ncat: CommandFilter, /bin/cat, root\n')
+        config_file = temp_dir.join('rootwrap.conf')
+        with open(config_file, 'w') as f:
+            f.write('[DEFAULT]\nfilters_path=%s\n' % filters_dir)
+        daemon_bin = os.path.join(os.path.dirname(quantum.__file__),
+                                  os.pardir, 'bin', 'quantum-rootwrap-daemon')
+        self.daemon_cmd = ' '.join([sys.executable, daemon_bin, config_file])
+        self.client = rootwrap_client.RootwrapClient(self.daemon_cmd)
+        self.addCleanup(self._stop_daemon)
+
+    def _stop_daemon(self):
+        if self.client._process:
+            self.client._process.stdin.close()
+            self.client._process.wait()
+
+    def test_execute(self):
+        result = self.client.execute(['cat'], 'foo\n')
+        self.assertEqual(result, (0, 'foo\n', ''))
+        self.assertEqual(self.client.get_stats()['cat']['count'], 1)
+
+    def test_execute_unauthorized(self):
+        returncode, stdout, stderr = self.client.execute(['ls'])
+        self.assertEqual(returncode, 99)
+
+    def test_restart_daemon(self):
+        self.client.execute(['cat'])
+        self._stop_daemon()
+        self.assertEqual(self.client.execute(['cat'], 'foo'),
+                         (0, 'foo', ''))
+
+    def test_utils_execute_uses_daemon(self):
+        with mock.patch.object(utils, '_get_rootwrap_client',
+                               return_value=self.client):
+            result = utils.execute(['cat'], 'sudo', process_input='bar')
+            self.assertEqual(result, 'bar')
+            self.assertRaises(RuntimeError, utils.execute, ['ls'], 'sudo')
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
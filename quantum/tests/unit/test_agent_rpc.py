@@ -15,10 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from quantum.agent import rpc
 from quantum.openstack.common import context
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.tests import base
 
 
@@ -45,6 +48,61 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def _test_batch_rpc_call(self, method):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('quantum.openstack.common.rpc.call') as rpc_call:
+            rpc_call.return_value = ['foo', 'bar']
+            actual_val = getattr(agent, method)(ctxt, ['dev1', 'dev2'],
+                                                'fake_agent_id')
+        self.assertEqual(actual_val, ['foo', 'bar'])
+        self.assertEqual(rpc_call.call_count, 1)
+        msg = rpc_call.call_args[0][2]
+        self.assertEqual(msg['method'], method)
+        self.assertEqual(msg['version'], agent.BATCH_RPC_API_VERSION)
+        self.assertEqual(msg['args']['devices'], ['dev1', 'dev2'])
+
+    def _test_batch_rpc_call_fallback(self, method, single_method):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError('UnsupportedRpcVersion')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call', side_effect=error),
+            mock.patch.object(agent, single_method, return_value='foo')
+        ) as (call, single_call):
+            self.assertEqual(getattr(agent, method)(ctxt, ['dev1', 'dev2'],
+                                                    'fake_agent_id'),
+                             ['foo', 'foo'])
+            self.assertFalse(agent.batch_supported)
+            # The batched method is not tried again
+            getattr(agent, method)(ctxt, ['dev3'], 'fake_agent_id')
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(single_call.call_count, 3)
+
+    def test_get_devices_details_list(self):
+        self._test_batch_rpc_call('get_devices_details_list')
+
+    def test_get_devices_details_list_fallback(self):
+        self._test_batch_rpc_call_fallback('get_devices_details_list',
+                                           'get_device_details')
+
+    def test_update_devices_down_list(self):
+        self._test_batch_rpc_call('update_devices_down_list')
+
+    def test_update_devices_down_list_fallback(self):
+        self._test_batch_rpc_call_fallback('update_devices_down_list',
+                                           'update_device_down')
+
+    def test_batch_rpc_call_other_remote_error_raised(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError('PortNotFound')
+        with mock.patch.object(agent, 'call', side_effect=error):
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+        self.assertTrue(agent.batch_supported)
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state(self):
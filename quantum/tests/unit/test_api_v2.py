@@ -522,7 +522,15 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
     def setUp(self):
         super(JSONV2TestCase, self).setUp()
 
-    def _test_list(self, req_tenant_id, real_tenant_id):
+    def _enable_streaming(self):
+        cfg.CONF.set_override('allow_list_streaming', True)
+        instance = self.plugin.return_value
+        instance._QuantumPluginBaseV2__native_streaming_support = True
+        # The signature of the plugin base class has no stream argument
+        instance.get_networks = mock.Mock()
+        self.api = webtest.TestApp(router.APIRouter())
+
+    def _test_list(self, req_tenant_id, real_tenant_id, streamed=False):
         env = {}
         if req_tenant_id:
             env = {'quantum.context': context.Context('', req_tenant_id)}
@@ -535,11 +543,17 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
                       'subnets': []}
         return_value = [input_dict]
         instance = self.plugin.return_value
+        if streamed:
+            self._enable_streaming()
+            return_value = iter(return_value)
         instance.get_networks.return_value = return_value
 
         res = self.api.get(_get_path('networks',
                                      fmt=self.fmt), extra_environ=env)
         res = self.deserialize(res)
+        if streamed:
+            kwargs = instance.get_networks.call_args[1]
+            self.assertTrue(kwargs['stream'])
         self.assertTrue('networks' in res)
         if not req_tenant_id or req_tenant_id == real_tenant_id:
             # expect full list returned
@@ -564,6 +578,40 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         tenant_id = _uuid()
         self._test_list(tenant_id + "bad", tenant_id)
 
+    def _test_list_policy_filters(self, params, expected):
+        tenant_id = _uuid()
+        env = {'quantum.context': context.Context('', tenant_id)}
+        instance = self.plugin.return_value
+        instance.get_ports.return_value = []
+        self.api.get(_get_path('ports', fmt=self.fmt), params=params,
+                     extra_environ=env)
+        filters = instance.get_ports.call_args[1]['filters']
+        self.assertEqual(filters, {'tenant_id': expected(tenant_id)})
+
+    def test_list_policy_filters(self):
+        self._test_list_policy_filters({}, lambda tenant_id: [tenant_id])
+
+    def test_list_policy_filters_other_tenant(self):
+        self._test_list_policy_filters({'tenant_id': 'other'},
+                                       lambda tenant_id: [])
+
+    def test_list_streamed(self):
+        tenant_id = _uuid()
+        self._test_list(tenant_id, tenant_id, streamed=True)
+
+    def test_list_streamed_keystone_bad(self):
+        tenant_id = _uuid()
+        self._test_list(tenant_id + "bad", tenant_id, streamed=True)
+
+    def test_list_with_limit_not_streamed(self):
+        self._enable_streaming()
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = []
+        self.api.get(_get_path('networks', fmt=self.fmt),
+                     params={'limit': '2'})
+        kwargs = instance.get_networks.call_args[1]
+        self.assertNotIn('stream', kwargs)
+
     def test_list_pagination(self):
         id1 = str(_uuid())
         id2 = str(_uuid())
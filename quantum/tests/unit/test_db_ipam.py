@@ -0,0 +1,199 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import netaddr
+from oslo.config import cfg
+
+from quantum.common import exceptions as q_exc
+from quantum import context
+from quantum.db.ipam import driver as ipam_driver
+from quantum.db.ipam import stripe_driver
+from quantum.db import models_v2
+from quantum.manager import QuantumManager
+from quantum.tests import base
+from quantum.tests.unit import test_db_plugin
+
+
+RANGE_DRIVER = 'quantum.db.ipam.range_driver.AvailabilityRangeDriver'
+STRIPE_DRIVER = 'quantum.db.ipam.stripe_driver.StripedIpamDriver'
+
+
+class TestFreeRuns(base.BaseTestCase):
+
+    def test_encode_decode(self):
+        runs = [(0, 0), (2, 5), (7, 7)]
+        self.assertEqual(stripe_driver.encode_runs(runs), '0,2-5,7')
+        self.assertEqual(stripe_driver.decode_runs('0,2-5,7'), runs)
+        self.assertEqual(stripe_driver.decode_runs(''), [])
+        self.assertEqual(stripe_driver.decode_runs(None), [])
+
+    def test_take_offsets_spans_runs(self):
+        runs = [(0, 1), (4, 6)]
+        self.assertEqual(stripe_driver.take_offsets(runs, 3), [0, 1, 4])
+        self.assertEqual(runs, [(5, 6)])
+        self.assertEqual(stripe_driver.take_offsets(runs, 5), [5, 6])
+        self.assertEqual(runs, [])
+
+    def test_remove_offset(self):
+        runs = [(0, 9)]
+        self.assertTrue(stripe_driver.remove_offset(runs, 4))
+        self.assertEqual(runs, [(0, 3), (5, 9)])
+        self.assertTrue(stripe_driver.remove_offset(runs, 0))
+        self.assertTrue(stripe_driver.remove_offset(runs, 9))
+        self.assertEqual(runs, [(1, 3), (5, 8)])
+        self.assertFalse(stripe_driver.remove_offset(runs, 4))
+        self.assertFalse(stripe_driver.remove_offset(runs, 12))
+
+    def test_add_offset_merges(self):
+        runs = [(0, 3), (5, 8)]
+        self.assertTrue(stripe_driver.add_offset(runs, 4))
+        self.assertEqual(runs, [(0, 8)])
+        self.assertTrue(stripe_driver.add_offset(runs, 9))
+        self.assertTrue(stripe_driver.add_offset(runs, 11))
+        self.assertEqual(runs, [(0, 9), (11, 11)])
+        self.assertFalse(stripe_driver.add_offset(runs, 3))
+        self.assertFalse(stripe_driver.add_offset(runs, 11))
+
+
+class IpamDriverTestCase(test_db_plugin.QuantumDbPluginV2TestCase):
+
+    driver = RANGE_DRIVER
+
+    def setUp(self):
+        super(IpamDriverTestCase, self).setUp()
+        cfg.CONF.set_override('ipam_driver', self.driver)
+        ipam_driver.reset_ipam_driver()
+        self.addCleanup(ipam_driver.reset_ipam_driver)
+        self.plugin = QuantumManager.get_plugin()
+        self.ctx = context.get_admin_context()
+
+    def _get_subnet(self, subnet):
+        return self.plugin.get_subnet(self.ctx, subnet['subnet']['id'])
+
+    def _generate_ips(self, subnet, count):
+        with self.ctx.session.begin(subtransactions=True):
+            return self.plugin._generate_ips(self.ctx, [subnet], count)
+
+    def test_generate_ips_bulk(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet = self._get_subnet(subnet)
+            ips = self._generate_ips(subnet, 100)
+            addresses = set(ip['ip_address'] for ip in ips)
+            self.assertEqual(len(addresses), 100)
+            pool = netaddr.IPRange('10.0.0.2', '10.0.0.254')
+            for ip in ips:
+                self.assertEqual(ip['subnet_id'], subnet['id'])
+                self.assertIn(netaddr.IPAddress(ip['ip_address']), pool)
+            more = self._generate_ips(subnet, 153)
+            self.assertFalse(addresses & set(ip['ip_address']
+                                             for ip in more))
+
+    def test_generate_ips_exhausted(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet = self._get_subnet(subnet)
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self._generate_ips, subnet, 6)
+            # The failed request must not leak addresses
+            ips = self._generate_ips(subnet, 5)
+            self.assertEqual(sorted(ip['ip_address'] for ip in ips),
+                             ['10.0.0.%d' % i for i in range(2, 7)])
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self._generate_ips, subnet, 1)
+
+    def test_generate_ips_over_subnets(self):
+        with self.network() as network:
+            with self.subnet(network=network, cidr='10.0.0.0/29') as s1:
+                with self.subnet(network=network, cidr='10.0.1.0/29') as s2:
+                    subnets = [self._get_subnet(s1), self._get_subnet(s2)]
+                    with self.ctx.session.begin(subtransactions=True):
+                        ips = self.plugin._generate_ips(self.ctx, subnets, 8)
+                    self.assertEqual(
+                        len([ip for ip in ips
+                             if ip['subnet_id'] == subnets[0]['id']]), 5)
+                    self.assertEqual(
+                        len([ip for ip in ips
+                             if ip['subnet_id'] == subnets[1]['id']]), 3)
+
+    def test_allocate_specific_and_recycle(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet = self._get_subnet(subnet)
+            with self.ctx.session.begin(subtransactions=True):
+                self.plugin._allocate_specific_ip(self.ctx, subnet['id'],
+                                                  '10.0.0.4')
+            ips = self._generate_ips(subnet, 4)
+            self.assertNotIn('10.0.0.4', [ip['ip_address'] for ip in ips])
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self._generate_ips, subnet, 1)
+            with self.ctx.session.begin(subtransactions=True):
+                self.plugin._recycle_ip(self.ctx, subnet['network_id'],
+                                        subnet['id'], '10.0.0.4')
+            ips = self._generate_ips(subnet, 1)
+            self.assertEqual(ips[0]['ip_address'], '10.0.0.4')
+
+    def test_recycle_ip_outside_pools(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet = self._get_subnet(subnet)
+            self.assertRaises(q_exc.InvalidInput, self.plugin._recycle_ip,
+                              self.ctx, subnet['network_id'], subnet['id'],
+                              '10.0.0.1')
+
+    def test_create_ports(self):
+        with self.subnet(cidr='10.0.0.0/28') as subnet:
+            with self.port(subnet=subnet) as p1:
+                with self.port(subnet=subnet) as p2:
+                    ip1 = p1['port']['fixed_ips'][0]['ip_address']
+                    ip2 = p2['port']['fixed_ips'][0]['ip_address']
+                    self.assertNotEqual(ip1, ip2)
+
+
+class StripedIpamDriverTestCase(IpamDriverTestCase):
+
+    driver = STRIPE_DRIVER
+
+    def test_pool_split_into_stripes(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            stripes = self.ctx.session.query(
+                stripe_driver.IPAvailabilityStripe).join(
+                    models_v2.IPAllocationPool).filter_by(
+                        subnet_id=subnet['subnet']['id']).all()
+            self.assertEqual(len(stripes), 15)
+            self.assertEqual(sum(len(stripe_driver.take_offsets(
+                stripe_driver.decode_runs(s['free_runs']), 256))
+                for s in stripes), 253)
+
+    def test_convert_availability_ranges(self):
+        cfg.CONF.set_override('ipam_driver', RANGE_DRIVER)
+        ipam_driver.reset_ipam_driver()
+        with self.subnet(cidr='10.0.0.0/27') as subnet:
+            subnet = self._get_subnet(subnet)
+            used = set(ip['ip_address']
+                       for ip in self._generate_ips(subnet, 3))
+            cfg.CONF.set_override('ipam_driver', STRIPE_DRIVER)
+            ipam_driver.reset_ipam_driver()
+            ips = self._generate_ips(subnet, 26)
+            self.assertFalse(used & set(ip['ip_address'] for ip in ips))
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              self._generate_ips, subnet, 1)
+            ranges = self.ctx.session.query(models_v2.IPAvailabilityRange)
+            self.assertEqual(ranges.count(), 0)
+
+    def test_delete_subnet_forgets_striped_subnet(self):
+        driver = ipam_driver.get_ipam_driver()
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet_id = subnet['subnet']['id']
+            self._generate_ips(self._get_subnet(subnet), 1)
+            self.assertIn(subnet_id, driver._striped_subnets)
+        self.assertNotIn(subnet_id, driver._striped_subnets)
@@ -517,6 +517,16 @@ class QuantumDbPluginV2TestCase(testlib_api.WebTestCase):
         self.assertEqual(sorted([i['id'] for i in res['%ss' % resource]]),
                          sorted([i[resource]['id'] for i in items]))
 
+    def _test_list_resources_streamed(self, resource, items):
+        # the list must be streamed by the plugin itself
+        cfg.CONF.set_override('allow_list_streaming', True)
+        self.api = APIRouter()
+        plugin = QuantumManager.get_plugin()
+        with mock.patch.object(plugin, '_iter_collection',
+                               wraps=plugin._iter_collection) as iter_mock:
+            self._test_list_resources(resource, items)
+        self.assertTrue(iter_mock.called)
+
     @contextlib.contextmanager
     def network(self, name='net1',
                 admin_state_up=True,
@@ -837,6 +847,32 @@ class TestPortsV2(QuantumDbPluginV2TestCase):
             for p in self.deserialize(self.fmt, res)['ports']:
                 self._delete('ports', p['id'])
 
+    def test_create_ports_bulk_native_addresses(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            subnet_id = subnet['subnet']['id']
+            overrides = {1: {'mac_address': '00:11:22:33:44:55'},
+                         2: {'fixed_ips': [{'subnet_id': subnet_id,
+                                            'ip_address': '10.0.0.10'}]}}
+            res = self._create_port_bulk(self.fmt, 5,
+                                         subnet['subnet']['network_id'],
+                                         'test', True, override=overrides)
+            self.assertEqual(res.status_int, 201)
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual(ports[1]['mac_address'], '00:11:22:33:44:55')
+            self.assertEqual(ports[2]['fixed_ips'],
+                             [{'subnet_id': subnet_id,
+                               'ip_address': '10.0.0.10'}])
+            self.assertEqual(len(set(p['mac_address'] for p in ports)), 5)
+            ips = set()
+            for p in ports:
+                self.assertEqual(len(p['fixed_ips']), 1)
+                ips.add(p['fixed_ips'][0]['ip_address'])
+            self.assertEqual(len(ips), 5)
+            for p in ports:
+                self._delete('ports', p['id'])
+
     def test_create_ports_bulk_emulated(self):
         real_has_attr = hasattr
 
@@ -923,6 +959,44 @@ class TestPortsV2(QuantumDbPluginV2TestCase):
                                self.port()) as ports:
             self._test_list_resources('port', ports)
 
+    def test_list_ports_with_column_fields(self):
+        with self.port() as port:
+            res = self._list('ports', query_params='fields=id&fields=name')
+            self.assertEqual(res['ports'],
+                             [{'id': port['port']['id'],
+                               'name': port['port']['name']}])
+
+    def test_list_ports_with_column_fields_filtered_by_subnet(self):
+        with self.subnet() as subnet:
+            subnet_id = subnet['subnet']['id']
+            fixed_ips = [{'subnet_id': subnet_id}, {'subnet_id': subnet_id}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips) as port:
+                self.assertEqual(len(port['port']['fixed_ips']), 2)
+                res = self._list(
+                    'ports',
+                    query_params='fixed_ips=subnet_id%%3D%s&fields=id' %
+                    subnet_id)
+                self.assertEqual(res['ports'], [{'id': port['port']['id']}])
+
+    def test_get_column_fields(self):
+        plugin = QuantumManager.get_plugin()
+        self.assertEqual(plugin._get_column_fields(
+            models_v2.Port, ['id', 'name', 'id']), ['id', 'name'])
+        self.assertIsNone(plugin._get_column_fields(
+            models_v2.Port, ['id', 'fixed_ips']))
+        self.assertIsNone(plugin._get_column_fields(models_v2.Port, None))
+
+    def test_list_ports_streamed(self):
+        # for this test we need to enable overlapping ips
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        cfg.CONF.set_override('allow_list_streaming', True)
+        self.api = APIRouter()
+        with mock.patch.object(db_base_plugin_v2, 'STREAM_CHUNK_SIZE', 2):
+            with contextlib.nested(self.port(),
+                                   self.port(),
+                                   self.port()) as ports:
+                self._test_list_resources('port', ports)
+
     def test_list_ports_filtered_by_fixed_ip(self):
         # for this test we need to enable overlapping ips
         cfg.CONF.set_default('allow_overlapping_ips', True)
@@ -1273,6 +1347,23 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
             res = self._create_port(self.fmt, net_id=net_id)
             self.assertEqual(res.status_int, 503)
 
+    def test_generate_macs_exhaustion(self):
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            net_id = net['network']['id']
+            with mock.patch('random.randint', return_value=0):
+                macs = db_base_plugin_v2.QuantumDbPluginV2._generate_macs(
+                    ctx, net_id, 1)
+                self.assertEqual(macs, ['12:34:56:78:00:00'])
+                self.assertRaises(
+                    q_exc.MacAddressGenerationFailure,
+                    db_base_plugin_v2.QuantumDbPluginV2._generate_macs,
+                    ctx, net_id, 2)
+                self.assertRaises(
+                    q_exc.MacAddressGenerationFailure,
+                    db_base_plugin_v2.QuantumDbPluginV2._generate_macs,
+                    ctx, net_id, 1, exclude=macs)
+
     def test_requested_duplicate_ip(self):
         with self.subnet() as subnet:
             with self.port(subnet=subnet) as port:
@@ -2234,6 +2325,28 @@ class TestNetworksV2(QuantumDbPluginV2TestCase):
             self.assertEqual(None,
                              res['networks'][0].get('id'))
 
+    def test_list_networks_dict_extend_batch_funcs(self):
+        plugin = QuantumManager.get_plugin()
+
+        def extend_networks(context, networks):
+            for network in networks:
+                network['extended'] = network['name']
+
+        with contextlib.nested(
+            mock.patch.dict(
+                db_base_plugin_v2.QuantumDbPluginV2.
+                _dict_extend_batch_functions,
+                {'networks': ['_extend_networks_test']}),
+            mock.patch.object(plugin, '_extend_networks_test', create=True,
+                              side_effect=extend_networks),
+            self.network(name='net1'),
+            self.network(name='net2')) as (_, extend, net1, net2):
+            networks = plugin.get_networks(context.get_admin_context(),
+                                           fields=['extended'])
+            self.assertEqual(1, extend.call_count)
+            self.assertEqual([{'extended': 'net1'}, {'extended': 'net2'}],
+                             sorted(networks))
+
     def test_list_networks_with_parameters_invalid_values(self):
         with contextlib.nested(self.network(name='net1',
                                             admin_state_up=False),
@@ -49,6 +49,30 @@ class TestDhcpRpcCallackMixin(base.BaseTestCase):
 
         self.assertEqual(len(self.log.mock_calls), 1)
 
+    def test_get_active_networks_fingerprints(self):
+        self.plugin.get_networks.return_value = [
+            dict(id='a', admin_state_up=True),
+            dict(id='b', admin_state_up=True)]
+        self.plugin.get_subnets.return_value = [
+            dict(id='s1', network_id='a', cidr='10.0.0.0/24')]
+        ports = [dict(id='p1', network_id='a', fixed_ips=[]),
+                 dict(id='p2', network_id='b', fixed_ips=[])]
+        self.plugin.get_ports.return_value = ports
+
+        fingerprints = self.callbacks.get_active_networks(
+            mock.Mock(), host='host', fingerprints=True)
+        self.assertEqual(sorted(fingerprints), ['a', 'b'])
+        self.plugin.get_ports.assert_called_once_with(
+            mock.ANY, filters=dict(network_id=mock.ANY),
+            fields=dhcp_rpc_base.DHCP_PORT_FIELDS)
+
+        # only the network whose content changed gets a new fingerprint
+        ports[1]['fixed_ips'] = [dict(subnet_id='s2', ip_address='10.1.0.2')]
+        new_fingerprints = self.callbacks.get_active_networks(
+            mock.Mock(), host='host', fingerprints=True)
+        self.assertEqual(new_fingerprints['a'], fingerprints['a'])
+        self.assertNotEqual(new_fingerprints['b'], fingerprints['b'])
+
     def test_get_network_info(self):
         network_retval = dict(id='a')
 
@@ -0,0 +1,36 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from quantum.db import segment_ranges
+from quantum.tests import base
+
+
+class TestSegmentRanges(base.BaseTestCase):
+
+    def test_merge_ranges(self):
+        self.assertEqual(segment_ranges.merge_ranges(
+            [(20, 29), (1, 5), (3, 9), (10, 12), (14, 14)]),
+            [(1, 12), (14, 14), (20, 29)])
+        self.assertEqual(segment_ranges.merge_ranges([]), [])
+
+    def test_subtract_ids(self):
+        self.assertEqual(segment_ranges.subtract_ids(
+            [(1, 10), (20, 29)], [0, 1, 5, 5, 6, 10, 25, 40]),
+            [(2, 4), (7, 9), (20, 24), (26, 29)])
+        self.assertEqual(segment_ranges.subtract_ids([(1, 3)], [1, 2, 3]),
+                         [])
+        self.assertEqual(segment_ranges.subtract_ids([(1, 1 << 24)], []),
+                         [(1, 1 << 24)])
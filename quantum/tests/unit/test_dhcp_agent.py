@@ -18,6 +18,7 @@
 import os
 import socket
 import sys
+import time
 import uuid
 
 import eventlet
@@ -294,6 +295,38 @@ class TestDhcpAgent(base.BaseTestCase):
     def test_sync_state_disabled_net(self):
         self._test_sync_state_helper(['b'], ['a'])
 
+    def test_sync_state_fingerprints(self):
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks.return_value = {'a': 'fp-a2',
+                                                            'b': 'fp-b',
+                                                            'c': 'fp-c'}
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.cache.put_fingerprint('a', 'fp-a1')
+            dhcp.cache.put_fingerprint('b', 'fp-b')
+            dhcp.cache.put_fingerprint('d', 'fp-d')
+
+            def refresh(network_id):
+                if network_id == 'c':
+                    dhcp.needs_resync = True
+
+            with mock.patch.object(dhcp, 'refresh_dhcp_helper') as helper:
+                helper.side_effect = refresh
+                dhcp.sync_state()
+
+                mock_plugin.get_active_networks.assert_called_once_with(
+                    fingerprints=True)
+                self.assertEqual(sorted(helper.call_args_list),
+                                 [mock.call('a'), mock.call('c')])
+            # a failed refresh is retried on the next sync
+            self.assertEqual(dhcp.cache.fingerprints, {'a': 'fp-a2',
+                                                       'b': 'fp-b'})
+            self.assertTrue(dhcp.needs_resync)
+            self.assertEqual(dhcp.sync_stats['resync_networks'], 3)
+            self.assertEqual(dhcp.sync_stats['resync_skipped'], 1)
+
     def test_sync_state_plugin_error(self):
         with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
             mock_plugin = mock.Mock()
@@ -413,6 +446,8 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
                               'quantum.agent.linux.interface.NullDriver')
         config.register_root_helper(cfg.CONF)
         cfg.CONF.register_opts(dhcp_agent.DhcpAgent.OPTS)
+        # Handle the events on arrival
+        cfg.CONF.set_override('event_debounce_interval', 0)
 
         self.plugin_p = mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi')
         plugin_cls = self.plugin_p.start()
@@ -685,6 +720,23 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.call_driver.assert_called_once_with('reload_allocations',
                                                  fake_network)
 
+    def test_port_update_during_refresh_applied(self):
+        def get_network_info(network_id):
+            self.dhcp.port_update_end(None, dict(port=vars(fake_port2)))
+            return fake_network
+
+        self.cache.get_network_by_id.return_value = fake_network
+        self.plugin.get_network_info.side_effect = get_network_info
+
+        self.dhcp.refresh_dhcp_helper(fake_network.id)
+
+        # The port is put again once the fetched network is cached
+        calls = [call[0] for call in self.cache.mock_calls]
+        self.assertIn('put_port', calls[calls.index('put'):])
+        self.assertEqual(self.cache.put_port.call_args[0][0].id,
+                         fake_port2.id)
+        self.assertEqual(self.dhcp._port_event_logs, [])
+
     def test_subnet_update_end_restart(self):
         new_state = FakeModel(fake_network.id,
                               tenant_id=fake_network.tenant_id,
@@ -731,7 +783,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.put_port(mock.ANY)])
-        self.call_driver.assert_called_once_with('reload_allocations',
+        self.call_driver.assert_called_once_with('reload_hosts',
                                                  fake_network)
 
     def test_port_delete_end(self):
@@ -745,7 +797,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             [mock.call.get_port_by_id(fake_port2.id),
              mock.call.get_network_by_id(fake_network.id),
              mock.call.remove_port(fake_port2)])
-        self.call_driver.assert_called_once_with('reload_allocations',
+        self.call_driver.assert_called_once_with('reload_hosts',
                                                  fake_network)
 
     def test_port_delete_end_unknown_port(self):
@@ -780,6 +832,13 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
         self.make_msg.assert_called_once_with('get_active_networks',
                                               host='foo')
 
+    def test_get_active_networks_fingerprints(self):
+        self.proxy.get_active_networks(fingerprints=True)
+        self.assertTrue(self.call.called)
+        self.make_msg.assert_called_once_with('get_active_networks',
+                                              host='foo',
+                                              fingerprints=True)
+
     def test_get_network_info(self):
         self.call.return_value = dict(a=1)
         retval = self.proxy.get_network_info('netid')
@@ -934,6 +993,108 @@ class TestNetworkCache(base.BaseTestCase):
         nc.put(fake_network)
         self.assertEqual(nc.get_port_by_id(fake_port1.id), fake_port1)
 
+    def test_fingerprints(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        nc.put_fingerprint(fake_network.id, 'fp1')
+        nc.put_fingerprint('other', 'fp2')
+        self.assertEqual(nc.get_fingerprint(fake_network.id), 'fp1')
+
+        nc.prune_fingerprints([fake_network.id])
+        self.assertIsNone(nc.get_fingerprint('other'))
+        nc.remove(fake_network)
+        self.assertIsNone(nc.get_fingerprint(fake_network.id))
+
+
+class TestNetworkEventQueue(base.BaseTestCase):
+    def setUp(self):
+        super(TestNetworkEventQueue, self).setUp()
+        self.process = mock.Mock()
+        self.queue = dhcp_agent.NetworkEventQueue(self.process, 0.5, 4)
+
+    def test_put_merges_pending_events(self):
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            self.queue.processed_at['net-1'] = time.time()
+            self.queue.put('net-1', dhcp_agent.RELOAD_HOSTS)
+            self.queue.put('net-1', dhcp_agent.REFRESH)
+            self.queue.put('net-1', dhcp_agent.RELOAD_HOSTS)
+            self.assertEqual(spawn_after.call_count, 1)
+        self.assertEqual(self.queue.pending['net-1'][0], dhcp_agent.REFRESH)
+        self.assertFalse(self.process.called)
+
+        self.queue._run('net-1')
+        self.process.assert_called_once_with('net-1', dhcp_agent.REFRESH)
+        self.assertEqual(self.queue.pending, {})
+        self.assertEqual(self.queue.scheduled, set())
+        state = self.queue.get_state()
+        self.assertEqual(state['events'], 3)
+        self.assertEqual(state['events_merged'], 2)
+        self.assertEqual(state['event_merge_ratio'], 0.667)
+        self.assertEqual(state['events_pending'], 0)
+
+    def test_merge(self):
+        merge = dhcp_agent.NetworkEventQueue._merge
+        self.assertEqual(merge(dhcp_agent.REFRESH, dhcp_agent.DISABLE),
+                         dhcp_agent.DISABLE)
+        self.assertEqual(merge(dhcp_agent.DISABLE, dhcp_agent.ENABLE),
+                         dhcp_agent.ENABLE)
+        self.assertEqual(merge(dhcp_agent.DISABLE, dhcp_agent.REFRESH),
+                         dhcp_agent.DISABLE)
+        self.assertEqual(merge(dhcp_agent.ENABLE, dhcp_agent.RELOAD_HOSTS),
+                         dhcp_agent.ENABLE)
+
+    def test_networks_processed_in_parallel(self):
+        def process(network_id, action):
+            processing.append(network_id)
+            concurrency.append(len(processing))
+            eventlet.sleep(0.01)
+            processing.remove(network_id)
+
+        processing = []
+        concurrency = []
+        self.process.side_effect = process
+        self.queue.pool = eventlet.GreenPool(2)
+        for network_id in ('net-1', 'net-2', 'net-3'):
+            self.queue.put(network_id, dhcp_agent.ENABLE)
+        self.queue.pool.waitall()
+        self.assertEqual(self.process.call_count, 3)
+        self.assertEqual(max(concurrency), 2)
+
+    def test_events_while_processing_are_deferred(self):
+        def process(network_id, action):
+            self.queue.put(network_id, dhcp_agent.RELOAD_HOSTS)
+
+        self.process.side_effect = process
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            self.queue.put('net-1', dhcp_agent.ENABLE)
+            self.queue.pool.waitall()
+            self.process.assert_called_once_with('net-1', dhcp_agent.ENABLE)
+            spawn_after.assert_called_once_with(
+                mock.ANY, self.queue.pool.spawn_n, self.queue._run, 'net-1')
+            self.assertTrue(0 < spawn_after.call_args[0][0] <= 0.5)
+
+    def test_process_exception(self):
+        self.process.side_effect = Exception
+        with mock.patch.object(dhcp_agent.LOG, 'exception') as log:
+            self.queue.put('net-1', dhcp_agent.ENABLE)
+            self.queue.pool.waitall()
+            self.assertTrue(log.called)
+        self.assertEqual(self.queue.scheduled, set())
+
+    def test_processed_at_pruned(self):
+        self.queue.processed_at['net-old'] = time.time() - 1
+        self.queue.put('net-1', dhcp_agent.ENABLE)
+        self.queue.pool.waitall()
+        self.assertEqual(self.queue.processed_at.keys(), ['net-1'])
+
+    def test_no_interval(self):
+        self.queue.interval = 0
+        self.queue.put('net-1', dhcp_agent.DISABLE)
+        self.process.assert_called_once_with('net-1', dhcp_agent.DISABLE)
+        self.assertEqual(self.queue.processed_at, {})
+
 
 class TestDeviceManager(base.BaseTestCase):
     def setUp(self):
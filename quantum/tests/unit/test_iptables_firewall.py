@@ -914,3 +914,78 @@ class IptablesFirewallTestCase(base.BaseTestCase):
             pass
         self.iptables_inst.assert_has_calls([call.defer_apply_on(),
                                              call.defer_apply_off()])
+
+
+class IptablesFirewallIpsetTestCase(IptablesFirewallTestCase):
+    def setUp(self):
+        cfg.CONF.set_override('enable_ipset', True, 'SECURITYGROUP')
+        self.addCleanup(cfg.CONF.clear_override, 'enable_ipset',
+                        'SECURITYGROUP')
+        super(IptablesFirewallIpsetTestCase, self).setUp()
+        self.firewall.ipset = mock.Mock()
+        self.firewall.ipset.ipsets = {}
+
+    def _remote_group_port(self):
+        port = self._fake_port()
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': 'ingress',
+                                         'protocol': 'tcp',
+                                         'remote_group_id': 'fake_sgid'}]
+        return port
+
+    def test_update_security_group_members(self):
+        self.firewall.ipset.ipsets = {'IPv4fake_sgid': set()}
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2'], 'IPv6': ['fe80::2']})
+        self.firewall.ipset.set_members.assert_called_once_with(
+            'IPv4fake_sgid', 'IPv4', ['10.0.0.2'])
+
+    def test_update_security_group_members_without_set(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2'], 'IPv6': []})
+        self.assertFalse(self.firewall.ipset.set_members.called)
+
+    def test_prepare_port_filter_remote_group_set(self):
+        self.firewall.ipset.ipsets = {'IPv4fake_sgid': set(['10.0.0.2'])}
+        self.firewall.prepare_port_filter(self._remote_group_port())
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev',
+                           '-j RETURN -p tcp ! -s 10.0.0.1 '
+                           '-m set --match-set IPv4fake_sgid src')])
+        self.assertEqual(self.firewall.used_ipsets, set(['IPv4fake_sgid']))
+
+    def test_prepare_port_filter_remote_group_without_set(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2'], 'IPv6': ['fe80::2']})
+        self.firewall.prepare_port_filter(self._remote_group_port())
+        self.firewall.ipset.set_members.assert_called_once_with(
+            'IPv4fake_sgid', 'IPv4', ['10.0.0.2'])
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev',
+                           '-j RETURN -p tcp ! -s 10.0.0.1 '
+                           '-m set --match-set IPv4fake_sgid src')])
+
+    def test_prepare_port_filter_remote_group_own_ips_set(self):
+        self.firewall.ipset.ipsets = {'IPv4fake_sgid': set(['10.0.0.2'])}
+        port = self._remote_group_port()
+        port['fixed_ips'] = ['10.0.0.1', '10.0.0.3']
+        self.firewall.prepare_port_filter(port)
+        self.firewall.ipset.set_members.assert_called_once_with(
+            'IPv4porttapfake_dev', 'IPv4', ['10.0.0.1', '10.0.0.3'])
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev',
+                           '-j RETURN -p tcp '
+                           '-m set ! --match-set IPv4porttapfake_dev src '
+                           '-m set --match-set IPv4fake_sgid src')])
+        self.assertEqual(self.firewall.used_ipsets,
+                         set(['IPv4fake_sgid', 'IPv4porttapfake_dev']))
+
+    def test_defer_apply_removes_unused_sets(self):
+        self.firewall.ipset.ipsets = {'IPv4fake_sgid': set(['10.0.0.2']),
+                                      'IPv4old_sgid': set(['10.0.0.3'])}
+        self.firewall.sg_members = {'fake_sgid': {'IPv4': ['10.0.0.2']},
+                                    'old_sgid': {'IPv4': ['10.0.0.3']}}
+        with self.firewall.defer_apply():
+            self.firewall.prepare_port_filter(self._remote_group_port())
+        self.firewall.ipset.destroy.assert_called_once_with('IPv4old_sgid')
+        self.assertEqual(self.firewall.sg_members.keys(), ['fake_sgid'])
@@ -20,6 +20,7 @@
 import inspect
 import os
 
+import mock
 import mox
 
 from quantum.agent.linux import iptables_manager
@@ -302,3 +303,109 @@ class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def test_nat_not_found(self):
         self.assertFalse('nat' in self.iptables.ipv4)
+
+
+class IptablesManagerIncrementalTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.execute = mock.Mock(return_value='')
+        self.iptables = iptables_manager.IptablesManager(
+            _execute=self.execute, root_helper='sudo', incremental=True)
+        self.bn = iptables_manager.binary_name
+
+    def _restore_calls(self):
+        return [c for c in self.execute.call_args_list
+                if c[0][0][0].endswith('-restore')]
+
+    def test_first_apply_is_full(self):
+        self.iptables.apply()
+        self.assertEqual(self.execute.call_count, 4)
+        self.assertEqual(self.iptables.apply_stats['full_applies'], 2)
+        self.assertEqual(self.iptables.apply_stats['incremental_applies'], 0)
+
+    def test_unchanged_apply_is_skipped(self):
+        self.iptables.apply()
+        self.execute.reset_mock()
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+        self.assertEqual(self.iptables.apply_stats['skipped_applies'], 2)
+        self.assertEqual(self.iptables.apply_stats['last_delta_size'], 0)
+
+    def test_changed_chain_only(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.apply()
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '--noflush'],
+            process_input=('*filter\n:%s-filter - [0:0]\n'
+                           '-A %s-filter -j DROP\nCOMMIT' %
+                           (self.bn, self.bn)),
+            root_helper='sudo')
+        self.assertEqual(self.iptables.apply_stats['incremental_applies'], 1)
+        self.assertEqual(self.iptables.apply_stats['last_delta_size'], 2)
+
+    def test_remove_chain_and_builtin_jump(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j $filter')
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.apply()
+        bn = self.bn
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '--noflush'],
+            process_input=('*filter\n:%s-INPUT - [0:0]\n'
+                           ':%s-filter - [0:0]\n'
+                           '-X %s-filter\nCOMMIT' % (bn, bn, bn)),
+            root_helper='sudo')
+
+    def test_shared_chain_rules_are_replaced_in_place(self):
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+        self.iptables.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT',
+                                              wrap=False)
+        self.iptables.apply()
+        bn = self.bn
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '--noflush'],
+            process_input=('*filter\n'
+                           '-D FORWARD -j quantum-filter-top\n'
+                           '-D FORWARD -j %s-FORWARD\n'
+                           '-I FORWARD 1 -j quantum-filter-top\n'
+                           '-I FORWARD 2 -j %s-FORWARD\n'
+                           '-I FORWARD 3 -j ACCEPT\nCOMMIT' % (bn, bn)),
+            root_helper='sudo')
+
+    def test_failed_incremental_apply_falls_back_to_full(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.apply()
+
+        def _execute(args, **kwargs):
+            if '--noflush' in args:
+                raise RuntimeError()
+            return ''
+
+        self.execute.reset_mock()
+        self.execute.side_effect = _execute
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.apply()
+        restores = self._restore_calls()
+        self.assertEqual(len(restores), 2)
+        self.assertEqual(restores[-1][0][0], ['iptables-restore'])
+        self.assertEqual(self.iptables.apply_stats['full_applies'], 3)
+
+    def test_namespace_is_used(self):
+        self.iptables.namespace = 'qrouter-foo'
+        self.iptables.apply()
+        self.execute.reset_mock()
+        self.iptables.ipv4['nat'].add_rule('snat', '-j ACCEPT')
+        self.iptables.apply()
+        self.assertEqual(self.execute.call_args[0][0],
+                         ['ip', 'netns', 'exec', 'qrouter-foo',
+                          'iptables-restore', '--noflush'])
@@ -15,8 +15,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
+import time
 
+import eventlet
 import mock
 from oslo.config import cfg
 
@@ -381,6 +384,7 @@ class TestBasicRouterOperations(base.BaseTestCase):
              'admin_state_up': True,
              'routes': [],
              'external_gateway_info': {}}]
+        agent.after_start()
         agent._process_routers(routers)
 
         agent.router_deleted(None, routers[0]['id'])
@@ -390,6 +394,111 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self.device_exists.assert_has_calls(
             [mock.call(self.conf.external_network_bridge)])
 
+    def testOutdatedRouterUpdateSkipped(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router_id = _uuid()
+        agent._router_timestamps[router_id] = 10
+        with mock.patch.object(agent, '_router_added') as router_added:
+            agent._process_router_update(l3_agent.RouterUpdate(
+                router_id, l3_agent.PRIORITY_SYNC_ROUTERS, 5,
+                {'id': router_id}))
+        self.assertFalse(router_added.called)
+        self.assertEqual(agent._router_timestamps[router_id], 10)
+
+    def testRemovedRouterTimestampsPruned(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        known_id, removed_id, recent_id = _uuid(), _uuid(), _uuid()
+        agent.router_info[known_id] = mock.Mock()
+        agent._router_timestamps = {known_id: 10, removed_id: 10,
+                                    recent_id: time.time()}
+        agent._prune_router_timestamps()
+        self.assertEqual(sorted(agent._router_timestamps),
+                         sorted([known_id, recent_id]))
+
+    def _test_router_delta(self, revision_number):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.after_start()
+        router_id = _uuid()
+        router = {'id': router_id, 'revision_number': 3,
+                  l3_constants.FLOATINGIP_KEY: []}
+        agent.router_info[router_id] = l3_agent.RouterInfo(
+            router_id, self.conf.root_helper, self.conf.use_namespaces,
+            router=router)
+        fip = {'id': _uuid(), 'floating_ip_address': '8.8.8.8',
+               'fixed_ip_address': '7.7.7.7', 'port_id': _uuid()}
+        delta = {'router_id': router_id, 'revision_number': revision_number,
+                 'floatingips_added': [fip]}
+        with contextlib.nested(
+            mock.patch.object(agent, 'process_router'),
+            mock.patch('eventlet.spawn_n')
+        ) as (process_router, spawn_n):
+            agent.router_delta(None, delta)
+        return agent, router, process_router, spawn_n
+
+    def testRouterDeltaApplied(self):
+        agent, router, process_router, spawn_n = self._test_router_delta(4)
+        process_router.assert_called_once_with(
+            agent.router_info[router['id']])
+        self.assertEqual(4, router['revision_number'])
+        self.assertEqual(1, len(router[l3_constants.FLOATINGIP_KEY]))
+        self.assertFalse(spawn_n.called)
+
+    def testOutdatedRouterDeltaSkipped(self):
+        agent, router, process_router, spawn_n = self._test_router_delta(3)
+        self.assertFalse(process_router.called)
+        self.assertFalse(spawn_n.called)
+        self.assertEqual(3, router['revision_number'])
+
+    def testRouterDeltaGapFetchesRouter(self):
+        agent, router, process_router, spawn_n = self._test_router_delta(5)
+        self.assertFalse(process_router.called)
+        spawn_n.assert_called_once_with(agent._resync_router, router['id'])
+        self.assertEqual([], router[l3_constants.FLOATINGIP_KEY])
+
+    def testApplyRouterDelta(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        fips = [{'id': 'fip1', 'fixed_ip_address': '10.0.0.1'},
+                {'id': 'fip2', 'fixed_ip_address': '10.0.0.2'},
+                {'id': 'fip3', 'fixed_ip_address': '10.0.0.3'}]
+        router = {l3_constants.FLOATINGIP_KEY: fips,
+                  l3_constants.INTERFACE_KEY: [{'id': 'port1'}]}
+        agent._apply_router_delta(router, {
+            'floatingips_removed': ['fip1', 'fip2'],
+            'floatingips_added': [{'id': 'fip2',
+                                   'fixed_ip_address': '10.0.0.4'},
+                                  {'id': 'fip4',
+                                   'fixed_ip_address': '10.0.0.5'}],
+            'interfaces_added': [{'id': 'port2'}]})
+        self.assertEqual([('fip3', '10.0.0.3'), ('fip2', '10.0.0.4'),
+                          ('fip4', '10.0.0.5')],
+                         [(fip['id'], fip['fixed_ip_address'])
+                          for fip in router[l3_constants.FLOATINGIP_KEY]])
+        self.assertEqual(['port1', 'port2'],
+                         [p['id'] for p in
+                          router[l3_constants.INTERFACE_KEY]])
+
+    def testResyncRouter(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router_id = _uuid()
+        self.plugin_api.get_routers.return_value = [{'id': _uuid()},
+                                                    {'id': router_id}]
+        with mock.patch.object(agent, '_process_routers') as process_routers:
+            agent._resync_router(router_id)
+        self.plugin_api.get_routers.assert_called_once_with(
+            agent.context, router_id=router_id)
+        self.assertEqual([{'id': router_id}],
+                         process_routers.call_args[0][0])
+
+    def testResyncDeletedRouter(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.after_start()
+        router_id = _uuid()
+        self.plugin_api.get_routers.return_value = []
+        with mock.patch.object(agent, '_router_removed') as router_removed:
+            agent.router_info[router_id] = mock.Mock()
+            agent._resync_router(router_id)
+        router_removed.assert_called_once_with(router_id)
+
     def testDestroyNamespace(self):
 
         class FakeDev(object):
@@ -459,6 +568,56 @@ class TestBasicRouterOperations(base.BaseTestCase):
         self._configure_metadata_proxy(enableflag=False)
 
 
+class TestRouterProcessingQueue(base.BaseTestCase):
+
+    def _process(self, updates, workers):
+        processed = []
+
+        def process_update(update):
+            processed.append((update.router_id, 'start'))
+            eventlet.sleep(0)
+            processed.append((update.router_id, 'end'))
+
+        router_queue = l3_agent.RouterProcessingQueue(process_update,
+                                                      workers)
+        router_queue.start()
+        router_queue.process(updates)
+        return processed
+
+    def test_rpc_updates_before_sync(self):
+        updates = [
+            l3_agent.RouterUpdate('r1', l3_agent.PRIORITY_SYNC_ROUTERS, 1),
+            l3_agent.RouterUpdate('r2', l3_agent.PRIORITY_RPC, 1)]
+        processed = self._process(updates, 1)
+        self.assertEqual(processed, [('r2', 'start'), ('r2', 'end'),
+                                     ('r1', 'start'), ('r1', 'end')])
+
+    def test_same_router_processed_serially(self):
+        updates = [l3_agent.RouterUpdate('r1', l3_agent.PRIORITY_RPC, i)
+                   for i in range(3)]
+        updates.append(l3_agent.RouterUpdate('r2', l3_agent.PRIORITY_RPC, 0))
+        processed = self._process(updates, 4)
+        r1 = [step for router_id, step in processed if router_id == 'r1']
+        self.assertEqual(r1, ['start', 'end'] * 3)
+        self.assertIn(('r2', 'start'), processed[:3])
+
+    def test_failed_update_is_done(self):
+        update = l3_agent.RouterUpdate('r1', l3_agent.PRIORITY_RPC, 0)
+        router_queue = l3_agent.RouterProcessingQueue(
+            mock.Mock(side_effect=RuntimeError), 1)
+        router_queue.start()
+        router_queue.process([update])
+        self.assertTrue(update.done.ready())
+
+    def test_workers_spawned_on_start(self):
+        with mock.patch('eventlet.spawn_n') as spawn_n:
+            router_queue = l3_agent.RouterProcessingQueue(mock.Mock(), 2)
+            self.assertFalse(spawn_n.called)
+            router_queue.start()
+            router_queue.start()
+        self.assertEqual(spawn_n.call_count, 2)
+
+
 class TestL3AgentEventHandler(base.BaseTestCase):
 
     def setUp(self):
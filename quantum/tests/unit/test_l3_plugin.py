@@ -24,6 +24,7 @@ import itertools
 
 import mock
 from oslo.config import cfg
+import sqlalchemy
 from webob import exc
 import webtest
 
@@ -1577,6 +1578,55 @@ class L3NatDBTestCase(L3NatTestCaseBase):
     def test_floatingips_op_agent(self):
         self._test_notify_op_agent(self._test_floatingips_op_agent)
 
+    def _test_interfaces_delta_agent(self, r, notifyApi):
+        with self.port(no_delete=True) as p:
+            self._router_interface_action('add',
+                                          r['router']['id'],
+                                          None,
+                                          p['port']['id'])
+            self._router_interface_action('remove',
+                                          r['router']['id'],
+                                          None,
+                                          p['port']['id'])
+        self.assertFalse(notifyApi.routers_updated.called)
+        added, removed = [args[1] for args, kwargs in
+                          notifyApi.router_delta.call_args_list]
+        self.assertEqual([p['port']['id']],
+                         [port['id'] for port in added['interfaces_added']])
+        self.assertIn('subnet', added['interfaces_added'][0])
+        self.assertEqual([p['port']['id']], removed['interfaces_removed'])
+        self.assertEqual(added['revision_number'] + 1,
+                         removed['revision_number'])
+
+    def test_interfaces_delta_agent(self):
+        cfg.CONF.set_override('l3_delta_updates', True)
+        with self.router() as r:
+            self._test_notify_op_agent(
+                self._test_interfaces_delta_agent, r)
+
+    def _test_floatingips_delta_agent(self, notifyApi):
+        with self.floatingip_with_assoc() as fip:
+            fip_id = fip['floatingip']['id']
+            self._update('floatingips', fip_id,
+                         {'floatingip': {'port_id': None}})
+        # add gateway, delete gateway
+        self.assertEqual(2, notifyApi.routers_updated.call_count)
+        deltas = [args[1] for args, kwargs in
+                  notifyApi.router_delta.call_args_list]
+        revisions = [delta['revision_number'] for delta in deltas]
+        self.assertEqual(sorted(set(revisions)), revisions)
+        added = [delta['floatingips_added'] for delta in deltas
+                 if 'floatingips_added' in delta]
+        removed = [delta['floatingips_removed'] for delta in deltas
+                   if 'floatingips_removed' in delta]
+        self.assertEqual([fip_id], [floatingip['id'] for floatingip in
+                                    added[0]])
+        self.assertEqual([fip_id], removed[-1])
+
+    def test_floatingips_delta_agent(self):
+        cfg.CONF.set_override('l3_delta_updates', True)
+        self._test_notify_op_agent(self._test_floatingips_delta_agent)
+
     def test_l3_agent_routers_query_interfaces(self):
         with self.router() as r:
             with self.port(no_delete=True) as p:
@@ -1660,6 +1710,79 @@ class L3NatDBTestCase(L3NatTestCaseBase):
             self.assertTrue(floatingips[0]['fixed_ip_address'] is not None)
             self.assertTrue(floatingips[0]['router_id'] is not None)
 
+    def test_l3_agent_routers_query_revision_number(self):
+        with self.floatingip_with_assoc() as fip:
+            plugin = TestL3NatPlugin()
+            ctx = context.get_admin_context()
+            router_id = fip['floatingip']['router_id']
+            before = plugin.get_sync_data(ctx, router_id)[0]
+            self._update('floatingips', fip['floatingip']['id'],
+                         {'floatingip': {'port_id': None}})
+            after = plugin.get_sync_data(ctx, router_id)[0]
+            self.assertEqual(before['revision_number'] + 1,
+                             after['revision_number'])
+
+    def test_l3_agent_routers_query_matches_plugin_calls(self):
+        with self.floatingip_with_assoc() as fip:
+            plugin = TestL3NatPlugin()
+            ctx = context.get_admin_context()
+            router_ids = [fip['floatingip']['router_id']]
+            routers = plugin.get_sync_data(ctx, router_ids)
+            del routers[0]['revision_number']
+            expected = plugin._process_sync_data(
+                plugin._get_sync_routers(ctx, router_ids),
+                plugin.get_sync_interfaces(ctx, router_ids),
+                plugin._get_sync_floating_ips(ctx, router_ids))
+            # The synced ports are not extended by the port extensions
+            port_keys = routers[0]['gw_port'].keys()
+            for port in ([expected[0]['gw_port']] +
+                         expected[0][l3_constants.INTERFACE_KEY]):
+                for key in set(port) - set(port_keys):
+                    del port[key]
+            self.assertEqual(expected, routers)
+
+    def test_l3_agent_routers_query_chunked(self):
+        with contextlib.nested(self.router(), self.router()) as routers:
+            plugin = TestL3NatPlugin()
+            router_ids = [r['router']['id'] for r in routers]
+            with mock.patch.object(l3_db, 'SYNC_CHUNK_SIZE', new=1):
+                synced = plugin.get_sync_data(context.get_admin_context(),
+                                              router_ids)
+            self.assertEqual(sorted(router_ids),
+                             sorted(r['id'] for r in synced))
+
+    def test_l3_agent_routers_query_count(self):
+        statements = []
+
+        def count_queries(router_ids):
+            del statements[:]
+            plugin.get_sync_data(ctx, router_ids)
+            return len(statements)
+
+        plugin = TestL3NatPlugin()
+        ctx = context.get_admin_context()
+        # The engine, and its listener, are dropped at the end of the test
+        sqlalchemy.event.listen(
+            ctx.session.get_bind(), 'before_cursor_execute',
+            lambda conn, cursor, statement, *args: statements.append(
+                statement))
+        with contextlib.nested(self.subnet(cidr='10.0.1.0/24'),
+                               self.subnet(cidr='10.0.2.0/24'),
+                               self.router(), self.router()) as (
+                                   s1, s2, r1, r2):
+            self._router_interface_action('add', r1['router']['id'],
+                                          s1['subnet']['id'], None)
+            self._router_interface_action('add', r2['router']['id'],
+                                          s2['subnet']['id'], None)
+            one = count_queries([r1['router']['id']])
+            two = count_queries([r1['router']['id'], r2['router']['id']])
+            self._router_interface_action('remove', r1['router']['id'],
+                                          s1['subnet']['id'], None)
+            self._router_interface_action('remove', r2['router']['id'],
+                                          s2['subnet']['id'], None)
+        self.assertTrue(one)
+        self.assertEqual(one, two)
+
     def test_router_delete_subnet_inuse_returns_409(self):
         with self.router() as r:
             with self.subnet() as s:
@@ -620,6 +620,50 @@ tag:tag1,option:classless-static-route,%s,%s""".lstrip() % (fake_v6,
                                     mock.call(exp_opt_name, exp_opt_data)])
         self.execute.assert_called_once_with(exp_args, 'sudo')
 
+    def _test_reload_hosts(self, old_host_data):
+        exp_host_name = '/dhcp/cccccccc-cccc-cccc-cccc-cccccccccccc/host'
+        exp_host_data = """
+00:00:80:aa:bb:cc,192-168-0-2.openstacklocal,192.168.0.2
+00:00:f3:aa:bb:cc,fdca-3ba5-a17a-4ba3--2.openstacklocal,fdca:3ba5:a17a:4ba3::2
+00:00:0f:aa:bb:cc,192-168-0-3.openstacklocal,192.168.0.3
+00:00:0f:aa:bb:cc,fdca-3ba5-a17a-4ba3--3.openstacklocal,fdca:3ba5:a17a:4ba3::3
+""".lstrip()
+
+        with mock.patch.object(dhcp.Dnsmasq, 'active') as active:
+            active.__get__ = mock.Mock(return_value=True)
+            with mock.patch.object(dhcp.Dnsmasq, 'pid') as pid:
+                pid.__get__ = mock.Mock(return_value=5)
+                dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(),
+                                  namespace='qdhcp-ns', version=float(2.59))
+                with mock.patch.object(dm, '_get_value_from_conf_file',
+                                       return_value=old_host_data(
+                                           exp_host_data)) as get_value:
+                    with mock.patch.object(dm,
+                                           '_output_opts_file') as opts:
+                        dm.reload_hosts()
+                        get_value.assert_called_once_with('host')
+                        self.assertFalse(opts.called)
+        return exp_host_name, exp_host_data
+
+    def test_reload_hosts(self):
+        exp_host_name, exp_host_data = self._test_reload_hosts(
+            lambda data: data.replace('0f', '0e'))
+        self.safe.assert_called_once_with(exp_host_name, exp_host_data)
+        self.execute.assert_called_once_with(['kill', '-HUP', 5], 'sudo')
+
+    def test_reload_hosts_unchanged(self):
+        self._test_reload_hosts(lambda data: data)
+        self.assertFalse(self.safe.called)
+        self.assertFalse(self.execute.called)
+
+    def test_reload_hosts_no_dhcp(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
+        with mock.patch.object(dm, '_enable_dhcp', return_value=False):
+            with mock.patch.object(dm, 'reload_allocations') as reload:
+                dm.reload_hosts()
+                reload.assert_called_once_with()
+        self.assertFalse(self.safe.called)
+
     def test_make_subnet_interface_ip_map(self):
         with mock.patch('quantum.agent.linux.ip_lib.IPDevice') as ip_dev:
             ip_dev.return_value.addr.list.return_value = [
@@ -0,0 +1,131 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from quantum.agent.linux import ovsdb_monitor
+from quantum.tests import base
+
+
+HEADINGS = '"headings":["row","action","name","external_ids","ofport"]'
+INITIAL = ('{"data":[["uuid-1","initial","tap1",'
+           '["map",[["attached-mac","fa:16:3e:00:00:01"],'
+           '["iface-id","port-1"]]],1],'
+           '["uuid-2","initial","br-int",["map",[]],65534]],' + HEADINGS +
+           '}')
+INSERT = ('{"data":[["uuid-3","insert","tap3",'
+          '["map",[["attached-mac","fa:16:3e:00:00:03"],'
+          '["iface-id","port-3"]]],["set",[]]]],' + HEADINGS + '}')
+MODIFY = ('{"data":[["uuid-3","old",null,null,["set",[]]],'
+          '["uuid-3","new","tap3",'
+          '["map",[["attached-mac","fa:16:3e:00:00:03"],'
+          '["iface-id","port-3"]]],3]],' + HEADINGS + '}')
+DELETE = ('{"data":[["uuid-1","delete","tap1",'
+          '["map",[["attached-mac","fa:16:3e:00:00:01"],'
+          '["iface-id","port-1"]]],1]],' + HEADINGS + '}')
+
+
+class TestParseOvsdbValue(base.BaseTestCase):
+
+    def test_map(self):
+        self.assertEqual(ovsdb_monitor.parse_ovsdb_value(
+            ['map', [['a', '1'], ['b', '2']]]), {'a': '1', 'b': '2'})
+
+    def test_set(self):
+        self.assertEqual(ovsdb_monitor.parse_ovsdb_value(['set', []]), [])
+
+    def test_uuid(self):
+        self.assertEqual(ovsdb_monitor.parse_ovsdb_value(['uuid', 'x']), 'x')
+
+    def test_atom(self):
+        self.assertEqual(ovsdb_monitor.parse_ovsdb_value(5), 5)
+
+
+class TestOvsdbMonitor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestOvsdbMonitor, self).setUp()
+        self.monitor = ovsdb_monitor.OvsdbMonitor(root_helper='sudo')
+
+    def _iface_ids(self):
+        return set(ids.get('iface-id')
+                   for ids in self.monitor.get_external_ids())
+
+    def test_get_cmd(self):
+        self.assertEqual(self.monitor._get_cmd(),
+                         ['sudo', 'ovsdb-client', 'monitor', 'Interface',
+                          'name,external_ids,ofport', '--format=json'])
+
+    def test_initial_dump_syncs(self):
+        self.assertFalse(self.monitor.synced)
+        self.monitor.process_output(INITIAL)
+        self.assertTrue(self.monitor.synced)
+        self.assertEqual(self._iface_ids(), set(['port-1', None]))
+
+    def test_insert_modify_delete(self):
+        self.monitor.process_output(INITIAL)
+        self.monitor.process_output(INSERT)
+        self.assertEqual(self._iface_ids(), set(['port-1', 'port-3', None]))
+        self.monitor.process_output(MODIFY)
+        self.assertEqual(self.monitor.interfaces['uuid-3']['ofport'], 3)
+        self.monitor.process_output(DELETE)
+        self.assertEqual(self._iface_ids(), set(['port-3', None]))
+
+    def test_get_external_ids_of_names(self):
+        self.monitor.process_output(INITIAL)
+        self.monitor.process_output(INSERT)
+        self.assertEqual(self.monitor.get_external_ids(['tap3', 'qg-1']),
+                         [{'attached-mac': 'fa:16:3e:00:00:03',
+                           'iface-id': 'port-3'}])
+
+    def test_blank_line_ignored(self):
+        self.monitor.process_output('\n')
+        self.assertFalse(self.monitor.synced)
+
+    def test_wait_returns_true_after_change(self):
+        self.monitor.process_output(INITIAL)
+        self.assertTrue(self.monitor.wait(0))
+        self.assertFalse(self.monitor.wait(0))
+
+    def test_wait_times_out(self):
+        self.assertFalse(self.monitor.wait(0.01))
+
+    def test_kill_process_invalidates(self):
+        self.monitor.process_output(INITIAL)
+        process = mock.Mock()
+        self.monitor._process = process
+        self.monitor._kill_process()
+        process.kill.assert_called_once_with()
+        self.assertFalse(self.monitor.synced)
+        self.assertEqual(self.monitor.interfaces, {})
+
+    def test_run_respawns_after_exit(self):
+        process = mock.Mock()
+        process.stdout.readline.side_effect = [INITIAL, '']
+
+        def _sleep(interval):
+            self.monitor._stopped = True
+
+        with mock.patch.object(ovsdb_monitor.utils, 'subprocess_popen',
+                               return_value=process) as popen:
+            with mock.patch.object(ovsdb_monitor.eventlet, 'sleep',
+                                   side_effect=_sleep) as sleep:
+                self.monitor._run()
+        popen.assert_called_once_with(self.monitor._get_cmd(),
+                                      stdout=ovsdb_monitor.subprocess.PIPE)
+        sleep.assert_called_once_with(self.monitor.respawn_interval)
+        self.assertFalse(self.monitor.synced)
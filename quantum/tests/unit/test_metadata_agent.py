@@ -37,6 +37,12 @@ class FakeConf(object):
     nova_metadata_ip = '9.9.9.9'
     nova_metadata_port = 8775
     metadata_proxy_shared_secret = 'secret'
+    metadata_pool_size = 4
+    metadata_cache_size = 100
+    metadata_cache_ttl = 30
+    metadata_cache_notifications = True
+    metadata_stats_interval = 0
+    host = 'host'
 
 
 class TestMetadataProxyHandler(base.BaseTestCase):
@@ -235,12 +241,143 @@ class TestMetadataProxyHandler(base.BaseTestCase):
         with testtools.ExpectedException(Exception):
             self._proxy_request_test_helper(302)
 
+    def test_proxy_request_reuses_connection(self):
+        req = mock.Mock(path_info='/the_path', query_string='', headers={},
+                        method='GET', body='')
+        with mock.patch('httplib2.Http') as mock_http:
+            mock_http.return_value.request.return_value = (
+                mock.Mock(status=200), 'content')
+            self.handler._proxy_request('the_id', req)
+            self.handler._proxy_request('the_id', req)
+            mock_http.assert_called_once_with()
+            self.assertEqual(mock_http.return_value.request.call_count, 2)
+
     def test_sign_instance_id(self):
         self.assertEqual(
             self.handler._sign_instance_id('foo'),
             '773ba44693c7553d6ee20f61ea5d2757a9a4f4a44d2841ae4e95b52e4cd62db4'
         )
 
+    def _get_instance_id_twice(self, headers, list_ports_retval):
+        headers['X-Forwarded-For'] = '192.168.1.1'
+        req = mock.Mock(headers=headers)
+        list_ports = self.qclient.return_value.list_ports
+        list_ports.side_effect = lambda **kwargs: {
+            'ports': list_ports_retval.pop(0)}
+        self.handler._get_instance_id(req)
+        retval = self.handler._get_instance_id(req)
+        return retval, list_ports.call_count
+
+    def test_get_instance_id_cached(self):
+        ports = [[{'id': 'p1', 'device_id': 'device_id'}]]
+        retval, calls = self._get_instance_id_twice(
+            {'X-Quantum-Network-ID': 'the_id'}, ports)
+        self.assertEqual(retval, 'device_id')
+        self.assertEqual(calls, 1)
+        self.assertEqual(self.qclient.call_count, 1)
+        stats = self.handler.get_stats()
+        self.assertEqual(stats['cache_hits'], 1)
+        self.assertEqual(stats['cache_misses'], 1)
+        self.assertEqual(stats['cache_hit_rate'], 0.5)
+
+    def test_get_instance_id_not_cached_without_notifications(self):
+        conf = mock.Mock(metadata_cache_notifications=False,
+                         metadata_cache_size=100,
+                         metadata_cache_ttl=30,
+                         metadata_pool_size=4)
+        self.handler = agent.MetadataProxyHandler(conf)
+        ports = [[{'id': 'p1', 'device_id': 'device_id'}],
+                 [{'id': 'p1', 'device_id': 'device_id'}]]
+        retval, calls = self._get_instance_id_twice(
+            {'X-Quantum-Network-ID': 'the_id'}, ports)
+        self.assertEqual(retval, 'device_id')
+        self.assertEqual(calls, 2)
+
+    def test_get_instance_id_router_id_cached(self):
+        ports = [
+            [{'id': 'p1', 'network_id': 'net1'}],
+            [{'id': 'p2', 'device_id': 'device_id'}]
+        ]
+        retval, calls = self._get_instance_id_twice(
+            {'X-Quantum-Router-ID': 'the_id'}, ports)
+        self.assertEqual(retval, 'device_id')
+        self.assertEqual(calls, 2)
+
+    def test_get_instance_id_no_match_not_cached(self):
+        ports = [[], [{'id': 'p1', 'device_id': 'device_id'}]]
+        retval, calls = self._get_instance_id_twice(
+            {'X-Quantum-Network-ID': 'the_id'}, ports)
+        self.assertEqual(retval, 'device_id')
+        self.assertEqual(calls, 2)
+
+    def _cache_lookups(self):
+        cache = self.handler.cache
+        cache.set(('router', 'r1'), ('net1',), ['rp1'])
+        cache.set(('instance', ('net1',), '10.0.0.2'), 'vm1', ['p1'])
+        cache.set(('instance', ('net2',), '10.0.0.2'), 'vm2', ['p2'])
+        return cache
+
+    def test_port_delete_notification(self):
+        cache = self._cache_lookups()
+        self.handler.handle_notification(
+            {'event_type': 'port.delete.end', 'payload': {'port_id': 'p1'}})
+        self.assertIsNone(cache.get(('instance', ('net1',), '10.0.0.2')))
+        self.assertEqual(len(cache), 2)
+
+    def test_port_update_notification(self):
+        cache = self._cache_lookups()
+        self.handler.handle_notification(
+            {'event_type': 'port.update.end',
+             'payload': {'port': {'id': 'p3', 'network_id': 'net2'}}})
+        self.assertIsNone(cache.get(('instance', ('net2',), '10.0.0.2')))
+        self.assertEqual(len(cache), 2)
+
+    def test_router_interface_notification(self):
+        cache = self._cache_lookups()
+        self.handler.handle_notification(
+            {'event_type': 'router.interface.create',
+             'payload': {'router.interface': {'id': 'r1'}}})
+        self.assertIsNone(cache.get(('router', 'r1')))
+        self.assertEqual(len(cache), 2)
+
+    def test_start_notification_consumer(self):
+        self.handler.conf = mock.Mock(metadata_cache_notifications=True,
+                                      metadata_stats_interval=0,
+                                      host='host')
+        with mock.patch.object(agent.rpc, 'create_connection') as create:
+            self.handler.start()
+            create.assert_has_calls([
+                mock.call(new=True),
+                mock.call().declare_topic_consumer(
+                    'notifications.info', self.handler.handle_notification,
+                    queue_name='quantum-metadata-agent.host'),
+                mock.call().consume_in_thread()])
+
+
+class TestLookupCache(base.BaseTestCase):
+    def test_lru_eviction(self):
+        cache = agent.LookupCache(2, 30)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expiry(self):
+        cache = agent.LookupCache(2, 30)
+        with mock.patch('time.time') as now:
+            now.return_value = 100
+            cache.set('a', 1)
+            now.return_value = 131
+            self.assertIsNone(cache.get('a'))
+
+    def test_disabled(self):
+        cache = agent.LookupCache(2, 0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
 
 class TestUnixDomainHttpProtocol(base.BaseTestCase):
     def test_init_empty_client(self):
@@ -331,6 +331,92 @@ class QuantumPolicyTestCase(base.BaseTestCase):
             result = policy.enforce(self.context, action, target, self.plugin)
             self.assertTrue(result)
 
+    def test_compiled_rule_for_admin(self):
+        admin_context = context.get_admin_context()
+        compiled = policy._get_compiled_rule('get_network',
+                                             admin_context.to_dict())
+        self.assertIs(compiled, True)
+
+    def test_compiled_rule_for_user(self):
+        compiled = policy._get_compiled_rule('get_network',
+                                             self.context.to_dict())
+        self.assertIsInstance(compiled, policy._InlinedRuleCheck)
+        self.assertIsInstance(compiled.rule, common_policy.OrCheck)
+        self.assertEqual(len(compiled.rule.rules), 3)
+        self.assertEqual(policy._get_target_keys(compiled),
+                         set(['tenant_id', 'shared', 'router:external']))
+
+    def test_check_list_fetches_parents_once(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_network_owner")
+        ports = [{'id': 'p1', 'network_id': 'n1'},
+                 {'id': 'p2', 'network_id': 'n1'},
+                 {'id': 'p3', 'network_id': 'n2'},
+                 {'id': 'p4', 'network_id': 'n3'}]
+        networks = [{'id': 'n1', 'tenant_id': 'fake'},
+                    {'id': 'n2', 'tenant_id': 'somebody_else'}]
+        with mock.patch.object(self.plugin, 'get_networks',
+                               return_value=networks) as get_networks:
+            result = policy.check_list(self.context, 'get_port', ports,
+                                       plugin=self.plugin)
+            self.assertEqual([port['id'] for port in result], ['p1', 'p2'])
+        get_networks.assert_called_once_with(
+            self.context, filters={'id': mock.ANY},
+            fields=['id', 'tenant_id'])
+        self.assertEqual(
+            sorted(get_networks.call_args[1]['filters']['id']),
+            ['n1', 'n2', 'n3'])
+
+    def test_check_list_without_parent_in_rule(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_owner")
+        ports = [{'id': 'p1', 'network_id': 'n1', 'tenant_id': 'fake'},
+                 {'id': 'p2', 'network_id': 'n1',
+                  'tenant_id': 'somebody_else'}]
+        with mock.patch.object(self.plugin, 'get_networks') as get_networks:
+            result = policy.check_list(self.context, 'get_port', ports,
+                                       plugin=self.plugin)
+            self.assertEqual([port['id'] for port in result], ['p1'])
+        self.assertFalse(get_networks.called)
+
+    def test_check_target_without_tenant_id(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_owner")
+        target = {'id': 'p1', 'network_id': 'n1'}
+        self.assertFalse(policy.check(self.context, 'get_port', target))
+        self.assertEqual(
+            list(policy.check_list(self.context, 'get_port', [target])), [])
+
+    def test_check_target_without_tenant_id_other_branch(self):
+        self.rules['get_network'] = common_policy.parse_rule(
+            "rule:admin_or_owner or rule:shared")
+        target = {'id': 'n1', 'shared': True}
+        self.assertTrue(policy.check(self.context, 'get_network', target))
+        self.assertEqual(
+            list(policy.check_list(self.context, 'get_network', [target])),
+            [target])
+
+    def test_get_filters_for_owner(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_owner")
+        self.assertEqual(policy.get_filters(self.context, 'get_port'),
+                         {'tenant_id': ['fake']})
+
+    def test_get_filters_for_admin(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_owner")
+        admin_context = context.get_admin_context()
+        self.assertEqual(policy.get_filters(admin_context, 'get_port'), {})
+
+    def test_get_filters_with_and(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "tenant_id:%(tenant_id)s and rule:shared")
+        self.assertEqual(policy.get_filters(self.context, 'get_port'),
+                         {'tenant_id': ['fake'], 'shared': [True]})
+
+    def test_get_filters_not_expressible(self):
+        self.assertIsNone(policy.get_filters(self.context, 'get_network'))
+
     def test_get_roles_context_is_admin_rule_missing(self):
         rules = dict((k, common_policy.parse_rule(v)) for k, v in {
             "some_other_rule": "role:admin",
@@ -22,7 +22,9 @@ import subprocess
 import uuid
 
 import fixtures
+import mock
 
+from quantum.rootwrap import daemon
 from quantum.rootwrap import filters
 from quantum.rootwrap import wrapper
 from quantum.tests import base
@@ -364,3 +366,41 @@ class PathFilterTestCase(base.BaseTestCase):
                     os.path.realpath(self.TRAVERSAL_SYMLINK_WITHIN_DIR)]
 
         self.assertEqual(expected, self.f.get_command(args))
+
+
+class RootwrapDaemonTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        config = mock.Mock(exec_dirs=['/bin'], use_syslog=False)
+        self.daemon = daemon.RootwrapDaemon(
+            config, [filters.CommandFilter("/bin/cat", "root")])
+
+    def test_run_command(self):
+        result = self.daemon.run_command(['cat'], 'foo\n')
+        self.assertEqual(result, (0, 'foo\n', ''))
+
+    def test_run_command_unauthorized(self):
+        returncode, stdout, stderr = self.daemon.run_command(['ls', '/'])
+        self.assertEqual(returncode, daemon.RC_UNAUTHORIZED)
+        self.assertEqual(stdout, '')
+        self.assertIn('Unauthorized command', stderr)
+
+    def test_stats(self):
+        self.daemon.run_command(['cat'], '')
+        self.daemon.run_command(['cat'], '')
+        self.daemon.run_command(['ls', '/'])
+        stats = self.daemon.get_stats()
+        self.assertEqual(stats.keys(), ['cat'])
+        self.assertEqual(stats['cat']['count'], 2)
+        self.assertEqual(sum(stats['cat']['buckets'].values()), 2)
+
+    def test_latency_histogram(self):
+        histogram = daemon.LatencyHistogram()
+        for elapsed_ms in (0.5, 1, 7, 10000):
+            histogram.add(elapsed_ms)
+        result = histogram.to_dict()
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(result['buckets']['le_1'], 2)
+        self.assertEqual(result['buckets']['le_10'], 1)
+        self.assertEqual(result['buckets']['inf'], 1)
@@ -0,0 +1,74 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from quantum.scheduler import balancing
+from quantum.tests import base
+
+
+def _any_agent(resource_id, agent_id):
+    return True
+
+
+class TestHashRing(base.BaseTestCase):
+    def test_get_agent_is_stable(self):
+        ring = balancing.HashRing(['a', 'b', 'c'])
+        self.assertEqual(ring.get_agent('router1'),
+                         balancing.HashRing(['c', 'b', 'a']).get_agent(
+                             'router1'))
+
+    def test_get_agent_eligible(self):
+        ring = balancing.HashRing(['a', 'b', 'c'])
+        for i in range(20):
+            self.assertEqual('b', ring.get_agent('r%d' % i, set(['b'])))
+
+    def test_get_agent_empty(self):
+        self.assertIsNone(balancing.HashRing([]).get_agent('router1'))
+
+    def test_adding_agent_moves_few_resources(self):
+        placement = dict(('r%d' % i, None) for i in range(1000))
+        placement = balancing.hash_moves(placement, ['a', 'b', 'c'],
+                                         _any_agent)
+        moves = balancing.hash_moves(placement, ['a', 'b', 'c', 'd'],
+                                     _any_agent)
+        self.assertEqual(set(['d']), set(moves.values()))
+        self.assertTrue(150 < len(moves) < 350)
+
+
+class TestLevelLoads(base.BaseTestCase):
+    def test_level_loads(self):
+        placement = dict(('r%d' % i, 'a') for i in range(10))
+        moves = balancing.level_loads(placement, ['a', 'b', 'c'],
+                                      _any_agent)
+        placement.update(moves)
+        loads = [placement.values().count(agent) for agent in 'abc']
+        self.assertEqual([4, 3, 3], loads)
+
+    def test_level_loads_balanced(self):
+        placement = {'r1': 'a', 'r2': 'b'}
+        self.assertEqual({}, balancing.level_loads(placement, ['a', 'b'],
+                                                   _any_agent))
+
+    def test_level_loads_moves_from_removed_agent(self):
+        placement = {'r1': 'a', 'r2': 'gone'}
+        self.assertEqual({'r2': 'b'},
+                         balancing.level_loads(placement, ['a', 'b'],
+                                               _any_agent))
+
+    def test_level_loads_respects_candidates(self):
+        placement = {'r1': 'a', 'r2': 'a'}
+        self.assertEqual({}, balancing.level_loads(
+            placement, ['a', 'b'], lambda resource_id, agent_id: False))
@@ -29,6 +29,7 @@ from quantum.agent import securitygroups_rpc as sg_rpc
 from quantum import context
 from quantum.db import securitygroups_rpc_base as sg_db_rpc
 from quantum.extensions import securitygroup as ext_sg
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import proxy
 from quantum.tests import base
 from quantum.tests.unit import test_extension_security_group as test_sg
@@ -208,8 +209,8 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                              'remote_group_id': sg2_id,
                              'security_group_id': sg1_id},
                             ]
-                self.assertEqual(port_rpc['security_group_rules'],
-                                 expected)
+                self.assertEqual(sorted(port_rpc['security_group_rules']),
+                                 sorted(expected))
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
@@ -388,11 +389,143 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                              'remote_group_id': sg2_id,
                              'security_group_id': sg1_id},
                             ]
+                self.assertEqual(sorted(port_rpc['security_group_rules']),
+                                 sorted(expected))
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
+    def test_security_group_info_for_devices_ipv4_source_group(self):
+
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', 'tcp', '24',
+                    '25', remote_group_id=sg2_id)
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, 201)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+                devices = [port_id1, 'no_exist_device']
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                port_rpc = info['devices'][port_id1]
+                expected = [{'direction': 'egress', 'ethertype': 'IPv4',
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': 'IPv6',
+                             'security_group_id': sg1_id},
+                            {'direction': u'ingress',
+                             'protocol': u'tcp', 'ethertype': u'IPv4',
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
                 self.assertEqual(port_rpc['security_group_rules'],
                                  expected)
+                self.assertEqual(port_rpc['security_group_source_groups'],
+                                 [sg2_id])
+                self.assertEqual(info['sg_member_ips'],
+                                 {sg2_id: {'IPv4': [u'10.0.0.3'],
+                                           'IPv6': []}})
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_compiled_security_groups_cached_by_revision(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group()) as (subnet_v4, sg1):
+                sg1_id = sg1['security_group']['id']
+                ctx = context.get_admin_context()
+                compile_groups = mock.Mock(
+                    wraps=self.rpc._compile_security_groups)
+                self.rpc._compile_security_groups = compile_groups
+
+                groups = self.rpc._get_compiled_security_groups(ctx,
+                                                                [sg1_id])
+                self.assertEqual(len(groups[sg1_id]['rules']), 2)
+                self.rpc._get_compiled_security_groups(ctx, [sg1_id])
+                self.assertEqual(compile_groups.call_count, 1)
+
+                rule1 = self._build_security_group_rule(
+                    sg1_id, 'ingress', 'tcp', '22', '22')
+                res = self._create_security_group_rule(self.fmt, rule1)
+                self.assertEqual(res.status_int, 201)
+                groups = self.rpc._get_compiled_security_groups(ctx,
+                                                                [sg1_id])
+                self.assertEqual(compile_groups.call_count, 2)
+                self.assertEqual(len(groups[sg1_id]['rules']), 3)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                port_id1 = self.deserialize(self.fmt, res1)['port']['id']
+                groups = self.rpc._get_compiled_security_groups(ctx,
+                                                                [sg1_id])
+                self.assertEqual(compile_groups.call_count, 3)
+                self.assertEqual(groups[sg1_id]['member_ips']['IPv4'],
+                                 [u'10.0.0.2'])
+                self._delete('ports', port_id1)
+
+    def test_port_addresses_update_bumps_revisions(self):
+        plugin = mock.Mock(spec=sg_db_rpc.SecurityGroupServerRpcMixin)
+        ctx = context.get_admin_context()
+        original_port = {'fixed_ips': ['10.0.0.2'],
+                         'device_owner': 'compute:nova',
+                         ext_sg.SECURITYGROUPS: ['sg1']}
+        updated_port = {'fixed_ips': ['10.0.0.3'],
+                        'device_owner': 'compute:nova'}
+        sg_db_rpc.SecurityGroupServerRpcMixin.update_security_group_on_port(
+            plugin, ctx, 'port1', {'port': {}}, original_port, updated_port)
+        plugin._bump_security_group_revisions.assert_called_once_with(
+            ctx, ['sg1'])
+        # Telling whether to notify does not write anything
+        plugin.reset_mock()
+        self.assertTrue(
+            sg_db_rpc.SecurityGroupServerRpcMixin.
+            is_security_group_member_updated(plugin, ctx, original_port,
+                                             updated_port))
+        self.assertFalse(plugin._bump_security_group_revisions.called)
+
+    def test_compiled_security_groups_pruned(self):
+        ctx = context.get_admin_context()
+        with self.security_group() as sg1:
+            sg1_id = sg1['security_group']['id']
+            with self.security_group(name='sg2') as sg2:
+                sg2_id = sg2['security_group']['id']
+                self.rpc._get_compiled_security_groups(ctx, [sg1_id])
+                self.rpc._get_compiled_security_groups(ctx, [sg2_id])
+                self.assertEqual(
+                    set(self.rpc._compiled_security_groups),
+                    set([sg1_id, sg2_id]))
+            # Compiling a group past twice the size of the last pruning
+            # drops the deleted ones
+            with self.security_group(name='sg3') as sg3:
+                sg3_id = sg3['security_group']['id']
+                self.rpc._get_compiled_security_groups(ctx, [sg3_id])
+                self.assertEqual(set(self.rpc._compiled_security_groups),
+                                 set([sg1_id, sg3_id]))
+
 
 class SGServerRpcCallBackMixinTestCaseXML(SGServerRpcCallBackMixinTestCase):
     fmt = 'xml'
@@ -432,6 +565,7 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.root_helper = 'sudo'
         self.agent.init_firewall()
         self.firewall = mock.Mock()
+        self.firewall.uses_member_sets = False
         firewall_object = firewall_base.FirewallDriver()
         self.firewall.defer_apply.side_effect = firewall_object.defer_apply
         self.agent.firewall = self.firewall
@@ -446,6 +580,7 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
                                                       'fake_sgid2'}]}
         fake_devices = {'fake_device': self.fake_device}
         self.firewall.ports = fake_devices
+        rpc.security_group_info_for_devices.return_value = None
         rpc.security_group_rules_for_devices.return_value = fake_devices
 
     def test_prepare_and_remove_devices_filter(self):
@@ -501,6 +636,66 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
                  call.update_port_filter(self.fake_device)]
         self.firewall.assert_has_calls(calls)
 
+    def test_prepare_devices_filter_with_info(self):
+        fake_device = {'device': 'fake_device',
+                       'fixed_ips': ['10.0.0.3'],
+                       'security_groups': ['fake_sgid1'],
+                       'security_group_source_groups': ['fake_sgid2'],
+                       'security_group_rules': [{'direction': 'ingress',
+                                                 'ethertype': 'IPv4',
+                                                 'security_group_id':
+                                                 'fake_sgid1',
+                                                 'remote_group_id':
+                                                 'fake_sgid2'}]}
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': fake_device},
+            'sg_member_ips': {'fake_sgid2': {'IPv4': ['10.0.0.3',
+                                                     '10.0.0.4'],
+                                            'IPv6': ['fe80::1']}}}
+        self.agent.prepare_devices_filter(['fake_device'])
+        expected_rules = [{'direction': 'ingress',
+                           'ethertype': 'IPv4',
+                           'security_group_id': 'fake_sgid1',
+                           'remote_group_id': 'fake_sgid2',
+                           'source_ip_prefix': '10.0.0.4/32'}]
+        self.assertEqual(fake_device['security_group_rules'],
+                         expected_rules)
+        self.firewall.assert_has_calls([call.defer_apply(),
+                                        call.prepare_port_filter(
+                                            fake_device)])
+        self.assertFalse(rpc.security_group_rules_for_devices.called)
+
+    def test_prepare_devices_filter_with_member_sets(self):
+        self.firewall.uses_member_sets = True
+        rpc = self.agent.plugin_rpc
+        member_ips = {'IPv4': ['10.0.0.4'], 'IPv6': []}
+        rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': self.fake_device},
+            'sg_member_ips': {'fake_sgid2': member_ips}}
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.firewall.assert_has_calls(
+            [call.update_security_group_members('fake_sgid2', member_ips),
+             call.defer_apply(),
+             call.prepare_port_filter(self.fake_device)])
+
+    def test_security_groups_member_updated_with_member_sets(self):
+        self.firewall.uses_member_sets = True
+        self.agent.refresh_firewall = mock.Mock()
+        rpc = self.agent.plugin_rpc
+        member_ips = {'IPv4': ['10.0.0.4'], 'IPv6': []}
+        rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': self.fake_device},
+            'sg_member_ips': {'fake_sgid2': member_ips}}
+        self.agent.security_groups_member_updated(['fake_sgid2',
+                                                   'fake_sgid3'])
+        rpc.security_group_info_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', member_ips)
+        self.assertFalse(self.firewall.update_port_filter.called)
+        self.assertFalse(self.agent.refresh_firewall.called)
+
 
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
@@ -524,6 +719,26 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+             'method': 'security_group_info_for_devices',
+             'namespace': None},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
+    def test_security_group_info_for_devices_unsupported(self):
+        self.rpc.call.side_effect = rpc_common.RemoteError(
+            'UnsupportedRpcVersion')
+        self.assertIsNone(
+            self.rpc.security_group_info_for_devices(None, ['fake_device']))
+        self.assertIsNone(
+            self.rpc.security_group_info_for_devices(None, ['fake_device']))
+        self.assertEqual(self.rpc.call.call_count, 1)
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -1015,6 +1230,7 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
         self.mox.StubOutWithMock(self.iptables, "execute")
 
         self.rpc = mock.Mock()
+        self.rpc.security_group_info_for_devices.return_value = None
         self.agent.plugin_rpc = self.rpc
         rule1 = [{'direction': 'ingress',
                   'protocol': 'udp',
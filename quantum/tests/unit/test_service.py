@@ -0,0 +1,176 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from quantum.common import rpc as q_rpc
+from quantum import service
+from quantum.tests import base
+
+
+class TestTopicStats(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestTopicStats, self).setUp()
+        self.stats = q_rpc.TopicStats('q-plugin')
+
+    def test_collect(self):
+        self.stats.received()
+        self.stats.received()
+        self.stats.handled('report_state', 0.01)
+        self.stats.received()
+        self.stats.handled('report_state', 0.03)
+        self.stats.handled('get_device_details', 0.2)
+        stats = self.stats.collect()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['max_pending'], 2)
+        self.assertEqual(sorted(stats['methods']),
+                         ['get_device_details', 'report_state'])
+        report_state = stats['methods']['report_state']
+        self.assertEqual(report_state['count'], 2)
+        self.assertAlmostEqual(report_state['mean_ms'], 20)
+        self.assertAlmostEqual(report_state['max_ms'], 30)
+
+    def test_collect_resets(self):
+        self.stats.received()
+        self.stats.received()
+        self.stats.handled('report_state', 0.01)
+        self.stats.collect()
+        stats = self.stats.collect()
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['max_pending'], 1)
+        self.assertEqual(stats['methods'], {})
+
+
+class TestStatsDispatcher(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestStatsDispatcher, self).setUp()
+        stats_p = mock.patch.dict(q_rpc._TOPIC_STATS, clear=True)
+        stats_p.start()
+        self.addCleanup(stats_p.stop)
+        self.dispatcher = mock.Mock()
+        self.stats_dispatcher = q_rpc.StatsDispatcher('q-plugin',
+                                                      self.dispatcher)
+
+    def test_dispatch(self):
+        result = self.stats_dispatcher.dispatch('ctxt', '1.0', 'report_state',
+                                                None, agent_state={})
+        self.assertEqual(result, self.dispatcher.dispatch.return_value)
+        self.dispatcher.dispatch.assert_called_once_with(
+            'ctxt', '1.0', 'report_state', None, agent_state={})
+        stats = q_rpc.get_topic_stats('q-plugin').collect()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['methods']['report_state']['count'], 1)
+
+    def test_dispatch_failure(self):
+        self.dispatcher.dispatch.side_effect = ValueError
+        self.assertRaises(ValueError, self.stats_dispatcher.dispatch,
+                          'ctxt', '1.0', 'report_state', None)
+        stats = q_rpc.get_topic_stats('q-plugin').collect()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['methods']['report_state']['count'], 1)
+
+    def test_report_stats(self):
+        self.stats_dispatcher.dispatch('ctxt', '1.0', 'report_state', None)
+        with mock.patch.object(q_rpc, 'LOG') as log:
+            q_rpc.report_stats()
+        self.assertEqual(log.info.call_count, 2)
+
+
+class TestServeRpc(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestServeRpc, self).setUp()
+        self.plugin = mock.Mock()
+        get_plugin_p = mock.patch('quantum.manager.QuantumManager.'
+                                  'get_plugin', return_value=self.plugin)
+        get_plugin_p.start()
+        self.addCleanup(get_plugin_p.stop)
+        self.addCleanup(cfg.CONF.reset)
+
+    def test_serve_rpc_in_process(self):
+        cfg.CONF.set_override('rpc_stats_interval', 0)
+        self.assertIsNone(service.serve_rpc())
+        self.plugin.start_rpc_listener.assert_called_once_with()
+
+    def test_serve_rpc_workers(self):
+        cfg.CONF.set_override('rpc_workers', 2)
+        launcher = mock.Mock()
+        self.assertEqual(service.serve_rpc(launcher), launcher)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+        self.assertEqual(launcher.launch_service.call_count, 1)
+        rpc_worker = launcher.launch_service.call_args[0][0]
+        self.assertIsInstance(rpc_worker, service.RpcWorker)
+        self.assertEqual(launcher.launch_service.call_args[1],
+                         {'workers': 2})
+
+    def test_serve_rpc_workers_new_launcher(self):
+        cfg.CONF.set_override('rpc_workers', 2)
+        with mock.patch('quantum.wsgi.WorkerLauncher') as launcher_cls:
+            launcher = service.serve_rpc()
+        self.assertEqual(launcher, launcher_cls.return_value)
+        self.assertEqual(launcher.launch_service.call_count, 1)
+
+    def test_serve_rpc_unsupported_plugin(self):
+        cfg.CONF.set_override('rpc_workers', 2)
+        del self.plugin.start_rpc_listener
+        launcher = mock.Mock()
+        self.assertIsNone(service.serve_rpc(launcher))
+        self.assertFalse(launcher.launch_service.called)
+
+
+class TestRpcWorker(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRpcWorker, self).setUp()
+        self.addCleanup(cfg.CONF.reset)
+        self.plugin = mock.Mock()
+        self.worker = service.RpcWorker(self.plugin)
+
+    def test_start_stop(self):
+        with mock.patch('quantum.openstack.common.loopingcall.'
+                        'FixedIntervalLoopingCall') as looping_call:
+            self.worker.start()
+            looping_call.assert_called_once_with(q_rpc.report_stats)
+            reporter = looping_call.return_value
+            reporter.start.assert_called_once_with(interval=60,
+                                                   initial_delay=60)
+            self.worker.stop()
+        conn = self.plugin.start_rpc_listener.return_value
+        conn.close.assert_called_once_with()
+        reporter.stop.assert_called_once_with()
+        # wait returns once stopped
+        self.worker.wait()
+
+    def test_stop_closes_all_connections(self):
+        cfg.CONF.set_override('rpc_stats_interval', 0)
+        conns = [mock.Mock(), mock.Mock()]
+        self.plugin.start_rpc_listener.return_value = conns
+        self.worker.start()
+        self.worker.stop()
+        for conn in conns:
+            conn.close.assert_called_once_with()
+
+    def test_start_without_stats(self):
+        cfg.CONF.set_override('rpc_stats_interval', 0)
+        with mock.patch('quantum.openstack.common.loopingcall.'
+                        'FixedIntervalLoopingCall') as looping_call:
+            self.worker.start()
+        self.assertFalse(looping_call.called)
+        self.plugin.start_rpc_listener.assert_called_once_with()
@@ -15,7 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import errno
 import os
+import signal
 import socket
 import urllib2
 
@@ -28,6 +31,8 @@ import webob.exc
 from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as exception
+from quantum.openstack.common import jsonutils
+from quantum.openstack.common import service as common_service
 from quantum.tests import base
 from quantum import wsgi
 
@@ -92,6 +97,31 @@ class TestWSGIServer(base.BaseTestCase):
                             mock_listen.return_value)
                     ])
 
+    def test_start_with_workers(self):
+        server = wsgi.Server("test_workers")
+        with mock.patch.object(wsgi, 'WorkerLauncher') as launcher_cls:
+            server.start(None, 0, host="127.0.0.1", workers=2)
+            launcher = launcher_cls.return_value
+            launcher.launch_service.assert_called_once_with(server._server,
+                                                            workers=2)
+            self.assertIsInstance(server._server, wsgi.WorkerService)
+            server.stop()
+            server.wait()
+            launcher.wait.assert_called_once_with()
+        self.assertFalse(launcher.running)
+        self.assertEqual(0, server.pool.running())
+        server._socket.close()
+
+    def test_worker_service(self):
+        server = mock.Mock()
+        service = wsgi.WorkerService(server, 'app')
+        service.start()
+        server.pool.spawn.assert_called_once_with(server._run, 'app',
+                                                  server._socket)
+        service.stop()
+        server.pool.spawn.return_value.kill.assert_called_once_with()
+        server.pool.waitall.assert_called_once_with()
+
     def test_app(self):
         greetings = 'Hello, World!!!'
 
@@ -112,6 +142,47 @@ class TestWSGIServer(base.BaseTestCase):
         server.stop()
 
 
+class TestWorkerLauncher(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestWorkerLauncher, self).setUp()
+        signal_p = mock.patch('signal.signal')
+        self.signal = signal_p.start()
+        self.addCleanup(signal_p.stop)
+        self.launcher = wsgi.WorkerLauncher()
+        self.addCleanup(os.close, self.launcher.writepipe)
+
+    def test_sighup_handled(self):
+        self.signal.assert_any_call(signal.SIGHUP,
+                                    self.launcher._handle_sighup)
+
+    def test_start_child_closes_connections(self):
+        with contextlib.nested(
+            mock.patch.object(wsgi.db_api, 'dispose'),
+            mock.patch.object(wsgi.rpc, 'cleanup'),
+            mock.patch('os.fork', return_value=1234)
+        ) as (dispose, cleanup, fork):
+            self.launcher._start_child(
+                common_service.ServiceWrapper(mock.Mock(), 1))
+        dispose.assert_called_once_with()
+        cleanup.assert_called_once_with()
+        self.assertIn(1234, self.launcher.children)
+
+    def test_sighup_restarts_workers(self):
+        self.launcher.children = {1234: None, 1235: None}
+        with mock.patch('os.kill') as kill:
+            self.launcher._handle_sighup(signal.SIGHUP, None)
+        kill.assert_has_calls([mock.call(1234, signal.SIGTERM),
+                               mock.call(1235, signal.SIGTERM)],
+                              any_order=True)
+
+    def test_sighup_ignores_exited_workers(self):
+        self.launcher.children = {1234: None}
+        with mock.patch('os.kill',
+                        side_effect=OSError(errno.ESRCH, 'No such process')):
+            self.launcher._handle_sighup(signal.SIGHUP, None)
+
+
 class SerializerTest(base.BaseTestCase):
     def test_serialize_unknown_content_type(self):
         """Verify that exception InvalidContentType is raised."""
@@ -588,6 +659,20 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_json_collection_iter(self):
+        serializer = wsgi.JSONDictSerializer()
+        serializer.STREAM_CHUNK_SIZE = 10
+        items = iter([{'id': 'a'}, {'id': 'b'}, {'id': 'c'}])
+        chunks = list(serializer.serialize_collection_iter('ports', items))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(jsonutils.loads(''.join(chunks)),
+                         {'ports': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]})
+
+    def test_json_collection_iter_empty(self):
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.serialize_collection_iter('ports', []))
+        self.assertEqual(chunks, ['{"ports": []}'])
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
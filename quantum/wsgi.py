@@ -20,6 +20,7 @@ Utility methods for working with WSGI servers
 """
 import errno
 import os
+import signal
 import socket
 import ssl
 import sys
@@ -37,8 +38,11 @@ import webob.exc
 from quantum.common import constants
 from quantum.common import exceptions as exception
 from quantum import context
+from quantum.db import api as db_api
 from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import rpc
+from quantum.openstack.common import service as common_service
 
 socket_opts = [
     cfg.IntOpt('backlog',
@@ -74,6 +78,9 @@ CONF.register_opts(socket_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Seconds a stopping worker waits for its requests in progress to complete
+WORKER_SHUTDOWN_TIMEOUT = 60
+
 
 def run_server(application, port):
     """Run a WSGI server with the given application."""
@@ -81,12 +88,79 @@ def run_server(application, port):
     eventlet.wsgi.server(sock, application)
 
 
+class WorkerService(object):
+    """Serve a WSGI application from a worker process.
+
+    Started in the worker processes forked by a WorkerLauncher, which
+    all accept the connections of the listening socket of the server.
+    """
+
+    def __init__(self, server, application):
+        self._server = server
+        self._application = application
+        self._thread = None
+
+    def start(self):
+        self._thread = self._server.pool.spawn(self._server._run,
+                                               self._application,
+                                               self._server._socket)
+
+    def wait(self):
+        self._server.pool.waitall()
+
+    def stop(self):
+        """Stop accepting connections and complete the requests."""
+        if self._thread is None:
+            return
+        self._thread.kill()
+        self._thread = None
+        with eventlet.Timeout(WORKER_SHUTDOWN_TIMEOUT, False):
+            self._server.pool.waitall()
+
+
+class WorkerLauncher(common_service.ProcessLauncher):
+    """Fork the worker processes and respawn the ones which exit.
+
+    On SIGHUP the workers are restarted: each one stops accepting
+    connections, exits once its requests are completed and is replaced
+    by a new worker.
+    """
+
+    def __init__(self):
+        super(WorkerLauncher, self).__init__()
+        signal.signal(signal.SIGHUP, self._handle_sighup)
+
+    def _handle_sighup(self, signo, frame):
+        LOG.info(_('Caught SIGHUP, restarting %d workers'),
+                 len(self.children))
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError as exc:
+                if exc.errno != errno.ESRCH:
+                    raise
+
+    def _start_child(self, wrap):
+        # The database and AMQP connections of this process must not be
+        # shared with the child, which would open its own, so they are
+        # closed and opened again on their next use
+        db_api.dispose()
+        rpc.cleanup()
+        return super(WorkerLauncher, self)._start_child(wrap)
+
+    def _child_process(self, service):
+        # Hangups are handled by the parent
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        super(WorkerLauncher, self)._child_process(service)
+
+
 class Server(object):
     """Server class to manage multiple WSGI sockets and applications."""
 
     def __init__(self, name, threads=1000):
         self.pool = eventlet.GreenPool(threads)
         self.name = name
+        self._launcher = None
 
     def _get_socket(self, host, port, backlog):
         bind_addr = (host, port)
@@ -165,8 +239,13 @@ class Server(object):
 
         return sock
 
-    def start(self, application, port, host='0.0.0.0'):
-        """Run a WSGI server with the given application."""
+    def start(self, application, port, host='0.0.0.0', workers=0):
+        """Run a WSGI server with the given application.
+
+        With workers, the application is served by as many forked
+        processes sharing the listening socket, the calling process only
+        supervising them.
+        """
         self._host = host
         self._port = port
         backlog = CONF.backlog
@@ -174,7 +253,13 @@ class Server(object):
         self._socket = self._get_socket(self._host,
                                         self._port,
                                         backlog=backlog)
-        self._server = self.pool.spawn(self._run, application, self._socket)
+        if workers < 1:
+            self._server = self.pool.spawn(self._run, application,
+                                           self._socket)
+        else:
+            self._launcher = WorkerLauncher()
+            self._server = WorkerService(self, application)
+            self._launcher.launch_service(self._server, workers=workers)
 
     @property
     def host(self):
@@ -184,13 +269,25 @@ class Server(object):
     def port(self):
         return self._socket.getsockname()[1] if self._socket else self._port
 
+    @property
+    def launcher(self):
+        """The WorkerLauncher of the workers, None without workers."""
+        return self._launcher
+
     def stop(self):
-        self._server.kill()
+        if self._launcher is None:
+            self._server.kill()
+        else:
+            # wait() then stops the workers
+            self._launcher.running = False
 
     def wait(self):
         """Wait until all servers have completed running."""
         try:
-            self.pool.waitall()
+            if self._launcher is None:
+                self.pool.waitall()
+            else:
+                self._launcher.wait()
         except KeyboardInterrupt:
             pass
 
@@ -332,11 +429,35 @@ class DictSerializer(ActionDispatcher):
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization."""
 
+    # Minimum size of the chunks of a streamed response
+    STREAM_CHUNK_SIZE = 65536
+
     def default(self, data):
         def sanitizer(obj):
             return unicode(obj)
         return jsonutils.dumps(data, default=sanitizer)
 
+    def serialize_collection_iter(self, collection, items):
+        """Yield the JSON of {collection: items} by chunks.
+
+        Items are serialized one at a time as they are produced, so the
+        whole list is never held in memory.
+        """
+        chunk = ['{%s: [' % self.default(collection)]
+        size = 0
+        for i, item in enumerate(items):
+            data = self.default(item)
+            if i:
+                data = ', ' + data
+            chunk.append(data)
+            size += len(data)
+            if size >= self.STREAM_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        chunk.append(']}')
+        yield ''.join(chunk)
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the API throughput of the server with api_workers processes.
+
+For each --workers count, the API is served by the database plugin
+without authentication nor message broker, --networks networks are
+created and --clients client processes then list them --requests times
+in total:
+
+    tools/api_benchmark.py --workers 0 2 4 8 --clients 32 --requests 4000
+
+The requests and their latencies are timed on the client side. Without
+--connection the database is a sqlite file, which is fine for the read
+only load of the clients.
+"""
+
+import argparse
+import httplib
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from oslo.config import cfg
+
+from quantum.common import config
+from quantum import quota  # noqa
+from quantum import wsgi
+
+
+ETC_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'etc')
+
+
+def serve(args, workers, connection):
+    cfg.CONF([], project='quantum')
+    cfg.CONF.set_override('core_plugin',
+                          'quantum.db.db_base_plugin_v2.QuantumDbPluginV2')
+    cfg.CONF.set_override('auth_strategy', 'noauth')
+    cfg.CONF.set_override('api_paste_config',
+                          os.path.abspath(os.path.join(ETC_DIR,
+                                                       'api-paste.ini')))
+    cfg.CONF.set_override('policy_file',
+                          os.path.abspath(os.path.join(ETC_DIR,
+                                                       'policy.json')))
+    cfg.CONF.set_override('sql_connection', connection, 'DATABASE')
+    cfg.CONF.set_override('quota_network', -1, 'QUOTAS')
+    # The agent notifications are dropped
+    cfg.CONF.set_override('rpc_backend',
+                          'quantum.openstack.common.rpc.impl_fake')
+    app = config.load_paste_app('quantum')
+    server = wsgi.Server('api-benchmark')
+    server.start(app, args.port, '127.0.0.1', workers=workers)
+    server.wait()
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start listening on port %d' % port)
+
+
+def request(conn, method, path, body=None):
+    conn.request(method, path, body and json.dumps(body),
+                 {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = response.read()
+    if response.status >= 400:
+        raise RuntimeError('%s %s failed: %d %s' % (method, path,
+                                                     response.status, data))
+    return data
+
+
+def populate(args):
+    conn = httplib.HTTPConnection('127.0.0.1', args.port)
+    for i in xrange(args.networks):
+        request(conn, 'POST', '/v2.0/networks',
+                {'network': {'name': 'bench-%d' % i,
+                             'tenant_id': 'bench'}})
+    conn.close()
+
+
+def client(job):
+    port, count = job
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    latencies = []
+    for i in xrange(count):
+        start = time.time()
+        request(conn, 'GET', '/v2.0/networks')
+        latencies.append(time.time() - start)
+    conn.close()
+    return latencies
+
+
+def measure(args, workers, pool):
+    tmpdir = tempfile.mkdtemp(prefix='api-benchmark-')
+    connection = args.connection or 'sqlite:///%s' % os.path.join(
+        tmpdir, 'quantum.db')
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            serve(args, workers, connection)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        os._exit(status)
+    try:
+        wait_for_port(args.port)
+        populate(args)
+        # Clients connect again for each worker count, no warm up is
+        # needed beyond the population requests
+        per_client = args.requests // args.clients
+        start = time.time()
+        results = pool.map(client, [(args.port, per_client)] * args.clients)
+        elapsed = time.time() - start
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    latencies = sorted(latency for result in results for latency in result)
+    print('workers %2d: %6d requests in %7.2fs, %7.1f req/s, '
+          'p50 %6.1fms, p99 %6.1fms' % (
+              workers, len(latencies), elapsed, len(latencies) / elapsed,
+              latencies[len(latencies) // 2] * 1000,
+              latencies[int(len(latencies) * 0.99)] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        help='SQLAlchemy URL of an empty scratch database')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4],
+                        help='api_workers values to measure')
+    parser.add_argument('--clients', type=int, default=32,
+                        help='concurrent client processes')
+    parser.add_argument('--requests', type=int, default=4000,
+                        help='network list requests for each measure')
+    parser.add_argument('--networks', type=int, default=50,
+                        help='networks returned by each list request')
+    parser.add_argument('--port', type=int, default=19696)
+    args = parser.parse_args()
+
+    # The client processes are forked before the servers
+    pool = multiprocessing.Pool(args.clients)
+    try:
+        for workers in args.workers:
+            measure(args, workers, pool)
+    finally:
+        pool.terminate()
+
+if __name__ == '__main__':
+    main()
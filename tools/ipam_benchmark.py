@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure concurrent IP allocation throughput of the IPAM drivers.
+
+Every worker thread repeatedly allocates --batch addresses in one
+transaction, records them as IPAllocation rows and, with --churn, returns
+part of them to the pool again to fragment the free space. Row locks are
+only meaningful on a real database server, for instance:
+
+    tools/ipam_benchmark.py --connection mysql://user:pw@host/bench \\
+        --workers 16 --allocations 4096 --cidr 10.0.0.0/16
+
+Transactions failing with a database error such as a deadlock are
+retried. Without --connection an in-memory sqlite database is used, which
+only supports a single worker and measures the per-allocation cost.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from oslo.config import cfg
+from sqlalchemy import exc as sql_exc
+
+from quantum.api.v2 import attributes
+from quantum.common import config  # noqa
+from quantum import context
+from quantum.db import api as db
+from quantum.db import db_base_plugin_v2
+from quantum.db.ipam import driver as ipam_driver
+from quantum.db.ipam import stripe_driver
+from quantum.db import models_v2
+
+
+DRIVERS = {
+    'range': 'quantum.db.ipam.range_driver.AvailabilityRangeDriver',
+    'stripe': 'quantum.db.ipam.stripe_driver.StripedIpamDriver',
+}
+
+
+def create_subnet(plugin, ctx, cidr):
+    network = plugin.create_network(ctx, {'network': {
+        'name': 'ipam-bench', 'admin_state_up': True,
+        'tenant_id': 'bench', 'shared': False}})
+    return plugin.create_subnet(ctx, {'subnet': {
+        'name': 'ipam-bench', 'tenant_id': 'bench',
+        'network_id': network['id'], 'cidr': cidr, 'ip_version': 4,
+        'enable_dhcp': False,
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED}})
+
+
+def worker(plugin, subnet, transactions, args, stats):
+    ctx = context.get_admin_context()
+    done = 0
+    while done < transactions:
+        try:
+            with ctx.session.begin(subtransactions=True):
+                ips = plugin._generate_ips(ctx, [subnet], args.batch)
+                for ip in ips:
+                    ctx.session.add(models_v2.IPAllocation(
+                        network_id=subnet['network_id'], **ip))
+            if args.churn and random.random() < args.churn:
+                with ctx.session.begin(subtransactions=True):
+                    ip = random.choice(ips)
+                    plugin._recycle_ip(ctx, subnet['network_id'],
+                                       ip['subnet_id'], ip['ip_address'])
+            done += 1
+        except sql_exc.OperationalError:
+            ctx.session.rollback()
+            stats['retries'] += 1
+            time.sleep(0.001)
+
+
+def count_fragments(ctx, subnet_id):
+    ranges = ctx.session.query(models_v2.IPAvailabilityRange).join(
+        models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id).count()
+    stripes = ctx.session.query(stripe_driver.IPAvailabilityStripe).join(
+        models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id)
+    return ranges + sum(len(stripe_driver.decode_runs(s['free_runs']))
+                        for s in stripes)
+
+
+def run(name, args):
+    cfg.CONF.set_override('ipam_driver', DRIVERS[name])
+    ipam_driver.reset_ipam_driver()
+    plugin = db_base_plugin_v2.QuantumDbPluginV2()
+    db.register_models()
+    ctx = context.get_admin_context()
+    subnet = create_subnet(plugin, ctx, args.cidr)
+
+    transactions = args.allocations // (args.batch * args.workers)
+    stats = {'retries': 0}
+    threads = [threading.Thread(target=worker,
+                                args=(plugin, subnet, transactions, args,
+                                      stats))
+               for i in range(args.workers)]
+    start = time.time()
+    if args.workers == 1:
+        worker(plugin, subnet, transactions, args, stats)
+    else:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.time() - start
+
+    allocated = transactions * args.workers * args.batch
+    print('%-7s %8d addresses in %7.2fs: %9.1f/s, %d retries, '
+          '%d free runs' % (name, allocated, elapsed, allocated / elapsed,
+                            stats['retries'],
+                            count_fragments(ctx, subnet['id'])))
+    db.clear_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        help='SQLAlchemy URL of an empty scratch database')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--allocations', type=int, default=2048,
+                        help='addresses to allocate per driver')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='addresses allocated per transaction')
+    parser.add_argument('--churn', type=float, default=0.0,
+                        help='probability of releasing an address again '
+                             'after each transaction')
+    parser.add_argument('--cidr', default='10.0.0.0/16')
+    parser.add_argument('--drivers', nargs='+', default=sorted(DRIVERS),
+                        choices=sorted(DRIVERS))
+    args = parser.parse_args()
+
+    cfg.CONF([], project='quantum')
+    if not args.connection:
+        # Every thread would get its own in-memory database
+        args.workers = 1
+    cfg.CONF.set_override('sql_connection', args.connection or 'sqlite://',
+                          'DATABASE')
+    for name in args.drivers:
+        run(name, args)
+
+if __name__ == '__main__':
+    main()
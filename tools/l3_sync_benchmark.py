@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the L3 agent router sync query against the plugin call path.
+
+Every router gets a gateway port, --interfaces internal interfaces and
+--floatingips floating IPs, inserted directly as rows. The full sync of
+all routers is then timed with get_sync_data and with the former
+composition of get_routers, get_ports and get_floatingips calls, along
+with the number of SQL statements each runs:
+
+    tools/l3_sync_benchmark.py --routers 100 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy
+
+from quantum.common import config  # noqa
+from quantum.common import constants
+from quantum import context
+from quantum.db import api as db
+from quantum.db import db_base_plugin_v2
+from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.openstack.common import uuidutils
+
+
+# Internal subnets are consecutive /28s from here
+INTERNAL_BASE = netaddr.IPAddress('172.16.0.0').value
+
+
+class L3Plugin(db_base_plugin_v2.QuantumDbPluginV2,
+               l3_db.L3_NAT_db_mixin):
+    pass
+
+
+def legacy_sync(plugin, ctx):
+    routers = plugin._get_sync_routers(ctx)
+    router_ids = [router['id'] for router in routers]
+    return plugin._process_sync_data(
+        routers,
+        plugin.get_sync_interfaces(ctx, router_ids),
+        plugin._get_sync_floating_ips(ctx, router_ids))
+
+
+def add_port(session, network_id, subnet_id, ip, device_id, device_owner):
+    port_id = uuidutils.generate_uuid()
+    session.add(models_v2.Port(
+        id=port_id, tenant_id='bench', name='', network_id=network_id,
+        mac_address='fa:16:3e:%02x:%02x:%02x' % (
+            (ip.value >> 16) & 0xff, (ip.value >> 8) & 0xff, ip.value & 0xff),
+        admin_state_up=True, status='ACTIVE', device_id=device_id,
+        device_owner=device_owner))
+    session.add(models_v2.IPAllocation(
+        port_id=port_id, ip_address=str(ip), subnet_id=subnet_id,
+        network_id=network_id))
+    # The models lack the relationships which would order the inserts
+    # after the ones of the rows they reference
+    session.flush()
+    return port_id
+
+
+def add_subnet(session, cidr):
+    network_id = uuidutils.generate_uuid()
+    subnet_id = uuidutils.generate_uuid()
+    session.add(models_v2.Network(
+        id=network_id, tenant_id='bench', name='bench', status='ACTIVE',
+        admin_state_up=True, shared=False))
+    session.add(models_v2.Subnet(
+        id=subnet_id, tenant_id='bench', name='bench',
+        network_id=network_id, ip_version=4, cidr=cidr,
+        gateway_ip=str(netaddr.IPNetwork(cidr)[1]), enable_dhcp=False,
+        shared=False))
+    session.flush()
+    return network_id, subnet_id
+
+
+def populate(ctx, args):
+    session = ctx.session
+    with session.begin():
+        ext_net_id, ext_subnet_id = add_subnet(session, '10.0.0.0/8')
+        session.add(l3_db.ExternalNetwork(network_id=ext_net_id))
+    ext_ips = netaddr.IPNetwork('10.0.0.0/8').iter_hosts()
+    ext_ips.next()
+    for i in xrange(args.routers):
+        with session.begin():
+            router_id = uuidutils.generate_uuid()
+            gw_port_id = add_port(session, ext_net_id, ext_subnet_id,
+                                  ext_ips.next(), router_id,
+                                  constants.DEVICE_OWNER_ROUTER_GW)
+            session.add(l3_db.Router(
+                id=router_id, tenant_id='bench', name='bench',
+                status='ACTIVE', admin_state_up=True,
+                gw_port_id=gw_port_id))
+            for j in xrange(args.interfaces):
+                cidr = netaddr.IPNetwork('%s/28' % netaddr.IPAddress(
+                    INTERNAL_BASE + (i * args.interfaces + j) * 16))
+                network_id, subnet_id = add_subnet(session, str(cidr))
+                add_port(session, network_id, subnet_id, cidr[1], router_id,
+                         constants.DEVICE_OWNER_ROUTER_INTF)
+                for k in xrange(args.floatingips):
+                    vm_port_id = add_port(session, network_id, subnet_id,
+                                          cidr[2 + k], 'vm',
+                                          'compute:bench')
+                    ip = ext_ips.next()
+                    fip_port_id = add_port(
+                        session, ext_net_id, ext_subnet_id, ip, 'fip',
+                        constants.DEVICE_OWNER_FLOATINGIP)
+                    session.add(l3_db.FloatingIP(
+                        id=uuidutils.generate_uuid(), tenant_id='bench',
+                        floating_ip_address=str(ip),
+                        floating_network_id=ext_net_id,
+                        floating_port_id=fip_port_id,
+                        fixed_port_id=vm_port_id,
+                        fixed_ip_address=str(cidr[2 + k]),
+                        router_id=router_id))
+
+
+def measure(name, sync, plugin, ctx, count, statements):
+    del statements[:]
+    start = time.time()
+    routers = sync(plugin, ctx)
+    elapsed = time.time() - start
+    assert len(routers) == count
+    print('%-7s %6d routers in %7.2fs: %6d statements' % (
+        name, count, elapsed, len(statements)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        help='SQLAlchemy URL of an empty scratch database')
+    parser.add_argument('--routers', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    parser.add_argument('--interfaces', type=int, default=2,
+                        help='internal interfaces per router')
+    parser.add_argument('--floatingips', type=int, default=1,
+                        help='floating IPs per interface')
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='only time get_sync_data')
+    args = parser.parse_args()
+
+    cfg.CONF([], project='quantum')
+    cfg.CONF.set_override('sql_connection', args.connection or 'sqlite://',
+                          'DATABASE')
+    for count in args.routers:
+        args.routers = count
+        plugin = L3Plugin()
+        db.register_models()
+        ctx = context.get_admin_context()
+        populate(ctx, args)
+        statements = []
+        sqlalchemy.event.listen(
+            ctx.session.get_bind(), 'before_cursor_execute',
+            lambda conn, cursor, statement, *args: statements.append(
+                statement))
+        measure('sync', lambda plugin, ctx: plugin.get_sync_data(ctx),
+                plugin, ctx, count, statements)
+        if not args.skip_legacy:
+            measure('legacy', legacy_sync, plugin, ctx, count, statements)
+        db.clear_db()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the OVS plugin tunnel allocation on large tunnel id ranges.
+
+For each --tunnels range size, the tunnel ranges table is synchronized
+with the range 1:size, as the server does when it starts, --networks
+tunnels are reserved, half of them released in random order and
+reserved again, then the range is synchronized again with --networks
+tunnels allocated:
+
+    tools/segment_allocation_benchmark.py --tunnels 4096 1048576 16777216
+
+The number of range rows left in the table shows how fragmented the
+pool gets.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from oslo.config import cfg
+
+from quantum.common import config  # noqa
+from quantum.db import api as db
+from quantum.plugins.openvswitch import ovs_db_v2
+from quantum.plugins.openvswitch import ovs_models_v2
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def reserve(session, count):
+    return [ovs_db_v2.reserve_tunnel(session) for i in xrange(count)]
+
+
+def release(session, tunnel_ids, tunnel_id_ranges):
+    for tunnel_id in tunnel_ids:
+        ovs_db_v2.release_tunnel(session, tunnel_id, tunnel_id_ranges)
+
+
+def measure(args, size):
+    tunnel_id_ranges = [(1, size)]
+    session = db.get_session()
+    _, sync = timed(ovs_db_v2.sync_tunnel_allocations, tunnel_id_ranges)
+    tunnel_ids, reserved = timed(reserve, session, args.networks)
+    random.shuffle(tunnel_ids)
+    released = tunnel_ids[:len(tunnel_ids) // 2]
+    _, freed = timed(release, session, released, tunnel_id_ranges)
+    _, reserved_again = timed(reserve, session, len(released))
+    _, resync = timed(ovs_db_v2.sync_tunnel_allocations, tunnel_id_ranges)
+    rows = session.query(ovs_models_v2.TunnelRange).count()
+    print('tunnels %9d: sync %6.3fs, %d reserves %6.2fs, %d releases '
+          '%6.2fs, %d reserves %6.2fs, resync %6.3fs, %d ranges' % (
+              size, sync, args.networks, reserved, len(released), freed,
+              len(released), reserved_again, resync, rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection',
+                        help='SQLAlchemy URL of an empty scratch database')
+    parser.add_argument('--tunnels', type=int, nargs='+',
+                        default=[4096, 1 << 20, 1 << 24],
+                        help='sizes of the tunnel id range')
+    parser.add_argument('--networks', type=int, default=1000,
+                        help='tunnels reserved on each range')
+    args = parser.parse_args()
+
+    cfg.CONF([], project='quantum')
+    cfg.CONF.set_override('sql_connection', args.connection or 'sqlite://',
+                          'DATABASE')
+    random.seed(0)
+    for size in args.tunnels:
+        ovs_db_v2.initialize()
+        measure(args, size)
+        db.clear_db()
+
+if __name__ == '__main__':
+    main()